@@ -1,12 +1,118 @@
-"""The main module showing a simple example of how to use the wrapper"""
+"""
+The main module showing a simple example of how to use the wrapper
+
+Without arguments, a single server is started in the foreground, reading commands from the console.
+Servers can also be managed by a daemon, which is controlled by short-lived clients:
+
+    python -m mcserverwrapper.main daemon /tmp/mcserverwrapper.sock --stream-port 8080
+    python -m mcserverwrapper.main ctl /tmp/mcserverwrapper.sock start lobby /srv/lobby/server.jar
+    python -m mcserverwrapper.main ctl /tmp/mcserverwrapper.sock command lobby "/say hi"
+    python -m mcserverwrapper.main ctl /tmp/mcserverwrapper.sock status
+    python -m mcserverwrapper.main ctl /tmp/mcserverwrapper.sock tail lobby --follow
+    python -m mcserverwrapper.main ctl /tmp/mcserverwrapper.sock stop lobby
+
+The disk usage of a world can be analyzed without a running server:
+
+    python -m mcserverwrapper.main world usage /srv/lobby/world --top 10
+    python -m mcserverwrapper.main world prune /srv/lobby/world --min-inhabited 1200 --protect overworld:-500,-500,500,500
+    python -m mcserverwrapper.main world compact /srv/lobby/world --level 9
+
+The stored mod loading profiles of a Forge server show which mods got slower since the previous boot:
+
+    python -m mcserverwrapper.main boots /srv/modpack --top 10
+"""
+
+import argparse
+import json
+import os
+import sys
 
 from mcserverwrapper import Wrapper
 
 # pylint: disable=C0103
 
-def main():
+# pylint: disable-next=too-many-statements
+def main(args=None):
     """Main function"""
 
+    parser = argparse.ArgumentParser(prog="mcserverwrapper")
+    modes = parser.add_subparsers(dest="mode")
+
+    daemon_parser = modes.add_parser("daemon", help="run a daemon which manages servers")
+    daemon_parser.add_argument("socket", help="the path of the unix socket to listen on")
+    daemon_parser.add_argument("--stream-port", type=int, default=None,
+                               help="stream the console of all servers over http on this port")
+    daemon_parser.add_argument("--stream-host", default="127.0.0.1")
+    daemon_parser.add_argument("--stream-token", default=None,
+                               help="the token http clients have to send, a random token is printed if not set")
+    daemon_parser.add_argument("--stream-origin", action="append", default=[],
+                               help="the origin of a web page which may connect, e.g. https://panel.example.com")
+
+    ctl_parser = modes.add_parser("ctl", help="send a request to a running daemon")
+    ctl_parser.add_argument("socket", help="the path of the unix socket the daemon listens on")
+    actions = ctl_parser.add_subparsers(dest="action", required=True)
+    start_parser = actions.add_parser("start")
+    start_parser.add_argument("name")
+    start_parser.add_argument("jar")
+    start_parser.add_argument("--start-command", default=None)
+    start_parser.add_argument("--no-wait", action="store_true")
+    actions.add_parser("stop").add_argument("name")
+    command_parser = actions.add_parser("command")
+    command_parser.add_argument("name")
+    command_parser.add_argument("command")
+    actions.add_parser("status").add_argument("name", nargs="?")
+    tail_parser = actions.add_parser("tail")
+    tail_parser.add_argument("name")
+    tail_parser.add_argument("-n", "--lines", type=int, default=20)
+    tail_parser.add_argument("-f", "--follow", action="store_true")
+    actions.add_parser("shutdown")
+
+    world_parser = modes.add_parser("world", help="analyze and maintain world files")
+    world_actions = world_parser.add_subparsers(dest="world_action", required=True)
+    usage_parser = world_actions.add_parser("usage", help="show the disk usage per dimension and region")
+    usage_parser.add_argument("world", help="the world directory")
+    usage_parser.add_argument("--top", type=int, default=10, help="the amount of largest regions to show")
+    usage_parser.add_argument("--cache", default=None, help="the json file caching the results between scans")
+    usage_parser.add_argument("--workers", type=int, default=None)
+    prune_parser = world_actions.add_parser("prune", help="drop rarely visited chunks of a stopped server")
+    prune_parser.add_argument("world", help="the world directory")
+    prune_parser.add_argument("--min-inhabited", type=int, required=True,
+                              help="drop chunks players spent fewer ticks in, 20 ticks are one second")
+    prune_parser.add_argument("--protect", type=_protected_area, action="append", default=[], metavar="DIMENSION:X1,Z1,X2,Z2",
+                              help="keep all chunks in this area, given in block coordinates")
+    prune_parser.add_argument("--apply", action="store_true",
+                              help="rewrite the region files, without this only a report is shown")
+    prune_parser.add_argument("--workers", type=int, default=None)
+    compact_parser = world_actions.add_parser("compact", help="rewrite the region files of a stopped server compactly")
+    compact_parser.add_argument("world", help="the world directory")
+    compact_parser.add_argument("--level", type=int, default=None, choices=range(1, 10), metavar="1-9",
+                                help="recompress chunks with this zlib level, if the result is smaller")
+    compact_parser.add_argument("--workers", type=int, default=None)
+
+    _add_boots_parser(modes)
+
+    parsed = parser.parse_args(args)
+
+    if parsed.mode == "daemon":
+        run_daemon(parsed)
+    elif parsed.mode == "ctl":
+        return run_client(parsed)
+    elif parsed.mode == "world":
+        return run_world(parsed)
+    elif parsed.mode == "boots":
+        return run_boots(parsed)
+    else:
+        run_foreground()
+    return 0
+
+def _add_boots_parser(modes):
+    boots_parser = modes.add_parser("boots", help="show the mod loading profile of the last boots of a Forge server")
+    boots_parser.add_argument("server", help="the server directory")
+    boots_parser.add_argument("--top", type=int, default=10, help="the amount of slowest mods and largest changes to show")
+
+def run_foreground():
+    """Start the server.jar in the current directory and pass console input to it"""
+
     wrapper = Wrapper()
 
     try:
@@ -20,5 +126,180 @@ def main():
         wrapper.stop()
         raise e
 
+def run_daemon(parsed):
+    """Run a daemon until it receives a shutdown request"""
+
+    # pylint: disable=import-outside-toplevel
+    from mcserverwrapper.src.daemon import Daemon
+    from mcserverwrapper.src.streaming import ConsoleStreamServer
+    # pylint: enable=import-outside-toplevel
+
+    stream_server = None
+    if parsed.stream_port is not None:
+        stream_server = ConsoleStreamServer(parsed.stream_host, parsed.stream_port, parsed.stream_token,
+                                            allowed_origins=parsed.stream_origin)
+        if parsed.stream_token is None:
+            print(f"Stream token: {stream_server.token}")
+    Daemon(parsed.socket, stream_server).serve_forever()
+
+def run_client(parsed):
+    """Send the parsed request to a daemon and print the response"""
+
+    # pylint: disable-next=import-outside-toplevel
+    from mcserverwrapper.src.daemon import DaemonError, send_request, stream_request
+
+    request = {key: value for key, value in vars(parsed).items()
+               if key not in ["mode", "socket", "start_command", "no_wait"] and value is not None}
+    if parsed.action == "start":
+        request["wait"] = not parsed.no_wait
+        if parsed.start_command is not None:
+            request["start_command"] = parsed.start_command
+
+    try:
+        if parsed.action == "tail":
+            for response in stream_request(parsed.socket, request):
+                if "line" in response:
+                    print(response["line"])
+                elif not response.get("ok", True):
+                    raise DaemonError(response.get("error"))
+                else:
+                    print("\n".join(response["lines"]))
+        else:
+            print(json.dumps(send_request(parsed.socket, request), indent=2))
+    except DaemonError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+def run_world(parsed):
+    """Run a world maintenance action"""
+
+    # pylint: disable-next=import-outside-toplevel
+    from mcserverwrapper.src.error import ServerRunningError
+
+    try:
+        if parsed.world_action == "prune":
+            return _run_world_prune(parsed)
+        if parsed.world_action == "compact":
+            return _run_world_compact(parsed)
+    except ServerRunningError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    # pylint: disable-next=import-outside-toplevel
+    from mcserverwrapper.src.world.region_analyzer import RegionAnalyzer
+
+    report = RegionAnalyzer(parsed.world, parsed.cache, parsed.workers).analyze()
+    print(f"{'dimension':<32} {'kind':<9} {'files':>6} {'chunks':>8} {'size':>10} {'fragmented':>10}")
+    for entry in report.dimensions():
+        print(f"{entry.dimension:<32} {entry.kind:<9} {entry.file_count:>6} {entry.chunk_count:>8} "
+              f"{_format_size(entry.file_size):>10} {entry.fragmentation:>10.1%}")
+    print(f"\nLargest regions (total {_format_size(report.total_size)}, {report.scanned} files scanned):")
+    for region in report.largest(parsed.top):
+        print(f"{region.path:<48} {region.chunk_count:>5} chunks {_format_size(region.file_size):>10} "
+              f"{region.fragmentation:>7.1%} fragmented" + (f" ({region.error})" if region.error else ""))
+    return 0
+
+def run_boots(parsed):
+    """Print the latest boot profile, and its changes against the boot before"""
+
+    # pylint: disable-next=import-outside-toplevel
+    from mcserverwrapper.src.server.mod_profiler import PROFILE_DIR_NAME, ProfileStore, compare_profiles
+
+    profiles = ProfileStore(os.path.join(parsed.server, PROFILE_DIR_NAME)).latest(2)
+    if len(profiles) == 0:
+        print("No boots were profiled yet")
+        return 1
+
+    latest = profiles[-1]
+    print(f"Boot took {latest.total:.2f}s with {len(latest.mod_files)} mod files")
+    for phase, seconds in latest.phases.items():
+        print(f"{phase:<32} {seconds:>8.2f}s")
+    print("\nSlowest mods:")
+    for timing in latest.slowest_mods(parsed.top):
+        print(f"{timing.mod:<48} {timing.total:>8.2f}s")
+
+    if len(profiles) == 2:
+        previous = profiles[0]
+        print(f"\nChanges since the previous boot ({previous.total:.2f}s):")
+        for change in compare_profiles(previous, latest)[:parsed.top]:
+            print(f"{change.kind:<6} {change.name:<48} {change.delta:>+8.2f}s")
+        added = sorted(set(latest.mod_files) - set(previous.mod_files))
+        removed = sorted(set(previous.mod_files) - set(latest.mod_files))
+        for name in added:
+            print(f"+ {name}")
+        for name in removed:
+            print(f"- {name}")
+    return 0
+
+def _run_world_prune(parsed):
+    # pylint: disable-next=import-outside-toplevel
+    from mcserverwrapper.src.world.pruning import WorldPruner
+
+    if parsed.apply:
+        _ensure_server_stopped(parsed.world, "pruned")
+    report = WorldPruner(parsed.world, parsed.min_inhabited, parsed.protect, parsed.workers).prune(dry_run=not parsed.apply)
+    for region in report.regions:
+        if region.dropped > 0 or region.error:
+            print(f"{region.path:<48} {region.dropped:>5}/{region.chunk_count:<5} chunks "
+                  f"{_format_size(region.size_before - region.size_after):>10}" +
+                  (f" ({region.error})" if region.error else ""))
+    verb = "Dropped" if parsed.apply else "Would drop"
+    print(f"\n{verb} {report.dropped} of {report.chunk_count} chunks, "
+          f"{_format_size(report.size_before)} -> {_format_size(report.size_after)} "
+          f"({_format_size(report.reclaimed)} reclaimed)")
+    return 1 if len(report.errors()) > 0 else 0
+
+def _run_world_compact(parsed):
+    # pylint: disable-next=import-outside-toplevel
+    from mcserverwrapper.src.world.compaction import RegionCompactor
+
+    _ensure_server_stopped(parsed.world, "compacted")
+    report = RegionCompactor(parsed.world, parsed.level, parsed.workers).compact()
+    for region in report.errors():
+        print(f"{region.path:<48} {region.error}")
+    print(f"Compacted {len(report.regions)} region files, {_format_size(report.size_before)} -> "
+          f"{_format_size(report.size_after)} ({_format_size(report.reclaimed)} reclaimed)")
+    return 1 if len(report.errors()) > 0 else 0
+
+def _ensure_server_stopped(world_dir, action):
+    """Refuse to rewrite the region files of a world whose server is running, like Wrapper.prune_world does"""
+
+    # pylint: disable=import-outside-toplevel
+    from mcserverwrapper.src.error import ServerRunningError
+    from mcserverwrapper.src.server.log_tail import server_dir_in_use
+    # pylint: enable=import-outside-toplevel
+
+    if server_dir_in_use(_find_server_dir(world_dir)):
+        raise ServerRunningError(f"The world can only be {action} while the server is stopped")
+
+def _find_server_dir(world_dir):
+    """Return the closest parent of the world containing a server.properties, the world can be nested, e.g. worlds/lobby"""
+
+    world_dir = os.path.abspath(world_dir)
+    path = os.path.dirname(world_dir)
+    while not os.path.isfile(os.path.join(path, "server.properties")):
+        parent = os.path.dirname(path)
+        if parent == path:
+            # without a server.properties, the world is expected directly in the server directory
+            return os.path.dirname(world_dir)
+        path = parent
+    return path
+
+def _protected_area(text):
+    # pylint: disable-next=import-outside-toplevel
+    from mcserverwrapper.src.world.pruning import ProtectedArea
+
+    return ProtectedArea.parse(text)
+
+def _format_size(size):
+    for unit in ["B", "KiB", "MiB"]:
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,255 @@
+"""Module containing the CommandWriter class, which sends large amounts of commands without flooding the server"""
+
+from __future__ import annotations
+
+import re
+import time
+from collections import Counter
+from queue import Empty, Full, Queue
+from threading import Condition, Lock, Thread
+
+from .server import BaseServer
+from .util import instrumentation
+
+# the length of a single tick, which is the target for the mspt-based rate limiting
+TARGET_MSPT = 50.0
+# forget about mspt measurements after this many seconds without a new one
+MSPT_TIMEOUT = 30.0
+# Minecraft warns about being behind at most every 15 seconds
+CANT_KEEP_UP_INTERVAL_MS = 15000.0
+
+# commands which have the same effect no matter how often they are executed
+DEFAULT_IDEMPOTENT_COMMANDS = (
+    "setblock",
+    "fill",
+    "gamerule",
+    "weather",
+    "time set",
+    "difficulty",
+    "scoreboard players set",
+    "worldborder set"
+)
+
+_CANT_KEEP_UP_PATTERN = re.compile(r"Can't keep up! .* Running (\d+)ms or (\d+) ticks behind")
+# reply to /forge tps: "Overall: Mean tick time: 12.345 ms. Mean TPS: 20.000"
+_MEAN_TICK_PATTERN = re.compile(r"Overall\s*: Mean tick time: ([0-9.]+) ms")
+
+# pylint: disable-next=too-many-instance-attributes
+class CommandWriter:
+    """
+    Sends commands to a server from a bounded queue, in batches and limited by a token bucket
+
+    The token bucket refills with `rate` commands per second, which is scaled down while the server
+    reports a tick time above 50 ms. Feed the console output into feed() to enable this.
+
+    Args:
+        server (BaseServer): the server to send the commands to
+        rate (float): the maximum amount of commands per second
+        burst (int): the maximum amount of commands sent at once after the writer was idle
+        max_queue_size (int): the maximum amount of pending commands, submit() blocks if the queue is full
+        batch_size (int): the maximum amount of commands written to stdin with a single write
+        drop_duplicates (bool): if True, an idempotent command repeating the last queued command is dropped while that is pending
+        idempotent_commands (tuple[str, ...]): the command prefixes considered idempotent
+    """
+
+    # pylint: disable-next=too-many-positional-arguments
+    def __init__(self, server: BaseServer, rate: float = 200.0, burst: int = 100, max_queue_size: int = 10000,
+                 batch_size: int = 64, drop_duplicates: bool = False,
+                 idempotent_commands: tuple[str, ...] = DEFAULT_IDEMPOTENT_COMMANDS) -> None:
+        if rate <= 0:
+            raise ValueError(f"Expected a positive rate, got {rate}")
+        if burst < 1 or batch_size < 1:
+            raise ValueError("Expected burst and batch_size to be at least 1")
+
+        self._server = server
+        self._rate = rate
+        self._burst = burst
+        self._batch_size = batch_size
+        self._drop_duplicates = drop_duplicates
+        self._idempotent_commands = tuple(prefix.lstrip("/") for prefix in idempotent_commands)
+
+        self._queue: Queue[str] = instrumentation.InstrumentedQueue("command_writer.queue", max_queue_size)
+        self._pending = Counter()
+        self._pending_lock = Lock()
+        self._idle = Condition(self._pending_lock)
+        self._unsent = 0
+        self._last_queued = None
+
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._mspt = None
+        self._mspt_time = 0.0
+
+        self._thread = None
+        self._closed = False
+
+    def submit(self, command: str, timeout: float | None = None) -> bool:
+        """
+        Add a command to the send queue, blocking while the queue is full
+
+        Args:
+            command (str): the command to send
+            timeout (float | None): the maximum seconds to wait for space in the queue
+
+        Returns:
+            bool: False if the command was dropped as a duplicate, True otherwise
+        """
+
+        if self._closed:
+            raise RuntimeError("CommandWriter is closed")
+        if len(command) == 0:
+            return True
+
+        with self._pending_lock:
+            # only a direct repetition can be dropped, an identical command queued earlier may be undone by the ones after it
+            if self._drop_duplicates and command == self._last_queued and self._pending[command] > 0 \
+               and self._is_idempotent(command):
+                return False
+            self._pending[command] += 1
+            self._unsent += 1
+            self._last_queued = command
+
+        self._ensure_thread()
+        try:
+            self._queue.put(command, timeout=timeout)
+        except Full:
+            with self._pending_lock:
+                if self._last_queued == command:
+                    self._last_queued = None
+            self._forget(command)
+            raise
+        return True
+
+    def submit_all(self, commands: list[str]) -> int:
+        """Add all given commands to the send queue and return the amount of commands that weren't dropped"""
+
+        return sum(1 for command in commands if self.submit(command))
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait until all submitted commands were sent, return False on timeout"""
+
+        with self._idle:
+            return self._idle.wait_for(lambda: self._unsent == 0, timeout)
+
+    def close(self, flush: bool = True, timeout: float | None = None) -> None:
+        """Stop the writer thread, sending all pending commands first if flush is True"""
+
+        if flush:
+            self.flush(timeout)
+        else:
+            # drop all commands which weren't picked up by the writer thread yet
+            try:
+                while True:
+                    self._forget(self._queue.get_nowait())
+            except Empty:
+                pass
+        self._closed = True
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def pending(self) -> int:
+        """Return the amount of commands which weren't sent yet"""
+
+        return self._unsent
+
+    def effective_rate(self) -> float:
+        """Return the current commands per second limit, after scaling it by the observed tick time"""
+
+        if self._mspt is None or time.monotonic() - self._mspt_time > MSPT_TIMEOUT:
+            return self._rate
+        return self._rate * min(1.0, TARGET_MSPT / max(self._mspt, 1.0))
+
+    def observe_mspt(self, mspt: float) -> None:
+        """Report a measured tick time in milliseconds"""
+
+        if self._mspt is None or time.monotonic() - self._mspt_time > MSPT_TIMEOUT:
+            self._mspt = mspt
+        else:
+            # smooth the measurements to avoid jumping between extremes
+            self._mspt = 0.7 * self._mspt + 0.3 * mspt
+        self._mspt_time = time.monotonic()
+
+    def feed(self, line: str) -> None:
+        """Read tick time information from a line of console output"""
+
+        if "Can't keep up!" in line:
+            match = _CANT_KEEP_UP_PATTERN.search(line)
+            if match is not None:
+                # the server fell behind this many ms since the last warning
+                self.observe_mspt(TARGET_MSPT * (1 + int(match.group(1)) / CANT_KEEP_UP_INTERVAL_MS))
+            return
+
+        match = _MEAN_TICK_PATTERN.search(line)
+        if match is not None:
+            self.observe_mspt(float(match.group(1)))
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None:
+            with self._pending_lock:
+                if self._thread is None:
+                    self._thread = Thread(target=self._t_writer, daemon=True)
+                    self._thread.start()
+
+    def _t_writer(self) -> None:
+        """Take commands from the queue and send them in batches"""
+
+        while not self._closed or not self._queue.empty():
+            try:
+                batch = [self._queue.get(timeout=0.1)]
+            except Empty:
+                continue
+
+            while len(batch) < self._batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except Empty:
+                    break
+
+            while len(batch) > 0:
+                count = min(len(batch), self._take_tokens(len(batch)))
+                self._send(batch[:count])
+                batch = batch[count:]
+
+    def _send(self, commands: list[str]) -> None:
+        stop_commands = [command for command in commands if command.lstrip("/") == "stop"]
+        commands = [command for command in commands if command.lstrip("/") != "stop"]
+
+        try:
+            self._server.execute_commands(commands)
+            # stop commands need the server-specific shutdown handling
+            for command in stop_commands:
+                self._server.execute_command(command)
+        # the writer thread has to keep running, so that flush() doesn't wait forever
+        # pylint: disable-next=broad-exception-caught
+        except Exception as e:
+            self._server.logger.log(f"Could not send {len(commands) + len(stop_commands)} commands: {e}")
+        finally:
+            for command in commands + stop_commands:
+                self._forget(command)
+
+    def _take_tokens(self, wanted: int) -> int:
+        """Block until at least one token is available, then take up to wanted tokens"""
+
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self._burst, self._tokens + (now - self._last_refill) * self.effective_rate())
+            self._last_refill = now
+
+            if self._tokens >= 1:
+                taken = min(wanted, int(self._tokens))
+                self._tokens -= taken
+                return taken
+
+            time.sleep((1 - self._tokens) / self.effective_rate())
+
+    def _forget(self, command: str) -> None:
+        with self._idle:
+            self._pending[command] -= 1
+            if self._pending[command] <= 0:
+                del self._pending[command]
+            self._unsent -= 1
+            if self._unsent == 0:
+                self._idle.notify_all()
+
+    def _is_idempotent(self, command: str) -> bool:
+        return command.lstrip("/").startswith(self._idempotent_commands)
@@ -0,0 +1,298 @@
+"""
+Module containing the Daemon class, which manages servers for short-lived clients over a Unix domain socket
+
+Every connection carries a single request, which is a json object on one line.
+The daemon answers with one json line, or with one json line per output line for a followed tail:
+
+    {"action": "start", "name": "lobby", "jar": "/srv/lobby/server.jar"}
+    {"action": "command", "name": "lobby", "command": "/say hi"}
+    {"action": "status"}
+    {"action": "tail", "name": "lobby", "lines": 20, "follow": true}
+    {"action": "stop", "name": "lobby"}
+
+Responses contain "ok": true and the requested data, or "ok": false and an "error" message.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import socket
+import socketserver
+from threading import Lock, Thread
+from typing import Any, Generator
+
+from .error import McServerWrapperError
+from .streaming import ConsoleStreamServer
+from .wrapper import Wrapper
+
+class DaemonError(McServerWrapperError):
+    """An error occuring if the daemon could not execute a request"""
+
+class _ManagedServer:
+    """A server managed by the daemon, tail requests read the output from the wrappers' output hub"""
+
+    def __init__(self, name: str, wrapper: Wrapper) -> None:
+        self.name = name
+        self.wrapper = wrapper
+        self.startup_error = None
+
+    def start(self, blocking: bool) -> None:
+        """Start the server"""
+
+        if blocking:
+            self.wrapper.startup()
+        else:
+            Thread(target=self._t_startup, daemon=True).start()
+
+    def status(self) -> dict[str, Any]:
+        """Return the current state of the server, errors reading it are reported as its startup error"""
+
+        status = {
+            "name": self.name,
+            "jar": self.wrapper.server_jar,
+            "version": None,
+            "pid": None,
+            "exit_status": None,
+            "running": False,
+            "players": [],
+            "startup_error": self.startup_error
+        }
+        try:
+            server = self.wrapper.server
+            # pylint: disable-next=protected-access
+            child = server._child
+            status.update({
+                "version": str(server.version),
+                "pid": child.pid if child is not None else None,
+                "exit_status": server.get_child_status(0) if child is not None else None,
+                "running": self.wrapper.server_running(),
+                "players": self.wrapper.players.online_players()
+            })
+        # a single broken server, e.g. with an unreadable jar, must not break the status of all servers
+        # pylint: disable-next=broad-exception-caught
+        except Exception as e:
+            if status["startup_error"] is None:
+                status["startup_error"] = str(e)
+        return status
+
+    def _t_startup(self) -> None:
+        try:
+            self.wrapper.startup()
+        # the error is reported in the status
+        # pylint: disable-next=broad-exception-caught
+        except Exception as e:
+            self.startup_error = str(e)
+
+class Daemon:
+    """
+    A long-lived process managing multiple servers, which can be controlled over a Unix domain socket
+
+    Args:
+        socket_path (str): the path of the socket file to listen on
+        stream_server (ConsoleStreamServer | None): if set, the output of all managed servers is streamed by it
+    """
+
+    def __init__(self, socket_path: str, stream_server: ConsoleStreamServer | None = None) -> None:
+        if not hasattr(socket, "AF_UNIX"):
+            raise DaemonError("The daemon needs Unix domain sockets, which are not supported on this platform")
+
+        self.socket_path = socket_path
+        self.stream_server = stream_server
+        self._servers: dict[str, _ManagedServer] = {}
+        self._lock = Lock()
+        self._socket_server = None
+
+    def serve_forever(self) -> None:
+        """Listen for requests until shutdown() is called"""
+
+        if os.path.exists(self.socket_path):
+            if _socket_is_alive(self.socket_path):
+                raise DaemonError(f"Another daemon is already listening on {self.socket_path}")
+            # left over from a crashed daemon
+            os.remove(self.socket_path)
+
+        daemon = self
+
+        class _Handler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                # pylint: disable-next=protected-access
+                daemon._handle_connection(self.rfile, self.wfile)
+
+        self._socket_server = socketserver.ThreadingUnixStreamServer(self.socket_path, _Handler)
+        self._socket_server.daemon_threads = True
+        os.chmod(self.socket_path, 0o600)
+        if self.stream_server is not None:
+            self.stream_server.start()
+
+        try:
+            self._socket_server.serve_forever()
+        finally:
+            self._socket_server.server_close()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+            self.stop_all()
+            if self.stream_server is not None:
+                self.stream_server.stop()
+
+    def shutdown(self) -> None:
+        """Stop listening for requests, which also stops all managed servers"""
+
+        if self._socket_server is not None:
+            self._socket_server.shutdown()
+
+    def stop_all(self) -> None:
+        """Stop all managed servers"""
+
+        with self._lock:
+            servers = list(self._servers.values())
+            self._servers.clear()
+        for managed in servers:
+            self._stop_server(managed)
+
+    # pylint: disable-next=too-many-return-statements
+    def handle_request(self, request: dict[str, Any]) -> dict[str, Any]:
+        """Execute a single request and return its response, tail requests are not followed"""
+
+        action = request.get("action")
+        if action == "start":
+            return self._start(request)
+        if action == "stop":
+            self._stop_server(self._pop_server(request))
+            return {"ok": True}
+        if action == "command":
+            command = request.get("command")
+            if not isinstance(command, str):
+                raise DaemonError("Expected a command")
+            self._get_server(request).wrapper.send_command(command)
+            return {"ok": True}
+        if action == "status":
+            if "name" in request:
+                return {"ok": True, "servers": [self._get_server(request).status()]}
+            with self._lock:
+                servers = list(self._servers.values())
+            return {"ok": True, "servers": [managed.status() for managed in servers]}
+        if action == "tail":
+            lines = self._get_server(request).wrapper.output_hub.latest(int(request.get("lines", 20)))
+            return {"ok": True, "lines": lines}
+        if action == "shutdown":
+            Thread(target=self.shutdown, daemon=True).start()
+            return {"ok": True}
+
+        raise DaemonError(f"Unknown action {action}")
+
+    def _handle_connection(self, rfile, wfile) -> None:
+        try:
+            request = json.loads(rfile.readline())
+            if not isinstance(request, dict):
+                raise DaemonError("Expected a json object")
+
+            if request.get("action") == "tail" and request.get("follow", False):
+                self._follow(request, wfile)
+                return
+
+            response = self.handle_request(request)
+        except (McServerWrapperError, ValueError, TypeError, FileNotFoundError) as e:
+            response = {"ok": False, "error": str(e)}
+        except (BrokenPipeError, ConnectionResetError):
+            return
+
+        wfile.write((json.dumps(response) + "\n").encode("utf8"))
+
+    def _follow(self, request: dict[str, Any], wfile) -> None:
+        """Send the latest output lines, then every new line until the client disconnects"""
+
+        managed = self._get_server(request)
+        subscription = managed.wrapper.subscribe(int(request.get("lines", 20)))
+
+        try:
+            while self._servers.get(managed.name) is managed:
+                lines = subscription.get_many(100, timeout=1)
+                if len(lines) == 0 and subscription.hub.closed:
+                    break
+                for line in lines:
+                    wfile.write((json.dumps({"line": line}) + "\n").encode("utf8"))
+                wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # the client disconnected
+            pass
+
+    def _start(self, request: dict[str, Any]) -> dict[str, Any]:
+        name = request.get("name")
+        jar = request.get("jar")
+        if not isinstance(name, str) or not isinstance(jar, str):
+            raise DaemonError("Expected a name and a jar")
+
+        wrapper = Wrapper(os.path.abspath(jar), server_start_command=request.get("start_command"),
+                          server_property_args=request.get("properties"), print_output=False)
+        managed = _ManagedServer(name, wrapper)
+
+        with self._lock:
+            if name in self._servers:
+                raise DaemonError(f"Server {name} is already managed by this daemon")
+            self._servers[name] = managed
+        if self.stream_server is not None:
+            self.stream_server.add_server(name, wrapper)
+
+        try:
+            managed.start(request.get("wait", True))
+            return {"ok": True, "server": managed.status()}
+        except Exception:
+            with self._lock:
+                del self._servers[name]
+            if self.stream_server is not None:
+                self.stream_server.remove_server(name)
+            raise
+
+    def _stop_server(self, managed: _ManagedServer) -> None:
+        if self.stream_server is not None:
+            self.stream_server.remove_server(managed.name)
+        managed.wrapper.stop()
+
+    def _get_server(self, request: dict[str, Any]) -> _ManagedServer:
+        with self._lock:
+            managed = self._servers.get(request.get("name"))
+        if managed is None:
+            raise DaemonError(f"Unknown server {request.get('name')}")
+        return managed
+
+    def _pop_server(self, request: dict[str, Any]) -> _ManagedServer:
+        with self._lock:
+            managed = self._servers.pop(request.get("name"), None)
+        if managed is None:
+            raise DaemonError(f"Unknown server {request.get('name')}")
+        return managed
+
+def send_request(socket_path: str, request: dict[str, Any], timeout: float | None = None) -> dict[str, Any]:
+    """
+    Send a single request to a running daemon and return its response
+
+    Raises:
+        DaemonError: if the daemon returned an error
+    """
+
+    for response in stream_request(socket_path, request, timeout):
+        if not response.get("ok", True):
+            raise DaemonError(response.get("error"))
+        return response
+    raise DaemonError("The daemon closed the connection without a response")
+
+def stream_request(socket_path: str, request: dict[str, Any],
+                   timeout: float | None = None) -> Generator[dict[str, Any], None, None]:
+    """Send a single request to a running daemon and yield every response line, e.g. of a followed tail"""
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(socket_path)
+        client.sendall((json.dumps(request) + "\n").encode("utf8"))
+        with client.makefile("rb") as rfile:
+            for line in rfile:
+                yield json.loads(line)
+
+def _socket_is_alive(socket_path: str) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(socket_path)
+            return True
+        except OSError:
+            return False
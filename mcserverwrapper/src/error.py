@@ -5,3 +5,12 @@ class McServerWrapperError(Exception):
 
 class ServerExitedError(McServerWrapperError):
     """An error occuring if the minecraft server unexpectedly crashed"""
+
+class PortAllocationError(McServerWrapperError):
+    """An error occuring if no free port could be leased"""
+
+class ServerRunningError(McServerWrapperError):
+    """An error occuring if an action needs the server to be stopped"""
+
+class CommandError(McServerWrapperError):
+    """An error occuring if the server replied to a command with an error, or didn't reply in time"""
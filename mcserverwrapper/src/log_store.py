@@ -0,0 +1,257 @@
+"""
+Module containing the LogStore class, which keeps the console output of servers in a searchable SQLite database
+
+The store is an optional sink, which reads the output from an output hub:
+
+    store = LogStore("/srv/logs.sqlite3")
+    store.attach(wrapper.output_hub, "lobby")
+    ...
+    store.query(text="exception", level="ERROR", since=time.time() - 3600)
+"""
+
+from __future__ import annotations
+
+import re
+import sqlite3
+import time
+from threading import Lock, Thread
+
+from .error import McServerWrapperError
+from .util import console_parser, instrumentation
+from .util.output_hub import OutputHub
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS lines (
+    id INTEGER PRIMARY KEY,
+    time REAL NOT NULL,
+    server TEXT,
+    thread TEXT,
+    level TEXT,
+    source TEXT,
+    player TEXT,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS lines_time ON lines (time);
+CREATE INDEX IF NOT EXISTS lines_level_time ON lines (level, time);
+CREATE INDEX IF NOT EXISTS lines_player_time ON lines (player, time);
+CREATE VIRTUAL TABLE IF NOT EXISTS lines_fts USING fts5 (message, content='lines', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS lines_insert AFTER INSERT ON lines BEGIN
+    INSERT INTO lines_fts (rowid, message) VALUES (new.id, new.message);
+END;
+CREATE TRIGGER IF NOT EXISTS lines_delete AFTER DELETE ON lines BEGIN
+    INSERT INTO lines_fts (lines_fts, rowid, message) VALUES ('delete', old.id, old.message);
+END;
+"""
+
+_NAME = r"([A-Za-z0-9_]{1,16})"
+# chat, joins, leaves and logins, which are the lines the player filter is meant for
+_PLAYER_PATTERNS = (
+    re.compile(rf"^<{_NAME}> "),
+    re.compile(rf"^{_NAME} (?:joined the game|left the game|lost connection:)"),
+    re.compile(rf"^{_NAME}\[/[^\]]*\] logged in with entity id"),
+    re.compile(rf"^UUID of player {_NAME} is ")
+)
+
+class LogStoreError(McServerWrapperError):
+    """An error occuring if the log store can't be used"""
+
+# pylint: disable-next=too-many-instance-attributes
+class LogEntry:
+    """A single stored line of console output"""
+
+    __slots__ = ("id", "time", "server", "thread", "level", "source", "player", "message")
+
+    # pylint: disable-next=too-many-arguments,too-many-positional-arguments
+    def __init__(self, id_: int, time_: float, server: str | None, thread: str | None, level: str | None,
+                 source: str | None, player: str | None, message: str) -> None:
+        self.id = id_
+        self.time = time_
+        self.server = server
+        self.thread = thread
+        self.level = level
+        self.source = source
+        self.player = player
+        self.message = message
+
+    id: int
+    time: float
+    server: str | None
+    thread: str | None
+    level: str | None
+    source: str | None
+    player: str | None
+    message: str
+
+# pylint: disable-next=too-many-instance-attributes
+class LogStore:
+    """
+    Stores parsed console lines in SQLite with a full-text index on the messages
+
+    Lines are inserted in batches in a single transaction, and the database runs in WAL mode,
+    so queries don't block the writer.
+
+    Args:
+        path (str): the path of the database file
+        batch_size (int): the maximum amount of lines inserted with a single transaction
+        flush_interval (float): the maximum seconds an attached hub's line waits before it is inserted
+    """
+
+    def __init__(self, path: str, batch_size: int = 500, flush_interval: float = 1.0) -> None:
+        if batch_size < 1:
+            raise ValueError(f"Expected a positive batch_size, got {batch_size}")
+
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._lock = Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        try:
+            self._connection.executescript(_SCHEMA)
+        except sqlite3.OperationalError as e:
+            self._connection.close()
+            raise LogStoreError(f"The SQLite library doesn't support the FTS5 extension: {e}") from e
+
+        # lines without a log prefix, like stack traces, get the level of the line before them
+        self._last_levels: dict[str | None, str | None] = {}
+        self._threads: list[Thread] = []
+        self._closed = False
+
+    def attach(self, hub: OutputHub, server: str | None = None) -> None:
+        """
+        Store all lines published to the hub from now on, until the hub or the store is closed
+
+        Args:
+            hub (OutputHub): the output hub, e.g. of a Wrapper
+            server (str | None): the server name the lines are stored with
+        """
+
+        subscription = hub.subscribe()
+        thread = Thread(target=self._t_store, args=[subscription, server], daemon=True)
+        self._threads.append(thread)
+        thread.start()
+
+    def add_lines(self, lines: list[str], server: str | None = None, received_at: float | None = None) -> None:
+        """
+        Parse and insert lines of console output with a single transaction
+
+        Args:
+            lines (list[str]): the raw console lines
+            server (str | None): the server name the lines are stored with
+            received_at (float | None): the unix timestamp of the lines, defaults to now
+        """
+
+        received_at = time.time() if received_at is None else received_at
+        rows = []
+        for line in lines:
+            if line == "":
+                continue
+            parsed = console_parser.parse_line(line)
+            if parsed is None:
+                rows.append((received_at, server, None, self._last_levels.get(server), None, None, line))
+                continue
+            self._last_levels[server] = parsed.level
+            rows.append((received_at, server, parsed.thread, parsed.level, parsed.source,
+                         _find_player(parsed.message), parsed.message))
+
+        if len(rows) == 0:
+            return
+
+        with instrumentation.span("log_store.insert"), self._lock:
+            with self._connection:
+                self._connection.executemany("INSERT INTO lines (time, server, thread, level, source, player, message) "
+                                             "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    # pylint: disable-next=too-many-arguments,too-many-positional-arguments
+    def query(self, text: str | None = None, level: str | None = None, player: str | None = None,
+              since: float | None = None, until: float | None = None, server: str | None = None,
+              limit: int = 100) -> list[LogEntry]:
+        """
+        Search the stored lines, all given filters have to match
+
+        Args:
+            text (str | None): words which all have to appear in the message
+            level (str | None): the log level, e.g. "ERROR"
+            player (str | None): the player who chatted, joined, left or logged in
+            since (float | None): the earliest unix timestamp
+            until (float | None): the latest unix timestamp
+            server (str | None): the server name given to attach() or add_lines()
+            limit (int): the maximum amount of returned lines
+
+        Returns:
+            list[LogEntry]: the matching lines, newest first
+        """
+
+        conditions = []
+        params = []
+        if text is not None and text.strip() != "":
+            # every word is quoted, so the text is never interpreted as an FTS5 query expression
+            conditions.append("id IN (SELECT rowid FROM lines_fts WHERE lines_fts MATCH ?)")
+            params.append(" ".join('"' + word.replace('"', '""') + '"' for word in text.split()))
+        for column, value in (("level", level), ("player", player), ("server", server)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            conditions.append("time >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("time <= ?")
+            params.append(until)
+
+        where = f"WHERE {' AND '.join(conditions)}" if len(conditions) > 0 else ""
+        params.append(limit)
+
+        # a separate connection per query, so reads never wait for the writer
+        with instrumentation.span("log_store.query"):
+            connection = sqlite3.connect(self.path)
+            try:
+                rows = connection.execute("SELECT id, time, server, thread, level, source, player, message FROM lines "
+                                          f"{where} ORDER BY time DESC, id DESC LIMIT ?", params).fetchall()
+            finally:
+                connection.close()
+        return [LogEntry(*row) for row in rows]
+
+    def delete_before(self, timestamp: float) -> int:
+        """Delete all lines older than the given unix timestamp and return their amount"""
+
+        with self._lock:
+            with self._connection:
+                return self._connection.execute("DELETE FROM lines WHERE time < ?", (timestamp,)).rowcount
+
+    def close(self) -> None:
+        """Store the remaining lines of all attached hubs and close the database"""
+
+        self._closed = True
+        for thread in self._threads:
+            thread.join(timeout=self.flush_interval + 5)
+        with self._lock:
+            self._connection.close()
+
+    def _t_store(self, subscription, server: str | None) -> None:
+        """Insert the lines of a hub subscription in batches"""
+
+        while True:
+            lines = subscription.get_many(self.batch_size, timeout=self.flush_interval)
+            if len(lines) == 0:
+                if self._closed or subscription.hub.closed:
+                    return
+                continue
+
+            # collect more lines for up to flush_interval, so quiet servers don't need a transaction per line
+            deadline = time.monotonic() + self.flush_interval
+            while len(lines) < self.batch_size and not self._closed and not subscription.hub.closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                lines += subscription.get_many(self.batch_size - len(lines), timeout=remaining)
+            self.add_lines(lines, server)
+
+def _find_player(message: str) -> str | None:
+    for pattern in _PLAYER_PATTERNS:
+        match = pattern.match(message)
+        if match is not None:
+            return match.group(1)
+    return None
@@ -0,0 +1,209 @@
+"""Module containing the PlayerIndex class, which tracks online players from the console output"""
+
+from __future__ import annotations
+
+import re
+import time
+from threading import Lock
+from typing import Callable
+
+from .util import console_parser, logger
+from .util.logger import Logger
+
+_NAME = r"([A-Za-z0-9_]{1,16})"
+_JOIN_PATTERN = re.compile(rf"^{_NAME}(?: \(formerly known as [^)]*\))? joined the game$")
+_LEAVE_PATTERN = re.compile(rf"^{_NAME} left the game$")
+_LOST_CONNECTION_PATTERN = re.compile(rf"^{_NAME} lost connection: (.*)$")
+_UUID_PATTERN = re.compile(rf"^UUID of player {_NAME} is ([0-9a-fA-F\-]{{32,36}})$")
+# 1.13+: There are 2 of a max of 20 players online: Steve, Alex
+_LIST_PATTERN = re.compile(r"^There are (\d+) of a max(?: of)? (\d+) players online:(.*)$")
+# 1.7.10 - 1.12.2: There are 2/20 players online: (the names follow on the next line)
+_LIST_PATTERN_OLD = re.compile(r"^There are (\d+)/(\d+) players online:$")
+
+class PlayerSession:
+    """A single session of a player on the server"""
+
+    def __init__(self, name: str, uuid: str | None = None, joined_at: float | None = None) -> None:
+        self.name = name
+        self.uuid = uuid
+        self.joined_at = joined_at if joined_at is not None else time.time()
+        self.left_at = None
+        self.leave_reason = None
+
+    name: str
+    uuid: str | None
+    joined_at: float
+    left_at: float | None
+    leave_reason: str | None
+
+    def duration(self) -> float:
+        """Return the length of the session in seconds, up to now if the player is still online"""
+
+        end = self.left_at if self.left_at is not None else time.time()
+        return end - self.joined_at
+
+# pylint: disable-next=too-many-instance-attributes
+class PlayerIndex:
+    """
+    An in-memory index of the online players, fed by the join and leave lines of the console output
+    All lookups are O(1) and don't send any commands to the server
+    """
+
+    def __init__(self, history_size: int = 1000, log: Logger | None = None) -> None:
+        self._online: dict[str, PlayerSession] = {}
+        self._uuids: dict[str, str] = {}
+        self._history: list[PlayerSession] = []
+        self._history_size = history_size
+        self._join_callbacks: list[Callable[[PlayerSession], None]] = []
+        self._leave_callbacks: list[Callable[[PlayerSession], None]] = []
+        self._awaiting_list_names = False
+        self._lock = Lock()
+        self._log = log.log if log is not None else logger.log
+
+    # pylint: disable-next=too-many-return-statements
+    def feed(self, line: str) -> None:
+        """Update the index from a single line of console output"""
+
+        parsed = console_parser.parse_line(line)
+        if parsed is None:
+            if self._awaiting_list_names:
+                # some versions print the player names without a log prefix
+                self._awaiting_list_names = False
+                self._reconcile(line)
+            return
+
+        # players can't fake these messages, because chat lines always start with <name> or [name]
+        message = parsed.message
+
+        if self._awaiting_list_names:
+            self._awaiting_list_names = False
+            self._reconcile(message)
+            return
+
+        match = _JOIN_PATTERN.match(message)
+        if match is not None:
+            self._join(match.group(1))
+            return
+
+        match = _LEAVE_PATTERN.match(message)
+        if match is not None:
+            self._leave(match.group(1), None)
+            return
+
+        match = _LOST_CONNECTION_PATTERN.match(message)
+        if match is not None:
+            self._leave(match.group(1), match.group(2))
+            return
+
+        match = _UUID_PATTERN.match(message)
+        if match is not None:
+            with self._lock:
+                self._uuids[match.group(1).lower()] = match.group(2)
+            return
+
+        match = _LIST_PATTERN.match(message)
+        if match is not None:
+            self._reconcile(match.group(3))
+            return
+
+        if _LIST_PATTERN_OLD.match(message) is not None:
+            self._awaiting_list_names = True
+
+    def is_online(self, name: str) -> bool:
+        """Return True if the player with the given name is online"""
+
+        return name.lower() in self._online
+
+    def count(self) -> int:
+        """Return the amount of online players"""
+
+        return len(self._online)
+
+    def online_players(self) -> list[str]:
+        """Return the names of all online players"""
+
+        with self._lock:
+            return [session.name for session in self._online.values()]
+
+    def get_session(self, name: str) -> PlayerSession | None:
+        """Return the current session of the given player, or None if the player is offline"""
+
+        return self._online.get(name.lower())
+
+    def get_uuid(self, name: str) -> str | None:
+        """Return the uuid of the given player, if it was printed while the player logged in"""
+
+        return self._uuids.get(name.lower())
+
+    def session_duration(self, name: str) -> float | None:
+        """Return the seconds the given player has been online for, or None if the player is offline"""
+
+        session = self.get_session(name)
+        if session is None:
+            return None
+        return session.duration()
+
+    def history(self) -> list[PlayerSession]:
+        """Return the most recent finished sessions, oldest first"""
+
+        with self._lock:
+            return self._history.copy()
+
+    def on_join(self, callback: Callable[[PlayerSession], None]) -> None:
+        """Register a function which is called with the new PlayerSession whenever a player joins"""
+
+        self._join_callbacks.append(callback)
+
+    def on_leave(self, callback: Callable[[PlayerSession], None]) -> None:
+        """Register a function which is called with the finished PlayerSession whenever a player leaves"""
+
+        self._leave_callbacks.append(callback)
+
+    def clear(self) -> None:
+        """End all sessions, e.g. because the server stopped"""
+
+        for name in self.online_players():
+            self._leave(name, "Server stopped")
+
+    def _join(self, name: str) -> None:
+        with self._lock:
+            if name.lower() in self._online:
+                return
+            session = PlayerSession(name, self._uuids.get(name.lower()))
+            self._online[name.lower()] = session
+
+        self._run_callbacks(self._join_callbacks, session)
+
+    def _leave(self, name: str, reason: str | None) -> None:
+        with self._lock:
+            session = self._online.pop(name.lower(), None)
+            if session is None:
+                return
+            session.left_at = time.time()
+            session.leave_reason = reason
+            self._history.append(session)
+            if len(self._history) > self._history_size:
+                del self._history[0]
+
+        self._run_callbacks(self._leave_callbacks, session)
+
+    def _reconcile(self, names_str: str) -> None:
+        """Make the index match the player names from a /list reply"""
+
+        names = [name.strip() for name in names_str.split(",") if name.strip() != ""]
+        listed = {name.lower() for name in names}
+
+        for name in self.online_players():
+            if name.lower() not in listed:
+                self._leave(name, None)
+        for name in names:
+            self._join(name)
+
+    def _run_callbacks(self, callbacks: list[Callable[[PlayerSession], None]], session: PlayerSession) -> None:
+        for callback in callbacks:
+            try:
+                callback(session)
+            # a failing callback should never stop the output handler
+            # pylint: disable-next=broad-exception-caught
+            except Exception as e:
+                self._log(f"Player callback {callback} failed: {e}", False)
@@ -0,0 +1,344 @@
+"""
+Module containing the PlayerLists class, which manages the whitelist, ops and bans of a server in bulk
+
+The json lists are loaded into dicts indexed by uuid, name and ip, so lookups don't touch the disk.
+Edits are collected in a batch, and applied at once when the batch ends:
+
+    with wrapper.player_lists.batch() as batch:
+        for name, uuid in players:
+            batch.whitelist_add(name, uuid)
+
+The whitelist is written with a single atomic file replace, followed by one /whitelist reload.
+The server has no reload command for ops and bans, and overwrites their files whenever it changes them,
+so while it is running they are changed with commands, which are sent together through the CommandWriter.
+If the server isn't running, all lists are written directly.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import uuid as uuid_lib
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from threading import Lock
+from typing import TYPE_CHECKING, Any, Generator
+
+if TYPE_CHECKING:
+    from .wrapper import Wrapper
+
+WHITELIST = "whitelist.json"
+OPS = "ops.json"
+BANNED_PLAYERS = "banned-players.json"
+BANNED_IPS = "banned-ips.json"
+# the format of the created and expires fields of bans
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S %z"
+
+class PlayerListFile:
+    """
+    A single json list of the server, indexed by its key field and by lowercase player names
+
+    Args:
+        path (str): the path of the json file
+        key (str): the field identifying an entry, "uuid" for player lists and "ip" for banned-ips.json
+    """
+
+    def __init__(self, path: str, key: str) -> None:
+        self.path = path
+        self.key = key
+        self._entries: dict[str, dict[str, Any]] = {}
+        self._names: dict[str, str] = {}
+        # the modification time and size of the loaded file
+        self._mtime = None
+        self.load()
+
+    def load(self) -> None:
+        """Read the file, a missing file is an empty list"""
+
+        entries = []
+        self._mtime = None
+        if os.path.isfile(self.path):
+            self._mtime = _file_version(self.path)
+            with open(self.path, "r", encoding="utf8") as list_file:
+                content = list_file.read()
+            entries = json.loads(content) if content.strip() != "" else []
+
+        self._entries = {}
+        self._names = {}
+        for entry in entries:
+            self._index(entry)
+
+    def refresh(self) -> bool:
+        """Reload the file if it was changed since it was read, return True if it was reloaded"""
+
+        if _file_version(self.path) == self._mtime:
+            return False
+        self.load()
+        return True
+
+    def save(self) -> None:
+        """Replace the file atomically, so the server never reads a half written list"""
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        file_descriptor, temp_path = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(file_descriptor, "w", encoding="utf8") as temp_file:
+                json.dump(list(self._entries.values()), temp_file, indent=2)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        self._mtime = _file_version(self.path)
+
+    def get(self, key_or_name: str) -> dict[str, Any] | None:
+        """Return the entry with the given key, or of the player with the given name"""
+
+        entry = self._entries.get(key_or_name)
+        if entry is None:
+            key = self._names.get(key_or_name.lower())
+            entry = self._entries.get(key) if key is not None else None
+        return entry
+
+    def entries(self) -> list[dict[str, Any]]:
+        """Return all entries"""
+
+        return list(self._entries.values())
+
+    def put(self, entry: dict[str, Any]) -> None:
+        """Add an entry, replacing an entry with the same key"""
+
+        self.remove(entry[self.key])
+        self._index(entry)
+
+    def remove(self, key_or_name: str) -> dict[str, Any] | None:
+        """Remove the entry with the given key or player name, and return it"""
+
+        entry = self.get(key_or_name)
+        if entry is None:
+            return None
+        del self._entries[entry[self.key]]
+        if "name" in entry:
+            self._names.pop(entry["name"].lower(), None)
+        return entry
+
+    def __contains__(self, key_or_name: str) -> bool:
+        return self.get(key_or_name) is not None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _index(self, entry: dict[str, Any]) -> None:
+        self._entries[entry[self.key]] = entry
+        if "name" in entry:
+            self._names[entry["name"].lower()] = entry[self.key]
+
+class PlayerListBatch:
+    """The edits of a batch, which are applied when the batch ends"""
+
+    def __init__(self, player_lists: PlayerLists) -> None:
+        self._lists = player_lists
+        # the entries to put or the keys to remove, in order, by file name
+        self.edits: dict[str, list[tuple[str, Any]]] = {WHITELIST: [], OPS: [], BANNED_PLAYERS: [], BANNED_IPS: []}
+        # the commands with the same effect, used for lists the running server owns
+        self.commands: dict[str, list[str]] = {WHITELIST: [], OPS: [], BANNED_PLAYERS: [], BANNED_IPS: []}
+
+    def whitelist_add(self, name: str, uuid: str | None = None) -> None:
+        """Add a player to the whitelist"""
+
+        self._put(WHITELIST, {"uuid": self._lists.resolve_uuid(name, uuid), "name": name}, f"/whitelist add {name}")
+
+    def whitelist_remove(self, name: str) -> None:
+        """Remove a player from the whitelist"""
+
+        self._remove(WHITELIST, name, f"/whitelist remove {name}")
+
+    def op(self, name: str, uuid: str | None = None, level: int = 4, bypasses_player_limit: bool = False) -> None:
+        """Make a player an operator, the level is only used if the server isn't running"""
+
+        entry = {"uuid": self._lists.resolve_uuid(name, uuid), "name": name, "level": level,
+                 "bypassesPlayerLimit": bypasses_player_limit}
+        self._put(OPS, entry, f"/op {name}")
+
+    def deop(self, name: str) -> None:
+        """Remove the operator status of a player"""
+
+        self._remove(OPS, name, f"/deop {name}")
+
+    def ban(self, name: str, uuid: str | None = None, reason: str = "Banned by an operator.",
+            expires: datetime | None = None, source: str = "Server") -> None:
+        """Ban a player, the expiry is only used if the server isn't running"""
+
+        entry = {"uuid": self._lists.resolve_uuid(name, uuid), "name": name, **_ban_fields(reason, expires, source)}
+        self._put(BANNED_PLAYERS, entry, f"/ban {name} {reason}")
+
+    def pardon(self, name: str) -> None:
+        """Unban a player"""
+
+        self._remove(BANNED_PLAYERS, name, f"/pardon {name}")
+
+    def ban_ip(self, ip: str, reason: str = "Banned by an operator.", expires: datetime | None = None,
+               source: str = "Server") -> None:
+        """Ban an ip address, the expiry is only used if the server isn't running"""
+
+        self._put(BANNED_IPS, {"ip": ip, **_ban_fields(reason, expires, source)}, f"/ban-ip {ip} {reason}")
+
+    def pardon_ip(self, ip: str) -> None:
+        """Unban an ip address"""
+
+        self._remove(BANNED_IPS, ip, f"/pardon-ip {ip}")
+
+    def _put(self, file_name: str, entry: dict[str, Any], command: str) -> None:
+        self.edits[file_name].append(("put", entry))
+        self.commands[file_name].append(command)
+
+    def _remove(self, file_name: str, key_or_name: str, command: str) -> None:
+        self.edits[file_name].append(("remove", key_or_name))
+        self.commands[file_name].append(command)
+
+class PlayerLists:
+    """
+    The whitelist, ops and bans of a server
+
+    Args:
+        server_path (str): the server directory
+        wrapper (Wrapper | None): the wrapper of the server, needed to apply changes while it is running
+    """
+
+    def __init__(self, server_path: str, wrapper: Wrapper | None = None) -> None:
+        self.server_path = server_path
+        self.wrapper = wrapper
+        self.whitelist = PlayerListFile(os.path.join(server_path, WHITELIST), "uuid")
+        self.ops = PlayerListFile(os.path.join(server_path, OPS), "uuid")
+        self.banned_players = PlayerListFile(os.path.join(server_path, BANNED_PLAYERS), "uuid")
+        self.banned_ips = PlayerListFile(os.path.join(server_path, BANNED_IPS), "ip")
+        self._lock = Lock()
+
+    def is_whitelisted(self, name_or_uuid: str) -> bool:
+        """Return True if the player is on the whitelist"""
+
+        return name_or_uuid in self.whitelist
+
+    def is_op(self, name_or_uuid: str) -> bool:
+        """Return True if the player is an operator"""
+
+        return name_or_uuid in self.ops
+
+    def is_banned(self, name_or_uuid: str) -> bool:
+        """Return True if the player is banned, expired bans are ignored"""
+
+        return _ban_active(self.banned_players.get(name_or_uuid))
+
+    def is_ip_banned(self, ip: str) -> bool:
+        """Return True if the ip address is banned, expired bans are ignored"""
+
+        return _ban_active(self.banned_ips.get(ip))
+
+    def refresh(self) -> None:
+        """Reload all lists which were changed on disk, e.g. by commands of players"""
+
+        with self._lock:
+            for player_list in self._files().values():
+                player_list.refresh()
+
+    def resolve_uuid(self, name: str, uuid: str | None) -> str:
+        """Return the given uuid, the one seen in the console output, or the offline uuid in offline mode"""
+
+        if uuid is not None:
+            return uuid
+        if self.wrapper is not None:
+            seen_uuid = self.wrapper.players.get_uuid(name)
+            if seen_uuid is not None:
+                return seen_uuid
+        for player_list in self._files().values():
+            entry = player_list.get(name)
+            if entry is not None and "uuid" in entry:
+                return entry["uuid"]
+        if self._online_mode():
+            raise ValueError(f"The uuid of {name} is unknown, online mode servers need the uuid of new players")
+        return offline_uuid(name)
+
+    @contextmanager
+    def batch(self) -> Generator[PlayerListBatch, None, None]:
+        """Collect edits, which are applied at once when the block ends without an error"""
+
+        batch = PlayerListBatch(self)
+        yield batch
+        self.apply(batch)
+
+    def apply(self, batch: PlayerListBatch) -> None:
+        """Apply the edits of a batch to the in-memory lists, the files and the running server"""
+
+        running = self.wrapper is not None and self.wrapper.server_running()
+        commands = []
+        with self._lock:
+            for file_name, player_list in self._files().items():
+                edits = batch.edits[file_name]
+                if len(edits) == 0:
+                    continue
+
+                player_list.refresh()
+                for operation, value in edits:
+                    if operation == "put":
+                        player_list.put(value)
+                    else:
+                        player_list.remove(value)
+
+                if not running:
+                    player_list.save()
+                elif file_name == WHITELIST:
+                    player_list.save()
+                    commands.append("/whitelist reload")
+                else:
+                    # the server writes these files itself after executing the commands
+                    commands.extend(batch.commands[file_name])
+
+        if len(commands) > 0:
+            self.wrapper.send_commands(commands)
+
+    def _files(self) -> dict[str, PlayerListFile]:
+        return {WHITELIST: self.whitelist, OPS: self.ops, BANNED_PLAYERS: self.banned_players,
+                BANNED_IPS: self.banned_ips}
+
+    def _online_mode(self) -> bool:
+        props_path = os.path.join(self.server_path, "server.properties")
+        if not os.path.isfile(props_path):
+            return True
+        with open(props_path, "r", encoding="utf8") as props_file:
+            for line in props_file:
+                if line.startswith("online-mode="):
+                    return line.split("=", 1)[1].strip() != "false"
+        return True
+
+def _file_version(path: str) -> tuple[int, int] | None:
+    """Return the modification time and size, the size catches changes within the timestamp resolution"""
+
+    if not os.path.isfile(path):
+        return None
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+def offline_uuid(name: str) -> str:
+    """Return the uuid an offline mode server gives the player"""
+
+    digest = bytearray(hashlib.md5(f"OfflinePlayer:{name}".encode("utf8")).digest())
+    # a name-based version 3 uuid, like java's UUID.nameUUIDFromBytes
+    digest[6] = (digest[6] & 0x0f) | 0x30
+    digest[8] = (digest[8] & 0x3f) | 0x80
+    return str(uuid_lib.UUID(bytes=bytes(digest)))
+
+def _ban_fields(reason: str, expires: datetime | None, source: str) -> dict[str, str]:
+    return {
+        "created": datetime.now(timezone.utc).astimezone().strftime(DATE_FORMAT),
+        "source": source,
+        "expires": expires.astimezone().strftime(DATE_FORMAT) if expires is not None else "forever",
+        "reason": reason
+    }
+
+def _ban_active(entry: dict[str, Any] | None) -> bool:
+    if entry is None:
+        return False
+    if entry.get("expires", "forever") == "forever":
+        return True
+    return datetime.strptime(entry["expires"], DATE_FORMAT) > datetime.now(timezone.utc)
@@ -0,0 +1,167 @@
+"""
+Module containing the provision function, which creates new server directories from a template directory
+
+Files which the server never changes, like jars, libraries and mods, are hardlinked, so all instances share them.
+All other files are cloned with a reflink if the filesystem supports it, e.g. on btrfs, xfs or apfs,
+which shares the data until either copy is changed. Only if neither is possible, files are copied.
+"""
+
+from __future__ import annotations
+
+import errno
+import fnmatch
+import os
+import shutil
+import sys
+from typing import Sequence
+
+from . import server_properties_helper
+from .server import ServerBuilder
+
+# paths relative to the template directory, matching files the server only reads
+DEFAULT_IMMUTABLE_PATTERNS = ("*.jar", "libraries/*", "mods/*", "versions/*")
+# the files which are written after provisioning, so they must never be shared with the template
+_WRITTEN_FILES = ("eula.txt", "server.properties")
+# ioctl request cloning a whole file on linux
+_FICLONE = 0x40049409
+
+class ProvisionResult:
+    """The amount of files provisioned by each method"""
+
+    def __init__(self) -> None:
+        self.hardlinked = 0
+        self.reflinked = 0
+        self.copied = 0
+        self.copied_bytes = 0
+
+    hardlinked: int
+    reflinked: int
+    copied: int
+    # the amount of bytes which were really copied, instead of being shared
+    copied_bytes: int
+
+# pylint: disable-next=too-many-arguments,too-many-positional-arguments
+def provision(template_dir: str, target_dir: str, jar_name: str = "server.jar",
+              server_property_args: dict | None = None, accept_eula: bool = True,
+              immutable_patterns: Sequence[str] = DEFAULT_IMMUTABLE_PATTERNS) -> ProvisionResult:
+    """
+    Create a new server directory from a template directory
+
+    Args:
+        template_dir (str): the directory containing the template server
+        target_dir (str): the new server directory, which must not exist yet
+        jar_name (str): the name of the server jar, used to detect the version for the server.properties
+        server_property_args (dict | None): the properties of the new server, see the Wrapper for all keys,
+            if None, the server.properties of the template is kept unchanged
+        accept_eula (bool): if True, eula.txt is written with the eula accepted
+        immutable_patterns (Sequence[str]): the relative paths of files which are hardlinked instead of cloned
+
+    Returns:
+        ProvisionResult: the amount of files provisioned by each method
+    """
+
+    if not os.path.isdir(template_dir):
+        raise ValueError(f"Template directory {template_dir} not found")
+    if os.path.exists(target_dir):
+        raise ValueError(f"Target directory {target_dir} already exists")
+
+    result = _Provisioner(immutable_patterns).clone_tree(template_dir, target_dir)
+
+    if accept_eula:
+        with open(os.path.join(target_dir, "eula.txt"), "w", encoding="utf8") as eula_file:
+            eula_file.write("eula=true\n")
+    if server_property_args is not None:
+        version = ServerBuilder.detect_version(os.path.join(target_dir, jar_name))
+        properties = server_properties_helper.parse_properties_args(target_dir, server_property_args, version)
+        server_properties_helper.save_properties(target_dir, properties)
+    return result
+
+class _Provisioner:
+    """Clones a directory tree, remembering if the filesystem supports reflinks"""
+
+    def __init__(self, immutable_patterns: Sequence[str]) -> None:
+        self.immutable_patterns = immutable_patterns
+        self.reflinks_supported = sys.platform.startswith("linux") or sys.platform == "darwin"
+        self.result = ProvisionResult()
+
+    def clone_tree(self, source_dir: str, target_dir: str) -> ProvisionResult:
+        """Clone all files and directories of the source into the target"""
+
+        for root, dirs, files in os.walk(source_dir):
+            relative_root = os.path.relpath(root, source_dir)
+            target_root = os.path.normpath(os.path.join(target_dir, relative_root))
+            os.makedirs(target_root)
+            shutil.copystat(root, target_root)
+
+            for name in files:
+                relative_path = os.path.normpath(os.path.join(relative_root, name)).replace(os.sep, "/")
+                source = os.path.join(root, name)
+                target = os.path.join(target_root, name)
+                if os.path.islink(source):
+                    os.symlink(os.readlink(source), target)
+                elif self._is_immutable(relative_path) and self._hardlink(source, target):
+                    self.result.hardlinked += 1
+                elif self._reflink(source, target):
+                    self.result.reflinked += 1
+                else:
+                    shutil.copy2(source, target)
+                    self.result.copied += 1
+                    self.result.copied_bytes += os.path.getsize(target)
+
+            # symlinked directories are recreated as links instead of being followed
+            for name in dirs[:]:
+                if os.path.islink(os.path.join(root, name)):
+                    os.symlink(os.readlink(os.path.join(root, name)), os.path.join(target_root, name))
+                    dirs.remove(name)
+
+        return self.result
+
+    def _is_immutable(self, relative_path: str) -> bool:
+        if relative_path in _WRITTEN_FILES:
+            return False
+        return any(fnmatch.fnmatch(relative_path, pattern) for pattern in self.immutable_patterns)
+
+    @staticmethod
+    def _hardlink(source: str, target: str) -> bool:
+        try:
+            os.link(source, target)
+        except OSError:
+            # e.g. the target is on another filesystem
+            return False
+        return True
+
+    def _reflink(self, source: str, target: str) -> bool:
+        if not self.reflinks_supported:
+            return False
+
+        try:
+            if sys.platform == "darwin":
+                _clonefile(source, target)
+            else:
+                _ficlone(source, target)
+        except OSError as e:
+            if os.path.exists(target):
+                os.remove(target)
+            if e.errno in (errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.ENOSYS):
+                # the filesystem doesn't support reflinks, so no further file is tried
+                self.reflinks_supported = False
+                return False
+            raise
+        shutil.copystat(source, target)
+        return True
+
+def _ficlone(source: str, target: str) -> None:
+    # pylint: disable-next=import-outside-toplevel,import-error
+    import fcntl
+
+    with open(source, "rb") as source_file, open(target, "wb") as target_file:
+        fcntl.ioctl(target_file.fileno(), _FICLONE, source_file.fileno())
+
+def _clonefile(source: str, target: str) -> None:
+    # pylint: disable-next=import-outside-toplevel
+    import ctypes
+
+    libc = ctypes.CDLL(None, use_errno=True)
+    if libc.clonefile(os.fsencode(source), os.fsencode(target), 0) != 0:
+        error = ctypes.get_errno()
+        raise OSError(error, os.strerror(error), target)
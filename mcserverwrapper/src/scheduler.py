@@ -0,0 +1,309 @@
+"""
+Module containing the Scheduler class, which runs recurring server operations like saves, restarts and backups
+
+All jobs of all servers share a single timer thread, which advances a timer wheel once per tick.
+Due jobs are run in a small thread pool, so a long backup doesn't delay other jobs.
+A job is never run twice at the same time, a run which is due while the previous run is still busy is skipped.
+Every job gets a fixed random offset of up to its jitter, so many servers don't run the same job in the same second.
+
+    scheduler = Scheduler()
+    scheduler.add_job("lobby-save", lambda: lobby.send_command("/save-all"), cron="*/15 * * * *", jitter=60)
+    scheduler.add_job("lobby-announce", lambda: lobby.send_command("/say Vote!"), interval=600)
+    scheduler.start()
+"""
+
+from __future__ import annotations
+
+import math
+import random
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from threading import Condition, Thread
+from typing import Callable
+
+# the macros supported instead of the five fields of a cron expression
+CRON_MACROS = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *"
+}
+# the minimum and maximum of the minute, hour, day of month, month and day of week fields
+_CRON_FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+# pylint: disable-next=too-many-instance-attributes
+class CronExpression:
+    """
+    A cron expression with the fields minute, hour, day of month, month and day of week
+
+    Fields can be "*", numbers, ranges like "1-5", lists like "1,15" and steps like "*/15" or "0-30/10".
+    As in cron, a job with both day fields restricted runs on days matching either of them.
+
+    Args:
+        expression (str): the cron expression, or one of the macros like "@daily"
+    """
+
+    def __init__(self, expression: str) -> None:
+        if not isinstance(expression, str):
+            raise TypeError(f"Expected str, got {type(expression)}")
+
+        self.expression = expression
+        fields = CRON_MACROS.get(expression.strip(), expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"Expected 5 fields in cron expression '{expression}', got {len(fields)}")
+
+        self.minutes, self.hours, self.days, self.months, weekdays = \
+            (_parse_cron_field(field, *limits) for field, limits in zip(fields, _CRON_FIELDS))
+        # 0 and 7 are both sunday, python counts from monday = 0
+        self.weekdays = {(weekday - 1) % 7 for weekday in weekdays}
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def next_after(self, moment: datetime) -> datetime:
+        """Return the first matching minute after the given moment"""
+
+        moment = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # no schedule is more than a few years apart, except for february 29th on a non-leap weekday
+        limit = moment + timedelta(days=366 * 8)
+        while moment < limit:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0)
+            elif not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment
+        raise ValueError(f"The cron expression '{self.expression}' never matches")
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day_matches = moment.day in self.days
+        weekday_matches = moment.weekday() in self.weekdays
+        if self._any_day or self._any_weekday:
+            return day_matches and weekday_matches
+        return day_matches or weekday_matches
+
+def _parse_cron_field(field: str, minimum: int, maximum: int) -> set[int]:
+    values = set()
+    for part in field.split(","):
+        value_range, _, step = part.partition("/")
+        if value_range == "*":
+            start, end = minimum, maximum
+        elif "-" in value_range:
+            start, end = (int(value) for value in value_range.split("-", 1))
+        else:
+            start = end = int(value_range)
+            # "5/10" means from 5 to the maximum in steps of 10
+            end = maximum if step else end
+        step = int(step) if step else 1
+        if start < minimum or end > maximum or start > end or step < 1:
+            raise ValueError(f"Invalid cron field '{field}', values have to be between {minimum} and {maximum}")
+        values.update(range(start, end + 1, step))
+    return values
+
+# pylint: disable-next=too-many-instance-attributes
+class Job:
+    """A recurring task, either running on a cron schedule or in a fixed interval"""
+
+    # pylint: disable-next=too-many-arguments
+    def __init__(self, name: str, action: Callable[[], None], cron: CronExpression | None,
+                 interval: float | None, offset: float) -> None:
+        self.name = name
+        self.action = action
+        self.cron = cron
+        self.interval = interval
+        self.offset = offset
+        self.next_run = None
+        self.running = False
+        self.cancelled = False
+        self.runs = 0
+        self.skipped = 0
+        self.last_duration = None
+        self.last_error = None
+
+    name: str
+    action: Callable[[], None]
+    cron: CronExpression | None
+    interval: float | None
+    # the fixed part of the jitter, added to every scheduled time
+    offset: float
+    # the unix time of the next run
+    next_run: float | None
+    running: bool
+    cancelled: bool
+    runs: int
+    # the amount of runs which were skipped because the previous run was still busy
+    skipped: int
+    last_duration: float | None
+    # the traceback of the last failed run, reset by a successful run
+    last_error: str | None
+
+    def schedule_after(self, moment: float) -> float:
+        """Return the time of the first run after the given unix time"""
+
+        if self.cron is not None:
+            # cron schedules are matched on the times without the jitter
+            base = self.cron.next_after(datetime.fromtimestamp(moment - self.offset)).timestamp()
+            return base + self.offset
+        return moment + self.interval
+
+# pylint: disable-next=too-many-instance-attributes
+class Scheduler:
+    """
+    Runs jobs on cron schedules or in intervals, driven by a single timer thread
+
+    Args:
+        tick (float): the resolution of the timer wheel in seconds
+        wheel_size (int): the amount of slots of the timer wheel, jobs further away wait for more rounds
+        max_workers (int): the amount of jobs which can run at the same time
+        clock (Callable[[], float]): returns the current unix time
+    """
+
+    def __init__(self, tick: float = 1.0, wheel_size: int = 512, max_workers: int = 4,
+                 clock: Callable[[], float] = time.time) -> None:
+        if tick <= 0 or wheel_size < 1:
+            raise ValueError("The tick has to be positive and the wheel needs at least one slot")
+
+        self.tick = tick
+        self.clock = clock
+        self._jobs: dict[str, Job] = {}
+        # every slot holds the jobs due in its tick, or in the same slot of a later round
+        self._wheel: list[list[tuple[int, Job]]] = [[] for _ in range(wheel_size)]
+        self._current_tick = math.floor(clock() / tick)
+        self._changed = Condition()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scheduler")
+        self._thread = None
+        self._running = False
+
+    # pylint: disable-next=too-many-arguments
+    def add_job(self, name: str, action: Callable[[], None], cron: str | None = None, interval: float | None = None,
+                jitter: float = 0) -> Job:
+        """
+        Add a recurring job
+
+        Args:
+            name (str): the unique name of the job
+            action (Callable[[], None]): the function running the job
+            cron (str | None): the cron expression of the schedule
+            interval (float | None): the seconds between runs, used if no cron expression is given
+            jitter (float): the maximum seconds the job is delayed, the delay is fixed per job name
+
+        Returns:
+            Job: the added job
+        """
+
+        if (cron is None) == (interval is None):
+            raise ValueError("Exactly one of cron and interval has to be given")
+        if interval is not None and interval <= 0:
+            raise ValueError(f"The interval has to be positive, got {interval}")
+        if jitter < 0:
+            raise ValueError(f"The jitter can't be negative, got {jitter}")
+
+        # seeding with the name spreads many jobs, but keeps each job at the same time after restarts
+        offset = random.Random(name).uniform(0, jitter) if jitter > 0 else 0.0
+        job = Job(name, action, CronExpression(cron) if cron is not None else None, interval, offset)
+        with self._changed:
+            if name in self._jobs:
+                raise ValueError(f"A job named {name} already exists")
+            self._jobs[name] = job
+            now = self.clock()
+            self._insert(job, job.schedule_after(now) if cron is not None else now + interval + offset)
+        return job
+
+    def remove_job(self, name: str) -> None:
+        """Remove a job, a currently running run finishes"""
+
+        with self._changed:
+            self._jobs.pop(name).cancelled = True
+
+    def jobs(self) -> list[Job]:
+        """Return all jobs, sorted by their next run"""
+
+        with self._changed:
+            return sorted(self._jobs.values(), key=lambda job: job.next_run)
+
+    def start(self) -> None:
+        """Start the timer thread"""
+
+        with self._changed:
+            if self._running:
+                return
+            self._running = True
+            # the current tick is kept, so the first advance runs the jobs which became due before the start
+        self._thread = Thread(target=self._t_timer, name="scheduler-timer", daemon=True)
+        self._thread.start()
+
+    def stop(self, wait: bool = True) -> None:
+        """Stop the timer thread, and wait for running jobs if wait is True"""
+
+        with self._changed:
+            self._running = False
+            self._changed.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        self._executor.shutdown(wait=wait)
+
+    def advance(self) -> None:
+        """Run all jobs which became due since the last tick, this is called by the timer thread"""
+
+        with self._changed:
+            target_tick = math.floor(self.clock() / self.tick)
+            # after a long pause every slot is visited once, which finds all overdue jobs
+            first_tick = max(self._current_tick + 1, target_tick - len(self._wheel) + 1)
+            due = []
+            for tick in range(first_tick, target_tick + 1):
+                slot = self._wheel[tick % len(self._wheel)]
+                due.extend(entry for entry in slot if entry[0] <= target_tick)
+                slot[:] = [entry for entry in slot if entry[0] > target_tick]
+            self._current_tick = max(self._current_tick, target_tick)
+
+            now = self.clock()
+            for _, job in due:
+                if job.cancelled:
+                    continue
+                if job.running:
+                    job.skipped += 1
+                else:
+                    job.running = True
+                    self._executor.submit(self._run, job)
+                self._insert(job, job.schedule_after(max(now, job.next_run)))
+
+    def _insert(self, job: Job, due: float) -> None:
+        """Put a job into the slot of the tick it is due in, has to be called while holding the lock"""
+
+        job.next_run = due
+        due_tick = max(math.ceil(due / self.tick), self._current_tick + 1)
+        self._wheel[due_tick % len(self._wheel)].append((due_tick, job))
+
+    def _run(self, job: Job) -> None:
+        start = time.perf_counter()
+        try:
+            job.action()
+            job.last_error = None
+        # a failing job must not stop the scheduler, the error is kept in the job
+        # pylint: disable-next=broad-exception-caught
+        except Exception:
+            job.last_error = traceback.format_exc()
+        finally:
+            job.last_duration = time.perf_counter() - start
+            job.runs += 1
+            job.running = False
+
+    def _t_timer(self) -> None:
+        while True:
+            with self._changed:
+                if not self._running:
+                    return
+                next_tick_time = (self._current_tick + 1) * self.tick
+                self._changed.wait(max(next_tick_time - self.clock(), 0))
+                if not self._running:
+                    return
+            if self.clock() >= next_tick_time:
+                self.advance()
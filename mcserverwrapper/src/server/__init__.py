@@ -4,10 +4,13 @@ from .server_builder import ServerBuilder
 from .base_server import BaseServer
 from .paper_server import PaperServer
 from .vanilla_server import VanillaServer
+from .resource_limits import CpuScheduler, ResourceLimits
 
 __exports__ = [
     ServerBuilder,
     BaseServer,
     PaperServer,
-    VanillaServer
+    VanillaServer,
+    CpuScheduler,
+    ResourceLimits
 ]
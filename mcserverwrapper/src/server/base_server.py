@@ -11,21 +11,32 @@ from subprocess import TimeoutExpired
 from time import sleep
 from typing import Generator
 
-import pexpect
-from pexpect import popen_spawn
-
 from ..mcversion import McVersion
-from ..util import info_getter, logger
+from ..util import console_parser, info_getter, instrumentation, logger
 from ..error import ServerExitedError
+from .resource_limits import ResourceLimits
 
+# pylint: disable-next=too-many-instance-attributes
 class BaseServer:
     """The base server, containing server type-independent functionality"""
 
-    def __init__(self, server_path: str, version: McVersion, port: int, start_cmd: str) -> None:
+    # pylint: disable-next=too-many-arguments,too-many-positional-arguments
+    def __init__(self, server_path: str, version: McVersion, port: int, start_cmd: str,
+                 resource_limits: ResourceLimits | None = None, session_dir: str | None = None,
+                 ring_size: int | None = None) -> None:
         self.server_path = server_path
         self.version = version
+        # the log of this server, which is kept in its own directory
+        self.logger = logger.Logger(str(server_path))
         self._port = port
         self._start_cmd = start_cmd
+        self._resource_limits = resource_limits
+        # if set, the server runs detached under a session holder, which keeps it alive if the wrapper exits
+        self._session_dir = session_dir
+        # if set, the output is read and formatted by a worker process, and passed back through a ring of this size
+        self._ring_size = ring_size
+        # if set, the server was started by other tooling and is only followed through its log file
+        self._log_attached = False
         self._child = None
 
     VERSION_TYPE = None
@@ -34,7 +45,21 @@ class BaseServer:
         """Starts the minecraft server"""
 
         # starts the server process
-        self._child = popen_spawn.PopenSpawn(cmd=self._start_cmd, cwd=self.server_path, timeout=1)
+        if self._session_dir is not None:
+            # pylint: disable-next=import-outside-toplevel
+            from .session import spawn_session
+            self._child = spawn_session(self._start_cmd, self.server_path, self._session_dir)
+        elif self._ring_size is not None:
+            # pylint: disable-next=import-outside-toplevel
+            from .worker import WorkerChild
+            self._child = WorkerChild(self._start_cmd, self.server_path, self._ring_size)
+        else:
+            # pexpect is imported here to keep importing the wrapper fast
+            # pylint: disable-next=import-outside-toplevel
+            from pexpect import popen_spawn
+            self._child = popen_spawn.PopenSpawn(cmd=self._start_cmd, cwd=self.server_path, timeout=1)
+        if self._resource_limits is not None:
+            self._resource_limits.apply(self._child.pid, self.logger)
 
         # wait for files to get generated or server to exit
         while (not os.path.isfile(os.path.join(self.server_path, "./server.properties")) \
@@ -50,6 +75,59 @@ class BaseServer:
         if blocking:
             self._wait_for_startup()
 
+    def attach(self) -> bool:
+        """
+        Attach to the detached server of a previous wrapper, replaying the output it didn't read
+
+        Returns:
+            bool: False if the server isn't detached or its session holder isn't running
+        """
+
+        if self._session_dir is None:
+            return False
+
+        # pylint: disable-next=import-outside-toplevel
+        from .session import SessionChild, SessionError, session_alive
+
+        if not session_alive(self._session_dir):
+            return False
+        try:
+            self._child = SessionChild(self._session_dir)
+        except SessionError:
+            return False
+        self.logger.log(f"Attached to the running server with pid {self._child.pid}")
+        return True
+
+    def attach_log(self, pid: int | None = None, offset_path: str | None = None) -> None:
+        """
+        Follow logs/latest.log of a server which was started by other tooling, instead of starting it
+
+        The output continues after the last line read by a previous attach, commands can't be sent.
+
+        Args:
+            pid (int | None): the pid of the server, searched in the running java processes if not given
+            offset_path (str | None): the file storing the read offset, defaults to a file in the server directory
+        """
+
+        # pylint: disable-next=import-outside-toplevel
+        from .log_tail import LogTailChild, find_server_pid
+
+        pid = pid if pid is not None else find_server_pid(self.server_path)
+        self._child = LogTailChild(self.server_path, pid, offset_path)
+        self._log_attached = True
+        self.logger.log(f"Following the log of the server with pid {pid}")
+
+    def detach(self) -> None:
+        """Stop controlling the detached server, which keeps running until a new wrapper attaches"""
+
+        if self._session_dir is None and not self._log_attached:
+            raise ValueError("Only detached servers can be detached, use ServerBuilder.detached()")
+        if self._child is None:
+            return
+
+        self.logger.log("Detaching from the server")
+        self._child.detach()
+
     def stop(self):
         """Stop the running server gracefully"""
 
@@ -58,12 +136,17 @@ class BaseServer:
             return
 
         if self.get_child_status(1) is None:
-            self.execute_command("/stop")
+            if self._log_attached:
+                # servers save their worlds on SIGTERM, just like on /stop
+                self.logger.log("Stopping server")
+                self._child.terminate()
+            else:
+                self.execute_command("/stop")
 
     def kill(self):
         """Kill the server process, but UNSAVED DATA WILL BE LOST AND SAVES POSSIBLY CORRUPTED"""
 
-        logger.log("Killing server process")
+        self.logger.log("Killing server process")
         if sys.platform == "win32":
             os.system(f"taskkill /pid {self._child.pid} /f")
         else:
@@ -71,14 +154,30 @@ class BaseServer:
             self._child.kill(signal.SIGKILL)
 
         if self.get_child_status(30) is None:
-            logger.log("Server did not stop")
-            logger.log("We're running out of options, maybe try manually killing the server?")
+            self.logger.log("Server did not stop")
+            self.logger.log("We're running out of options, maybe try manually killing the server?")
 
     def execute_command(self, command: str) -> None:
         """Send a given command to the server"""
 
-        logger.log(f"Sending command: {command}")
-        self._child.sendline(command)
+        with instrumentation.span("execute_command"):
+            self.logger.log(f"Sending command: {command}")
+            self._child.sendline(command)
+
+    def execute_commands(self, commands: list[str]) -> None:
+        """
+        Send multiple commands to the server with a single write
+        Stop commands are not handled specially, use execute_command for them
+        """
+
+        if len(commands) == 0:
+            return
+
+        with instrumentation.span("execute_commands"):
+            commands = [self._prepare_command(command) for command in commands]
+            self.logger.log("\n".join(f"Sending command: {command}" for command in commands), False)
+            self._child.send("".join(command + os.linesep for command in commands))
+        instrumentation.count("execute_commands.commands", len(commands))
 
     def get_child_status(self, timeout: int) -> int | None:
         """
@@ -88,7 +187,9 @@ class BaseServer:
 
         try:
             status = self._child.proc.wait(timeout)
-            # server stopped
+            # server stopped, so its scheduled cpus can be reused and its cgroup removed
+            if self._resource_limits is not None:
+                self._resource_limits.release()
             return status
         except TimeoutExpired:
             # expected exception, server is still running
@@ -112,16 +213,27 @@ class BaseServer:
             if not isinstance(timeout, (int, float)):
                 raise TypeError(f"timeout expected type (int, float), not {type(timeout)}")
 
+        # pylint: disable-next=import-outside-toplevel
+        import pexpect
+
         # wait for the server to initialize
         while self._child is None:
             sleep(0.1)
 
+        # isolated servers deliver formatted lines, the reading and formatting happens in the worker
+        if self._ring_size is not None and not self._log_attached:
+            yield from self._child.read_lines(timeout)
+            return ""
+
         output = b""
         empties = 0
         # read one char at a time, until the server exits
         while terminate_time > datetime.now():
             try:
                 output_char = bytes(self._child.read(1))
+                if instrumentation.enabled:
+                    instrumentation.count("read_output.chunks")
+                    instrumentation.count("read_output.bytes", len(output_char))
 
                 if output == b"":
                     empties += 1
@@ -132,6 +244,8 @@ class BaseServer:
 
                 # if a line break is in the output, return line
                 if b"\n" in output:
+                    if instrumentation.enabled:
+                        instrumentation.count("read_output.lines")
                     yield self._format_output(output)
                     output = b""
                 # if more than 10 empty chars have been read, all data has been read
@@ -156,10 +270,10 @@ class BaseServer:
             sleep(1)
 
     def _ensure_stop(self):
-        logger.log("Stopping server")
+        self.logger.log("Stopping server")
         status = self.get_child_status(30)
         if status is None:
-            logger.log("Server did not stop within 30 seconds")
+            self.logger.log("Server did not stop within 30 seconds")
             if sys.platform == "win32":
                 self._child.kill(signal.CTRL_C_EVENT)
             else:
@@ -167,28 +281,16 @@ class BaseServer:
 
             status = self.get_child_status(60)
             if status is None:
-                logger.log("Server did not stop within 90 seconds")
+                self.logger.log("Server did not stop within 90 seconds")
 
-    def _format_output(self, raw_text: bytes) -> str:
-        # remove line breaks
-        raw_text = raw_text.replace(b"\r", b"").replace(b"\n", b"")
+    def _prepare_command(self, command: str) -> str:
+        """Convert the given command to the format the server expects"""
 
-        # try to decode the output string
-        try:
-            text_str = raw_text.decode("ascii")
-        # if the total decoding fails, decode every char individually
-        except UnicodeDecodeError:
-            text_str = ""
-            for char in [raw_text[i:i+1] for i in range(len(raw_text))]:
-                try:
-                    text_str += char.decode("ascii")
-                # if the conversion fails, skip the char
-                except UnicodeDecodeError:
-                    pass
-                except AttributeError:
-                    pass
-
-        return text_str
+        return command
+
+    def _format_output(self, raw_text: bytes) -> str:
+        with instrumentation.span("format_output"):
+            return console_parser.decode_line(raw_text)
 
     # pylint: disable=attribute-defined-outside-init, unreachable, protected-access, undefined-variable
     @staticmethod
@@ -5,8 +5,10 @@ from __future__ import annotations
 import json
 import os
 import re
-from zipfile import ZipFile
+from typing import Generator
+
 from .base_server import BaseServer
+from .mod_profiler import PROFILE_DIR_NAME, ModLoadProfiler, ProfileStore
 from ..mcversion import McVersion, McVersionType
 
 class ForgeServer(BaseServer):
@@ -17,19 +19,59 @@ class ForgeServer(BaseServer):
 
     VERSION_TYPE = McVersionType.FORGE
 
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # only set if the mod loading is profiled, see enable_load_profiler
+        self.load_profiler = None
+
+    load_profiler: ModLoadProfiler | None
+
+    def enable_load_profiler(self) -> ModLoadProfiler:
+        """Time the mod loading of every boot from now on, the profiles are stored in the server directory"""
+
+        if self.load_profiler is None:
+            self.load_profiler = ModLoadProfiler(ProfileStore(os.path.join(self.server_path, PROFILE_DIR_NAME)),
+                                                 os.path.join(self.server_path, "mods"), log=self.logger)
+        return self.load_profiler
+
+    def start(self, blocking=True):
+        if self.load_profiler is not None:
+            self.load_profiler.begin()
+        super().start(blocking)
+
+    def read_output(self, timeout=None) -> Generator[str, None, None]:
+        lines = super().read_output(timeout)
+        # servers which aren't profiled don't pay for the extra generator
+        if self.load_profiler is None:
+            return lines
+        return self._profile_lines(lines)
+
     def execute_command(self, command: str):
-        if not command.startswith("/"):
-            command = "/" + command
+        command = self._prepare_command(command)
 
         super().execute_command(command)
 
         if command == "/stop":
             self._ensure_stop()
 
+    def _profile_lines(self, lines: Generator[str, None, None]) -> Generator[str, None, None]:
+        for line in lines:
+            self.load_profiler.feed(line)
+            yield line
+
+    def _prepare_command(self, command: str) -> str:
+        if not command.startswith("/"):
+            command = "/" + command
+
+        return command
+
     @classmethod
     def _check_jar(cls, jar_file: str) -> McVersion | None:
         """Search the given jar file to find the version"""
 
+        # pylint: disable-next=import-outside-toplevel
+        from zipfile import ZipFile
+
         with ZipFile(jar_file, "r") as zf:
             # for Minecraft 1.14+
             version_json = None
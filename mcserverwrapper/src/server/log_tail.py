@@ -0,0 +1,318 @@
+"""
+Module containing the LogTailChild class, which follows logs/latest.log of a server the wrapper didn't start
+
+The log is read incrementally from a stored offset, so attaching again doesn't reread lines which were already read.
+New lines are waited for with inotify on Linux, and by polling the file everywhere else.
+When the server rotates the log, the rest of the old file is read before continuing with the new one.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import select
+import signal
+import sys
+import time
+from subprocess import TimeoutExpired
+from threading import Lock
+
+from ..error import McServerWrapperError
+from ..util.process import pid_alive
+from .session import SESSION_DIR_NAME, session_alive
+
+LOG_PATH = os.path.join("logs", "latest.log")
+OFFSET_FILE_NAME = ".mcserverwrapper-logtail.json"
+# the offset is written at most this often while reading, and always on close()
+_SAVE_INTERVAL = 1.0
+
+class LogTailError(McServerWrapperError):
+    """An error occuring if a server attached through its log file is asked for something only a child can do"""
+
+class _TailProcess:
+    """Mimics the proc attribute of a PopenSpawn"""
+
+    def __init__(self, child: LogTailChild) -> None:
+        self._child = child
+
+    def wait(self, timeout: float | None = None) -> int:
+        """
+        Wait for the server process to exit
+
+        The exit status of a process which isn't a child of the wrapper can't be read, so 0 is returned
+        """
+
+        pid = self._child.pid
+        end = None if timeout is None else time.monotonic() + timeout
+        while pid is None or pid_alive(pid):
+            if end is not None and time.monotonic() >= end:
+                raise TimeoutExpired(f"pid {pid}", timeout)
+            time.sleep(0.1 if end is None else max(min(0.1, end - time.monotonic()), 0))
+        return 0
+
+# pylint: disable-next=too-many-instance-attributes
+class LogTailChild:
+    """
+    Follows the log file of a running server, with the methods of a PopenSpawn the servers use
+
+    Args:
+        server_path (str): the server directory
+        pid (int | None): the pid of the server process, used to detect its exit and to stop it
+        offset_path (str | None): the json file storing the read offset, defaults to a file in the server directory
+        timeout (float): the seconds read() waits for output
+        poll_interval (float): the seconds between checks of the log file if inotify isn't available
+    """
+
+    # pylint: disable-next=too-many-arguments
+    def __init__(self, server_path: str, pid: int | None = None, offset_path: str | None = None,
+                 timeout: float = 1, poll_interval: float = 0.25) -> None:
+        self.log_path = os.path.join(server_path, LOG_PATH)
+        self.offset_path = offset_path if offset_path is not None else os.path.join(server_path, OFFSET_FILE_NAME)
+        self.pid = pid
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.proc = _TailProcess(self)
+
+        self._file = None
+        self._inode = None
+        # the file offset of the first byte in the buffer
+        self._offset = 0
+        self._buffer = bytearray()
+        self._closed = False
+        self._saved_at = 0.0
+        self._lock = Lock()
+        self._watch = _Inotify.create(os.path.dirname(self.log_path))
+
+        self._open_log(*self._read_state())
+
+    @property
+    def offset(self) -> int:
+        """The offset of the next byte read() returns, inside the current log file"""
+
+        return self._offset
+
+    def read(self, size: int = -1) -> bytes:
+        """
+        Return up to size bytes of new log output, like PopenSpawn.read_nonblocking
+
+        Raises:
+            pexpect.exceptions.TIMEOUT: if no output was written within the timeout
+            pexpect.exceptions.EOF: if the server exited and all output was read, or the tail was closed
+        """
+
+        # pylint: disable-next=import-outside-toplevel
+        import pexpect
+
+        end = time.monotonic() + self.timeout
+        while True:
+            with self._lock:
+                if self._closed:
+                    raise pexpect.exceptions.EOF("The log tail was closed")
+                if len(self._buffer) > 0 or self._fill():
+                    size = len(self._buffer) if size < 0 else size
+                    data = bytes(self._buffer[:size])
+                    del self._buffer[:size]
+                    self._offset += len(data)
+                    if time.monotonic() - self._saved_at > _SAVE_INTERVAL:
+                        self._save_state()
+                    return data
+                # only report the exit after everything the server wrote was read
+                if self.pid is not None and not pid_alive(self.pid) and not self._fill():
+                    raise pexpect.exceptions.EOF("The server exited")
+
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                raise pexpect.exceptions.TIMEOUT("No output within the timeout")
+            self._wait(remaining)
+
+    def send(self, data: str | bytes) -> int:
+        """Commands can't be sent to a server which wasn't started by the wrapper"""
+
+        raise LogTailError("Commands can't be sent to a server attached through its log file")
+
+    def sendline(self, line: str = "") -> int:
+        """Commands can't be sent to a server which wasn't started by the wrapper"""
+
+        return self.send(line)
+
+    def kill(self, sig: int) -> None:
+        """Send a signal to the server process"""
+
+        if self.pid is None:
+            raise LogTailError("The pid of the server is unknown, so it can't receive signals")
+        os.kill(self.pid, sig)
+
+    def terminate(self) -> None:
+        """Ask the server to stop, which saves the worlds like the stop command"""
+
+        self.kill(signal.SIGTERM)
+
+    def close(self) -> None:
+        """Stop following the log and store the offset, so the next tail continues after the last read byte"""
+
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._save_state()
+            if self._file is not None:
+                self._file.close()
+            if self._watch is not None:
+                self._watch.close()
+
+    # the servers detach from sessions and log tails the same way
+    detach = close
+
+    def _fill(self) -> bool:
+        """Read new data into the buffer, switching to a rotated log if the current one is complete"""
+
+        if self._file is not None:
+            data = self._file.read(65536)
+            if data:
+                self._buffer += data
+                return True
+
+        try:
+            stat = os.stat(self.log_path)
+        except FileNotFoundError:
+            # the log is being rotated
+            return False
+
+        if self._file is None or stat.st_ino != self._inode:
+            # the old log was completely read above, so the new one is read from its start
+            self._open_log(stat.st_ino, 0)
+            return self._fill() if self._file is not None else False
+        if stat.st_size < self._offset + len(self._buffer):
+            # the log was truncated in place
+            self._file.seek(0)
+            self._offset = 0
+            return self._fill()
+        return False
+
+    def _open_log(self, inode: int | None, offset: int | None) -> None:
+        """Open the log file, seeking to the offset if the stored inode matches, or to the end if nothing is stored"""
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        try:
+            # pylint: disable-next=consider-using-with
+            log_file = open(self.log_path, "rb")
+        except FileNotFoundError:
+            return
+
+        stat = os.fstat(log_file.fileno())
+        if inode is None:
+            # nothing was read yet, so only new output is followed
+            offset = stat.st_size
+        elif inode != stat.st_ino or offset > stat.st_size:
+            # the log was rotated since the offset was stored
+            offset = 0
+        log_file.seek(offset)
+
+        self._file = log_file
+        self._inode = stat.st_ino
+        self._offset = offset
+        self._buffer = bytearray()
+
+    def _wait(self, timeout: float) -> None:
+        if self._watch is not None:
+            self._watch.wait(min(timeout, 1.0))
+        else:
+            time.sleep(min(timeout, self.poll_interval))
+
+    def _read_state(self) -> tuple[int | None, int | None]:
+        if not os.path.isfile(self.offset_path):
+            return None, None
+        with open(self.offset_path, "r", encoding="utf8") as state_file:
+            state = json.load(state_file)
+        return state["inode"], state["offset"]
+
+    def _save_state(self) -> None:
+        if self._inode is None:
+            return
+        self._saved_at = time.monotonic()
+        temp_path = self.offset_path + ".tmp"
+        with open(temp_path, "w", encoding="utf8") as state_file:
+            json.dump({"inode": self._inode, "offset": self._offset}, state_file)
+        os.replace(temp_path, self.offset_path)
+
+class _Inotify:
+    """An inotify watch on a directory, using libc through ctypes"""
+
+    # IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    _MASK = 0x2 | 0x8 | 0x40 | 0x80 | 0x100 | 0x200
+    # IN_NONBLOCK | IN_CLOEXEC
+    _FLAGS = 0o4000 | 0o2000000
+
+    def __init__(self, fd: int) -> None:
+        self._fd = fd
+
+    @classmethod
+    def create(cls, directory: str) -> _Inotify | None:
+        """Return a watch on the directory, or None if inotify isn't available"""
+
+        if not sys.platform.startswith("linux") or not os.path.isdir(directory):
+            return None
+
+        # pylint: disable-next=import-outside-toplevel
+        import ctypes
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+            fd = libc.inotify_init1(cls._FLAGS)
+        except (OSError, AttributeError):
+            return None
+        if fd < 0:
+            return None
+        if libc.inotify_add_watch(fd, os.fsencode(directory), cls._MASK) < 0:
+            os.close(fd)
+            return None
+        return cls(fd)
+
+    def wait(self, timeout: float) -> None:
+        """Wait until something in the directory changed, or the timeout passed"""
+
+        try:
+            readable, _, _ = select.select([self._fd], [], [], timeout)
+        except (OSError, ValueError):
+            # the watch was closed by another thread
+            return
+        if readable:
+            try:
+                # the events themselves aren't needed, the log is checked after every change
+                while os.read(self._fd, 4096):
+                    pass
+            except OSError:
+                pass
+
+    def close(self) -> None:
+        """Remove the watch"""
+
+        os.close(self._fd)
+
+def find_server_pid(server_path: str) -> int | None:
+    """Return the pid of the java process running in the server directory, only supported on Linux"""
+
+    if not os.path.isdir("/proc"):
+        return None
+
+    server_path = os.path.realpath(server_path)
+    for entry in os.listdir("/proc"):
+        if not entry.isdecimal():
+            continue
+        try:
+            if os.readlink(f"/proc/{entry}/cwd") != server_path:
+                continue
+            with open(f"/proc/{entry}/cmdline", "rb") as cmdline_file:
+                executable = cmdline_file.read().split(b"\0", 1)[0]
+        except OSError:
+            # the process exited or belongs to another user
+            continue
+        if os.path.basename(executable).startswith(b"java"):
+            return int(entry)
+    return None
+
+def server_dir_in_use(server_path: str) -> bool:
+    """Return True if a server runs in the server directory, under a session holder or started by other tooling"""
+
+    return session_alive(os.path.join(server_path, SESSION_DIR_NAME)) or find_server_pid(server_path) is not None
@@ -0,0 +1,343 @@
+"""
+Module containing the ModLoadProfiler class, which times the mod loading of Forge servers from their console output
+
+Every boot is split into phases by the lines Forge and Minecraft print when a phase begins,
+e.g. 'Forge mod loading, version ...' for the construction of the mods or 'Preparing level' for the world.
+Within a phase, the mods are attributed the time from their first line until the next mod starts on the same thread,
+as the modloading workers handle one mod at a time. Lines carrying a duration, like the 'Bar Step' lines of 1.12,
+are taken as they are. Most per-mod lines are logged at debug level, which Forge only prints to the console
+with -Dforge.logging.console.level=debug, otherwise only the phases are timed.
+
+The profile of every boot is stored as json, so boots can be compared across modpack updates:
+
+    store = ProfileStore("/srv/modpack/.mcserverwrapper-profiles")
+    before, after = store.latest(2)
+    for change in compare_profiles(before, after)[:10]:
+        print(change.kind, change.name, f"{change.delta:+.2f}s")
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import tempfile
+import time
+from datetime import datetime
+from threading import Lock
+from typing import Any, Callable, Iterable, Pattern
+
+from ..util import console_parser, logger
+from ..util.logger import Logger
+
+# the default profile directory, inside the server directory
+PROFILE_DIR_NAME = ".mcserverwrapper-profiles"
+# the time before the first recognized phase
+STARTUP_PHASE = "startup"
+
+# the phases of a boot in their order, with the messages starting them
+DEFAULT_PHASES: tuple[tuple[str, str], ...] = (
+    ("launch", r"^ModLauncher running"),
+    ("discovery", r"^(Loading \d+ mods:|Forge Mod Loader has identified \d+ mods? to load|Found \d+ mods? to load)"),
+    ("construct", r"^(Forge mod loading, version|Forge Mod Loader version .* loading|Attempting early MinecraftForge setup)"),
+    ("registry", r"^(Injecting existing registry data|Registry freeze|Applying holder lookups|Processing ObjectHolder annotations)"),
+    ("data load", r"^(Reloading ResourceManager|Loaded \d+ recipes|Loaded \d+ advancements)"),
+    ("server", r"^Starting minecraft server version"),
+    ("world", r"^Preparing (level|start region)")
+)
+# the messages naming the mod a modloading thread works on, optionally with the seconds it took
+DEFAULT_MOD_PATTERNS: tuple[str, ...] = (
+    # 1.12: Bar Step: PreInitialization - Just Enough Items took 1.234s
+    r"^Bar Step: (?P<phase>\w+) - (?P<mod>.+) took (?P<seconds>\d+(\.\d+)?)s$",
+    # 1.13+, at debug level
+    r"^Creating FMLModContainer instance for (?P<mod>\S+)",
+    r"^Attempting to inject @EventBusSubscriber classes into the eventbus for (?P<mod>\S+)"
+)
+_DONE_PATTERN = re.compile(r"^Done \(")
+
+class ModTiming:
+    """The time a single mod took in each phase of a boot"""
+
+    def __init__(self, mod: str, phases: dict[str, float] | None = None) -> None:
+        self.mod = mod
+        self.phases = phases if phases is not None else {}
+
+    mod: str
+    phases: dict[str, float]
+
+    @property
+    def total(self) -> float:
+        """The seconds the mod took in all phases"""
+
+        return sum(self.phases.values())
+
+class BootProfile:
+    """
+    The phase and mod timings of a single boot
+
+    Args:
+        started_at (float): the unix time the boot started at
+        phases (dict[str, float]): the seconds every phase took, in the order of the phases
+        mods (dict[str, ModTiming]): the timing of every mod which was seen
+        total (float): the seconds from the start until the server was done starting
+        mod_files (list[str]): the files in the mods directory, which identify the modpack version
+    """
+
+    # pylint: disable-next=too-many-arguments
+    def __init__(self, started_at: float, phases: dict[str, float], mods: dict[str, ModTiming], total: float,
+                 mod_files: list[str] | None = None) -> None:
+        self.started_at = started_at
+        self.phases = phases
+        self.mods = mods
+        self.total = total
+        self.mod_files = mod_files if mod_files is not None else []
+
+    started_at: float
+    phases: dict[str, float]
+    mods: dict[str, ModTiming]
+    total: float
+    mod_files: list[str]
+
+    def slowest_mods(self, count: int = 10) -> list[ModTiming]:
+        """Return the mods which took the longest over all phases, slowest first"""
+
+        return sorted(self.mods.values(), key=lambda timing: timing.total, reverse=True)[:count]
+
+    def to_dict(self) -> dict[str, Any]:
+        """Convert the profile into a json-serializable dict"""
+
+        return {"started_at": self.started_at, "total": self.total, "phases": self.phases,
+                "mods": {mod: timing.phases for mod, timing in self.mods.items()}, "mod_files": self.mod_files}
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> BootProfile:
+        """Create a profile from a dict created by to_dict"""
+
+        mods = {mod: ModTiming(mod, phases) for mod, phases in data.get("mods", {}).items()}
+        return cls(data["started_at"], data.get("phases", {}), mods, data["total"], data.get("mod_files"))
+
+class TimingChange:
+    """The difference of a phase or mod between two boots"""
+
+    def __init__(self, kind: str, name: str, before: float | None, after: float | None) -> None:
+        self.kind = kind
+        self.name = name
+        self.before = before
+        self.after = after
+
+    # either 'phase' or 'mod'
+    kind: str
+    name: str
+    # None if the phase or mod didn't appear in the boot
+    before: float | None
+    after: float | None
+
+    @property
+    def delta(self) -> float:
+        """The seconds the phase or mod got slower, negative if it got faster"""
+
+        return (self.after or 0.0) - (self.before or 0.0)
+
+def compare_profiles(before: BootProfile, after: BootProfile) -> list[TimingChange]:
+    """
+    Compare the phases and mods of two boots
+
+    Args:
+        before (BootProfile): the earlier boot, e.g. before a modpack update
+        after (BootProfile): the later boot
+
+    Returns:
+        list[TimingChange]: the changes of all phases and mods, the largest difference first
+    """
+
+    changes = [TimingChange("phase", phase, before.phases.get(phase), after.phases.get(phase))
+               for phase in dict.fromkeys([*before.phases, *after.phases])]
+    for mod in dict.fromkeys([*before.mods, *after.mods]):
+        changes.append(TimingChange("mod", mod, before.mods[mod].total if mod in before.mods else None,
+                                    after.mods[mod].total if mod in after.mods else None))
+    changes.sort(key=lambda change: abs(change.delta), reverse=True)
+    return changes
+
+class ProfileStore:
+    """
+    A directory of boot profiles, one json file per boot
+
+    Args:
+        path (str): the directory of the profiles
+        max_profiles (int): the amount of profiles to keep, older profiles are deleted
+    """
+
+    def __init__(self, path: str, max_profiles: int = 100) -> None:
+        if not isinstance(max_profiles, int):
+            raise TypeError(f"Expected int, got {type(max_profiles)}")
+
+        self.path = path
+        self.max_profiles = max_profiles
+
+    def save(self, profile: BootProfile) -> str:
+        """Store a profile and return the path of its file"""
+
+        os.makedirs(self.path, exist_ok=True)
+        name = datetime.fromtimestamp(profile.started_at).strftime("boot-%Y%m%d-%H%M%S-%f.json")
+        path = os.path.join(self.path, name)
+        # the file is renamed into place, so readers never see a partial profile
+        fd, temp_path = tempfile.mkstemp(dir=self.path, prefix=".boot-", suffix=".json")
+        with os.fdopen(fd, "w", encoding="utf8") as profile_file:
+            json.dump(profile.to_dict(), profile_file, indent=2)
+        os.replace(temp_path, path)
+
+        for old_path in self.list()[:-self.max_profiles]:
+            os.remove(old_path)
+        return path
+
+    def list(self) -> list[str]:
+        """Return the paths of all stored profiles, oldest first"""
+
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(os.path.join(self.path, name) for name in os.listdir(self.path)
+                      if name.startswith("boot-") and name.endswith(".json"))
+
+    def latest(self, count: int = 1) -> list[BootProfile]:
+        """Return the latest stored profiles, oldest first"""
+
+        return [self.load(path) for path in self.list()[-count:]] if count > 0 else []
+
+    @staticmethod
+    def load(path: str) -> BootProfile:
+        """Read a stored profile"""
+
+        with open(path, "r", encoding="utf8") as profile_file:
+            return BootProfile.from_dict(json.load(profile_file))
+
+# pylint: disable-next=too-many-instance-attributes
+class ModLoadProfiler:
+    """
+    Times the phases and mods of a boot from the console lines fed to it
+
+    Args:
+        store (ProfileStore | None): the store every finished profile is saved to
+        mods_dir (str | None): the mods directory, whose files are listed in every profile
+        phases (Iterable[tuple[str, str]]): the phases in their order, with the pattern of the message starting them
+        mod_patterns (Iterable[str]): the patterns of messages naming a mod, with the groups mod and optionally
+            seconds and phase
+        clock (Callable[[], float]): the monotonic clock used to time the lines
+        log (Logger | None): the logger failures are written to, the logger set up last if not given
+    """
+
+    # pylint: disable-next=too-many-arguments,too-many-positional-arguments
+    def __init__(self, store: ProfileStore | None = None, mods_dir: str | None = None,
+                 phases: Iterable[tuple[str, str]] = DEFAULT_PHASES, mod_patterns: Iterable[str] = DEFAULT_MOD_PATTERNS,
+                 clock: Callable[[], float] = time.monotonic, log: Logger | None = None) -> None:
+        self.store = store
+        self.mods_dir = mods_dir
+        self._phases: list[tuple[str, Pattern]] = [(name, re.compile(pattern)) for name, pattern in phases]
+        self._mod_patterns: list[Pattern] = [re.compile(pattern) for pattern in mod_patterns]
+        self._clock = clock
+        self._log = log.log if log is not None else logger.log
+        self.last_profile = None
+        self._lock = Lock()
+        self._active = False
+        self._reset()
+
+    last_profile: BootProfile | None
+
+    def begin(self) -> None:
+        """Start timing a new boot, the lines until the next begin() are ignored once the server is done starting"""
+
+        with self._lock:
+            self._reset()
+            self._active = True
+            self._started_at = time.time()
+            self._start = self._clock()
+            self._phase_start = self._start
+
+    def feed(self, line: str) -> None:
+        """Update the timings from a single line of console output"""
+
+        if not self._active:
+            return
+        parsed = console_parser.parse_line(line)
+        if parsed is None:
+            return
+        message = parsed.message
+        now = self._clock()
+
+        with self._lock:
+            if _DONE_PATTERN.match(message) is not None:
+                self._finish(now)
+                return
+            for index in range(self._phase_index + 1, len(self._phases)):
+                if self._phases[index][1].match(message) is not None:
+                    self._enter_phase(index, now)
+                    return
+            for pattern in self._mod_patterns:
+                match = pattern.match(message)
+                if match is not None:
+                    self._mod_line(match, parsed.thread, now)
+                    return
+
+    @property
+    def active(self) -> bool:
+        """True if a boot is being timed"""
+
+        return self._active
+
+    def _reset(self) -> None:
+        self._started_at = 0.0
+        self._start = 0.0
+        self._phase_index = -1
+        self._phase_start = 0.0
+        self._phase_times: dict[str, float] = {}
+        self._mod_times: dict[str, ModTiming] = {}
+        # the mod every thread is working on, and since when
+        self._current_mods: dict[str | None, tuple[str, float]] = {}
+
+    def _phase_name(self) -> str:
+        return self._phases[self._phase_index][0] if self._phase_index >= 0 else STARTUP_PHASE
+
+    def _enter_phase(self, index: int, now: float) -> None:
+        """End the current phase and every mod running in it, phases are barriers for the modloading threads"""
+
+        self._end_mods(now)
+        self._phase_times[self._phase_name()] = now - self._phase_start
+        self._phase_index = index
+        self._phase_start = now
+
+    def _mod_line(self, match: re.Match, thread: str | None, now: float) -> None:
+        mod = match.group("mod").strip()
+        groups = match.groupdict()
+        if groups.get("seconds") is not None:
+            self._add_mod_time(mod, groups.get("phase") or self._phase_name(), float(groups["seconds"]))
+            return
+
+        current = self._current_mods.get(thread)
+        if current is not None:
+            self._add_mod_time(current[0], self._phase_name(), now - current[1])
+        self._current_mods[thread] = (mod, now)
+
+    def _add_mod_time(self, mod: str, phase: str, seconds: float) -> None:
+        timing = self._mod_times.get(mod)
+        if timing is None:
+            timing = ModTiming(mod)
+            self._mod_times[mod] = timing
+        timing.phases[phase] = timing.phases.get(phase, 0.0) + seconds
+
+    def _end_mods(self, now: float) -> None:
+        for mod, since in self._current_mods.values():
+            self._add_mod_time(mod, self._phase_name(), now - since)
+        self._current_mods.clear()
+
+    def _finish(self, now: float) -> None:
+        self._end_mods(now)
+        self._phase_times[self._phase_name()] = now - self._phase_start
+        self._active = False
+
+        mod_files = sorted(os.listdir(self.mods_dir)) if self.mods_dir is not None and os.path.isdir(self.mods_dir) else []
+        profile = BootProfile(self._started_at, self._phase_times, self._mod_times, now - self._start, mod_files)
+        self.last_profile = profile
+        if self.store is not None:
+            try:
+                self.store.save(profile)
+            except OSError as e:
+                self._log(f"Could not store the boot profile: {e}")
@@ -14,14 +14,19 @@ class PaperServer(BaseServer):
     VERSION_TYPE = McVersionType.PAPER
 
     def execute_command(self, command: str):
-        if command.startswith("/"):
-            command = command[1::]
+        command = self._prepare_command(command)
 
         super().execute_command(command)
 
         if command == "stop":
             self._ensure_stop()
 
+    def _prepare_command(self, command: str) -> str:
+        if command.startswith("/"):
+            command = command[1::]
+
+        return command
+
     @staticmethod
     def _check_jar(jar_file: str) -> McVersion | None:
         """Search the given jar file to find the version"""
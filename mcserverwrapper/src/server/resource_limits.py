@@ -0,0 +1,318 @@
+"""Module containing resource isolation options which are applied to a spawned server process"""
+
+from __future__ import annotations
+
+import os
+import sys
+from threading import Lock
+from typing import Callable
+
+from ..util import logger
+from ..util.logger import Logger
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+CGROUP_PARENT = "mcserverwrapper"
+NUMA_NODES_PATH = "/sys/devices/system/node"
+
+IONICE_CLASSES = {
+    "realtime": 1,
+    "best-effort": 2,
+    "idle": 3
+}
+
+class CpuScheduler:
+    """
+    Hands out sets of cpus to server instances, spreading them across cores and NUMA nodes
+    A single scheduler should be shared between all servers running on the same host
+    """
+
+    def __init__(self, cpus: list[int] | None = None, numa_aware: bool = True) -> None:
+        if cpus is None:
+            cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count()))
+
+        self._nodes = self._read_numa_nodes(cpus) if numa_aware else [list(cpus)]
+        self._usage = {cpu: 0 for cpu in cpus}
+        self._lock = Lock()
+
+    def allocate(self, cpu_count: int) -> set[int]:
+        """
+        Reserve cpu_count cpus for a new server instance
+
+        Instances are placed on the least loaded NUMA node, and on the least loaded cpus within that node.
+        If an instance needs more cpus than a single node has, the cpus are taken from all nodes.
+
+        Args:
+            cpu_count (int): the amount of cpus the instance should be pinned to
+
+        Returns:
+            set[int]: the allocated cpu ids
+        """
+
+        if not isinstance(cpu_count, int):
+            raise TypeError(f"Expected int, got {type(cpu_count)}")
+        if cpu_count < 1 or cpu_count > len(self._usage):
+            raise ValueError(f"Expected cpu_count between 1 and {len(self._usage)}, got {cpu_count}")
+
+        with self._lock:
+            candidates = [node for node in self._nodes if len(node) >= cpu_count]
+            if len(candidates) == 0:
+                candidates = [list(self._usage)]
+
+            node = min(candidates, key=lambda n: sum(self._usage[cpu] for cpu in n) / len(n))
+            cpus = sorted(node, key=lambda cpu: (self._usage[cpu], cpu))[:cpu_count]
+            for cpu in cpus:
+                self._usage[cpu] += 1
+
+        return set(cpus)
+
+    def release(self, cpus: set[int]) -> None:
+        """Return previously allocated cpus to the scheduler"""
+
+        with self._lock:
+            for cpu in cpus:
+                if self._usage.get(cpu, 0) > 0:
+                    self._usage[cpu] -= 1
+
+    def usage(self) -> dict[int, int]:
+        """Return the amount of instances pinned to each cpu"""
+
+        with self._lock:
+            return self._usage.copy()
+
+    @staticmethod
+    def _read_numa_nodes(cpus: list[int]) -> list[list[int]]:
+        """Group the given cpus by their NUMA node, or return a single group if NUMA info is unavailable"""
+
+        if not os.path.isdir(NUMA_NODES_PATH):
+            return [list(cpus)]
+
+        nodes = []
+        for entry in sorted(os.listdir(NUMA_NODES_PATH)):
+            cpulist_path = os.path.join(NUMA_NODES_PATH, entry, "cpulist")
+            if not entry.startswith("node") or not os.path.isfile(cpulist_path):
+                continue
+            with open(cpulist_path, "r", encoding="utf8") as cpulist_file:
+                node_cpus = [cpu for cpu in parse_cpu_list(cpulist_file.read()) if cpu in cpus]
+            if len(node_cpus) > 0:
+                nodes.append(node_cpus)
+
+        if len(nodes) == 0:
+            return [list(cpus)]
+        return nodes
+
+# pylint: disable-next=too-many-instance-attributes
+class ResourceLimits:
+    """
+    Resource isolation options for a single server process
+
+    Args:
+        cpus (set[int] | None): the cpus the server process gets pinned to
+        nice (int | None): the niceness of the server process
+        ionice_class (str | None): one of 'realtime', 'best-effort' or 'idle'
+        ionice_level (int | None): the io priority within the ionice_class, from 0 (highest) to 7 (lowest),
+            only used together with an ionice_class
+        memory_max (str | int | None): the cgroup v2 memory limit, e.g. '6G' or a byte count
+        cpu_quota (float | None): the cgroup v2 cpu limit in cpus, e.g. 2.5 allows 250% cpu time
+        cgroup_name (str | None): the name of the cgroup, defaults to 'server-<pid>'
+    """
+
+    # pylint: disable-next=too-many-positional-arguments
+    def __init__(self, cpus: set[int] | None = None, nice: int | None = None, ionice_class: str | None = None,
+                 ionice_level: int | None = None, memory_max: str | int | None = None, cpu_quota: float | None = None,
+                 cgroup_name: str | None = None) -> None:
+        if ionice_class is not None and ionice_class not in IONICE_CLASSES:
+            raise ValueError(f"Expected ionice_class to be one of {list(IONICE_CLASSES)}, got {ionice_class}")
+        if ionice_level is not None and not 0 <= ionice_level <= 7:
+            raise ValueError(f"Expected ionice_level between 0 and 7, got {ionice_level}")
+        if ionice_level is not None and ionice_class is None:
+            raise ValueError("An ionice_level can only be set together with an ionice_class")
+        if cpu_quota is not None and cpu_quota <= 0:
+            raise ValueError(f"Expected a positive cpu_quota, got {cpu_quota}")
+
+        self.cpus = set(cpus) if cpus is not None else None
+        self.nice = nice
+        self.ionice_class = ionice_class
+        self.ionice_level = ionice_level
+        self.memory_max = memory_max
+        self.cpu_quota = cpu_quota
+        self.cgroup_name = cgroup_name
+
+        self._scheduler = None
+        self._scheduled_cpu_count = 0
+        self._allocated_cpus = None
+        self._cgroup_path = None
+        self._log = logger.log
+
+    def schedule_cpus(self, scheduler: CpuScheduler, cpu_count: int) -> ResourceLimits:
+        """Let the given scheduler choose the cpus each time the limits are applied to a new process"""
+
+        if not isinstance(scheduler, CpuScheduler):
+            raise TypeError(f"Expected CpuScheduler, got {type(scheduler)}")
+
+        self._scheduler = scheduler
+        self._scheduled_cpu_count = cpu_count
+        return self
+
+    def is_empty(self) -> bool:
+        """Return True if no limits were configured"""
+
+        return self.cpus is None and self._scheduler is None and self.nice is None and self.ionice_class is None \
+               and self.memory_max is None and self.cpu_quota is None
+
+    def apply(self, pid: int, log: Logger | None = None) -> None:
+        """
+        Apply all configured limits to the process with the given pid
+        Limits which cannot be applied on this system are skipped and logged to the given logger
+
+        Affinity, niceness and io priority are set per thread on Linux, so they are applied to every thread of the process.
+        """
+
+        if log is not None:
+            self._log = log.log
+
+        if sys.platform == "win32":
+            if not self.is_empty():
+                self._log("Resource limits are not supported on Windows, skipping")
+            return
+
+        cpus = self.cpus
+        if self._scheduler is not None:
+            self.release()
+            self._allocated_cpus = self._scheduler.allocate(self._scheduled_cpu_count)
+            cpus = self._allocated_cpus
+
+        if cpus is not None:
+            try:
+                _apply_to_threads(pid, lambda tid: os.sched_setaffinity(tid, cpus))
+                self._log(f"Pinned server process {pid} to cpus {format_cpu_list(cpus)}")
+            except OSError as e:
+                self._log(f"Could not set cpu affinity for server process {pid}: {e}")
+
+        if self.nice is not None:
+            try:
+                _apply_to_threads(pid, lambda tid: os.setpriority(os.PRIO_PROCESS, tid, self.nice))
+            except OSError as e:
+                self._log(f"Could not set niceness for server process {pid}: {e}")
+
+        if self.ionice_class is not None:
+            self._apply_ionice(pid)
+
+        if self.memory_max is not None or self.cpu_quota is not None:
+            self._apply_cgroup(pid)
+
+    def release(self) -> None:
+        """Return cpus allocated by a CpuScheduler and remove the cgroup of the stopped server process"""
+
+        if self._allocated_cpus is not None:
+            self._scheduler.release(self._allocated_cpus)
+            self._allocated_cpus = None
+
+        if self._cgroup_path is not None:
+            try:
+                os.rmdir(self._cgroup_path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                self._log(f"Could not remove cgroup {self._cgroup_path}: {e}")
+            self._cgroup_path = None
+
+    def _apply_ionice(self, pid: int) -> None:
+        # pylint: disable-next=import-outside-toplevel
+        import subprocess
+
+        cmd = ["ionice", "-c", str(IONICE_CLASSES[self.ionice_class]), "-p"]
+        if self.ionice_level is not None and self.ionice_class != "idle":
+            cmd[3:3] = ["-n", str(self.ionice_level)]
+
+        def set_io_priority(tid: int) -> None:
+            result = subprocess.run(cmd + [str(tid)], check=False, capture_output=True)
+            if result.returncode != 0:
+                raise OSError(result.stderr.decode("utf8", errors="replace").strip())
+
+        try:
+            _apply_to_threads(pid, set_io_priority)
+        except OSError as e:
+            self._log(f"Could not set io priority for server process {pid}: {e}")
+
+    def _apply_cgroup(self, pid: int) -> None:
+        if not os.path.isfile(os.path.join(CGROUP_ROOT, "cgroup.controllers")):
+            self._log("cgroup v2 is not available, skipping memory and cpu quota")
+            return
+
+        parent_path = os.path.join(CGROUP_ROOT, CGROUP_PARENT)
+        cgroup_path = os.path.join(parent_path, self.cgroup_name or f"server-{pid}")
+
+        try:
+            os.makedirs(cgroup_path, exist_ok=True)
+            # controllers have to be enabled for the children of every ancestor
+            for path in [CGROUP_ROOT, parent_path]:
+                _write_cgroup_file(os.path.join(path, "cgroup.subtree_control"), "+cpu +memory")
+
+            if self.memory_max is not None:
+                _write_cgroup_file(os.path.join(cgroup_path, "memory.max"), str(self.memory_max))
+            if self.cpu_quota is not None:
+                period = 100000
+                _write_cgroup_file(os.path.join(cgroup_path, "cpu.max"), f"{int(self.cpu_quota * period)} {period}")
+
+            _write_cgroup_file(os.path.join(cgroup_path, "cgroup.procs"), str(pid))
+            self._cgroup_path = cgroup_path
+            self._log(f"Moved server process {pid} into cgroup {cgroup_path}")
+        except OSError as e:
+            self._log(f"Could not apply cgroup limits for server process {pid}: {e}")
+
+def parse_cpu_list(cpu_list: str) -> list[int]:
+    """Parse a linux cpu list like '0-3,8,10-11' into a list of cpu ids"""
+
+    cpus = []
+    for part in cpu_list.strip().split(","):
+        if part == "":
+            continue
+        if "-" in part:
+            start, end = part.split("-", maxsplit=1)
+            cpus.extend(range(int(start), int(end) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+def format_cpu_list(cpus: set[int]) -> str:
+    """Format the given cpu ids as a linux cpu list like '0-3,8'"""
+
+    ranges = []
+    for cpu in sorted(cpus):
+        if len(ranges) > 0 and ranges[-1][1] == cpu - 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ",".join(str(start) if start == end else f"{start}-{end}" for start, end in ranges)
+
+def _thread_ids(pid: int) -> set[int]:
+    """Return the ids of all threads of the process, or just the pid if they can't be listed"""
+
+    try:
+        return {int(tid) for tid in os.listdir(f"/proc/{pid}/task")}
+    except OSError:
+        return {pid}
+
+def _apply_to_threads(pid: int, apply: Callable[[int], None]) -> None:
+    """
+    Call apply with the id of every thread of the process, until no new threads show up
+    New threads inherit these settings from the thread creating them, so threads started afterwards are covered too
+    """
+
+    done = set()
+    while True:
+        tids = _thread_ids(pid) - done
+        if len(tids) == 0:
+            return
+        for tid in sorted(tids):
+            try:
+                apply(tid)
+            except OSError:
+                # threads may exit while the others are updated
+                if tid == pid or os.path.isdir(f"/proc/{pid}/task/{tid}"):
+                    raise
+        done |= tids
+
+def _write_cgroup_file(path: str, value: str) -> None:
+    with open(path, "w", encoding="utf8") as cgroup_file:
+        cgroup_file.write(value)
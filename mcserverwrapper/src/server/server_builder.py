@@ -2,18 +2,24 @@
 
 from __future__ import annotations
 
+import copy
 import os
 from pathlib import Path
 
-from mcserverwrapper.src.util import logger
+from mcserverwrapper.src.util import instrumentation, logger
 
 from .base_server import BaseServer
 from .vanilla_server import VanillaServer
 from .forge_server import ForgeServer
+from .resource_limits import CpuScheduler, ResourceLimits
+from .session import SESSION_DIR_NAME
 from ..mcversion import McVersion, McVersionType
 
 DEFAULT_START_CMD = "java -Xmx4G -Xms4G -jar server.jar nogui"
+# the default size of the shared output ring of isolated servers
+DEFAULT_RING_SIZE = 1 << 20
 
+# pylint: disable-next=too-many-instance-attributes
 class ServerBuilder:
     """
     Builder class to create a new Server object
@@ -54,6 +60,23 @@ class ServerBuilder:
 
         return builder
 
+    @classmethod
+    def detect_version(cls, jar_file: str) -> McVersion:
+        """
+        Detect the Minecraft version of a server jar without logging, so no log file is written next to the jar
+
+        Args:
+            jar_file (str): the full or relative path to the jar file
+
+        Returns:
+            McVersion: the version of the server jar
+        """
+
+        if not os.path.isfile(jar_file):
+            raise FileNotFoundError(f"Jarfile {jar_file} not found")
+
+        return cls._check_jar(jar_file, log=False)
+
     def start_command(self, start_command: str) -> ServerBuilder:
         """
         Add a custom start command to the server
@@ -88,6 +111,124 @@ class ServerBuilder:
         self._port = port
         return self
 
+    def cpu_affinity(self, cpus: set[int] | CpuScheduler, cpu_count: int = 1) -> ServerBuilder:
+        """
+        Pin the server process to a set of cpus
+
+        Args:
+            cpus (set[int] | CpuScheduler): the cpu ids to pin the server to,
+                or a shared CpuScheduler which chooses the cpus every time the server is started
+            cpu_count (int): the amount of cpus to allocate if a CpuScheduler is given
+
+        Returns:
+            ServerBuilder: the same ServerBuilder instance
+        """
+
+        if isinstance(cpus, CpuScheduler):
+            self._resource_limits.schedule_cpus(cpus, cpu_count)
+        else:
+            cpus = set(cpus)
+            if len(cpus) == 0 or not all(isinstance(cpu, int) for cpu in cpus):
+                raise TypeError(f"Expected a non-empty set of int, got {cpus}")
+            self._resource_limits.cpus = cpus
+        return self
+
+    def priority(self, nice: int | None = None, ionice_class: str | None = None,
+                 ionice_level: int | None = None) -> ServerBuilder:
+        """
+        Set the cpu and io scheduling priority of the server process
+
+        Args:
+            nice (int | None): the niceness of the server process, from -20 (highest) to 19 (lowest)
+            ionice_class (str | None): one of 'realtime', 'best-effort' or 'idle'
+            ionice_level (int | None): the io priority within the ionice_class, from 0 (highest) to 7 (lowest),
+                only used together with an ionice_class
+
+        Returns:
+            ServerBuilder: the same ServerBuilder instance
+        """
+
+        if nice is not None and not isinstance(nice, int):
+            raise TypeError(f"Expected int, got {type(nice)}")
+
+        limits = ResourceLimits(nice=nice, ionice_class=ionice_class, ionice_level=ionice_level)
+        self._resource_limits.nice = limits.nice
+        self._resource_limits.ionice_class = limits.ionice_class
+        self._resource_limits.ionice_level = limits.ionice_level
+        return self
+
+    def cgroup_limits(self, memory_max: str | int | None = None, cpu_quota: float | None = None,
+                      cgroup_name: str | None = None) -> ServerBuilder:
+        """
+        Move the server process into a cgroup v2 with the given memory and cpu limits (Linux only)
+
+        Args:
+            memory_max (str | int | None): the memory limit, e.g. '6G' or a byte count
+            cpu_quota (float | None): the cpu limit in cpus, e.g. 2.5 allows 250% cpu time
+            cgroup_name (str | None): the name of the cgroup below /sys/fs/cgroup/mcserverwrapper
+
+        Returns:
+            ServerBuilder: the same ServerBuilder instance
+        """
+
+        limits = ResourceLimits(memory_max=memory_max, cpu_quota=cpu_quota, cgroup_name=cgroup_name)
+        self._resource_limits.memory_max = limits.memory_max
+        self._resource_limits.cpu_quota = limits.cpu_quota
+        self._resource_limits.cgroup_name = limits.cgroup_name
+        return self
+
+    def detached(self, session_dir: str | None = None) -> ServerBuilder:
+        """
+        Run the server under a session holder, so it keeps running if the wrapper exits or is restarted
+        Only supported on platforms with Unix domain sockets
+
+        Args:
+            session_dir (str | None): the directory of the holders' socket and output spool,
+                defaults to a directory inside the server directory
+
+        Returns:
+            ServerBuilder: the same ServerBuilder instance
+        """
+
+        if session_dir is not None and not isinstance(session_dir, str):
+            raise TypeError(f"Expected str, got {type(session_dir)}")
+
+        self._detached = True
+        self._session_dir = session_dir
+        return self
+
+    def isolated(self, ring_size: int = DEFAULT_RING_SIZE) -> ServerBuilder:
+        """
+        Read and format the server output in a worker process, so many servers in one wrapper use multiple cores
+        The formatted lines are passed back through a ring buffer in shared memory
+
+        Args:
+            ring_size (int): the size of the output ring in bytes, the worker waits while it is full
+
+        Returns:
+            ServerBuilder: the same ServerBuilder instance
+        """
+
+        if not isinstance(ring_size, int):
+            raise TypeError(f"Expected int, got {type(ring_size)}")
+
+        self._ring_size = ring_size
+        return self
+
+    def profile_mod_loading(self) -> ServerBuilder:
+        """
+        Time the phases and mods of every boot of a Forge server, see ForgeServer.load_profiler
+
+        Returns:
+            ServerBuilder: the same ServerBuilder instance
+        """
+
+        if self._mcv.type != McVersionType.FORGE:
+            raise ValueError("Only the mod loading of Forge servers can be profiled")
+
+        self._profile_mod_loading = True
+        return self
+
     def build(self) -> BaseServer:
         """
         Build the actual server instance
@@ -97,10 +238,21 @@ class ServerBuilder:
             BaseServer: The new server instance which is a superclass of BaseServer
         """
 
+        if self._detached and self._ring_size is not None:
+            raise ValueError("Detached servers are read by their session holder, so they can't be isolated")
+
         server_path = Path(self._jar_path).parent.resolve()
 
         clazz = self.SERVER_CLASSES[self._mcv.type]
-        server = clazz(server_path, self._mcv, self._port, self._start_cmd)
+        # every server gets its own copy, so that scheduled cpus are tracked per server
+        limits = None if self._resource_limits.is_empty() else copy.copy(self._resource_limits)
+        session_dir = None
+        if self._detached:
+            session_dir = self._session_dir if self._session_dir is not None \
+                          else os.path.join(server_path, SESSION_DIR_NAME)
+        server = clazz(server_path, self._mcv, self._port, self._start_cmd, limits, session_dir, self._ring_size)
+        if self._profile_mod_loading:
+            server.enable_load_profiler()
 
         assert server is not None
         return server
@@ -113,25 +265,36 @@ class ServerBuilder:
         self._mcv = mcv
         self._start_cmd = DEFAULT_START_CMD.replace("server.jar", Path(jar_path).name)
         self._port = None
+        self._resource_limits = ResourceLimits()
+        self._detached = False
+        self._session_dir = None
+        self._ring_size = None
+        self._profile_mod_loading = False
 
     # pylint: disable=protected-access
     @classmethod
-    def _check_jar(cls, jar_file: str) -> McVersion:
+    @instrumentation.timed("server_builder.check_jar")
+    def _check_jar(cls, jar_file: str, log: bool = True) -> McVersion:
         mcv = None
+        # the detection is logged next to the jar, where the server writes its log as well
+        jar_logger = logger.Logger(os.path.dirname(os.path.abspath(jar_file)))
 
         for clazz in cls.SERVER_CLASSES.values():
             mcv = clazz._check_jar(jar_file)
             if mcv is not None:
-                logger.log(f"Detected Minecraft version: {mcv}")
+                if log:
+                    jar_logger.log(f"Detected Minecraft version: {mcv}")
                 return mcv
 
-        logger.log(f"Minecraft version could not be read from {jar_file.rsplit(os.sep, maxsplit=1)[1]}," + \
-                   " checking filename")
+        if log:
+            jar_logger.log(f"Minecraft version could not be read from {jar_file.rsplit(os.sep, maxsplit=1)[1]}," + \
+                           " checking filename")
 
         for clazz in cls.SERVER_CLASSES.values():
             mcv = clazz._check_jar_name(jar_file)
             if mcv is not None:
-                logger.log(f"Detected Minecraft version: {mcv}")
+                if log:
+                    jar_logger.log(f"Detected Minecraft version: {mcv}")
                 return mcv
 
         raise ValueError(f"Minecraft version could not be identified from {jar_file.rsplit(os.sep, maxsplit=1)[1]}")
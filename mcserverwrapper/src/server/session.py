@@ -0,0 +1,235 @@
+"""
+Module containing the SessionChild class, which controls a server running under a session holder
+
+A detached server keeps running if the wrapper exits. A new wrapper attaches to it again,
+receives all output it missed from the spool of the holder, and continues sending commands.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+from subprocess import TimeoutExpired
+from threading import Condition, Thread
+
+from ..error import McServerWrapperError
+from .session_holder import recv_frame, send_frame
+
+# the default session directory of detached servers, inside the server directory
+SESSION_DIR_NAME = ".mcserverwrapper-session"
+HOLDER_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "session_holder.py")
+# unix socket paths are limited to 108 bytes
+_MAX_SOCKET_PATH_LENGTH = 100
+
+class SessionError(McServerWrapperError):
+    """An error occuring if a detached session could not be started or attached"""
+
+class _SessionProcess:
+    """Mimics the proc attribute of a PopenSpawn"""
+
+    def __init__(self, child: SessionChild) -> None:
+        self._child = child
+
+    def wait(self, timeout: float | None = None) -> int:
+        """Wait for the server to exit and return its exit status"""
+
+        # pylint: disable-next=protected-access
+        return self._child._wait(timeout)
+
+# pylint: disable-next=too-many-instance-attributes
+class SessionChild:
+    """
+    A connection to a session holder, with the methods of a PopenSpawn the servers use
+
+    Args:
+        session_dir (str): the directory of the session
+        offset (int | None): the output offset to replay from, None continues after the last delivered output
+        timeout (float): the seconds read() waits for output
+    """
+
+    def __init__(self, session_dir: str, offset: int | None = None, timeout: float = 1) -> None:
+        if not hasattr(socket, "AF_UNIX"):
+            raise SessionError("Detached sessions need Unix domain sockets, which are not supported on this platform")
+
+        self.session_dir = session_dir
+        self.timeout = timeout
+        with open(os.path.join(session_dir, "holder.json"), "r", encoding="utf8") as info_file:
+            info = json.load(info_file)
+        self.pid = info["pid"]
+        self.holder_pid = info["holder_pid"]
+        self.proc = _SessionProcess(self)
+
+        self._buffer = bytearray()
+        self._exit_status = None
+        self._connected = True
+        self._detached = False
+        self._changed = Condition()
+
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self._socket.connect(session_socket_path(session_dir))
+            send_frame(self._socket, b"A", struct.pack("!q", -1 if offset is None else offset))
+            frame = recv_frame(self._socket)
+        except OSError as e:
+            self._socket.close()
+            raise SessionError(f"Could not attach to the session in {session_dir}") from e
+        if frame is None or frame[0] != b"S":
+            self._socket.close()
+            raise SessionError(f"The session in {session_dir} refused the attach")
+
+        # the offset of the next byte read() returns
+        self.offset = struct.unpack("!q", frame[1])[0]
+        Thread(target=self._t_receive, daemon=True).start()
+
+    def read(self, size: int = -1) -> bytes:
+        """
+        Return up to size bytes of output, like PopenSpawn.read_nonblocking
+
+        Raises:
+            pexpect.exceptions.TIMEOUT: if no output was received within the timeout
+            pexpect.exceptions.EOF: if the server exited or the session was detached
+        """
+
+        # pylint: disable-next=import-outside-toplevel
+        import pexpect
+
+        with self._changed:
+            self._changed.wait_for(lambda: len(self._buffer) > 0 or not self._connected, self.timeout)
+            if len(self._buffer) > 0:
+                size = len(self._buffer) if size < 0 else size
+                data = bytes(self._buffer[:size])
+                del self._buffer[:size]
+                self.offset += len(data)
+                return data
+            if not self._connected:
+                raise pexpect.exceptions.EOF("The server exited or the session was detached")
+        raise pexpect.exceptions.TIMEOUT("No output within the timeout")
+
+    def send(self, data: str | bytes) -> int:
+        """Write data to the stdin of the server"""
+
+        if isinstance(data, str):
+            data = data.encode("utf8")
+        send_frame(self._socket, b"I", data)
+        return len(data)
+
+    def sendline(self, line: str = "") -> int:
+        """Write a line to the stdin of the server"""
+
+        return self.send(line + os.linesep)
+
+    def kill(self, sig: int) -> None:
+        """Send a signal to the server process"""
+
+        send_frame(self._socket, b"K", struct.pack("!i", sig))
+
+    def detach(self) -> None:
+        """Disconnect from the holder and leave the server running"""
+
+        self._detached = True
+        try:
+            send_frame(self._socket, b"D", struct.pack("!q", self.offset))
+            self._socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._socket.close()
+
+    def _wait(self, timeout: float | None) -> int:
+        with self._changed:
+            if not self._changed.wait_for(lambda: self._exit_status is not None or not self._connected, timeout):
+                raise TimeoutExpired(f"session {self.session_dir}", timeout)
+            if self._exit_status is None:
+                if self._detached:
+                    raise TimeoutExpired(f"session {self.session_dir}", timeout)
+                # the holder died, so the server is gone too
+                return -1
+            return self._exit_status
+
+    def _t_receive(self) -> None:
+        try:
+            while True:
+                frame = recv_frame(self._socket)
+                if frame is None:
+                    break
+                frame_type, payload = frame
+                with self._changed:
+                    if frame_type == b"O":
+                        self._buffer += payload
+                    elif frame_type == b"X":
+                        self._exit_status = struct.unpack("!i", payload)[0]
+                    self._changed.notify_all()
+        except OSError:
+            pass
+        finally:
+            with self._changed:
+                self._connected = False
+                self._changed.notify_all()
+
+def session_socket_path(session_dir: str) -> str:
+    """Return the socket path of a session, which is moved to the temp directory if the path would be too long"""
+
+    socket_path = os.path.join(session_dir, "holder.sock")
+    if len(socket_path) > _MAX_SOCKET_PATH_LENGTH:
+        digest = hashlib.sha1(os.path.abspath(session_dir).encode("utf8")).hexdigest()[:16]
+        socket_path = os.path.join(tempfile.gettempdir(), f"mcserverwrapper-{digest}.sock")
+    return socket_path
+
+def session_alive(session_dir: str) -> bool:
+    """Return True if a session holder is listening in the session directory"""
+
+    if not hasattr(socket, "AF_UNIX") or not os.path.isfile(os.path.join(session_dir, "holder.json")):
+        return False
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(session_socket_path(session_dir))
+        except OSError:
+            return False
+    return True
+
+def spawn_session(command: str, cwd: str, session_dir: str, timeout: float = 10) -> SessionChild:
+    """
+    Start a session holder running the command, and attach to it
+
+    Args:
+        command (str): the start command of the server
+        cwd (str): the working directory of the server
+        session_dir (str): the directory storing the socket, spool and exit status
+        timeout (float): the seconds to wait for the holder to listen
+
+    Returns:
+        SessionChild: the attached session
+    """
+
+    session_dir = os.path.abspath(session_dir)
+    if session_alive(session_dir):
+        raise SessionError(f"A server is already running in the session {session_dir}")
+
+    os.makedirs(session_dir, exist_ok=True)
+    for name in ("holder.json", "exit_status"):
+        if os.path.isfile(os.path.join(session_dir, name)):
+            os.remove(os.path.join(session_dir, name))
+
+    with open(os.path.join(session_dir, "holder.log"), "ab") as holder_log:
+        # the holder gets its own session, so it doesn't receive the signals meant for the wrapper
+        # pylint: disable-next=consider-using-with
+        holder = subprocess.Popen([sys.executable, HOLDER_PATH, "--session-dir", session_dir, "--cwd", str(cwd),
+                                   "--socket", session_socket_path(session_dir), command],
+                                  stdin=subprocess.DEVNULL, stdout=holder_log, stderr=holder_log,
+                                  start_new_session=True)
+    # reap the holder if it exits while this process is still running
+    Thread(target=holder.wait, daemon=True).start()
+
+    end = time.monotonic() + timeout
+    while not session_alive(session_dir):
+        if time.monotonic() > end:
+            raise SessionError(f"The session holder in {session_dir} didn't start within {timeout} seconds")
+        time.sleep(0.02)
+    # replay everything, so no output is lost before the first read
+    return SessionChild(session_dir, offset=0)
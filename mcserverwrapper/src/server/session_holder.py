@@ -0,0 +1,263 @@
+"""
+A small process holding the stdin and stdout of a detached server, so the wrapper can exit and re-attach later
+
+This file only uses the standard library and is run as a script in its own session, so it survives the wrapper:
+
+    python session_holder.py --session-dir DIR --cwd SERVER_DIR --socket SOCKET -- java -jar server.jar nogui
+
+All output is appended to a spool, which is replayed to attaching clients from the offset they ask for.
+Clients talk to the holder over a unix socket with frames of a 1 byte type, a 4 byte length and the payload:
+
+    client -> holder: A attach (8 byte offset, -1 continues after the last delivered byte), I stdin data,
+                      K send a signal (4 byte signal number), D detach (8 byte offset of the first unread byte)
+    holder -> client: S replay start (8 byte offset), O output data, X the server exited (4 byte exit status)
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shlex
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import time
+from threading import Condition, Thread
+
+HEADER = struct.Struct("!cI")
+# the spool is split into two segments, the older one is dropped when the newer one is full
+DEFAULT_MAX_SPOOL_SIZE = 64 * 1024 * 1024
+# seconds the holder waits for a client to collect the exit status after the server exited
+DEFAULT_LINGER = 300
+
+def send_frame(sock: socket.socket, frame_type: bytes, payload: bytes = b"") -> None:
+    """Send a single frame"""
+
+    sock.sendall(HEADER.pack(frame_type, len(payload)) + payload)
+
+def recv_frame(sock: socket.socket) -> tuple[bytes, bytes] | None:
+    """Receive a single frame, or None if the connection was closed"""
+
+    header = _recv_exact(sock, HEADER.size)
+    if header is None:
+        return None
+    frame_type, length = HEADER.unpack(header)
+    payload = _recv_exact(sock, length)
+    if payload is None:
+        return None
+    return frame_type, payload
+
+def _recv_exact(sock: socket.socket, length: int) -> bytes | None:
+    data = b""
+    while len(data) < length:
+        chunk = sock.recv(length - len(data))
+        if chunk == b"":
+            return None
+        data += chunk
+    return data
+
+class _Spool:
+    """The output of the server in two rotating segment files, addressed by absolute byte offsets"""
+
+    def __init__(self, session_dir: str, max_size: int) -> None:
+        self.session_dir = session_dir
+        self.segment_size = max(max_size // 2, 1)
+        # (start offset, path) of the older and the newer segment
+        self.segments: list[tuple[int, str]] = [(0, os.path.join(session_dir, "spool.0"))]
+        self.size = 0
+        self.delivered = 0
+        self.exit_status = None
+        self.changed = Condition()
+        with open(self.segments[0][1], "wb"):
+            pass
+
+    @property
+    def start(self) -> int:
+        """The oldest offset which can still be replayed"""
+
+        return self.segments[0][0]
+
+    def append(self, data: bytes) -> None:
+        """Append output to the newest segment, rotating if it is full"""
+
+        with self.changed:
+            segment_start, path = self.segments[-1]
+            if self.size - segment_start >= self.segment_size:
+                if len(self.segments) == 2:
+                    os.remove(self.segments[0][1])
+                    self.segments.pop(0)
+                path = os.path.join(self.session_dir, f"spool.{(int(path.rsplit('.', 1)[1]) + 1) % 2}")
+                self.segments.append((self.size, path))
+                with open(path, "wb"):
+                    pass
+            with open(path, "ab") as spool_file:
+                spool_file.write(data)
+            self.size += len(data)
+            self.changed.notify_all()
+
+    def read(self, offset: int, max_size: int = 65536) -> bytes:
+        """Read the output starting at the given offset"""
+
+        with self.changed:
+            for index, (segment_start, path) in enumerate(self.segments):
+                segment_end = self.segments[index + 1][0] if index + 1 < len(self.segments) else self.size
+                if segment_start <= offset < segment_end:
+                    with open(path, "rb") as spool_file:
+                        spool_file.seek(offset - segment_start)
+                        return spool_file.read(min(max_size, segment_end - offset))
+        return b""
+
+class SessionHolder:
+    """Runs the server and serves its stdin and stdout to one attached client at a time"""
+
+    def __init__(self, session_dir: str, socket_path: str, process: subprocess.Popen, max_spool_size: int,
+                 linger: float) -> None:
+        self.session_dir = session_dir
+        self.socket_path = socket_path
+        self.process = process
+        self.linger = linger
+        self.spool = _Spool(session_dir, max_spool_size)
+        self._client = None
+        self._exit_collected = False
+
+    def run(self) -> int:
+        """Serve clients until the server exited and a client received the exit status, or linger passed"""
+
+        Thread(target=self._t_read_output, daemon=True).start()
+
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        listener.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        listener.listen()
+        listener.settimeout(0.5)
+
+        exited_at = None
+        try:
+            while True:
+                if self.spool.exit_status is not None:
+                    exited_at = exited_at if exited_at is not None else time.monotonic()
+                    if self._exit_collected or time.monotonic() - exited_at > self.linger:
+                        return 0
+                try:
+                    conn, _ = listener.accept()
+                except socket.timeout:
+                    continue
+                Thread(target=self._t_serve_client, args=[conn,], daemon=True).start()
+        finally:
+            listener.close()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    def _t_read_output(self) -> None:
+        while True:
+            data = os.read(self.process.stdout.fileno(), 65536)
+            if data == b"":
+                break
+            self.spool.append(data)
+
+        status = self.process.wait()
+        with open(os.path.join(self.session_dir, "exit_status"), "w", encoding="utf8") as status_file:
+            status_file.write(str(status))
+        with self.spool.changed:
+            self.spool.exit_status = status
+            self.spool.changed.notify_all()
+
+    def _t_serve_client(self, conn: socket.socket) -> None:
+        frame = recv_frame(conn)
+        if frame is None or frame[0] != b"A":
+            conn.close()
+            return
+
+        # a new client replaces the attached one
+        if self._client is not None:
+            self._client.close()
+        self._client = conn
+
+        offset = struct.unpack("!q", frame[1])[0]
+        offset = self.spool.delivered if offset < 0 else offset
+        offset = min(max(offset, self.spool.start), self.spool.size)
+        send_frame(conn, b"S", struct.pack("!q", offset))
+
+        Thread(target=self._t_receive_input, args=[conn,], daemon=True).start()
+        try:
+            while self._client is conn:
+                data = self.spool.read(offset)
+                if len(data) > 0:
+                    send_frame(conn, b"O", data)
+                    offset += len(data)
+                    if self._client is conn:
+                        self.spool.delivered = offset
+                    continue
+
+                with self.spool.changed:
+                    if self.spool.exit_status is not None and offset >= self.spool.size:
+                        send_frame(conn, b"X", struct.pack("!i", self.spool.exit_status))
+                        self._exit_collected = True
+                        return
+                    if offset >= self.spool.size:
+                        self.spool.changed.wait(0.5)
+        except OSError:
+            # the client disconnected
+            pass
+        finally:
+            if self._client is conn:
+                self._client = None
+            conn.close()
+
+    def _t_receive_input(self, conn: socket.socket) -> None:
+        try:
+            while True:
+                frame = recv_frame(conn)
+                if frame is None:
+                    break
+                if frame[0] == b"D":
+                    # output the client received but didn't read yet is replayed to the next client
+                    self.spool.delivered = struct.unpack("!q", frame[1])[0]
+                    self._client = None
+                    break
+                if frame[0] == b"I" and self.process.poll() is None:
+                    self.process.stdin.write(frame[1])
+                    self.process.stdin.flush()
+                elif frame[0] == b"K" and self.process.poll() is None:
+                    self.process.send_signal(struct.unpack("!i", frame[1])[0])
+        except OSError:
+            pass
+        finally:
+            if self._client is conn:
+                self._client = None
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+def main(args=None) -> int:
+    """Start the server and hold its session"""
+
+    parser = argparse.ArgumentParser(prog="session_holder")
+    parser.add_argument("--session-dir", required=True)
+    parser.add_argument("--cwd", required=True)
+    parser.add_argument("--socket", required=True)
+    parser.add_argument("--max-spool-size", type=int, default=DEFAULT_MAX_SPOOL_SIZE)
+    parser.add_argument("--linger", type=float, default=DEFAULT_LINGER)
+    parser.add_argument("command")
+    parsed = parser.parse_args(args)
+
+    # the wrapper sends its stop signals to the server, not to the holder
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+    with subprocess.Popen(shlex.split(parsed.command), cwd=parsed.cwd, stdin=subprocess.PIPE,
+                          stdout=subprocess.PIPE, stderr=subprocess.STDOUT, bufsize=0) as process:
+        holder = SessionHolder(parsed.session_dir, parsed.socket, process, parsed.max_spool_size, parsed.linger)
+
+        with open(os.path.join(parsed.session_dir, "holder.json"), "w", encoding="utf8") as info_file:
+            json.dump({"holder_pid": os.getpid(), "pid": process.pid, "command": parsed.command}, info_file)
+
+        return holder.run()
+
+if __name__ == "__main__":
+    sys.exit(main())
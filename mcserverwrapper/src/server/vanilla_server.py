@@ -5,7 +5,6 @@ from __future__ import annotations
 import json
 import os
 import re
-from zipfile import ZipFile
 from .base_server import BaseServer
 from ..mcversion import McVersion, McVersionType
 
@@ -15,18 +14,26 @@ class VanillaServer(BaseServer):
     VERSION_TYPE = McVersionType.VANILLA
 
     def execute_command(self, command: str):
-        if not command.startswith("/"):
-            command = "/" + command
+        command = self._prepare_command(command)
 
         super().execute_command(command)
 
         if command == "/stop":
             self._ensure_stop()
 
+    def _prepare_command(self, command: str) -> str:
+        if not command.startswith("/"):
+            command = "/" + command
+
+        return command
+
     @classmethod
     def _check_jar(cls, jar_file: str) -> McVersion | None:
         """Search the given jar file to find the version"""
 
+        # pylint: disable-next=import-outside-toplevel
+        from zipfile import ZipFile
+
         with ZipFile(jar_file, "r") as zf:
             # for Minecraft 1.14+
             version_json = None
@@ -0,0 +1,333 @@
+"""
+Module containing the WorkerChild class, which runs the I/O and output parsing of a server in its own process
+
+With many servers in one wrapper process, reading and formatting their output competes for the GIL.
+An isolated server is started by a worker process, which reads, formats and parses its output
+and writes the lines with the positions of their fields into a ring buffer in shared memory.
+The wrapper only copies finished lines out of the ring, so the parsing of every server runs on its own core.
+Commands are sent to the worker through a pipe.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import struct
+import time
+import weakref
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+from subprocess import TimeoutExpired
+from threading import Condition, Thread
+from typing import Generator
+
+from ..error import McServerWrapperError
+from ..util.console_parser import ParsedLine, decode_line, line_spans, parsed_from_spans
+
+# the write and read positions are on separate cache lines, as they are written by different processes
+_WRITE_OFFSET = 0
+_READ_OFFSET = 64
+_CAPACITY_OFFSET = 128
+_CLOSED_OFFSET = 136
+_HEADER_SIZE = 192
+_MIN_RING_SIZE = 1024
+_POSITION = struct.Struct("<Q")
+_LENGTH = struct.Struct("<I")
+# every line in the ring starts with the spans of its parsed fields, see console_parser.line_spans
+_SPANS = struct.Struct("<10i")
+# the seconds the worker sleeps while the ring is full
+_FULL_SLEEP = 0.001
+# the seconds to wait for the worker to start the server
+_START_TIMEOUT = 30
+
+class WorkerError(McServerWrapperError):
+    """An error occuring if the worker process of a server could not be started"""
+
+class OutputRing:
+    """
+    A ring buffer of lines in shared memory, with a single writing and a single reading process
+
+    The positions only ever grow, the offset in the ring is the position modulo the capacity.
+    Every line is stored as its length followed by the utf8 bytes, wrapping around the end of the ring.
+
+    Args:
+        name (str | None): the name of an existing ring to open, None creates a new ring
+        size (int | None): the capacity of a new ring in bytes
+    """
+
+    def __init__(self, name: str | None = None, size: int | None = None) -> None:
+        if name is None:
+            if not isinstance(size, int):
+                raise TypeError(f"Expected int, got {type(size)}")
+            if size < _MIN_RING_SIZE:
+                raise ValueError(f"The ring needs at least {_MIN_RING_SIZE} bytes, got {size}")
+            self._shm = SharedMemory(create=True, size=_HEADER_SIZE + size)
+            self._shm.buf[:_HEADER_SIZE] = bytes(_HEADER_SIZE)
+            _POSITION.pack_into(self._shm.buf, _CAPACITY_OFFSET, size)
+        else:
+            self._shm = SharedMemory(name=name)
+        self.name = self._shm.name
+        self.capacity = _POSITION.unpack_from(self._shm.buf, _CAPACITY_OFFSET)[0]
+        # the own position of each side is kept locally, only the other sides' position is read from the header
+        self._write_pos = self._load(_WRITE_OFFSET)
+        self._read_pos = self._load(_READ_OFFSET)
+
+    def write(self, lines: list[bytes]) -> bool:
+        """
+        Append lines to the ring, waiting while it is full, lines longer than the ring are truncated
+
+        Returns:
+            bool: True if the reader had read all lines published before, so it may be waiting for a wakeup
+        """
+
+        capacity = self.capacity
+        write_pos = self._write_pos
+        published = write_pos
+        for line in lines:
+            line = line[:capacity - _LENGTH.size]
+            needed = _LENGTH.size + len(line)
+            while capacity - (write_pos - self._load(_READ_OFFSET)) < needed:
+                # publish the lines written so far, so the reader can make room
+                self._store(_WRITE_OFFSET, write_pos)
+                published = write_pos
+                if self.closed:
+                    self._write_pos = write_pos
+                    return True
+                time.sleep(_FULL_SLEEP)
+            self._copy_in(write_pos, _LENGTH.pack(len(line)))
+            self._copy_in(write_pos + _LENGTH.size, line)
+            write_pos += needed
+        self._write_pos = write_pos
+        self._store(_WRITE_OFFSET, write_pos)
+        # the read position is checked after publishing, a reader which hadn't caught up yet will see the new lines
+        return self._load(_READ_OFFSET) >= published
+
+    def read(self, max_count: int = 1000) -> list[bytes]:
+        """Remove and return up to max_count lines from the ring"""
+
+        write_pos = self._load(_WRITE_OFFSET)
+        read_pos = self._read_pos
+        lines = []
+        while read_pos < write_pos and len(lines) < max_count:
+            length = _LENGTH.unpack(self._copy_out(read_pos, _LENGTH.size))[0]
+            lines.append(self._copy_out(read_pos + _LENGTH.size, length))
+            read_pos += _LENGTH.size + length
+        self._read_pos = read_pos
+        self._store(_READ_OFFSET, read_pos)
+        return lines
+
+    def empty(self) -> bool:
+        """Return True if the reader has read all published lines"""
+
+        return self._read_pos == self._load(_WRITE_OFFSET)
+
+    @property
+    def closed(self) -> bool:
+        """True if either side closed the ring, the writer after the last line and the reader if it stops reading"""
+
+        return self._shm.buf[_CLOSED_OFFSET] != 0
+
+    def close(self) -> None:
+        """Mark the ring as closed for the other side"""
+
+        self._shm.buf[_CLOSED_OFFSET] = 1
+
+    def release(self, unlink: bool = False) -> None:
+        """Unmap the ring from this process, and remove it if unlink is True"""
+
+        self._shm.close()
+        if unlink:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _load(self, offset: int) -> int:
+        return _POSITION.unpack_from(self._shm.buf, offset)[0]
+
+    def _store(self, offset: int, value: int) -> None:
+        _POSITION.pack_into(self._shm.buf, offset, value)
+
+    def _copy_in(self, pos: int, data: bytes) -> None:
+        start = pos % self.capacity
+        first = min(len(data), self.capacity - start)
+        buf = self._shm.buf
+        buf[_HEADER_SIZE + start:_HEADER_SIZE + start + first] = data[:first]
+        if first < len(data):
+            buf[_HEADER_SIZE:_HEADER_SIZE + len(data) - first] = data[first:]
+
+    def _copy_out(self, pos: int, length: int) -> bytes:
+        start = pos % self.capacity
+        first = min(length, self.capacity - start)
+        buf = self._shm.buf
+        data = bytes(buf[_HEADER_SIZE + start:_HEADER_SIZE + start + first])
+        if first < length:
+            data += bytes(buf[_HEADER_SIZE:_HEADER_SIZE + length - first])
+        return data
+
+class _WorkerProcess:
+    """Mimics the proc attribute of a PopenSpawn"""
+
+    def __init__(self, child: WorkerChild) -> None:
+        self._child = child
+
+    def wait(self, timeout: float | None = None) -> int:
+        """Wait for the server to exit and return its exit status"""
+
+        # pylint: disable-next=protected-access
+        return self._child._wait(timeout)
+
+# pylint: disable-next=too-many-instance-attributes
+class WorkerChild:
+    """
+    A server started by a worker process, with the methods of a PopenSpawn the servers use
+
+    Args:
+        start_cmd (str): the command starting the server
+        cwd (str): the server directory
+        ring_size (int): the size of the shared output ring in bytes
+        timeout (float): the seconds read_lines() waits for output before checking its deadline
+    """
+
+    def __init__(self, start_cmd: str, cwd: str, ring_size: int, timeout: float = 1) -> None:
+        self.timeout = timeout
+        self.proc = _WorkerProcess(self)
+        self.pid = None
+        self._exit_status = None
+        self._worker_alive = True
+        self._changed = Condition()
+
+        self._ring = OutputRing(size=ring_size)
+        self._finalizer = weakref.finalize(self, _release_ring, self._ring)
+        # spawned workers don't inherit the threads and locks of the wrapper
+        context = multiprocessing.get_context("spawn")
+        commands_reader, self._commands = context.Pipe(duplex=False)
+        self._events, events_writer = context.Pipe(duplex=False)
+        self._process = context.Process(target=_worker_main, name=f"mcserverwrapper-worker-{os.path.basename(cwd)}",
+                                        args=(start_cmd, str(cwd), self._ring.name, commands_reader, events_writer))
+        self._process.start()
+        commands_reader.close()
+        events_writer.close()
+        Thread(target=self._t_receive, daemon=True).start()
+
+        with self._changed:
+            self._changed.wait_for(lambda: self.pid is not None or not self._worker_alive, _START_TIMEOUT)
+        if self.pid is None:
+            self._process.kill()
+            self._finalizer()
+            raise WorkerError(f"The worker process could not start the server in {cwd}")
+
+    def read_lines(self, timeout: float | None = None) -> Generator[ParsedLine, None, None]:
+        """Yield the formatted and parsed output lines until the server exits or the timeout expires"""
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while deadline is None or time.monotonic() < deadline:
+            lines = self._ring.read()
+            for line in lines:
+                yield parsed_from_spans(line[_SPANS.size:].decode("utf8"), _SPANS.unpack_from(line))
+            if len(lines) > 0:
+                continue
+            with self._changed:
+                # the worker only wakes the reader if the ring was empty, so it is checked again under the lock
+                if self._ring.empty():
+                    if self._ring.closed or not self._worker_alive:
+                        self._finalizer()
+                        return
+                    self._changed.wait(self.timeout)
+
+    def send(self, data: str | bytes) -> int:
+        """Write data to the stdin of the server"""
+
+        if isinstance(data, str):
+            data = data.encode("utf8")
+        self._commands.send_bytes(data)
+        return len(data)
+
+    def sendline(self, line: str = "") -> int:
+        """Write a line to the stdin of the server"""
+
+        return self.send(line + os.linesep)
+
+    def kill(self, sig: int) -> None:
+        """Send a signal to the server process"""
+
+        os.kill(self.pid, sig)
+
+    def _wait(self, timeout: float | None) -> int:
+        with self._changed:
+            if not self._changed.wait_for(lambda: self._exit_status is not None or not self._worker_alive, timeout):
+                raise TimeoutExpired(f"worker {self._process.name}", timeout)
+            # the worker died, the server is orphaned or gone
+            return self._exit_status if self._exit_status is not None else -1
+
+    def _t_receive(self) -> None:
+        """Receive the pid, wakeups and exit status of the worker"""
+
+        while True:
+            try:
+                event, value = self._events.recv()
+            except (EOFError, OSError):
+                break
+            with self._changed:
+                if event == "pid":
+                    self.pid = value
+                elif event == "exit":
+                    self._exit_status = value
+                self._changed.notify_all()
+
+        self._process.join()
+        with self._changed:
+            self._worker_alive = False
+            self._changed.notify_all()
+
+def _release_ring(ring: OutputRing) -> None:
+    """Tell the worker to stop writing and remove the ring"""
+
+    ring.close()
+    ring.release(unlink=True)
+
+def _worker_main(start_cmd: str, cwd: str, ring_name: str, commands: Connection, events: Connection) -> None:
+    """Start the server, then format and parse its output into the ring until it exits"""
+
+    # pylint: disable-next=import-outside-toplevel
+    from pexpect import exceptions, popen_spawn
+
+    ring = OutputRing(ring_name)
+    child = popen_spawn.PopenSpawn(cmd=start_cmd, cwd=cwd, timeout=1)
+    events.send(("pid", child.pid))
+    Thread(target=_t_forward_commands, args=(child, commands), daemon=True).start()
+
+    pending = b""
+    while True:
+        try:
+            data = child.read_nonblocking(65536, timeout=1)
+        except exceptions.TIMEOUT:
+            continue
+        except exceptions.EOF:
+            break
+        *raw_lines, pending = (pending + data).split(b"\n")
+        lines = [_pack_line(line) for line in (decode_line(raw) for raw in raw_lines) if line]
+        if lines and ring.write(lines):
+            events.send(("data", None))
+
+    last_line = decode_line(pending)
+    if last_line:
+        ring.write([_pack_line(last_line)])
+    ring.close()
+    events.send(("exit", child.proc.wait()))
+    ring.release()
+
+def _pack_line(line: str) -> bytes:
+    """Prefix the line with the spans of its fields, the decoded lines are ascii so the indices match the bytes"""
+
+    return _SPANS.pack(*line_spans(line)) + line.encode("utf8")
+
+def _t_forward_commands(child, commands: Connection) -> None:
+    """Write the commands of the wrapper to the stdin of the server"""
+
+    while True:
+        try:
+            data = commands.recv_bytes()
+        except (EOFError, OSError):
+            return
+        child.send(data)
@@ -0,0 +1,297 @@
+"""
+Module containing the ServerPool class, which keeps pre-started servers ready to be handed out instantly
+
+Every template is a server directory, which is provisioned for each instance. The pool starts instances in the background
+until the configured amount of them is ready, so acquire() only has to take one out of the pool.
+Acquired servers belong to the caller, release() stops them and deletes their directory.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Condition, Timer
+from typing import Any
+
+from .error import McServerWrapperError
+from .provisioning import provision
+from .util import logger
+from .util.port_allocator import PortAllocator
+from .wrapper import Wrapper
+
+# the states of a pooled server
+STARTING = "starting"
+READY = "ready"
+ACQUIRED = "acquired"
+FAILED = "failed"
+# seconds before a failed start of a template is retried
+_RETRY_DELAY = 5.0
+
+class PoolError(McServerWrapperError):
+    """An error occuring if the pool could not hand out a server"""
+
+class ServerTemplate:
+    """The configuration of the servers a pool keeps ready"""
+
+    # pylint: disable-next=too-many-arguments,too-many-positional-arguments
+    def __init__(self, name: str, template_dir: str, size: int, jar_name: str = "server.jar",
+                 start_command: str | None = None, server_property_args: dict | None = None) -> None:
+        self.name = name
+        self.template_dir = template_dir
+        self.size = size
+        self.jar_name = jar_name
+        self.start_command = start_command
+        self.server_property_args = server_property_args
+
+    name: str
+    # the server directory which is copied for every instance
+    template_dir: str
+    # the amount of servers which are kept ready
+    size: int
+    jar_name: str
+    start_command: str | None
+    server_property_args: dict | None
+
+# pylint: disable-next=too-many-instance-attributes
+class PooledServer:
+    """A server started by the pool"""
+
+    def __init__(self, template: str, server_dir: str, port: int) -> None:
+        self.template = template
+        self.server_dir = server_dir
+        self.port = port
+        self.wrapper = None
+        self.state = STARTING
+        self.created_at = time.monotonic()
+        self.ready_at = None
+        self.error = None
+
+    template: str
+    server_dir: str
+    port: int
+    # created once the template was copied
+    wrapper: Wrapper | None
+    state: str
+    created_at: float
+    ready_at: float | None
+    error: str | None
+
+    @property
+    def warmup_time(self) -> float | None:
+        """The seconds the server needed to become ready, or None if it isn't ready yet"""
+
+        return None if self.ready_at is None else self.ready_at - self.created_at
+
+# pylint: disable-next=too-many-instance-attributes
+class ServerPool:
+    """
+    Keeps a number of started servers ready for every template
+
+    Args:
+        pool_dir (str): the directory containing the instance directories
+        port_allocator (PortAllocator | None): leases the ports of the instances, defaults to the shared pool
+        max_parallel_starts (int): the amount of servers which are started at the same time
+    """
+
+    def __init__(self, pool_dir: str, port_allocator: PortAllocator | None = None,
+                 max_parallel_starts: int = 2) -> None:
+        self.pool_dir = os.path.abspath(pool_dir)
+        self.port_allocator = port_allocator if port_allocator is not None else PortAllocator()
+        self._executor = ThreadPoolExecutor(max_workers=max_parallel_starts, thread_name_prefix="server-pool")
+        self._templates: dict[str, ServerTemplate] = {}
+        self._servers: dict[str, list[PooledServer]] = {}
+        self._retry_at: dict[str, float] = {}
+        # the summed warm-up time and the amount of started servers by template
+        self._warmups: dict[str, tuple[float, int]] = {}
+        self._changed = Condition()
+        self._next_id = 0
+        self._closed = False
+        os.makedirs(self.pool_dir, exist_ok=True)
+        self._logger = logger.Logger(self.pool_dir)
+
+    def add_template(self, template: ServerTemplate) -> None:
+        """Add a template and start filling its pool"""
+
+        if not isinstance(template, ServerTemplate):
+            raise TypeError(f"Expected ServerTemplate, got {type(template)}")
+        if template.size < 0:
+            raise ValueError(f"The pool size has to be at least 0, got {template.size}")
+        if not os.path.isfile(os.path.join(template.template_dir, template.jar_name)):
+            raise ValueError(f"{template.jar_name} not found in {template.template_dir}")
+
+        with self._changed:
+            if template.name in self._templates:
+                raise ValueError(f"A template named {template.name} already exists")
+            self._templates[template.name] = template
+            self._servers[template.name] = []
+            self._warmups[template.name] = (0.0, 0)
+            self._refill(template.name)
+
+    def acquire(self, template: str, timeout: float | None = None) -> PooledServer:
+        """
+        Take a ready server out of the pool, the pool starts a replacement in the background
+
+        Args:
+            template (str): the name of the template
+            timeout (float | None): the seconds to wait if no server is ready, None waits forever
+
+        Returns:
+            PooledServer: the ready server, which has to be given back with release()
+
+        Raises:
+            PoolError: if no server became ready within the timeout
+        """
+
+        end = None if timeout is None else time.monotonic() + timeout
+        with self._changed:
+            if template not in self._templates:
+                raise KeyError(f"Unknown template {template}")
+            while True:
+                if self._closed:
+                    raise PoolError("The pool is closed")
+                # the oldest ready server is handed out first
+                server = next((server for server in self._servers[template] if server.state == READY), None)
+                if server is not None:
+                    server.state = ACQUIRED
+                    self._servers[template].remove(server)
+                    self._refill(template)
+                    return server
+
+                # a template without warm servers starts one on demand
+                self._refill(template, minimum=1)
+                remaining = None if end is None else end - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise PoolError(f"No {template} server became ready within {timeout} seconds")
+                self._changed.wait(1.0 if remaining is None else min(remaining, 1.0))
+
+    def release(self, server: PooledServer) -> None:
+        """Stop an acquired server and delete its directory"""
+
+        with self._changed:
+            if not self._closed:
+                self._executor.submit(self._discard, server)
+                return
+        self._discard(server)
+
+    def wait_ready(self, template: str, count: int | None = None, timeout: float | None = None) -> bool:
+        """
+        Wait until the given amount of servers of the template is ready
+
+        Args:
+            template (str): the name of the template
+            count (int | None): the amount of ready servers, defaults to the pool size
+            timeout (float | None): the seconds to wait, None waits forever
+
+        Returns:
+            bool: True if the servers are ready, False if the timeout passed
+        """
+
+        count = self._templates[template].size if count is None else count
+        with self._changed:
+            return self._changed.wait_for(lambda: self._count(template, READY) >= count or self._closed, timeout) \
+                   and not self._closed
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        """Return the amount of servers in every state and the average warm-up time by template"""
+
+        with self._changed:
+            stats = {}
+            for name, template in self._templates.items():
+                warmup_sum, started = self._warmups[name]
+                stats[name] = {
+                    "size": template.size,
+                    "starting": self._count(name, STARTING),
+                    "ready": self._count(name, READY),
+                    "started": started,
+                    "average_warmup_time": warmup_sum / started if started > 0 else None
+                }
+            return stats
+
+    def close(self) -> None:
+        """Stop all servers which weren't acquired, acquired servers keep running"""
+
+        with self._changed:
+            self._closed = True
+            servers = [server for servers in self._servers.values() for server in servers]
+            self._changed.notify_all()
+        # starting servers are stopped once their start finished
+        for server in servers:
+            if server.state == READY:
+                self._executor.submit(self._discard, server)
+        self._executor.shutdown(wait=True)
+
+    def _count(self, template: str, state: str) -> int:
+        return sum(1 for server in self._servers[template] if server.state == state)
+
+    def _refill(self, template: str, minimum: int = 0) -> None:
+        """Start servers until the pool of the template is full, has to be called while holding the lock"""
+
+        if self._closed or time.monotonic() < self._retry_at.get(template, 0):
+            return
+        missing = max(self._templates[template].size, minimum) - len(self._servers[template])
+        for _ in range(missing):
+            self._next_id += 1
+            server_dir = os.path.join(self.pool_dir, f"{template}-{self._next_id}")
+            server = PooledServer(template, server_dir, self.port_allocator.lease(server_dir)["game"])
+            self._servers[template].append(server)
+            self._executor.submit(self._t_start, server, self._templates[template])
+
+    def _retry(self, template: str) -> None:
+        with self._changed:
+            self._refill(template)
+
+    def _t_start(self, server: PooledServer, template: ServerTemplate) -> None:
+        """Copy the template and start the server, this runs in the thread pool"""
+
+        try:
+            if os.path.isdir(server.server_dir):
+                shutil.rmtree(server.server_dir)
+            property_args = dict(template.server_property_args or {})
+            property_args["port"] = server.port
+            # writing eula.txt and server.properties up front saves the temporary server run
+            provision(template.template_dir, server.server_dir, template.jar_name, property_args)
+            server.wrapper = Wrapper(os.path.join(server.server_dir, template.jar_name),
+                                     server_start_command=template.start_command,
+                                     server_property_args=property_args, print_output=False)
+            server.wrapper.startup()
+            if server.wrapper.server.get_child_status(0) is not None:
+                server.error = "The server exited during startup"
+        # the failure is recorded and the start is retried later
+        # pylint: disable-next=broad-exception-caught
+        except Exception as e:
+            server.error = str(e)
+
+        with self._changed:
+            if server.error is None:
+                server.state = READY
+                server.ready_at = time.monotonic()
+                warmup_sum, started = self._warmups[server.template]
+                self._warmups[server.template] = (warmup_sum + server.warmup_time, started + 1)
+            else:
+                server.state = FAILED
+                self._servers[server.template].remove(server)
+                self._retry_at[server.template] = time.monotonic() + _RETRY_DELAY
+                timer = Timer(_RETRY_DELAY, self._retry, [server.template])
+                timer.daemon = True
+                timer.start()
+            closed = self._closed
+            self._changed.notify_all()
+
+        if server.state == FAILED:
+            # the instance directory is removed, so the failure is logged into the pool directory
+            self._logger.log(f"Pooled server {server.server_dir} failed to start: {server.error}")
+        if server.state == FAILED or closed:
+            self._discard(server)
+
+    def _discard(self, server: PooledServer) -> None:
+        """Stop a server and remove its directory"""
+
+        try:
+            if server.wrapper is not None:
+                server.wrapper.stop()
+                server.wrapper.server.get_child_status(30)
+        finally:
+            self.port_allocator.release(server.server_dir)
+            shutil.rmtree(server.server_dir, ignore_errors=True)
@@ -6,6 +6,7 @@ import os
 from typing import Any
 
 from .mcversion import McVersion
+from .util import instrumentation
 
 ALL_PROPERTIES = [
     "port",
@@ -41,6 +42,21 @@ def get_properties(server_path: str, server_version: McVersion) -> dict[str, Any
 
     return parse_properties_args(server_path, None, server_version)
 
+def get_level_name(server_path: str) -> str:
+    """Return the name of the world directory, which is world unless changed in server.properties"""
+
+    props_path = os.path.join(server_path, "server.properties")
+    if os.path.isfile(props_path):
+        with open(props_path, "r", encoding="utf8") as props_file:
+            for line in props_file:
+                if line.startswith("level-name="):
+                    # the value is escaped like a java properties file
+                    name = line.split("=", 1)[1].strip().replace("\\:", ":").replace("\\\\", "\\")
+                    if name != "":
+                        return name
+    return "world"
+
+@instrumentation.timed("properties.read")
 def parse_properties_args(server_path: str, server_property_args: dict | None, server_version: McVersion) \
                           -> dict[str, Any]:
     """Parse the given server_properties_args and provide defaults for missing values"""
@@ -106,6 +122,7 @@ def parse_properties_args(server_path: str, server_property_args: dict | None, s
 
     return server_property_args
 
+@instrumentation.timed("properties.write")
 def save_properties(server_path: str, server_property_args: dict[str, Any]) -> None:
     """Save all values from server_property_args to server.properties"""
 
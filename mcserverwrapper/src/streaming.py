@@ -0,0 +1,470 @@
+"""
+Module containing the ConsoleStreamServer class, which streams the console of servers to many web clients
+
+The server only uses asyncio and speaks just enough HTTP for these endpoints:
+
+    GET  /servers                            a json list of all streamed servers
+    GET  /servers/<name>/events?replay=100   the output as server-sent events
+    GET  /servers/<name>/ws?replay=100       the output as websocket text messages, text messages sent by the client
+                                             are executed as commands
+    POST /servers/<name>/command             execute the request body as a command
+
+Every request has to carry the token of the server, as a bearer token or as the token query parameter,
+because the commands would otherwise bypass the file permissions of the daemon socket.
+Browsers let any web page connect to local websockets and send simple POST requests, so requests with an Origin header
+are rejected unless the origin is allowed, and requests naming the server by a host name other than localhost are
+rejected unless the host is allowed, which stops DNS rebinding.
+
+Every line is encoded once per format and the same bytes are sent to all clients.
+A client which doesn't read fast enough is disconnected instead of slowing down the other clients.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import ipaddress
+import json
+import secrets
+import struct
+from collections import deque
+from threading import Event, Thread
+from typing import Any, Iterable
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from .util import instrumentation
+from .util.output_hub import Subscription
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+# the amount of bytes a client may fall behind before it is disconnected
+DEFAULT_MAX_CLIENT_BUFFER = 1024 * 1024
+# the largest request or websocket message accepted from a client
+MAX_MESSAGE_SIZE = 64 * 1024
+KEEPALIVE_INTERVAL = 15
+
+class _Client:
+    """A connected streaming client, with the encoded lines not yet written to it"""
+
+    def __init__(self, writer: asyncio.StreamWriter, websocket: bool, max_buffer: int) -> None:
+        self.writer = writer
+        self.websocket = websocket
+        self.max_buffer = max_buffer
+        self.closed = False
+        self._pending: deque[bytes] = deque()
+        self._pending_bytes = 0
+        self._ready = asyncio.Event()
+
+    def push(self, data: bytes) -> None:
+        """Queue data for writing, or disconnect the client if it has too much data pending"""
+
+        if self.closed:
+            return
+        if self._pending_bytes + len(data) > self.max_buffer:
+            if instrumentation.enabled:
+                instrumentation.count("streaming.slow_client")
+            self.close()
+            return
+        self._pending.append(data)
+        self._pending_bytes += len(data)
+        self._ready.set()
+
+    def close(self) -> None:
+        """Stop writing to the client and close the connection"""
+
+        self.closed = True
+        self._ready.set()
+        self.writer.close()
+
+    async def write_pending(self) -> None:
+        """Write all queued data until the client is closed"""
+
+        while not self.closed:
+            try:
+                await asyncio.wait_for(self._ready.wait(), KEEPALIVE_INTERVAL)
+            except asyncio.TimeoutError:
+                # keeps proxies from closing idle connections
+                self.push(_encode_websocket_frame(0x9, b"") if self.websocket else b": keepalive\n\n")
+                continue
+            self._ready.clear()
+            if self.closed or len(self._pending) == 0:
+                continue
+
+            data = b"".join(self._pending)
+            self._pending.clear()
+            self._pending_bytes = 0
+            try:
+                self.writer.write(data)
+                await self.writer.drain()
+            except ConnectionError:
+                self.close()
+
+class _StreamedServer:
+    """A server whose output is streamed, with a thread moving new lines from its output hub to the event loop"""
+
+    def __init__(self, name: str, wrapper) -> None:
+        self.name = name
+        self.wrapper = wrapper
+        self.clients: set[_Client] = set()
+        self.subscription = wrapper.output_hub.subscribe()
+        # the sequence number of the next line which wasn't sent to the clients yet
+        self.dispatched = self.subscription.cursor
+        self.stopped = False
+
+    def replay(self, count: int) -> list[str]:
+        """Return up to count of the lines already sent to the clients"""
+
+        start = max(self.dispatched - count, self.wrapper.output_hub.tail)
+        return Subscription(self.wrapper.output_hub, start).get_many(self.dispatched - start, block=False)
+
+# pylint: disable-next=too-many-instance-attributes
+class ConsoleStreamServer:
+    """
+    A local http server streaming the output of servers to web clients and accepting commands
+
+    Args:
+        host (str): the address to listen on
+        port (int): the port to listen on, 0 picks a free port
+        token (str | None): the token clients have to send as a bearer token or as the token query parameter,
+            a random token is generated if not set
+        max_client_buffer (int): the amount of bytes a client may fall behind before it is disconnected
+        allowed_origins (Iterable[str]): the origins of web pages which may connect, e.g. https://panel.example.com
+        allowed_hosts (Iterable[str]): the host names clients may use besides localhost and ip addresses,
+            e.g. the name of a reverse proxy
+    """
+
+    # pylint: disable-next=too-many-arguments,too-many-positional-arguments
+    def __init__(self, host: str = "127.0.0.1", port: int = 8080, token: str | None = None,
+                 max_client_buffer: int = DEFAULT_MAX_CLIENT_BUFFER, allowed_origins: Iterable[str] = (),
+                 allowed_hosts: Iterable[str] = ()) -> None:
+        self.host = host
+        self.port = port
+        # commands are accepted, so clients are never served without a token
+        self.token = token if token is not None else secrets.token_urlsafe(24)
+        self.max_client_buffer = max_client_buffer
+        self.allowed_origins = {origin.rstrip("/").lower() for origin in allowed_origins}
+        self.allowed_hosts = {host.lower() for host in allowed_hosts}
+
+        self._servers: dict[str, _StreamedServer] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._server: asyncio.AbstractServer | None = None
+        self._thread: Thread | None = None
+        self._started = Event()
+
+    def add_server(self, name: str, wrapper) -> None:
+        """
+        Stream the output of a wrapper
+
+        Args:
+            name (str): the name used in the urls of the server
+            wrapper (Wrapper): the wrapper of the server
+        """
+
+        if name in self._servers:
+            raise ValueError(f"Server {name} is already streamed")
+
+        streamed = _StreamedServer(name, wrapper)
+        self._servers[name] = streamed
+        Thread(target=self._t_pump, args=[streamed,], daemon=True).start()
+
+    def remove_server(self, name: str) -> None:
+        """Stop streaming a server and disconnect its clients"""
+
+        streamed = self._servers.pop(name, None)
+        if streamed is None:
+            return
+        streamed.stopped = True
+        self._call_in_loop(self._close_clients, streamed)
+
+    def servers(self) -> list[str]:
+        """Return the names of all streamed servers"""
+
+        return list(self._servers)
+
+    def start(self) -> None:
+        """Start serving in a background thread, and return once the server listens"""
+
+        self._thread = Thread(target=asyncio.run, args=[self.serve(),], daemon=True)
+        self._thread.start()
+        self._started.wait()
+        if self._server is None:
+            raise OSError(f"Could not listen on {self.host}:{self.port}")
+
+    def stop(self) -> None:
+        """Stop the server and disconnect all clients"""
+
+        for name in list(self._servers):
+            self.remove_server(name)
+        if self._loop is not None and self._server is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    async def serve(self) -> None:
+        """Serve clients until stop() is called"""
+
+        try:
+            self._server = await asyncio.start_server(self._handle_connection, self.host, self.port,
+                                                      limit=MAX_MESSAGE_SIZE)
+            self.port = self._server.sockets[0].getsockname()[1]
+            self._loop = asyncio.get_running_loop()
+        finally:
+            # start() raises if listening failed
+            self._started.set()
+
+        try:
+            while self._server.is_serving():
+                await asyncio.sleep(0.1)
+        finally:
+            self._loop = None
+            self._server = None
+            self._started.clear()
+
+    def _t_pump(self, streamed: _StreamedServer) -> None:
+        """Move new lines from the output hub to the event loop in batches"""
+
+        while not streamed.stopped:
+            lines = streamed.subscription.get_many(256, timeout=0.5)
+            if len(lines) > 0:
+                self._call_in_loop(self._dispatch, streamed, lines, streamed.subscription.cursor)
+            elif streamed.subscription.hub.closed:
+                # the server stopped, so its streams end
+                self._call_in_loop(self._close_clients, streamed)
+                return
+
+    def _call_in_loop(self, func, streamed: _StreamedServer, *args) -> None:
+        """Run func in the event loop, or directly if the server isn't running, because then there are no clients"""
+
+        try:
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(func, streamed, *args)
+                return
+        except RuntimeError:
+            # the event loop was closed in the meantime
+            pass
+        func(streamed, *args)
+
+    def _dispatch(self, streamed: _StreamedServer, lines: list[str], cursor: int) -> None:
+        """Encode a batch of lines once per format and queue it for every client"""
+
+        streamed.dispatched = cursor
+        if len(streamed.clients) == 0:
+            return
+
+        event_data = None
+        websocket_data = None
+        for client in list(streamed.clients):
+            if client.websocket:
+                if websocket_data is None:
+                    websocket_data = _encode_websocket_lines(lines)
+                client.push(websocket_data)
+            else:
+                if event_data is None:
+                    event_data = _encode_event_lines(lines)
+                client.push(event_data)
+            if client.closed:
+                streamed.clients.discard(client)
+
+        if instrumentation.enabled:
+            instrumentation.count("streaming.lines", len(lines))
+
+    @staticmethod
+    def _close_clients(streamed: _StreamedServer) -> None:
+        for client in list(streamed.clients):
+            if client.websocket and not client.closed:
+                client.writer.write(_encode_websocket_frame(0x8, struct.pack("!H", 1001)))
+            client.close()
+        streamed.clients.clear()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            method, path, query, headers = await _read_request_head(reader)
+
+            if not self._allowed_origin(headers):
+                await _respond(writer, 403, {"error": "Forbidden"})
+                return
+            if not self._authorized(query, headers):
+                await _respond(writer, 401, {"error": "Unauthorized"})
+                return
+
+            parts = [unquote(part) for part in path.strip("/").split("/")]
+            if method == "GET" and parts == ["servers"]:
+                await _respond(writer, 200, {"servers": self.servers()})
+                return
+
+            streamed = self._servers.get(parts[1]) if len(parts) == 3 and parts[0] == "servers" else None
+            if streamed is None:
+                await _respond(writer, 404, {"error": "Not found"})
+            elif method == "GET" and parts[2] == "events":
+                await self._stream(streamed, reader, writer, query, websocket=False)
+            elif method == "GET" and parts[2] == "ws" and headers.get("upgrade", "").lower() == "websocket":
+                await self._stream(streamed, reader, writer, query, websocket=True, headers=headers)
+            elif method == "POST" and parts[2] == "command":
+                length = int(headers.get("content-length", "0"))
+                if length > MAX_MESSAGE_SIZE:
+                    raise ValueError("Request body too large")
+                command = (await reader.readexactly(length)).decode("utf8").strip()
+                await asyncio.get_running_loop().run_in_executor(None, streamed.wrapper.send_command, command)
+                await _respond(writer, 204, None)
+            else:
+                await _respond(writer, 404, {"error": "Not found"})
+        except (ValueError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            await _respond(writer, 400, {"error": "Bad request"})
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    # pylint: disable-next=too-many-arguments,too-many-positional-arguments
+    async def _stream(self, streamed: _StreamedServer, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                      query: dict[str, str], websocket: bool, headers: dict[str, str] | None = None) -> None:
+        """Send the replayed lines and then every new line to the client until it disconnects"""
+
+        # the query is checked before the handshake, afterwards errors can't be answered with a http status
+        replay_count = int(query.get("replay", "100"))
+        if replay_count < 0:
+            raise ValueError("The replay count can't be negative")
+
+        if websocket:
+            if "sec-websocket-key" not in headers:
+                raise ValueError("Missing websocket key")
+            accept = base64.b64encode(hashlib.sha1((headers["sec-websocket-key"] + WEBSOCKET_GUID).encode("ascii"))
+                                      .digest()).decode("ascii")
+            writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                          f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode("ascii"))
+        else:
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+                         b"Connection: close\r\n\r\n")
+
+        client = _Client(writer, websocket, self.max_client_buffer)
+        replay = streamed.replay(replay_count)
+        if len(replay) > 0:
+            client.push(_encode_websocket_lines(replay) if websocket else _encode_event_lines(replay))
+        streamed.clients.add(client)
+
+        write_task = asyncio.ensure_future(client.write_pending())
+        try:
+            if websocket:
+                await self._read_websocket_commands(streamed, client, reader)
+            else:
+                # server-sent events are one-way, the client disconnecting ends the stream
+                while len(await reader.read(4096)) > 0:
+                    pass
+        except (asyncio.IncompleteReadError, ConnectionError):
+            # the client disconnected or was disconnected for being too slow
+            pass
+        finally:
+            streamed.clients.discard(client)
+            client.close()
+            write_task.cancel()
+
+    @staticmethod
+    async def _read_websocket_commands(streamed: _StreamedServer, client: _Client, reader: asyncio.StreamReader) -> None:
+        loop = asyncio.get_running_loop()
+        message = b""
+        while not client.closed:
+            opcode, fin, payload = await _read_websocket_frame(reader)
+            if opcode == 0x8:
+                client.writer.write(_encode_websocket_frame(0x8, payload[:2]))
+                return
+            if opcode == 0x9:
+                client.push(_encode_websocket_frame(0xA, payload))
+                continue
+            if opcode not in (0x0, 0x1):
+                continue
+
+            message += payload
+            if len(message) > MAX_MESSAGE_SIZE:
+                raise ValueError("Websocket message too large")
+            if fin:
+                command = message.decode("utf8").strip()
+                message = b""
+                await loop.run_in_executor(None, streamed.wrapper.send_command, command)
+
+    def _allowed_origin(self, headers: dict[str, str]) -> bool:
+        """Return False for requests of web pages which aren't allowed, or which reached the server by DNS rebinding"""
+
+        origin = headers.get("origin")
+        if origin is not None and origin.rstrip("/").lower() not in self.allowed_origins:
+            return False
+
+        host = urlsplit("//" + headers.get("host", "")).hostname
+        if host is None or host in ("localhost", self.host.lower()) or host in self.allowed_hosts:
+            return True
+        try:
+            ipaddress.ip_address(host)
+        except ValueError:
+            return False
+        return True
+
+    def _authorized(self, query: dict[str, str], headers: dict[str, str]) -> bool:
+        token = query.get("token")
+        authorization = headers.get("authorization", "")
+        if authorization.startswith("Bearer "):
+            token = authorization[len("Bearer "):]
+        return token is not None and hmac.compare_digest(token, self.token)
+
+async def _read_request_head(reader: asyncio.StreamReader) -> tuple[str, str, dict[str, str], dict[str, str]]:
+    """Read the request line and headers, and return the method, path, query parameters and lowercase headers"""
+
+    head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1")
+    request_line, *header_lines = head.split("\r\n")
+    method, target, _ = request_line.split(" ", 2)
+
+    headers = {}
+    for header_line in header_lines:
+        if ":" in header_line:
+            key, value = header_line.split(":", 1)
+            headers[key.strip().lower()] = value.strip()
+
+    url = urlsplit(target)
+    query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+    return method, url.path, query, headers
+
+async def _respond(writer: asyncio.StreamWriter, status: int, body: Any) -> None:
+    data = b"" if body is None else json.dumps(body).encode("utf8")
+    reasons = {200: "OK", 204: "No Content", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden",
+               404: "Not Found"}
+    writer.write((f"HTTP/1.1 {status} {reasons[status]}\r\nContent-Type: application/json\r\n"
+                  f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n").encode("ascii") + data)
+    try:
+        await writer.drain()
+    except ConnectionError:
+        pass
+
+async def _read_websocket_frame(reader: asyncio.StreamReader) -> tuple[int, bool, bytes]:
+    """Read a single frame sent by a client and return its opcode, fin bit and unmasked payload"""
+
+    first, second = await reader.readexactly(2)
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack("!H", await reader.readexactly(2))[0]
+    elif length == 127:
+        length = struct.unpack("!Q", await reader.readexactly(8))[0]
+    if length > MAX_MESSAGE_SIZE:
+        raise ValueError("Websocket frame too large")
+
+    mask = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(length)
+    if mask is not None:
+        payload = bytes(byte ^ mask[index % 4] for index, byte in enumerate(payload))
+    return first & 0x0F, bool(first & 0x80), payload
+
+def _encode_websocket_frame(opcode: int, payload: bytes) -> bytes:
+    """Encode an unmasked, unfragmented frame as sent by servers"""
+
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 65536:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+def _encode_websocket_lines(lines: list[str]) -> bytes:
+    return b"".join(_encode_websocket_frame(0x1, line.encode("utf8")) for line in lines)
+
+def _encode_event_lines(lines: list[str]) -> bytes:
+    return "".join(f"data: {line}\n\n" for line in lines).encode("utf8")
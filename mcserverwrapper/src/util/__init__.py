@@ -1,8 +1,11 @@
 """Export util classes"""
 
-from . import info_getter, logger
+from . import info_getter, instrumentation, logger, port_allocator, process
 
 __exports__ = [
     info_getter,
-    logger
+    instrumentation,
+    logger,
+    port_allocator,
+    process
 ]
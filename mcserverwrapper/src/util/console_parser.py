@@ -0,0 +1,116 @@
+"""A module containing functions for splitting minecraft console lines into their parts"""
+
+from __future__ import annotations
+
+import re
+
+# [12:34:56] [Server thread/INFO]: message
+# [12:34:56] [Server thread/INFO] [minecraft/DedicatedServer]: message
+# [19Oct2026 12:34:56.789] [Server thread/INFO] [minecraft/DedicatedServer]: message, in the latest.log of Forge
+_DEFAULT_PATTERN = re.compile(r"^\[((?:\d{2}[A-Z][a-z]{2}\d{4} )?\d{2}:\d{2}:\d{2}(?:\.\d{3})?)\] "
+                              r"\[([^\]]*)/([A-Z]+)\](?: \[([^\]]*)\])?: (.*)$")
+# [12:34:56 INFO]: message
+_PAPER_PATTERN = re.compile(r"^\[(\d{2}:\d{2}:\d{2}) ([A-Z]+)\]: (.*)$")
+# the groups of the time, thread, level, source and message in each pattern, None if the pattern lacks the field
+_PATTERN_GROUPS = (
+    (_DEFAULT_PATTERN, (1, 2, 3, 4, 5)),
+    (_PAPER_PATTERN, (1, None, 2, None, 3))
+)
+# the spans of a line without a known log prefix
+_NO_SPANS = (-1,) * 10
+
+class ConsoleLine:
+    """A single parsed line of console output"""
+
+    __slots__ = ("time", "thread", "level", "source", "message")
+
+    def __init__(self, time: str, thread: str | None, level: str, source: str | None, message: str) -> None:
+        self.time = time
+        self.thread = thread
+        self.level = level
+        self.source = source
+        self.message = message
+
+    time: str
+    thread: str | None
+    level: str
+    source: str | None
+    message: str
+
+class ParsedLine(str):
+    """A console line which carries its parsed fields, parse_line() returns them instead of parsing the line again"""
+
+    def __new__(cls, line: str, parsed: ConsoleLine | None) -> ParsedLine:
+        self = super().__new__(cls, line)
+        self.parsed = parsed
+        return self
+
+    parsed: ConsoleLine | None
+
+def decode_line(raw_line: bytes) -> str:
+    """Remove the line breaks of a raw line of output and decode it, skipping all chars which aren't ascii"""
+
+    # remove line breaks
+    raw_line = raw_line.replace(b"\r", b"").replace(b"\n", b"")
+
+    # try to decode the output string
+    try:
+        return raw_line.decode("ascii")
+    # if the total decoding fails, skip every char which can't be decoded
+    except UnicodeDecodeError:
+        return raw_line.decode("ascii", errors="ignore")
+
+def parse_line(line: str) -> ConsoleLine | None:
+    """
+    Split a console line into its time, thread, level, source and message
+
+    Args:
+        line (str): the raw console line
+
+    Returns:
+        ConsoleLine | None: the parsed line, or None if the line doesn't have a known log prefix
+    """
+
+    # lines of isolated servers were already parsed by their worker process
+    if isinstance(line, ParsedLine):
+        return line.parsed
+
+    match = _DEFAULT_PATTERN.match(line)
+    if match is not None:
+        return ConsoleLine(match.group(1), match.group(2), match.group(3), match.group(4), match.group(5))
+
+    match = _PAPER_PATTERN.match(line)
+    if match is not None:
+        return ConsoleLine(match.group(1), None, match.group(2), None, match.group(3))
+
+    return None
+
+def line_spans(line: str) -> tuple[int, ...]:
+    """
+    Find the start and end indices of the time, thread, level, source and message of a console line
+
+    Args:
+        line (str): the raw console line
+
+    Returns:
+        tuple[int, ...]: the start and end of each field, -1 for missing fields or lines without a known log prefix
+    """
+
+    for pattern, groups in _PATTERN_GROUPS:
+        match = pattern.match(line)
+        if match is not None:
+            spans = []
+            for group in groups:
+                spans.extend((-1, -1) if group is None else match.span(group))
+            return tuple(spans)
+
+    return _NO_SPANS
+
+def parsed_from_spans(line: str, spans: tuple[int, ...]) -> ParsedLine:
+    """Build the parsed line from the spans line_spans() returned for it"""
+
+    if spans[0] < 0:
+        return ParsedLine(line, None)
+
+    fields = [None if start < 0 else line[start:end] for start, end in zip(spans[::2], spans[1::2])]
+    return ParsedLine(line, ConsoleLine(*fields))
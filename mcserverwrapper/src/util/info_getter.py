@@ -3,24 +3,31 @@
 from __future__ import annotations
 
 import sys
+from typing import TYPE_CHECKING
 
-from mcstatus import JavaServer
+from . import instrumentation
 
-# version-specific code doesn't work well with pylnt
-# https://github.com/pylint-dev/pylint/issues/7240
-# pylint: disable=import-error, no-name-in-module
+# mcstatus pulls in dns and asyncio, so it is only imported once the first ping is sent
+if TYPE_CHECKING:
+    # version-specific code doesn't work well with pylnt
+    # https://github.com/pylint-dev/pylint/issues/7240
+    # pylint: disable=import-error, no-name-in-module
 
-# python versions above 3.9
-if sys.version_info.minor > 9:
-    from mcstatus.responses import JavaStatusResponse
-else:
-    from mcstatus.status_response import JavaStatusResponse
+    # python versions above 3.9
+    if sys.version_info.minor > 9:
+        from mcstatus.responses import JavaStatusResponse
+    else:
+        from mcstatus.status_response import JavaStatusResponse
 
-# pylint: enable=import-error, no-name-in-module
+    # pylint: enable=import-error, no-name-in-module
 
+@instrumentation.timed("info_getter.ping")
 def ping_address_with_return(address, port, timeout=3) -> JavaStatusResponse | None:
     """Pings a given address/port combination and returns the result or None"""
 
+    # pylint: disable-next=import-outside-toplevel
+    from mcstatus import JavaServer
+
     if isinstance(port, str):
         port = int(port)
 
@@ -0,0 +1,240 @@
+"""
+A simple global state instrumentation registry with counters, histograms and trace spans
+
+Instrumentation is disabled by default. While disabled, every function returns immediately
+and span() returns a shared no-op context manager, so instrumented code paths stay as fast as before.
+"""
+
+from __future__ import annotations
+
+import functools
+import json
+import os
+import threading
+import time
+from queue import Queue
+from typing import Any, Callable
+
+# pylint: disable-next=invalid-name
+enabled = False
+
+# upper bounds of the histogram buckets in microseconds, the last bucket catches everything above
+BUCKET_BOUNDS_US = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000, 50000, 100000,
+                    200000, 500000, 1000000, 2000000, 5000000]
+
+class Histogram:
+    """A histogram of durations or sizes with fixed buckets"""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.buckets = [0] * (len(BUCKET_BOUNDS_US) + 1)
+
+    def add(self, value: float) -> None:
+        """Add a value, durations are expected in microseconds"""
+
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None or value < self.min else self.min
+        self.max = value if self.max is None or value > self.max else self.max
+
+        for index, bound in enumerate(BUCKET_BOUNDS_US):
+            if value <= bound:
+                self.buckets[index] += 1
+                return
+        self.buckets[-1] += 1
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the histogram as a json-serializable dict"""
+
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "mean": self.total / self.count if self.count > 0 else None,
+            "min": self.min,
+            "max": self.max,
+            "buckets": {str(bound): count for bound, count in zip(BUCKET_BOUNDS_US + ["inf"], self.buckets)}
+        }
+
+class _Span:
+    """Measures the duration of a with block"""
+
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.start = 0
+
+    def __enter__(self) -> _Span:
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *args) -> None:
+        end = time.perf_counter_ns()
+        _record_span(self.name, self.start, end)
+
+class _NoopSpan:
+    """A span which does nothing, used while instrumentation is disabled"""
+
+    __slots__ = ()
+
+    def __enter__(self) -> _NoopSpan:
+        return self
+
+    def __exit__(self, *args) -> None:
+        pass
+
+_NOOP_SPAN = _NoopSpan()
+
+_lock = threading.Lock()
+_counters: dict[str, int] = {}
+_histograms: dict[str, Histogram] = {}
+_hooks: list[Callable[[str, int, int], None]] = []
+# pylint: disable-next=invalid-name
+_trace_file = None
+
+def enable(trace_path: str | None = None) -> None:
+    """
+    Enable instrumentation
+
+    Args:
+        trace_path (str | None): if set, every finished span is appended to this file as a json line
+    """
+
+    global enabled, _trace_file
+
+    with _lock:
+        if _trace_file is not None:
+            _trace_file.close()
+            _trace_file = None
+        if trace_path is not None:
+            # pylint: disable-next=consider-using-with
+            _trace_file = open(trace_path, "a", encoding="utf8")
+    enabled = True
+
+def disable() -> None:
+    """Disable instrumentation, the collected data is kept until reset() is called"""
+
+    global enabled, _trace_file
+
+    enabled = False
+    with _lock:
+        if _trace_file is not None:
+            _trace_file.close()
+            _trace_file = None
+
+def reset() -> None:
+    """Delete all collected data"""
+
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+def add_hook(hook: Callable[[str, int, int], None]) -> None:
+    """Register a function which is called with the name, start and end in ns of every finished span"""
+
+    _hooks.append(hook)
+
+def remove_hook(hook: Callable[[str, int, int], None]) -> None:
+    """Remove a previously registered span hook"""
+
+    _hooks.remove(hook)
+
+def count(name: str, value: int = 1) -> None:
+    """Increase the counter with the given name"""
+
+    if not enabled:
+        return
+
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+def observe(name: str, value: float) -> None:
+    """Add a value to the histogram with the given name"""
+
+    if not enabled:
+        return
+
+    with _lock:
+        _get_histogram(name).add(value)
+
+def span(name: str) -> _Span | _NoopSpan:
+    """
+    Return a context manager measuring the duration of its with block
+
+    The duration is added to the histogram with the given name in microseconds
+    """
+
+    if not enabled:
+        return _NOOP_SPAN
+    return _Span(name)
+
+def timed(name: str) -> Callable:
+    """Decorator measuring every call of the decorated function like span() does"""
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            with _Span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def snapshot() -> dict[str, Any]:
+    """Return all counters and histograms as a json-serializable dict"""
+
+    with _lock:
+        return {
+            "counters": _counters.copy(),
+            "histograms": {name: histogram.to_dict() for name, histogram in _histograms.items()}
+        }
+
+def export(path: str) -> None:
+    """Write a snapshot of all counters and histograms to the given json file"""
+
+    data = snapshot()
+    data["time"] = time.time()
+    data["pid"] = os.getpid()
+
+    with open(path, "w", encoding="utf8") as export_file:
+        json.dump(data, export_file, indent=2)
+
+class InstrumentedQueue(Queue):
+    """A queue counting its puts and gets and recording its size, while instrumentation is enabled"""
+
+    def __init__(self, name: str, maxsize: int = 0) -> None:
+        super().__init__(maxsize)
+        self.name = name
+
+    def put(self, item, block=True, timeout=None) -> None:
+        super().put(item, block, timeout)
+        if enabled:
+            count(f"{self.name}.put")
+            observe(f"{self.name}.size", self.qsize())
+
+    def get(self, block=True, timeout=None):
+        item = super().get(block, timeout)
+        if enabled:
+            count(f"{self.name}.get")
+        return item
+
+def _get_histogram(name: str) -> Histogram:
+    histogram = _histograms.get(name)
+    if histogram is None:
+        histogram = Histogram()
+        _histograms[name] = histogram
+    return histogram
+
+def _record_span(name: str, start: int, end: int) -> None:
+    with _lock:
+        _get_histogram(name).add((end - start) / 1000)
+        if _trace_file is not None:
+            _trace_file.write(json.dumps({"name": name, "start_ns": start, "duration_us": (end - start) / 1000,
+                                          "thread": threading.current_thread().name}) + "\n")
+
+    for hook in _hooks:
+        hook(name, start, end)
@@ -1,24 +1,71 @@
-"""A simple global state logger"""
+"""A simple logger, writing into the log file of a server directory"""
+
+from __future__ import annotations
 
 import os
 
+from . import instrumentation
+
 LOGFILE_NAME = "mcserverwrapper.log"
 
+# the log file which was set up last, used by the module level log()
 # pylint: disable-next=invalid-name
 logfile_path = None
 
-def setup(server_path):
-    """Setup the logger"""
+class Logger:
+    """
+    Writes the log of a single server into its directory, so the logs of servers running in one process don't mix
+
+    Args:
+        server_path (str): the directory the log file is written to
+    """
+
+    def __init__(self, server_path: str) -> None:
+        self.path = os.path.join(server_path, LOGFILE_NAME)
+
+    path: str
 
-    if not os.path.isdir(server_path):
-        raise Exception(f"Directory {server_path} not found")
+    def setup(self) -> Logger:
+        """Create the log file and use it for the module level log()"""
 
-    global logfile_path
-    logfile_path = os.path.join(server_path, LOGFILE_NAME)
+        server_path = os.path.dirname(self.path)
+        if not os.path.isdir(server_path):
+            raise Exception(f"Directory {server_path} not found")
 
-    if not os.path.isfile(logfile_path):
-        with open(logfile_path, "w+", encoding="utf8"):
+        global logfile_path
+        logfile_path = self.path
+
+        if not os.path.isfile(self.path):
+            with open(self.path, "w+", encoding="utf8"):
+                pass
+        return self
+
+    def delete_logs(self) -> None:
+        """Delete the logfile"""
+
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+
+    @instrumentation.timed("logger.log")
+    def log(self, msg: str, print_output = True) -> None:
+        """
+        Send a log message
+        @param print_output: if set, print the msg to the console (default True)
+        """
+
+        try:
+            with open(self.path, "a", encoding="utf8") as logfile:
+                logfile.write(str(msg) + "\n")
+        # the server directory was removed, e.g. a pooled server whose output is still being read
+        except FileNotFoundError:
             pass
+        if print_output:
+            print(str(msg))
+
+def setup(server_path) -> Logger:
+    """Setup the logger"""
+
+    return Logger(server_path).setup()
 
 def delete_logs():
     """Delete the logfile"""
@@ -28,14 +75,11 @@ def delete_logs():
 
 def log(msg: str, print_output = True):
     """
-    Send a log message
+    Send a log message to the log file which was set up last
     @param print_output: if set, print the msg to the console (default True)
     """
 
     if logfile_path is None:
         raise Exception("Logger not yet set up")
 
-    with open(logfile_path, "a", encoding="utf8") as logfile:
-        logfile.write(str(msg) + "\n")
-    if print_output:
-        print(str(msg))
+    Logger(os.path.dirname(logfile_path)).log(msg, print_output)
@@ -0,0 +1,175 @@
+"""Module containing the OutputHub class, which broadcasts output lines to any number of subscribers"""
+
+from __future__ import annotations
+
+import time
+from queue import Empty
+from threading import Condition
+from typing import Callable, Generator
+
+from . import instrumentation
+
+DEFAULT_CAPACITY = 10000
+
+class OutputHub:
+    """
+    A shared append-only ring buffer of output lines
+
+    Every line is stored once, subscribers only keep a cursor into the buffer.
+    A subscriber which falls more than `capacity` lines behind skips the lines that were overwritten
+    and continues with the oldest line still available.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY) -> None:
+        if capacity < 1:
+            raise ValueError(f"Expected a positive capacity, got {capacity}")
+
+        self.capacity = capacity
+        # grows up to capacity, then the oldest lines are overwritten
+        self._buffer: list[str] = []
+        # the sequence number of the next published line
+        self._head = 0
+        self._closed = False
+        self._new_line = Condition()
+
+    @property
+    def head(self) -> int:
+        """The sequence number the next published line will get"""
+
+        return self._head
+
+    @property
+    def tail(self) -> int:
+        """The sequence number of the oldest line still stored"""
+
+        return max(0, self._head - self.capacity)
+
+    @property
+    def closed(self) -> bool:
+        """True if no more lines will be published"""
+
+        return self._closed
+
+    def publish(self, line: str) -> None:
+        """Append a line and wake up all waiting subscribers"""
+
+        with self._new_line:
+            if self._closed:
+                raise ValueError("Cannot publish to a closed OutputHub")
+            if len(self._buffer) < self.capacity:
+                self._buffer.append(line)
+            else:
+                self._buffer[self._head % self.capacity] = line
+            self._head += 1
+            self._new_line.notify_all()
+
+        if instrumentation.enabled:
+            instrumentation.count("output_hub.publish")
+
+    def close(self) -> None:
+        """Mark the end of the output, subscribers stop after reading the remaining lines"""
+
+        with self._new_line:
+            self._closed = True
+            self._new_line.notify_all()
+
+    def latest(self, count: int) -> list[str]:
+        """Return up to count of the most recently published lines, oldest first"""
+
+        with self._new_line:
+            start = max(self.tail, self._head - max(count, 0))
+            return [self._buffer[seq % self.capacity] for seq in range(start, self._head)]
+
+    def subscribe(self, replay: int = 0, on_lag: Callable[[int], None] | None = None) -> Subscription:
+        """
+        Create a new subscriber
+
+        Args:
+            replay (int): the amount of already published lines the subscriber should read first
+            on_lag (Callable[[int], None] | None): called with the amount of skipped lines if the subscriber lags behind
+
+        Returns:
+            Subscription: the new subscriber, starting at the current head minus replay
+        """
+
+        with self._new_line:
+            cursor = max(self.tail, self._head - max(replay, 0))
+        return Subscription(self, cursor, on_lag)
+
+class Subscription:
+    """
+    A single reader of an OutputHub with its own cursor
+
+    get() and empty() behave like the ones of queue.Queue, so a subscription can replace an output queue.
+    """
+
+    def __init__(self, hub: OutputHub, cursor: int, on_lag: Callable[[int], None] | None = None) -> None:
+        self.hub = hub
+        self.cursor = cursor
+        self.dropped = 0
+        self._on_lag = on_lag
+
+    def lag(self) -> int:
+        """Return the amount of published lines this subscriber hasn't read yet"""
+
+        return self.hub.head - self.cursor
+
+    def empty(self) -> bool:
+        """Return True if all published lines were read"""
+
+        return self.cursor >= self.hub.head
+
+    def get(self, block: bool = True, timeout: float | None = None) -> str:
+        """
+        Return the next line, waiting for it if block is True
+
+        Raises:
+            queue.Empty: if no line was published within the timeout, or the hub was closed and all lines were read
+        """
+
+        lines = self.get_many(1, block, timeout)
+        if len(lines) == 0:
+            raise Empty()
+        return lines[0]
+
+    def get_many(self, max_count: int, block: bool = True, timeout: float | None = None) -> list[str]:
+        """Return up to max_count of the next lines, waiting for at least one if block is True"""
+
+        hub = self.hub
+        # pylint: disable=protected-access
+        with hub._new_line:
+            if block:
+                deadline = None if timeout is None else time.monotonic() + timeout
+                while self.cursor >= hub._head and not hub._closed:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        break
+                    hub._new_line.wait(remaining)
+
+            skipped = hub.tail - self.cursor
+            if skipped > 0:
+                self.cursor += skipped
+                self.dropped += skipped
+
+            end = min(hub._head, self.cursor + max_count)
+            lines = [hub._buffer[seq % hub.capacity] for seq in range(self.cursor, end)]
+            self.cursor = end
+        # pylint: enable=protected-access
+
+        if skipped > 0:
+            if instrumentation.enabled:
+                instrumentation.count("output_hub.dropped", skipped)
+            if self._on_lag is not None:
+                self._on_lag(skipped)
+        if instrumentation.enabled and len(lines) > 0:
+            instrumentation.count("output_hub.get", len(lines))
+        return lines
+
+    def __iter__(self) -> Generator[str, None, None]:
+        """Yield all lines until the hub is closed"""
+
+        while True:
+            lines = self.get_many(100)
+            if len(lines) == 0 and self.hub.closed:
+                return
+            yield from lines
@@ -0,0 +1,192 @@
+"""
+Module containing the PortAllocator class, which hands out leases for server ports without collisions
+
+The leases are stored in a json file, which is locked while it is changed, so any number of processes
+can lease ports from the same pool at once. Released leases are kept as a reservation,
+so an owner gets the same ports again after a restart if they are still free.
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import socket
+import sys
+import tempfile
+from contextlib import contextmanager
+from typing import Generator
+
+from ..error import PortAllocationError
+from .process import pid_alive
+
+DEFAULT_PORT_RANGE = (25565, 26565)
+# query uses udp, all other ports use tcp
+PORT_KINDS = ("game", "rcon", "query")
+
+class PortAllocator:
+    """
+    A pool of ports, which are leased to owners like server directories
+
+    Args:
+        state_path (str | None): the json file storing the leases, defaults to a file in the temp directory
+        port_range (tuple[int, int]): the first and last port of the pool
+        host (str): the address used to check if a port is free
+    """
+
+    def __init__(self, state_path: str | None = None, port_range: tuple[int, int] = DEFAULT_PORT_RANGE,
+                 host: str = "0.0.0.0") -> None:
+        if port_range[0] > port_range[1] or port_range[0] < 1 or port_range[1] > 65535:
+            raise ValueError(f"Invalid port range {port_range}")
+
+        self.state_path = state_path if state_path is not None \
+                          else os.path.join(tempfile.gettempdir(), "mcserverwrapper-ports.json")
+        self.port_range = port_range
+        self.host = host
+        self._owners: set[str] = set()
+        self._atexit_registered = False
+
+    def lease(self, owner: str, kinds: tuple[str, ...] = ("game",)) -> dict[str, int]:
+        """
+        Lease a free port of every given kind, the lease is released when this process exits
+
+        Args:
+            owner (str): the unique name of the lease owner, e.g. the server directory
+            kinds (tuple[str, ...]): the port kinds, out of "game", "rcon" and "query"
+
+        Returns:
+            dict[str, int]: the leased port of every kind
+
+        Raises:
+            PortAllocationError: if the owner is leased by another running process, or the pool is exhausted
+        """
+
+        for kind in kinds:
+            if kind not in PORT_KINDS:
+                raise ValueError(f"Unknown port kind {kind}, expected one of {PORT_KINDS}")
+
+        with self._locked_state() as leases:
+            entry = leases.get(owner, {"ports": {}, "pid": None})
+            if entry["pid"] not in (None, os.getpid()):
+                raise PortAllocationError(f"{owner} is already leased by process {entry['pid']}")
+
+            active = set()
+            reserved = set()
+            for other_owner, other in leases.items():
+                if other_owner != owner:
+                    (active if other["pid"] is not None else reserved).update(other["ports"].values())
+
+            ports = {}
+            for kind in kinds:
+                preferred = entry["ports"].get(kind)
+                if preferred is not None and preferred not in active and preferred not in ports.values() \
+                   and self._is_free(preferred, kind):
+                    ports[kind] = preferred
+                else:
+                    ports[kind] = self._find_free_port(kind, active | set(ports.values()), reserved, leases)
+
+            entry["ports"].update(ports)
+            entry["pid"] = os.getpid()
+            leases[owner] = entry
+
+        self._owners.add(owner)
+        if not self._atexit_registered:
+            atexit.register(self.release_all)
+            self._atexit_registered = True
+        return ports
+
+    def release(self, owner: str) -> None:
+        """Release the lease of the owner, its ports stay reserved for it until another owner needs them"""
+
+        with self._locked_state() as leases:
+            entry = leases.get(owner)
+            if entry is not None and entry["pid"] == os.getpid():
+                entry["pid"] = None
+        self._owners.discard(owner)
+
+    def release_all(self) -> None:
+        """Release all leases taken by this allocator"""
+
+        for owner in list(self._owners):
+            self.release(owner)
+
+    def leases(self) -> dict[str, dict[str, int]]:
+        """Return the ports of all active leases by owner"""
+
+        with self._locked_state() as leases:
+            return {owner: entry["ports"].copy() for owner, entry in leases.items() if entry["pid"] is not None}
+
+    def _find_free_port(self, kind: str, active: set[int], reserved: set[int], leases: dict) -> int:
+        """Return the lowest free port, preferring ports no other owner reserved"""
+
+        for allow_reserved in (False, True):
+            for port in range(self.port_range[0], self.port_range[1] + 1):
+                if port in active or (port in reserved and not allow_reserved):
+                    continue
+                if not self._is_free(port, kind):
+                    continue
+                if allow_reserved:
+                    # take over the reservation of a released lease
+                    for entry in leases.values():
+                        entry["ports"] = {key: value for key, value in entry["ports"].items() if value != port}
+                return port
+
+        raise PortAllocationError(f"No free {kind} port in range {self.port_range[0]}-{self.port_range[1]}")
+
+    def _is_free(self, port: int, kind: str) -> bool:
+        """Return True if the port can be bound right now"""
+
+        sock_type = socket.SOCK_DGRAM if kind == "query" else socket.SOCK_STREAM
+        with socket.socket(socket.AF_INET, sock_type) as sock:
+            try:
+                sock.bind((self.host, port))
+            except OSError:
+                return False
+        return True
+
+    @contextmanager
+    def _locked_state(self) -> Generator[dict, None, None]:
+        """Lock the state file, yield the leases and write them back afterwards"""
+
+        with open(self.state_path, "a+", encoding="utf8") as state_file:
+            _lock_file(state_file)
+            try:
+                state_file.seek(0)
+                content = state_file.read()
+                leases = json.loads(content) if content.strip() != "" else {}
+
+                # leases of crashed processes are released
+                for entry in leases.values():
+                    if entry["pid"] is not None and entry["pid"] != os.getpid() and not pid_alive(entry["pid"]):
+                        entry["pid"] = None
+
+                yield leases
+
+                state_file.seek(0)
+                state_file.truncate()
+                json.dump(leases, state_file, indent=2)
+                state_file.flush()
+            finally:
+                _unlock_file(state_file)
+
+def _lock_file(file) -> None:
+    if sys.platform == "win32":
+        # pylint: disable-next=import-outside-toplevel,import-error
+        import msvcrt
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+    else:
+        # pylint: disable-next=import-outside-toplevel,import-error
+        import fcntl
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+
+def _unlock_file(file) -> None:
+    if sys.platform == "win32":
+        # pylint: disable-next=import-outside-toplevel,import-error
+        import msvcrt
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        # pylint: disable-next=import-outside-toplevel,import-error
+        import fcntl
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
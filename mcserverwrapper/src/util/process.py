@@ -0,0 +1,28 @@
+"""Module containing helpers for inspecting processes which weren't started by this wrapper"""
+
+from __future__ import annotations
+
+import os
+import sys
+
+def pid_alive(pid: int) -> bool:
+    """Return True if a process with the given pid exists, even if it belongs to another user"""
+
+    if sys.platform == "win32":
+        # os.kill would terminate the process on windows
+        # pylint: disable-next=import-outside-toplevel
+        import ctypes
+        handle = ctypes.windll.kernel32.OpenProcess(0x1000, False, pid)
+        if handle == 0:
+            return False
+        ctypes.windll.kernel32.CloseHandle(handle)
+        return True
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # the process exists, but belongs to another user
+        return True
+    return True
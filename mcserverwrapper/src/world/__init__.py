@@ -0,0 +1,14 @@
+"""Export world classes"""
+
+from . import compaction, nbt, pruning, region, region_analyzer, snbt, stats, world_data
+
+__exports__ = [
+    compaction,
+    nbt,
+    pruning,
+    region,
+    region_analyzer,
+    snbt,
+    stats,
+    world_data
+]
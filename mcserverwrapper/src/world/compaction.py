@@ -0,0 +1,193 @@
+"""
+Module containing the RegionCompactor class, which rewrites the region files of a stopped world without unused sectors
+
+The server never shrinks region files, so sectors freed by chunks which moved or shrank stay allocated.
+Optionally, chunks are recompressed with a stronger zlib level, which is kept if the result is smaller.
+Every region is written to a temporary file first, which only replaces the region file
+after the checksums of all chunks were verified.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import tempfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+from .region import (COMPRESSION_GZIP, COMPRESSION_NONE, COMPRESSION_ZLIB, HEADER_SIZE, SECTOR_SIZE, ChunkLocation,
+                     RegionError, RegionFile, chunk_sectors, decompress, write_region)
+from .region_analyzer import REGION_KINDS, RegionAnalyzer
+
+# rewriting a region takes much longer than starting a process, but not for a single small region
+_MIN_FILES_FOR_POOL = 2
+# the compression types which can be recompressed, lz4 chunks are kept as they are
+_RECOMPRESSIBLE = (COMPRESSION_GZIP, COMPRESSION_ZLIB, COMPRESSION_NONE)
+
+class RegionCompactResult:
+    """The result of compacting a single region file"""
+
+    # pylint: disable-next=too-many-arguments,too-many-positional-arguments
+    def __init__(self, path: str, chunk_count: int, recompressed: int, size_before: int, size_after: int,
+                 error: str | None = None) -> None:
+        self.path = path
+        self.chunk_count = chunk_count
+        self.recompressed = recompressed
+        self.size_before = size_before
+        self.size_after = size_after
+        self.error = error
+
+    # the path relative to the world directory
+    path: str
+    chunk_count: int
+    # the chunks which were stored with the new compression, because it was smaller
+    recompressed: int
+    size_before: int
+    size_after: int
+    # the reason the file couldn't be compacted, the file is unchanged in this case
+    error: str | None
+
+class CompactionReport:
+    """The results of compacting a world"""
+
+    def __init__(self, regions: list[RegionCompactResult]) -> None:
+        self.regions = regions
+
+    regions: list[RegionCompactResult]
+
+    @property
+    def size_before(self) -> int:
+        """The size of all region files before compacting"""
+
+        return sum(region.size_before for region in self.regions)
+
+    @property
+    def size_after(self) -> int:
+        """The size of all region files after compacting"""
+
+        return sum(region.size_after for region in self.regions)
+
+    @property
+    def reclaimed(self) -> int:
+        """The disk space freed by compacting"""
+
+        return self.size_before - self.size_after
+
+    def errors(self) -> list[RegionCompactResult]:
+        """Return the region files which couldn't be compacted"""
+
+        return [region for region in self.regions if region.error is not None]
+
+class RegionCompactor:
+    """
+    Rewrites the region files of all dimensions of a world
+
+    The server has to be stopped, because it keeps region files open and overwrites them on save.
+
+    Args:
+        world_dir (str): the world directory, containing level.dat
+        compression_level (int | None): the zlib level to recompress chunks with, None keeps the compressed data
+        workers (int | None): the amount of processes, defaults to the amount of cpus
+    """
+
+    def __init__(self, world_dir: str, compression_level: int | None = None, workers: int | None = None) -> None:
+        if compression_level is not None:
+            if not isinstance(compression_level, int):
+                raise TypeError(f"Expected int, got {type(compression_level)}")
+            if not 1 <= compression_level <= 9:
+                raise ValueError("The compression level has to be between 1 and 9")
+
+        self.analyzer = RegionAnalyzer(world_dir)
+        self.world_dir = world_dir
+        self.compression_level = compression_level
+        self.workers = workers
+
+    def compact(self) -> CompactionReport:
+        """Rewrite all region files, files without unused sectors are skipped unless chunks are recompressed"""
+
+        tasks = []
+        for dimension_dir in self.analyzer.dimensions().values():
+            for kind in REGION_KINDS:
+                kind_dir = os.path.join(dimension_dir, kind)
+                if not os.path.isdir(kind_dir):
+                    continue
+                for name in sorted(os.listdir(kind_dir)):
+                    if name.endswith(".mca"):
+                        tasks.append((self.world_dir, os.path.join(kind_dir, name), self.compression_level))
+
+        if len(tasks) >= _MIN_FILES_FOR_POOL and self.workers != 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                results = list(executor.map(_compact_region, tasks))
+        else:
+            results = [_compact_region(task) for task in tasks]
+        return CompactionReport([RegionCompactResult(**result) for result in results])
+
+def _compact_region(args: tuple[str, str, int | None]) -> dict[str, Any]:
+    """Compact a single region file, this runs in a worker process"""
+
+    world_dir, path, compression_level = args
+    result = {"path": os.path.relpath(path, world_dir), "chunk_count": 0, "recompressed": 0, "size_before": 0,
+              "size_after": 0, "error": None}
+    # the temporary file needs the name of the region, which contains its coordinates
+    temp_dir = tempfile.mkdtemp(prefix=".compact-", dir=os.path.dirname(path))
+    temp_path = os.path.join(temp_dir, os.path.basename(path))
+    try:
+        with RegionFile(path) as region:
+            result["size_before"] = result["size_after"] = region.size
+            chunks = region.chunks()
+            result["chunk_count"] = len(chunks)
+            used_size = HEADER_SIZE + sum(chunk.sector_count for chunk in chunks) * SECTOR_SIZE
+            if compression_level is None and (region.size <= used_size or len(chunks) == 0):
+                return result
+
+            entries, checksums = _read_entries(region, chunks, compression_level, result)
+
+        new_size = write_region(temp_path, entries)
+        _verify(temp_path, checksums)
+        if new_size < result["size_before"] or result["recompressed"] > 0:
+            os.replace(temp_path, path)
+            result["size_after"] = new_size
+    except (OSError, EOFError, RegionError, zlib.error) as e:
+        result["error"] = str(e)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return result
+
+def _read_entries(region: RegionFile, chunks: list[ChunkLocation], compression_level: int | None,
+                  result: dict[str, Any]) -> tuple[list[tuple[int, int, int, bytes]], dict[int, tuple[int, bool]]]:
+    """
+    Return the entries to write and the crc32 every chunk has to be read back with,
+    and if the checksum is of the decompressed data
+    """
+
+    entries = []
+    checksums = {}
+    for chunk in chunks:
+        data = region.read_raw(chunk)
+        compression = chunk.compression
+        checksums[chunk.index] = (zlib.crc32(data), False)
+        if compression_level is not None and compression in _RECOMPRESSIBLE:
+            uncompressed = decompress(data, compression)
+            recompressed = zlib.compress(uncompressed, compression_level)
+            if len(recompressed) < len(data):
+                data = recompressed
+                compression = COMPRESSION_ZLIB
+                checksums[chunk.index] = (zlib.crc32(uncompressed), True)
+                result["recompressed"] += 1
+        entries.append((chunk.index, chunk.timestamp, compression, data))
+    return entries, checksums
+
+def _verify(path: str, checksums: dict[int, tuple[int, bool]]) -> None:
+    """Raise a RegionError if a chunk of the written region doesn't match its checksum"""
+
+    with RegionFile(path) as region:
+        chunks = region.chunks()
+        if len(chunks) != len(checksums):
+            raise RegionError(f"{path} contains {len(chunks)} chunks instead of {len(checksums)}")
+        for chunk in chunks:
+            checksum, decompressed = checksums[chunk.index]
+            raw = region.read_raw(chunk)
+            data = region.read_chunk(chunk) if decompressed else raw
+            if zlib.crc32(data) != checksum or chunk_sectors(len(raw)) != chunk.sector_count:
+                raise RegionError(f"Chunk {chunk.index} of {path} doesn't match the original chunk")
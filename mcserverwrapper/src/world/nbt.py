@@ -0,0 +1,382 @@
+"""
+Module containing a lazy reader for NBT, the binary format of level.dat, playerdata and chunks
+
+Compounds and lists are returned as views on the data, which only decode the tags which are accessed.
+Lookups skip every other subtree by its length, so reading a single value from a large file
+doesn't decode the rest of it:
+
+    level = read_file("world/level.dat")
+    seed = level["Data"]["WorldGenSettings"]["seed"]
+"""
+
+from __future__ import annotations
+
+import gzip
+import struct
+import zlib
+from typing import Any, Iterator, Sequence
+
+TAG_END = 0
+TAG_BYTE = 1
+TAG_SHORT = 2
+TAG_INT = 3
+TAG_LONG = 4
+TAG_FLOAT = 5
+TAG_DOUBLE = 6
+TAG_BYTE_ARRAY = 7
+TAG_STRING = 8
+TAG_LIST = 9
+TAG_COMPOUND = 10
+TAG_INT_ARRAY = 11
+TAG_LONG_ARRAY = 12
+
+# the struct formats of the tags with a fixed size
+_FIXED_FORMATS = {
+    TAG_BYTE: struct.Struct(">b"),
+    TAG_SHORT: struct.Struct(">h"),
+    TAG_INT: struct.Struct(">i"),
+    TAG_LONG: struct.Struct(">q"),
+    TAG_FLOAT: struct.Struct(">f"),
+    TAG_DOUBLE: struct.Struct(">d")
+}
+# the element sizes and formats of the array tags
+_ARRAY_FORMATS = {TAG_BYTE_ARRAY: (1, "b"), TAG_INT_ARRAY: (4, "i"), TAG_LONG_ARRAY: (8, "q")}
+_INT = struct.Struct(">i")
+_USHORT = struct.Struct(">H")
+
+class NbtError(ValueError):
+    """An error occuring if NBT data is malformed"""
+
+class Compound:
+    """
+    A lazy view on a compound tag, tags are only decoded when they are accessed
+
+    The tag names are indexed while they are scanned, so every tag is only scanned once.
+
+    Args:
+        data (bytes): the uncompressed NBT data
+        pos (int): the position of the first tag of the compound
+    """
+
+    __slots__ = ("_data", "_index", "_scan_pos")
+
+    def __init__(self, data: bytes, pos: int) -> None:
+        self._data = data
+        # the type and payload position of the scanned tags by name
+        self._index: dict[str, tuple[int, int]] = {}
+        # the position of the first tag which wasn't scanned yet, None if the end was reached
+        self._scan_pos: int | None = pos
+
+    def get(self, name: str, default: Any = None) -> Any:
+        """Return the value of the named tag, or the default if it doesn't exist"""
+
+        found = self._find(name)
+        if found is None:
+            return default
+        return _view(self._data, found[1], found[0])
+
+    def tag_type(self, name: str) -> int | None:
+        """Return the type of the named tag, or None if it doesn't exist"""
+
+        found = self._find(name)
+        return found[0] if found is not None else None
+
+    def keys(self) -> list[str]:
+        """Return the names of all tags"""
+
+        self._scan(None)
+        return list(self._index)
+
+    def to_python(self) -> dict[str, Any]:
+        """Decode the whole compound into dicts and lists"""
+
+        return {name: _decode(value) for name, value in self.items()}
+
+    def items(self) -> Iterator[tuple[str, Any]]:
+        """Iterate over the names and values of all tags"""
+
+        self._scan(None)
+        for name, (tag, pos) in list(self._index.items()):
+            yield name, _view(self._data, pos, tag)
+
+    def __getitem__(self, name: str) -> Any:
+        found = self._find(name)
+        if found is None:
+            raise KeyError(name)
+        return _view(self._data, found[1], found[0])
+
+    def __contains__(self, name: str) -> bool:
+        return self._find(name) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def __len__(self) -> int:
+        return len(self.keys())
+
+    def __repr__(self) -> str:
+        return f"Compound({self.keys()})"
+
+    def _find(self, name: str) -> tuple[int, int] | None:
+        found = self._index.get(name)
+        if found is None and self._scan_pos is not None:
+            found = self._scan(name)
+        return found
+
+    def _scan(self, name: str | None) -> tuple[int, int] | None:
+        """Index the tags until the named tag is found, or all tags if name is None"""
+
+        data = self._data
+        pos = self._scan_pos
+        try:
+            while pos is not None:
+                tag = data[pos]
+                if tag == TAG_END:
+                    pos = None
+                    break
+                name_length = _USHORT.unpack_from(data, pos + 1)[0]
+                payload = pos + 3 + name_length
+                tag_name = decode_string(data[pos + 3:payload])
+                self._index[tag_name] = (tag, payload)
+                pos = skip(data, payload, tag)
+                if tag_name == name:
+                    break
+        except (struct.error, IndexError) as e:
+            raise NbtError("The NBT data ends unexpectedly") from e
+        finally:
+            self._scan_pos = pos
+        return self._index.get(name) if name is not None else None
+
+class TagList:
+    """
+    A lazy view on a list tag, elements are only decoded when they are accessed
+
+    Args:
+        data (bytes): the uncompressed NBT data
+        pos (int): the position of the payload of the list
+    """
+
+    __slots__ = ("_data", "_offsets", "element_type", "_start", "_count")
+
+    def __init__(self, data: bytes, pos: int) -> None:
+        self._data = data
+        self.element_type = data[pos]
+        self._count = _INT.unpack_from(data, pos + 1)[0]
+        self._start = pos + 5
+        # the positions of the elements, only needed for elements without a fixed size
+        self._offsets: list[int] | None = None
+
+    element_type: int
+
+    def to_python(self) -> list[Any]:
+        """Decode the whole list into dicts and lists"""
+
+        return [_decode(value) for value in self]
+
+    def __len__(self) -> int:
+        return max(self._count, 0)
+
+    def __getitem__(self, index: int) -> Any:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("list index out of range")
+        return _view(self._data, self._position(index), self.element_type)
+
+    def __iter__(self) -> Iterator[Any]:
+        pos = self._start
+        for _ in range(len(self)):
+            yield _view(self._data, pos, self.element_type)
+            pos = skip(self._data, pos, self.element_type)
+
+    def __repr__(self) -> str:
+        return f"TagList(type={self.element_type}, length={len(self)})"
+
+    def _position(self, index: int) -> int:
+        fixed = _FIXED_FORMATS.get(self.element_type)
+        if fixed is not None:
+            return self._start + index * fixed.size
+        if self._offsets is None:
+            self._offsets = []
+            pos = self._start
+            for _ in range(len(self)):
+                self._offsets.append(pos)
+                pos = skip(self._data, pos, self.element_type)
+        return self._offsets[index]
+
+def load(data: bytes) -> Compound:
+    """
+    Return a lazy view on the root compound of uncompressed NBT data
+
+    Args:
+        data (bytes): the uncompressed NBT data, starting with the root tag
+
+    Returns:
+        Compound: the root compound
+    """
+
+    try:
+        tag, pos = read_root(data)
+    except (struct.error, IndexError) as e:
+        raise NbtError("The NBT data ends unexpectedly") from e
+    if tag != TAG_COMPOUND:
+        raise NbtError(f"Expected a compound as root tag, got tag type {tag}")
+    return Compound(data, pos)
+
+def loads(data: bytes) -> Compound:
+    """Return a lazy view on the root compound of gzip, zlib or uncompressed NBT data"""
+
+    return load(decompress(data))
+
+def read_file(path: str) -> Compound:
+    """Read a gzip, zlib or uncompressed NBT file like level.dat, and return its root compound"""
+
+    with open(path, "rb") as nbt_file:
+        return loads(nbt_file.read())
+
+def decompress(data: bytes) -> bytes:
+    """Decompress NBT data, detecting the compression by its header"""
+
+    try:
+        if data[:2] == b"\x1f\x8b":
+            return gzip.decompress(data)
+        # the second byte makes the first two bytes a multiple of 31
+        if len(data) > 1 and data[0] & 0x0f == 8 and (data[0] << 8 | data[1]) % 31 == 0:
+            return zlib.decompress(data)
+    except (OSError, EOFError, zlib.error) as e:
+        raise NbtError(f"The NBT data can't be decompressed: {e}") from e
+    return data
+
+def find(data: bytes, path: Sequence[str]) -> Any:
+    """
+    Return the value at the path of tag names below the root compound, or None if it doesn't exist
+
+    Args:
+        data (bytes): the uncompressed NBT data, starting with the root tag
+        path (Sequence[str]): the names of the nested tags, e.g. ("Level", "InhabitedTime")
+
+    Returns:
+        Any: the decoded value, compounds are returned as dicts and lists as lists
+    """
+
+    try:
+        tag, pos = read_root(data)
+        for name in path:
+            if tag != TAG_COMPOUND:
+                return None
+            found = find_in_compound(data, pos, name.encode("utf8"))
+            if found is None:
+                return None
+            tag, pos = found
+        return read_value(data, pos, tag)[0]
+    except (struct.error, IndexError) as e:
+        raise NbtError("The NBT data ends unexpectedly") from e
+
+def _view(data: bytes, pos: int, tag: int) -> Any:
+    """Return a lazy view for compounds and lists, and the decoded value for all other tags"""
+
+    try:
+        if tag == TAG_COMPOUND:
+            return Compound(data, pos)
+        if tag == TAG_LIST:
+            return TagList(data, pos)
+        return read_value(data, pos, tag)[0]
+    except (struct.error, IndexError) as e:
+        raise NbtError("The NBT data ends unexpectedly") from e
+
+def _decode(value: Any) -> Any:
+    if isinstance(value, (Compound, TagList)):
+        return value.to_python()
+    return value
+
+def read_root(data: bytes) -> tuple[int, int]:
+    """Return the type and the payload position of the root tag"""
+
+    tag = data[0]
+    if tag == TAG_END:
+        raise NbtError("The NBT data is empty")
+    name_length = _USHORT.unpack_from(data, 1)[0]
+    return tag, 3 + name_length
+
+def find_in_compound(data: bytes, pos: int, name: bytes) -> tuple[int, int] | None:
+    """Return the type and payload position of the named tag in the compound at pos, or None"""
+
+    while True:
+        tag = data[pos]
+        if tag == TAG_END:
+            return None
+        name_length = _USHORT.unpack_from(data, pos + 1)[0]
+        payload = pos + 3 + name_length
+        if data[pos + 3:payload] == name:
+            return tag, payload
+        pos = skip(data, payload, tag)
+
+def skip(data: bytes, pos: int, tag: int) -> int:
+    """Return the position after the payload of the given tag type at pos"""
+
+    fixed = _FIXED_FORMATS.get(tag)
+    if fixed is not None:
+        return pos + fixed.size
+    if tag in _ARRAY_FORMATS:
+        return pos + 4 + _INT.unpack_from(data, pos)[0] * _ARRAY_FORMATS[tag][0]
+    if tag == TAG_STRING:
+        return pos + 2 + _USHORT.unpack_from(data, pos)[0]
+    if tag == TAG_LIST:
+        element_tag = data[pos]
+        count = _INT.unpack_from(data, pos + 1)[0]
+        pos += 5
+        element_fixed = _FIXED_FORMATS.get(element_tag)
+        if element_fixed is not None:
+            return pos + count * element_fixed.size
+        for _ in range(count):
+            pos = skip(data, pos, element_tag)
+        return pos
+    if tag == TAG_COMPOUND:
+        while True:
+            child_tag = data[pos]
+            if child_tag == TAG_END:
+                return pos + 1
+            pos = skip(data, pos + 3 + _USHORT.unpack_from(data, pos + 1)[0], child_tag)
+    raise NbtError(f"Unknown tag type {tag}")
+
+def read_value(data: bytes, pos: int, tag: int) -> tuple[Any, int]:
+    """Decode the payload of the given tag type at pos, and return it with the position after it"""
+
+    fixed = _FIXED_FORMATS.get(tag)
+    if fixed is not None:
+        return fixed.unpack_from(data, pos)[0], pos + fixed.size
+    if tag in _ARRAY_FORMATS:
+        count = _INT.unpack_from(data, pos)[0]
+        size, code = _ARRAY_FORMATS[tag]
+        return list(struct.unpack_from(f">{count}{code}", data, pos + 4)), pos + 4 + count * size
+    if tag == TAG_STRING:
+        length = _USHORT.unpack_from(data, pos)[0]
+        return decode_string(data[pos + 2:pos + 2 + length]), pos + 2 + length
+    if tag == TAG_LIST:
+        element_tag = data[pos]
+        count = _INT.unpack_from(data, pos + 1)[0]
+        pos += 5
+        values = []
+        for _ in range(count):
+            value, pos = read_value(data, pos, element_tag)
+            values.append(value)
+        return values, pos
+    if tag == TAG_COMPOUND:
+        values = {}
+        while True:
+            child_tag = data[pos]
+            if child_tag == TAG_END:
+                return values, pos + 1
+            name_length = _USHORT.unpack_from(data, pos + 1)[0]
+            name = decode_string(data[pos + 3:pos + 3 + name_length])
+            values[name], pos = read_value(data, pos + 3 + name_length, child_tag)
+    raise NbtError(f"Unknown tag type {tag}")
+
+def decode_string(raw: bytes) -> str:
+    """Decode the modified utf-8 of java, which only differs from utf-8 for null chars and surrogate pairs"""
+
+    try:
+        return raw.decode("utf8")
+    except UnicodeDecodeError:
+        return raw.replace(b"\xc0\x80", b"\x00").decode("utf8", "surrogatepass").encode("utf16", "surrogatepass") \
+                  .decode("utf16", "replace")
@@ -0,0 +1,288 @@
+"""
+Module containing the WorldPruner class, which removes rarely visited chunks from a stopped world
+
+Every chunk stores how many ticks players spent near it in InhabitedTime.
+Chunks below a threshold were only passed through, and are regenerated by the server if they are visited again.
+The chunks are parsed in a process pool, one region file per task. Dropped chunks are also removed from the
+entities/ and poi/ region files with the same name, and every changed region file is rewritten without unused sectors.
+"""
+
+from __future__ import annotations
+
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Iterable
+
+from . import nbt
+from .region import HEADER_SIZE, SECTOR_SIZE, ChunkLocation, RegionError, RegionFile, chunk_sectors, write_region
+from .region_analyzer import REGION_KINDS, RegionAnalyzer
+
+# parsing a region takes much longer than starting a process, but not for a single small region
+_MIN_FILES_FOR_POOL = 2
+# the path of InhabitedTime since 1.18, and before
+_INHABITED_TIME_PATHS = (("InhabitedTime",), ("Level", "InhabitedTime"))
+
+class ProtectedArea:
+    """
+    An area of a dimension whose chunks are never dropped, given in block coordinates
+
+    Args:
+        dimension (str): the dimension name, e.g. minecraft:overworld
+        x1 (int): the x coordinate of one corner
+        z1 (int): the z coordinate of one corner
+        x2 (int): the x coordinate of the opposite corner
+        z2 (int): the z coordinate of the opposite corner
+    """
+
+    # pylint: disable-next=too-many-arguments
+    def __init__(self, dimension: str, x1: int, z1: int, x2: int, z2: int) -> None:
+        self.dimension = dimension
+        # every chunk touching the area is protected
+        self.min_chunk_x = min(x1, x2) >> 4
+        self.min_chunk_z = min(z1, z2) >> 4
+        self.max_chunk_x = max(x1, x2) >> 4
+        self.max_chunk_z = max(z1, z2) >> 4
+
+    dimension: str
+    min_chunk_x: int
+    min_chunk_z: int
+    max_chunk_x: int
+    max_chunk_z: int
+
+    @staticmethod
+    def parse(text: str) -> ProtectedArea:
+        """Parse an area like minecraft:overworld:-500,-500,500,500, the namespace defaults to minecraft"""
+
+        if ":" not in text:
+            raise ValueError(f"Expected dimension:x1,z1,x2,z2, got {text}")
+        dimension, coordinates = text.rsplit(":", 1)
+        if ":" not in dimension:
+            dimension = f"minecraft:{dimension}"
+        values = coordinates.split(",")
+        if len(values) != 4:
+            raise ValueError(f"Expected dimension:x1,z1,x2,z2, got {text}")
+        return ProtectedArea(dimension, *(int(value) for value in values))
+
+    def contains_chunk(self, dimension: str, chunk_x: int, chunk_z: int) -> bool:
+        """Return True if the chunk at the given chunk coordinates is protected"""
+
+        return dimension == self.dimension and self.min_chunk_x <= chunk_x <= self.max_chunk_x \
+               and self.min_chunk_z <= chunk_z <= self.max_chunk_z
+
+# pylint: disable-next=too-many-instance-attributes
+class RegionPruneResult:
+    """The result of pruning a single region"""
+
+    # pylint: disable-next=too-many-arguments,too-many-positional-arguments
+    def __init__(self, path: str, dimension: str, chunk_count: int, dropped: int, unreadable: int,
+                 size_before: int, size_after: int, error: str | None = None) -> None:
+        self.path = path
+        self.dimension = dimension
+        self.chunk_count = chunk_count
+        self.dropped = dropped
+        self.unreadable = unreadable
+        self.size_before = size_before
+        self.size_after = size_after
+        self.error = error
+
+    # the path of the region file relative to the world directory
+    path: str
+    dimension: str
+    chunk_count: int
+    dropped: int
+    # the chunks which couldn't be parsed, they are always kept
+    unreadable: int
+    # the summed size of the region, entities and poi files and the dropped external chunks
+    size_before: int
+    size_after: int
+    # the reason the region couldn't be pruned, if it is malformed
+    error: str | None
+
+class PruneReport:
+    """The results of pruning a world, or what would be pruned in a dry run"""
+
+    def __init__(self, regions: list[RegionPruneResult], dry_run: bool) -> None:
+        self.regions = regions
+        self.dry_run = dry_run
+
+    regions: list[RegionPruneResult]
+    dry_run: bool
+
+    @property
+    def chunk_count(self) -> int:
+        """The amount of chunks before pruning"""
+
+        return sum(region.chunk_count for region in self.regions)
+
+    @property
+    def dropped(self) -> int:
+        """The amount of dropped chunks"""
+
+        return sum(region.dropped for region in self.regions)
+
+    @property
+    def size_before(self) -> int:
+        """The size of all pruned files before pruning"""
+
+        return sum(region.size_before for region in self.regions)
+
+    @property
+    def size_after(self) -> int:
+        """The size of all pruned files after pruning"""
+
+        return sum(region.size_after for region in self.regions)
+
+    @property
+    def reclaimed(self) -> int:
+        """The disk space freed by pruning"""
+
+        return self.size_before - self.size_after
+
+    def errors(self) -> list[RegionPruneResult]:
+        """Return the regions which couldn't be pruned"""
+
+        return [region for region in self.regions if region.error is not None]
+
+class WorldPruner:
+    """
+    Drops the chunks of a world which players spent less than a given time in
+
+    The server has to be stopped, because it keeps region files open and overwrites them on save.
+
+    Args:
+        world_dir (str): the world directory, containing level.dat
+        min_inhabited_ticks (int): chunks with a lower InhabitedTime are dropped, 20 ticks are one second
+        protected_areas (Iterable[ProtectedArea]): areas which are kept regardless of their InhabitedTime
+        workers (int | None): the amount of processes, defaults to the amount of cpus
+    """
+
+    def __init__(self, world_dir: str, min_inhabited_ticks: int, protected_areas: Iterable[ProtectedArea] = (),
+                 workers: int | None = None) -> None:
+        if not isinstance(min_inhabited_ticks, int):
+            raise TypeError(f"Expected int, got {type(min_inhabited_ticks)}")
+        if min_inhabited_ticks < 0:
+            raise ValueError("min_inhabited_ticks can't be negative")
+
+        self.analyzer = RegionAnalyzer(world_dir)
+        self.world_dir = world_dir
+        self.min_inhabited_ticks = min_inhabited_ticks
+        self.protected_areas = list(protected_areas)
+        self.workers = workers
+
+    def prune(self, dry_run: bool = True) -> PruneReport:
+        """
+        Drop the chunks below the threshold and rewrite the changed region files
+
+        Args:
+            dry_run (bool): if True, only report which chunks would be dropped and how much space this would free
+
+        Returns:
+            PruneReport: the results per region
+        """
+
+        tasks = []
+        for dimension, dimension_dir in self.analyzer.dimensions().items():
+            region_dir = os.path.join(dimension_dir, "region")
+            if not os.path.isdir(region_dir):
+                continue
+            for name in sorted(os.listdir(region_dir)):
+                if name.endswith(".mca"):
+                    tasks.append((self.world_dir, dimension, dimension_dir, name, self.min_inhabited_ticks,
+                                  self.protected_areas, dry_run))
+
+        if len(tasks) >= _MIN_FILES_FOR_POOL and self.workers != 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                results = list(executor.map(_prune_region, tasks))
+        else:
+            results = [_prune_region(task) for task in tasks]
+        return PruneReport([RegionPruneResult(**result) for result in results], dry_run)
+
+# pylint: disable-next=too-many-locals
+def _prune_region(args: tuple[str, str, str, str, int, list[ProtectedArea], bool]) -> dict[str, Any]:
+    """Prune a region and its entities and poi files, this runs in a worker process"""
+
+    world_dir, dimension, dimension_dir, name, min_inhabited_ticks, areas, dry_run = args
+    region_path = os.path.join(dimension_dir, "region", name)
+    result = {"path": os.path.relpath(region_path, world_dir), "dimension": dimension, "chunk_count": 0,
+              "dropped": 0, "unreadable": 0, "size_before": 0, "size_after": 0, "error": None}
+    try:
+        drop = _select_chunks(region_path, dimension, min_inhabited_ticks, areas, result)
+        result["dropped"] = len(drop)
+
+        for kind in REGION_KINDS:
+            path = os.path.join(dimension_dir, kind, name)
+            if os.path.isfile(path):
+                size_before, size_after = _compact(path, drop, dry_run)
+                result["size_before"] += size_before
+                result["size_after"] += size_after
+    except (OSError, RegionError) as e:
+        result["error"] = str(e)
+    return result
+
+def _select_chunks(region_path: str, dimension: str, min_inhabited_ticks: int, areas: list[ProtectedArea],
+                   result: dict[str, Any]) -> set[int]:
+    """Return the indices of the chunks to drop, and count the chunks of the region in the result"""
+
+    drop = set()
+    with RegionFile(region_path) as region:
+        for chunk in region.chunks():
+            result["chunk_count"] += 1
+            chunk_x = region.region_x * 32 + chunk.x
+            chunk_z = region.region_z * 32 + chunk.z
+            if any(area.contains_chunk(dimension, chunk_x, chunk_z) for area in areas):
+                continue
+            inhabited_time = _read_inhabited_time(region, chunk)
+            if inhabited_time is None:
+                result["unreadable"] += 1
+            elif inhabited_time < min_inhabited_ticks:
+                drop.add(chunk.index)
+    return drop
+
+def _read_inhabited_time(region: RegionFile, chunk: ChunkLocation) -> int | None:
+    """Return the InhabitedTime of a chunk, or None if it can't be parsed"""
+
+    try:
+        data = region.read_chunk(chunk)
+        for path in _INHABITED_TIME_PATHS:
+            value = nbt.find(data, path)
+            if isinstance(value, int):
+                return value
+    # gzip raises OSError and EOFError for broken data
+    except (OSError, EOFError, RegionError, nbt.NbtError, zlib.error):
+        pass
+    return None
+
+def _compact(path: str, drop: set[int], dry_run: bool) -> tuple[int, int]:
+    """Remove the dropped chunks from a region file, and return its size before and after"""
+
+    with RegionFile(path) as region:
+        size_before = region.size
+        chunks = region.chunks()
+        kept = []
+        external_paths = []
+        for chunk in chunks:
+            if chunk.index not in drop:
+                kept.append(chunk)
+            elif chunk.external:
+                external_paths.append(region.external_path(chunk))
+        if len(kept) == len(chunks):
+            return size_before, size_before
+
+        external_paths = [external_path for external_path in external_paths if os.path.isfile(external_path)]
+        size_before += sum(os.path.getsize(external_path) for external_path in external_paths)
+        size_after = HEADER_SIZE + sum(chunk_sectors(chunk.length - 1) * SECTOR_SIZE for chunk in kept) \
+                     if len(kept) > 0 else 0
+        if dry_run:
+            return size_before, size_after
+        # the data has to be copied before the mmap is closed
+        entries = [(chunk.index, chunk.timestamp, chunk.compression, region.read_raw(chunk)) for chunk in kept]
+
+    if len(entries) > 0:
+        write_region(path, entries)
+    else:
+        # the server creates a new region file when the area is generated again
+        os.remove(path)
+    for external_path in external_paths:
+        os.remove(external_path)
+    return size_before, size_after
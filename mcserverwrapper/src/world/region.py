@@ -0,0 +1,217 @@
+"""
+Module containing the RegionFile class, which reads the anvil region files (.mca) of a world
+
+A region file holds 32x32 chunks. It starts with two 4 KiB tables, the first containing the sector offset
+and sector count of every chunk, the second containing the time every chunk was last saved.
+Every chunk starts with its length and compression type, followed by the compressed NBT data.
+Chunks which don't fit into 255 sectors are stored in an external .mcc file next to the region file.
+"""
+
+from __future__ import annotations
+
+import gzip
+import mmap
+import os
+import re
+import struct
+import tempfile
+import zlib
+from typing import Iterable
+
+SECTOR_SIZE = 4096
+HEADER_SIZE = 2 * SECTOR_SIZE
+CHUNKS_PER_REGION = 1024
+
+COMPRESSION_GZIP = 1
+COMPRESSION_ZLIB = 2
+COMPRESSION_NONE = 3
+COMPRESSION_LZ4 = 4
+# set in the compression type if the chunk is stored in an external .mcc file
+EXTERNAL_FLAG = 0x80
+# the most sectors a chunk can use, larger chunks are stored externally
+MAX_CHUNK_SECTORS = 255
+
+_REGION_NAME_PATTERN = re.compile(r"^r\.(-?\d+)\.(-?\d+)\.mca$")
+
+class RegionError(ValueError):
+    """An error occuring if a region file or chunk is malformed"""
+
+class ChunkLocation:
+    """The position of a single chunk inside a region file"""
+
+    __slots__ = ("index", "sector_offset", "sector_count", "timestamp", "length", "compression")
+
+    # pylint: disable-next=too-many-arguments,too-many-positional-arguments
+    def __init__(self, index: int, sector_offset: int, sector_count: int, timestamp: int, length: int,
+                 compression: int) -> None:
+        self.index = index
+        self.sector_offset = sector_offset
+        self.sector_count = sector_count
+        self.timestamp = timestamp
+        self.length = length
+        self.compression = compression
+
+    # the position in the region, x + z * 32
+    index: int
+    sector_offset: int
+    sector_count: int
+    # the unix time the chunk was last saved
+    timestamp: int
+    # the length of the compressed data plus the compression type byte
+    length: int
+    compression: int
+
+    @property
+    def x(self) -> int:
+        """The x coordinate inside the region"""
+
+        return self.index % 32
+
+    @property
+    def z(self) -> int:
+        """The z coordinate inside the region"""
+
+        return self.index // 32
+
+    @property
+    def external(self) -> bool:
+        """True if the chunk data is stored in an external .mcc file"""
+
+        return self.compression & EXTERNAL_FLAG != 0
+
+class RegionFile:
+    """
+    A region file opened through mmap, so only the pages which are read are loaded from disk
+
+    Args:
+        path (str): the path of the .mca file
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.region_x, self.region_z = parse_region_name(os.path.basename(path))
+        self._file = open(path, "rb")  # pylint: disable=consider-using-with
+        self.size = os.fstat(self._file.fileno()).st_size
+        # an empty region file is valid, mmap can't map empty files though
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size > 0 else None
+
+    def __enter__(self) -> RegionFile:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Unmap and close the file"""
+
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+    def chunks(self) -> list[ChunkLocation]:
+        """Return the locations of all chunks stored in the region"""
+
+        if self.size < HEADER_SIZE:
+            return []
+
+        locations = struct.unpack_from(">1024I", self._map, 0)
+        timestamps = struct.unpack_from(">1024I", self._map, SECTOR_SIZE)
+        chunks = []
+        for index, location in enumerate(locations):
+            if location == 0:
+                continue
+            sector_offset = location >> 8
+            start = sector_offset * SECTOR_SIZE
+            if sector_offset < 2 or start + 5 > self.size:
+                raise RegionError(f"Chunk {index} of {self.path} points outside of the file")
+            length, compression = struct.unpack_from(">IB", self._map, start)
+            chunks.append(ChunkLocation(index, sector_offset, location & 0xff, timestamps[index], length, compression))
+        return chunks
+
+    def read_chunk(self, chunk: ChunkLocation) -> bytes:
+        """Return the decompressed NBT data of a chunk"""
+
+        if chunk.external:
+            with open(self.external_path(chunk), "rb") as chunk_file:
+                data = chunk_file.read()
+        else:
+            data = self.read_raw(chunk)
+        return decompress(data, chunk.compression & ~EXTERNAL_FLAG)
+
+    def read_raw(self, chunk: ChunkLocation) -> bytes:
+        """Return the chunk data as stored in the region, still compressed and empty for external chunks"""
+
+        start = chunk.sector_offset * SECTOR_SIZE + 5
+        return bytes(self._map[start:start + chunk.length - 1])
+
+    def external_path(self, chunk: ChunkLocation) -> str:
+        """Return the path of the .mcc file an external chunk is stored in"""
+
+        return os.path.join(os.path.dirname(self.path),
+                            f"c.{self.region_x * 32 + chunk.x}.{self.region_z * 32 + chunk.z}.mcc")
+
+def chunk_sectors(data_length: int) -> int:
+    """Return the amount of sectors a chunk with the given length of compressed data uses"""
+
+    return -(-(data_length + 5) // SECTOR_SIZE)
+
+def write_region(path: str, chunks: Iterable[tuple[int, int, int, bytes]]) -> int:
+    """
+    Write a region file without unused sectors, replacing an existing file atomically
+
+    Args:
+        path (str): the path of the .mca file
+        chunks (Iterable[tuple[int, int, int, bytes]]): the index, timestamp, compression type and
+                                                        compressed data of every chunk, as returned by read_raw
+
+    Returns:
+        int: the size of the written file
+    """
+
+    locations = [0] * CHUNKS_PER_REGION
+    timestamps = [0] * CHUNKS_PER_REGION
+    body = bytearray()
+    sector = HEADER_SIZE // SECTOR_SIZE
+    for index, timestamp, compression, data in chunks:
+        sectors = chunk_sectors(len(data))
+        if sectors > MAX_CHUNK_SECTORS:
+            raise RegionError(f"Chunk {index} of {path} is too large for a region file")
+        locations[index] = sector << 8 | sectors
+        timestamps[index] = timestamp
+        body += struct.pack(">IB", len(data) + 1, compression) + data
+        body += bytes(sectors * SECTOR_SIZE - len(data) - 5)
+        sector += sectors
+
+    directory = os.path.dirname(os.path.abspath(path))
+    file_descriptor, temp_path = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(file_descriptor, "wb") as region_file:
+            region_file.write(struct.pack(">1024I", *locations))
+            region_file.write(struct.pack(">1024I", *timestamps))
+            region_file.write(body)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return HEADER_SIZE + len(body)
+
+def decompress(data: bytes, compression: int) -> bytes:
+    """Decompress chunk data with the given compression type"""
+
+    if compression == COMPRESSION_ZLIB:
+        return zlib.decompress(data)
+    if compression == COMPRESSION_GZIP:
+        return gzip.decompress(data)
+    if compression == COMPRESSION_NONE:
+        return bytes(data)
+    if compression == COMPRESSION_LZ4:
+        raise RegionError("LZ4 compressed chunks are not supported")
+    raise RegionError(f"Unknown compression type {compression}")
+
+def parse_region_name(name: str) -> tuple[int, int]:
+    """Return the region coordinates of a region file name like r.-1.2.mca"""
+
+    match = _REGION_NAME_PATTERN.match(name)
+    if match is None:
+        raise RegionError(f"{name} is not a region file name")
+    return int(match.group(1)), int(match.group(2))
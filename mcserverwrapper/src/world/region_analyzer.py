@@ -0,0 +1,257 @@
+"""
+Module containing the RegionAnalyzer class, which reports the disk usage of the regions of a world
+
+The region/, entities/ and poi/ folders of every dimension are scanned in a process pool,
+only the headers of the region files are read. The results are cached by modification time and size,
+so a repeated scan only reads the region files which changed since.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+from .region import HEADER_SIZE, SECTOR_SIZE, RegionError, RegionFile
+
+# the folders of a dimension which contain region files
+REGION_KINDS = ("region", "entities", "poi")
+# below this amount of changed files, starting the process pool takes longer than reading the headers
+_MIN_FILES_FOR_POOL = 64
+_CACHE_VERSION = 1
+
+# pylint: disable-next=too-many-instance-attributes
+class RegionStats:
+    """The disk usage of a single region file"""
+
+    # pylint: disable-next=too-many-arguments,too-many-positional-arguments
+    def __init__(self, path: str, dimension: str, kind: str, file_size: int, chunk_count: int,
+                 compressed_bytes: int, used_sectors: int, external_chunks: int, error: str | None = None) -> None:
+        self.path = path
+        self.dimension = dimension
+        self.kind = kind
+        self.file_size = file_size
+        self.chunk_count = chunk_count
+        self.compressed_bytes = compressed_bytes
+        self.used_sectors = used_sectors
+        self.external_chunks = external_chunks
+        self.error = error
+
+    # the path relative to the world directory
+    path: str
+    # the dimension name, e.g. minecraft:overworld
+    dimension: str
+    # one of REGION_KINDS
+    kind: str
+    file_size: int
+    chunk_count: int
+    # the summed length of all chunks, without their padding to whole sectors
+    compressed_bytes: int
+    # the sectors allocated to chunks
+    used_sectors: int
+    external_chunks: int
+    # the reason the file couldn't be read, if it is malformed
+    error: str | None
+
+    @property
+    def free_sectors(self) -> int:
+        """The sectors behind the header which aren't used by any chunk"""
+
+        return max(-(-self.file_size // SECTOR_SIZE) - 2 - self.used_sectors, 0)
+
+    @property
+    def fragmentation(self) -> float:
+        """The share of the sectors behind the header which aren't used by any chunk"""
+
+        data_sectors = self.used_sectors + self.free_sectors
+        return self.free_sectors / data_sectors if data_sectors > 0 else 0.0
+
+class DimensionStats:
+    """The summed disk usage of all region files of one kind in one dimension"""
+
+    def __init__(self, dimension: str, kind: str) -> None:
+        self.dimension = dimension
+        self.kind = kind
+        self.file_count = 0
+        self.file_size = 0
+        self.chunk_count = 0
+        self.compressed_bytes = 0
+        self.free_sectors = 0
+
+    dimension: str
+    kind: str
+    file_count: int
+    file_size: int
+    chunk_count: int
+    compressed_bytes: int
+    free_sectors: int
+
+    @property
+    def fragmentation(self) -> float:
+        """The share of the sectors behind the headers which aren't used by any chunk"""
+
+        data_size = self.file_size - self.file_count * HEADER_SIZE
+        return self.free_sectors * SECTOR_SIZE / data_size if data_size > 0 else 0.0
+
+class WorldReport:
+    """The results of a scan"""
+
+    def __init__(self, regions: list[RegionStats], scanned: int) -> None:
+        self.regions = regions
+        self.scanned = scanned
+
+    regions: list[RegionStats]
+    # the amount of region files which were read, all others came from the cache
+    scanned: int
+
+    @property
+    def total_size(self) -> int:
+        """The summed size of all region files"""
+
+        return sum(region.file_size for region in self.regions)
+
+    def dimensions(self) -> list[DimensionStats]:
+        """Return the usage per dimension and kind, largest first"""
+
+        stats: dict[tuple[str, str], DimensionStats] = {}
+        for region in self.regions:
+            entry = stats.setdefault((region.dimension, region.kind), DimensionStats(region.dimension, region.kind))
+            entry.file_count += 1
+            entry.file_size += region.file_size
+            entry.chunk_count += region.chunk_count
+            entry.compressed_bytes += region.compressed_bytes
+            entry.free_sectors += region.free_sectors
+        return sorted(stats.values(), key=lambda entry: entry.file_size, reverse=True)
+
+    def largest(self, count: int = 10) -> list[RegionStats]:
+        """Return the largest region files"""
+
+        return sorted(self.regions, key=lambda region: region.file_size, reverse=True)[:count]
+
+    def most_fragmented(self, count: int = 10) -> list[RegionStats]:
+        """Return the region files wasting the most space on unused sectors"""
+
+        return sorted(self.regions, key=lambda region: region.free_sectors, reverse=True)[:count]
+
+class RegionAnalyzer:
+    """
+    Scans the region files of all dimensions of a world
+
+    Args:
+        world_dir (str): the world directory, containing level.dat
+        cache_path (str | None): the json file caching the results, None disables the cache
+        workers (int | None): the amount of processes, defaults to the amount of cpus
+    """
+
+    def __init__(self, world_dir: str, cache_path: str | None = None, workers: int | None = None) -> None:
+        if not os.path.isdir(world_dir):
+            raise ValueError(f"World directory {world_dir} not found")
+
+        self.world_dir = world_dir
+        self.cache_path = cache_path
+        self.workers = workers
+
+    def dimensions(self) -> dict[str, str]:
+        """Return the directories of all dimensions by name"""
+
+        dimensions = {"minecraft:overworld": self.world_dir}
+        # up to 1.15 and on older servers, nether and end live in DIM-1 and DIM1
+        for name, folder in (("minecraft:the_nether", "DIM-1"), ("minecraft:the_end", "DIM1")):
+            if os.path.isdir(os.path.join(self.world_dir, folder)):
+                dimensions[name] = os.path.join(self.world_dir, folder)
+        # custom dimensions of datapacks and mods live in dimensions/<namespace>/<name>
+        dimensions_dir = os.path.join(self.world_dir, "dimensions")
+        if os.path.isdir(dimensions_dir):
+            for namespace in sorted(os.listdir(dimensions_dir)):
+                namespace_dir = os.path.join(dimensions_dir, namespace)
+                for root, dirs, _ in os.walk(namespace_dir):
+                    if any(kind in dirs for kind in REGION_KINDS):
+                        name = os.path.relpath(root, namespace_dir).replace(os.sep, "/")
+                        dimensions[f"{namespace}:{name}"] = root
+                    dirs[:] = [folder for folder in dirs if folder not in REGION_KINDS]
+        return dimensions
+
+    def analyze(self) -> WorldReport:
+        """Scan all region files, reading only the files which changed since the cached scan"""
+
+        cache = self._read_cache()
+        results: dict[str, dict[str, Any]] = {}
+        changed = []
+        for path, dimension, kind, mtime, size in self._list_files():
+            cached = cache.get(path)
+            if cached is not None and cached["mtime"] == mtime and cached["file_size"] == size \
+               and cached["dimension"] == dimension:
+                results[path] = cached
+            else:
+                changed.append((self.world_dir, path, dimension, kind, mtime))
+
+        if len(changed) >= _MIN_FILES_FOR_POOL and self.workers != 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                scanned = list(executor.map(_scan_region, changed, chunksize=max(len(changed) // 256, 1)))
+        else:
+            scanned = [_scan_region(args) for args in changed]
+        for result in scanned:
+            results[result["path"]] = result
+
+        self._write_cache(results)
+        regions = [RegionStats(**{key: value for key, value in result.items() if key != "mtime"})
+                   for result in results.values()]
+        return WorldReport(sorted(regions, key=lambda region: region.path), len(changed))
+
+    def _list_files(self) -> list[tuple[str, str, str, int, int]]:
+        """Return the path, dimension, kind, modification time and size of all region files"""
+
+        files = []
+        for dimension, dimension_dir in self.dimensions().items():
+            for kind in REGION_KINDS:
+                kind_dir = os.path.join(dimension_dir, kind)
+                if not os.path.isdir(kind_dir):
+                    continue
+                for entry in os.scandir(kind_dir):
+                    if entry.name.endswith(".mca") and entry.is_file():
+                        stat = entry.stat()
+                        files.append((os.path.relpath(entry.path, self.world_dir), dimension, kind,
+                                      stat.st_mtime_ns, stat.st_size))
+        return files
+
+    def _read_cache(self) -> dict[str, dict[str, Any]]:
+        if self.cache_path is None or not os.path.isfile(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, "r", encoding="utf8") as cache_file:
+                cache = json.load(cache_file)
+        except ValueError:
+            # a broken cache only costs a full scan
+            return {}
+        if cache.get("version") != _CACHE_VERSION:
+            return {}
+        return cache["regions"]
+
+    def _write_cache(self, results: dict[str, dict[str, Any]]) -> None:
+        if self.cache_path is None:
+            return
+        temp_path = self.cache_path + ".tmp"
+        with open(temp_path, "w", encoding="utf8") as cache_file:
+            json.dump({"version": _CACHE_VERSION, "regions": results}, cache_file)
+        os.replace(temp_path, self.cache_path)
+
+def _scan_region(args: tuple[str, str, str, str, int]) -> dict[str, Any]:
+    """Read the header of a region file, this runs in a worker process"""
+
+    world_dir, path, dimension, kind, mtime = args
+    result = {"path": path, "dimension": dimension, "kind": kind, "mtime": mtime, "file_size": 0, "chunk_count": 0,
+              "compressed_bytes": 0, "used_sectors": 0, "external_chunks": 0, "error": None}
+    try:
+        with RegionFile(os.path.join(world_dir, path)) as region:
+            result["file_size"] = region.size
+            for chunk in region.chunks():
+                result["chunk_count"] += 1
+                result["used_sectors"] += chunk.sector_count
+                if chunk.external:
+                    result["external_chunks"] += 1
+                else:
+                    result["compressed_bytes"] += chunk.length + 4
+    except (OSError, RegionError) as e:
+        result["error"] = str(e)
+    return result
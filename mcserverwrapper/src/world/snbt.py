@@ -0,0 +1,290 @@
+"""
+Module containing a parser for SNBT, the text format of NBT the server prints in replies to /data get
+
+    Steve has the following entity data: {Health: 20.0f, Pos: [0.5d, 64.0d, -2.5d], Tags: ["afk"]}
+
+The parser scans the text character by character without regular expressions.
+Compounds become dicts, lists and arrays become lists, numbers become ints or floats by their suffix.
+"""
+
+from __future__ import annotations
+
+import time
+from queue import Empty
+from typing import Any
+
+from ..error import CommandError
+from ..util import console_parser
+from ..util.output_hub import Subscription
+
+# the characters of unquoted strings and numbers
+_UNQUOTED = frozenset("0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz_-.+")
+_WHITESPACE = frozenset(" \t\r\n")
+_INTEGER_SUFFIXES = frozenset("bBsSlL")
+_FLOAT_SUFFIXES = frozenset("fFdD")
+_NUMBER_START = frozenset("0123456789+-.")
+_ESCAPES = {"\\": "\\", "'": "'", "\"": "\"", "n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f"}
+
+# the markers between the target and the data in replies to /data get
+_REPLY_MARKERS = (" has the following entity data: ", " has the following block data: ",
+                  " has the following contents: ")
+# replies to /data get which failed, these are the whole message
+_ERROR_REPLIES = frozenset(("No entity was found", "No player was found", "The target block is not a block entity",
+                            "Only one entity is allowed, but the provided selector allows more than one"))
+_ERROR_REPLY_PREFIXES = ("Found no elements matching ",)
+# syntax errors are followed by a line with the command up to the position of the error
+_SYNTAX_ERROR_MARKER = "<--[HERE]"
+# chat, /say and /me messages, which players can fill with text looking like a reply
+_CHAT_PREFIXES = ("<", "[", "* ")
+
+class SnbtError(ValueError):
+    """An error occuring if SNBT text is malformed"""
+
+def parse(text: str) -> Any:
+    """
+    Parse SNBT text into python values
+
+    Args:
+        text (str): the SNBT text, e.g. {Health: 20.0f}
+
+    Returns:
+        Any: the parsed value, compounds are dicts and lists and arrays are lists
+    """
+
+    parser = _Parser(text)
+    value = parser.value()
+    parser.skip_whitespace()
+    if parser.pos != len(text):
+        raise SnbtError(f"Unexpected {text[parser.pos]!r} at position {parser.pos}")
+    return value
+
+def data_target(command: str) -> str | None:
+    """
+    Find the target a reply to a /data get command names before its data
+
+    Args:
+        command (str): the command, e.g. /data get entity Steve Pos
+
+    Returns:
+        str | None: the target, e.g. Steve or 1, 64, 2,
+                    or None if it can't be known in advance, e.g. for selectors or relative positions
+    """
+
+    args = command.lstrip("/").split()
+    if len(args) < 4 or args[:2] != ["data", "get"]:
+        return None
+
+    target = None
+    # selectors and uuids are replaced by the display name of the entity
+    if args[2] == "entity" and not args[3].startswith("@") and args[3].count("-") != 4:
+        target = args[3]
+    elif args[2] == "block" and len(args) >= 6 and not any(coordinate.startswith(("~", "^")) for coordinate in args[3:6]):
+        target = ", ".join(args[3:6])
+    elif args[2] == "storage":
+        target = f"Storage {args[3] if ':' in args[3] else 'minecraft:' + args[3]}"
+    return target
+
+def parse_data_reply(message: str, target: str | None = None) -> tuple[str, Any] | None:
+    """
+    Split a reply to /data get into its target and the parsed data
+
+    Args:
+        message (str): the message of the console line, without the log prefix
+        target (str | None): if set, only replies naming this target are accepted, see data_target()
+
+    Returns:
+        tuple[str, Any] | None: the target, e.g. the player name or block position, and the data,
+                                or None if the message isn't a reply to /data get
+    """
+
+    if message.startswith(_CHAT_PREFIXES):
+        return None
+    for marker in _REPLY_MARKERS:
+        index = message.find(marker)
+        if index != -1:
+            if target is not None and message[:index] != target:
+                return None
+            return message[:index], parse(message[index + len(marker):])
+    return None
+
+def await_data_reply(subscription: Subscription, timeout: float = 5, target: str | None = None) -> tuple[str, Any]:
+    """
+    Read the output until the reply to a /data get command which was sent after the subscription was created
+
+    Args:
+        subscription (Subscription): a subscription to the server output
+        timeout (float): the maximum seconds to wait for the reply
+        target (str | None): if set, only replies naming this target are accepted, see data_target()
+
+    Returns:
+        tuple[str, Any]: the target and the parsed data
+
+    Raises:
+        CommandError: if the command failed or no reply arrived within the timeout
+    """
+
+    deadline = time.monotonic() + timeout
+    previous = None
+    while True:
+        remaining = deadline - time.monotonic()
+        try:
+            line = subscription.get(timeout=max(remaining, 0))
+        except Empty as e:
+            if subscription.hub.closed:
+                raise CommandError("The server stopped before replying") from e
+            raise CommandError(f"No reply within {timeout} seconds") from e
+
+        parsed = console_parser.parse_line(line)
+        message = parsed.message if parsed is not None else line
+        reply = parse_data_reply(message, target)
+        if reply is not None:
+            return reply
+        if message in _ERROR_REPLIES or message.startswith(_ERROR_REPLY_PREFIXES):
+            raise CommandError(message)
+        if message.endswith(_SYNTAX_ERROR_MARKER):
+            # the line before is the error, e.g. Unknown or incomplete command, see below for error
+            raise CommandError(f"{previous}: {message}")
+        previous = message
+
+class _Parser:
+    """The state of parsing a single SNBT text"""
+
+    __slots__ = ("text", "pos")
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.pos = 0
+
+    def skip_whitespace(self) -> None:
+        """Move the position to the next character which isn't whitespace"""
+
+        text = self.text
+        pos = self.pos
+        while pos < len(text) and text[pos] in _WHITESPACE:
+            pos += 1
+        self.pos = pos
+
+    def value(self) -> Any:
+        """Parse the value at the current position"""
+
+        self.skip_whitespace()
+        if self.pos >= len(self.text):
+            raise SnbtError("Unexpected end of the SNBT text")
+        char = self.text[self.pos]
+        if char == "{":
+            return self._compound()
+        if char == "[":
+            return self._list()
+        if char in "\"'":
+            return self._quoted()
+        return _convert(self._unquoted())
+
+    def _compound(self) -> dict[str, Any]:
+        self.pos += 1
+        values = {}
+        self.skip_whitespace()
+        if self._take("}"):
+            return values
+        while True:
+            self.skip_whitespace()
+            key = self._quoted() if self.text[self.pos:self.pos + 1] in ("\"", "'") else self._unquoted()
+            self.skip_whitespace()
+            self._expect(":")
+            values[key] = self.value()
+            self.skip_whitespace()
+            if self._take("}"):
+                return values
+            self._expect(",")
+
+    def _list(self) -> list[Any]:
+        text = self.text
+        self.pos += 1
+        # typed arrays like [I; 1, 2] contain numbers only
+        if text[self.pos:self.pos + 1] in ("B", "I", "L") and text[self.pos + 1:self.pos + 2] == ";":
+            self.pos += 2
+        values = []
+        self.skip_whitespace()
+        if self._take("]"):
+            return values
+        while True:
+            values.append(self.value())
+            self.skip_whitespace()
+            if self._take("]"):
+                return values
+            self._expect(",")
+
+    def _quoted(self) -> str:
+        text = self.text
+        quote = text[self.pos]
+        start = self.pos + 1
+        end = text.find(quote, start)
+        if end == -1:
+            raise SnbtError(f"Unterminated string at position {self.pos}")
+        # most strings don't contain escapes, so they are sliced directly
+        if text.find("\\", start, end) == -1:
+            self.pos = end + 1
+            return text[start:end]
+
+        chars = []
+        pos = start
+        while pos < len(text):
+            char = text[pos]
+            if char == quote:
+                self.pos = pos + 1
+                return "".join(chars)
+            if char == "\\":
+                pos += 1
+                if pos >= len(text):
+                    break
+                escaped = text[pos]
+                chars.append(_ESCAPES.get(escaped, escaped))
+            else:
+                chars.append(char)
+            pos += 1
+        raise SnbtError(f"Unterminated string at position {start - 1}")
+
+    def _unquoted(self) -> str:
+        text = self.text
+        start = pos = self.pos
+        while pos < len(text) and text[pos] in _UNQUOTED:
+            pos += 1
+        if pos == start:
+            if pos >= len(text):
+                raise SnbtError("Unexpected end of the SNBT text")
+            raise SnbtError(f"Unexpected {text[pos]!r} at position {pos}")
+        self.pos = pos
+        return text[start:pos]
+
+    def _take(self, char: str) -> bool:
+        if self.text.startswith(char, self.pos):
+            self.pos += 1
+            return True
+        return False
+
+    def _expect(self, char: str) -> None:
+        if not self._take(char):
+            found = repr(self.text[self.pos]) if self.pos < len(self.text) else "the end"
+            raise SnbtError(f"Expected {char!r} at position {self.pos}, found {found}")
+
+# pylint: disable-next=too-many-return-statements
+def _convert(token: str) -> Any:
+    """Convert an unquoted token into a number or boolean, all other tokens are strings"""
+
+    if token == "true":
+        return True
+    if token == "false":
+        return False
+    # python's int() and float() also accept underscores, inf and nan
+    if token[0] not in _NUMBER_START or "_" in token:
+        return token
+    suffix = token[-1]
+    try:
+        if suffix in _INTEGER_SUFFIXES:
+            return int(token[:-1])
+        if suffix in _FLOAT_SUFFIXES:
+            return float(token[:-1])
+        if "." in token or "e" in token or "E" in token:
+            return float(token)
+        return int(token)
+    except ValueError:
+        return token
@@ -0,0 +1,229 @@
+"""
+Module containing the StatsTable class, which aggregates the statistics and advancements of all players of a world
+
+The values are stored column by column, one array of 64 bit ints per statistic with one row per player,
+so a leaderboard only reads a single array. The sorted order of a column is cached until its values change.
+On refresh, only the stats/*.json and advancements/*.json files which changed since are read, in a thread pool:
+
+    table = wrapper.stats
+    table.refresh()
+    for uuid, ticks in table.top("minecraft:custom/minecraft:play_time", 10):
+        print(table.name_of(uuid), ticks / 20 / 3600)
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Any
+
+# the column with the amount of completed advancements, recipes are not counted
+ADVANCEMENTS_DONE = "advancements"
+_STATS_DIR = "stats"
+_ADVANCEMENTS_DIR = "advancements"
+
+# pylint: disable-next=too-many-instance-attributes
+class StatsTable:
+    """
+    The statistics of all players of a world, as columns of ints
+
+    Statistics are named category/stat, e.g. minecraft:mined/minecraft:stone.
+    Before 1.13, the server stored them flat, so their names are kept as they are, e.g. stat.playOneMinute.
+
+    Args:
+        world_dir (str): the world directory, containing the stats and advancements folders
+        usercache_path (str | None): the usercache.json of the server, used to look up player names
+        max_workers (int): the amount of threads reading changed files
+    """
+
+    def __init__(self, world_dir: str, usercache_path: str | None = None, max_workers: int = 8) -> None:
+        if not isinstance(max_workers, int):
+            raise TypeError(f"Expected int, got {type(max_workers)}")
+
+        self.world_dir = world_dir
+        self.usercache_path = usercache_path
+        self.max_workers = max_workers
+        # the uuid of every row, and the row of every uuid
+        self._uuids: list[str] = []
+        self._rows: dict[str, int] = {}
+        self._columns: dict[str, array] = {}
+        # the columns every file set in a row, which are reset when the file changes
+        self._file_columns: dict[str, set[str]] = {}
+        # the modification time and size of every read file
+        self._versions: dict[str, tuple[int, int]] = {}
+        # the rows of a column sorted by value, largest first
+        self._sorted: dict[str, list[int]] = {}
+        self._names: dict[str, str] = {}
+        self._names_version = None
+        self._lock = Lock()
+
+    def refresh(self) -> int:
+        """
+        Read the files which changed since the last refresh, and forget the values of deleted files
+
+        Returns:
+            int: the amount of files which were read
+        """
+
+        files = self._list_files()
+        with self._lock:
+            changed = [path for path, version in files.items() if self._versions.get(path) != version]
+            deleted = [path for path in self._versions if path not in files]
+
+        if len(changed) > 1 and self.max_workers > 1:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stats") as executor:
+                loaded = list(executor.map(_load_file, changed))
+        else:
+            loaded = [_load_file(path) for path in changed]
+
+        with self._lock:
+            for path in deleted:
+                self._set_values(path, {})
+                del self._versions[path]
+            for path, values in zip(changed, loaded):
+                # a file which is being written is read again on the next refresh
+                if values is not None:
+                    self._set_values(path, values)
+                    self._versions[path] = files[path]
+        return len(changed)
+
+    def players(self) -> list[str]:
+        """Return the uuids of all players with statistics or advancements"""
+
+        with self._lock:
+            return sorted({_file_uuid(path) for path in self._file_columns})
+
+    def stat_names(self) -> list[str]:
+        """Return the names of all statistics any player has"""
+
+        with self._lock:
+            return sorted(self._columns)
+
+    def get(self, uuid: str, stat: str) -> int:
+        """Return the value of a statistic of a player, 0 if the player or statistic is unknown"""
+
+        with self._lock:
+            row = self._rows.get(uuid)
+            column = self._columns.get(stat)
+            if row is None or column is None:
+                return 0
+            return column[row]
+
+    def player_stats(self, uuid: str) -> dict[str, int]:
+        """Return all non-zero statistics of a player"""
+
+        with self._lock:
+            row = self._rows.get(uuid)
+            if row is None:
+                return {}
+            return {stat: column[row] for stat, column in self._columns.items() if column[row] != 0}
+
+    def total(self, stat: str) -> int:
+        """Return the sum of a statistic over all players"""
+
+        with self._lock:
+            return sum(self._columns.get(stat, ()))
+
+    def top(self, stat: str, count: int = 10) -> list[tuple[str, int]]:
+        """
+        Return the players with the highest values of a statistic, players with 0 are left out
+
+        Args:
+            stat (str): the name of the statistic
+            count (int): the maximum amount of players
+
+        Returns:
+            list[tuple[str, int]]: the uuid and value of every player, highest first
+        """
+
+        with self._lock:
+            column = self._columns.get(stat)
+            if column is None:
+                return []
+            rows = self._sorted.get(stat)
+            if rows is None:
+                rows = sorted(range(len(column)), key=column.__getitem__, reverse=True)
+                self._sorted[stat] = rows
+            return [(self._uuids[row], column[row]) for row in rows[:count] if column[row] != 0]
+
+    def name_of(self, uuid: str) -> str | None:
+        """Return the name of a player from the usercache of the server, or None if it is unknown"""
+
+        if self.usercache_path is None or not os.path.isfile(self.usercache_path):
+            return None
+        stat = os.stat(self.usercache_path)
+        if (stat.st_mtime_ns, stat.st_size) != self._names_version:
+            with open(self.usercache_path, "r", encoding="utf8") as cache_file:
+                entries = json.load(cache_file)
+            self._names = {entry["uuid"]: entry["name"] for entry in entries}
+            self._names_version = (stat.st_mtime_ns, stat.st_size)
+        return self._names.get(uuid)
+
+    def _list_files(self) -> dict[str, tuple[int, int]]:
+        files = {}
+        for folder in (_STATS_DIR, _ADVANCEMENTS_DIR):
+            folder_path = os.path.join(self.world_dir, folder)
+            if not os.path.isdir(folder_path):
+                continue
+            for entry in os.scandir(folder_path):
+                if entry.name.endswith(".json") and entry.is_file():
+                    stat = entry.stat()
+                    files[entry.path] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    def _set_values(self, path: str, values: dict[str, int]) -> None:
+        """Replace the values a file set in the row of its player"""
+
+        uuid = _file_uuid(path)
+        row = self._rows.get(uuid)
+        if row is None:
+            if len(values) == 0:
+                return
+            row = len(self._uuids)
+            self._uuids.append(uuid)
+            self._rows[uuid] = row
+            for column in self._columns.values():
+                column.append(0)
+
+        for stat in self._file_columns.pop(path, set()) - values.keys():
+            self._columns[stat][row] = 0
+            self._sorted.pop(stat, None)
+        for stat, value in values.items():
+            column = self._columns.get(stat)
+            if column is None:
+                column = array("q", [0]) * len(self._uuids)
+                self._columns[stat] = column
+            if column[row] != value:
+                column[row] = value
+                self._sorted.pop(stat, None)
+        if len(values) > 0:
+            self._file_columns[path] = set(values)
+
+def _file_uuid(path: str) -> str:
+    return os.path.basename(path)[:-len(".json")]
+
+def _load_file(path: str) -> dict[str, int] | None:
+    """Read a stats or advancements file into its values by column, or None if it can't be read"""
+
+    try:
+        with open(path, "r", encoding="utf8") as json_file:
+            content: dict[str, Any] = json.load(json_file)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(content, dict):
+        return None
+
+    if os.path.basename(os.path.dirname(path)) == _ADVANCEMENTS_DIR:
+        done = sum(1 for name, progress in content.items()
+                   if isinstance(progress, dict) and progress.get("done") and not name.startswith("minecraft:recipes/"))
+        return {ADVANCEMENTS_DONE: done}
+
+    stats = content.get("stats")
+    if isinstance(stats, dict):
+        return {f"{category}/{name}": value for category, values in stats.items() for name, value in values.items()
+                if isinstance(value, int)}
+    # before 1.13, the stats are stored flat, with achievements as objects
+    return {name: value for name, value in content.items() if isinstance(value, int)}
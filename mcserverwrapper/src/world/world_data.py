@@ -0,0 +1,113 @@
+"""
+Module containing the WorldData class, which reads level.dat, playerdata and chunks without a running server
+
+All files are read through the lazy NBT reader, so only the accessed tags are decoded:
+
+    world = WorldData("/srv/lobby/world")
+    print(world.seed(), world.game_rules()["keepInventory"])
+    positions = world.query_players(("Pos",))
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from typing import Any, Iterator, Sequence
+
+from . import nbt
+from .region import RegionFile
+from .region_analyzer import RegionAnalyzer
+
+_PLAYER_FILE_PATTERN = re.compile(r"^([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})\.dat$")
+
+class WorldData:
+    """
+    The data files of a world
+
+    Args:
+        world_dir (str): the world directory, containing level.dat
+    """
+
+    def __init__(self, world_dir: str) -> None:
+        if not os.path.isdir(world_dir):
+            raise ValueError(f"World directory {world_dir} not found")
+
+        self.world_dir = world_dir
+
+    def level(self) -> nbt.Compound:
+        """Return the Data compound of level.dat"""
+
+        return nbt.read_file(os.path.join(self.world_dir, "level.dat"))["Data"]
+
+    def seed(self) -> int | None:
+        """Return the world seed, which moved to WorldGenSettings in 1.16"""
+
+        level = self.level()
+        settings = level.get("WorldGenSettings")
+        if settings is not None:
+            return settings.get("seed")
+        return level.get("RandomSeed")
+
+    def game_rules(self) -> dict[str, str]:
+        """Return the game rules, the server stores all values as strings"""
+
+        rules = self.level().get("GameRules")
+        return rules.to_python() if rules is not None else {}
+
+    def player_uuids(self) -> list[str]:
+        """Return the uuids of all players with a playerdata file"""
+
+        player_dir = os.path.join(self.world_dir, "playerdata")
+        if not os.path.isdir(player_dir):
+            return []
+        return sorted(match.group(1) for match in map(_PLAYER_FILE_PATTERN.match, os.listdir(player_dir))
+                      if match is not None)
+
+    def player(self, uuid: str) -> nbt.Compound | None:
+        """Return the playerdata of a player, or None if the player never joined"""
+
+        path = os.path.join(self.world_dir, "playerdata", f"{uuid}.dat")
+        if not os.path.isfile(path):
+            return None
+        return nbt.read_file(path)
+
+    def players(self) -> Iterator[tuple[str, nbt.Compound]]:
+        """Iterate over the uuids and playerdata of all players, reading one file at a time"""
+
+        for uuid in self.player_uuids():
+            data = self.player(uuid)
+            if data is not None:
+                yield uuid, data
+
+    def query_players(self, path: Sequence[str]) -> dict[str, Any]:
+        """
+        Return a value of the playerdata of all players, e.g. ("Pos",) or ("abilities", "flying")
+
+        Args:
+            path (Sequence[str]): the names of the nested tags
+
+        Returns:
+            dict[str, Any]: the decoded value by uuid, None for players without the value
+        """
+
+        values = {}
+        for uuid in self.player_uuids():
+            with open(os.path.join(self.world_dir, "playerdata", f"{uuid}.dat"), "rb") as player_file:
+                values[uuid] = nbt.find(nbt.decompress(player_file.read()), path)
+        return values
+
+    def chunk(self, chunk_x: int, chunk_z: int, dimension: str = "minecraft:overworld") -> nbt.Compound | None:
+        """Return the NBT data of a chunk, or None if it wasn't generated yet"""
+
+        dimension_dir = RegionAnalyzer(self.world_dir).dimensions().get(dimension)
+        if dimension_dir is None:
+            raise ValueError(f"Dimension {dimension} not found")
+        path = os.path.join(dimension_dir, "region", f"r.{chunk_x >> 5}.{chunk_z >> 5}.mca")
+        if not os.path.isfile(path):
+            return None
+        index = (chunk_x & 31) + (chunk_z & 31) * 32
+        with RegionFile(path) as region:
+            for chunk in region.chunks():
+                if chunk.index == index:
+                    return nbt.load(region.read_chunk(chunk))
+        return None
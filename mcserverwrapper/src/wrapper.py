@@ -1,50 +1,135 @@
 """A module containing the wrapper class"""
 
+from __future__ import annotations
+
 import atexit
 import os
 import os.path
 import pathlib
-from queue import Queue
-from threading import Thread
+from threading import Lock, Thread
 from time import sleep
+from typing import TYPE_CHECKING, Any
 
 from .util import logger
-from .server import ServerBuilder
+from .util.output_hub import OutputHub, Subscription
+from .util.port_allocator import PortAllocator
+from .server import BaseServer, ServerBuilder
+from .server.server_builder import SESSION_DIR_NAME
+from .server.log_tail import server_dir_in_use
+from .server.session import session_alive
+from .command_writer import CommandWriter
 from .mcversion import McVersion
+from .player_index import PlayerIndex
+from .player_lists import PlayerLists
+from .error import ServerRunningError
 from ..src import server_properties_helper
 
+# the world modules are imported where they are used, to keep importing the wrapper fast
+if TYPE_CHECKING:
+    from .world.compaction import CompactionReport
+    from .world.pruning import ProtectedArea, PruneReport
+    from .world.stats import StatsTable
+    from .world.world_data import WorldData
+
+# pylint: disable-next=too-many-instance-attributes
 class Wrapper():
     """The outer shell of the wrapper, handling inputs and outputs"""
 
+    # pylint: disable-next=too-many-positional-arguments
     def __init__(self, jarfile_path: str = "server.jar", server_start_command=None, server_property_args=None,
-                 print_output=True) -> None:
+                 print_output=True, port_allocator: PortAllocator | None = None, detached: bool = False,
+                 isolated: bool = False, profile_mod_loading: bool = False) -> None:
         self.server_jar = jarfile_path
         self.server_path = pathlib.Path(jarfile_path).parent.resolve()
+        # every wrapper writes its own log, so servers running in one process don't mix their logs
+        self.logger = logger.Logger(str(self.server_path))
+        # if set, the server port is leased from the allocator instead of taken from the properties
+        self.port_allocator = port_allocator
+        # if set, the server keeps running when the wrapper exits, and the next wrapper attaches to it
+        self.detached = detached
+        # if set, the server output is read and formatted in a worker process instead of this process
+        self.isolated = isolated
+        # if set, the mod loading of every boot of a Forge server is timed, see ForgeServer.load_profiler
+        self.profile_mod_loading = profile_mod_loading
+        self._log_attached = False
+
+        # nothing touches the disk until the server is needed, which keeps short-lived wrappers cheap
+        self._server_start_command = server_start_command
+        self._server_property_args = server_property_args
+        self._server_builder = None
+        self._server = None
+        self._command_writer = None
+        self._properties = None
+
+        # every output line is stored once in the hub, each consumer reads it through its own subscription
+        self.output_hub = OutputHub()
+        self.output_queue = self.output_hub.subscribe()
+        self.players = PlayerIndex(log=self.logger)
+        self._player_lists = None
+        self._stats = None
+        # replies can't be told apart by the command they belong to, so queries are sent one at a time
+        self._query_lock = Lock()
+        self._output_thread = Thread(target=self._t_output_handler, args=[print_output,])
 
-        logger.setup(self.server_path)
-        # delete old logfile
-        logger.delete_logs()
+    @property
+    def server(self) -> BaseServer:
+        """The server instance, the jar file is only checked the first time this is accessed"""
 
-        self._server_builder = ServerBuilder.from_jar(jarfile_path)
+        self._prepare()
+        return self._server
 
-        prop_args_clean = server_properties_helper.parse_properties_args(self.server_path,
-                                                                         server_property_args,
-                                                                         self._server_builder._mcv)
-        server_properties_helper.save_properties(self.server_path, prop_args_clean)
-        self._server_builder.port(prop_args_clean["port"])
+    @property
+    def player_lists(self) -> PlayerLists:
+        """The whitelist, ops and bans of the server, which can be edited in batches"""
 
-        if server_start_command is not None:
-            self._server_builder.start_command(server_start_command)
+        if self._player_lists is None:
+            self._player_lists = PlayerLists(str(self.server_path), self)
+        return self._player_lists
 
-        self.server = self._server_builder.build()
-        atexit.register(self.stop)
+    @property
+    def world_data(self) -> WorldData:
+        """The level.dat, playerdata and chunks of the world, which can be read without a running server"""
 
-        self.output_queue = Queue()
-        self._output_thread = Thread(target=self._t_output_handler, args=[print_output,])
+        # pylint: disable-next=import-outside-toplevel
+        from .world.world_data import WorldData
+        return WorldData(self._world_dir())
+
+    @property
+    def stats(self) -> StatsTable:
+        """The statistics and advancements of all players, call refresh() on it to read the changed files"""
+
+        if self._stats is None:
+            # pylint: disable-next=import-outside-toplevel
+            from .world.stats import StatsTable
+            self._stats = StatsTable(self._world_dir(), os.path.join(self.server_path, "usercache.json"))
+        return self._stats
+
+    @property
+    def command_writer(self) -> CommandWriter:
+        """The CommandWriter used by send_commands"""
+
+        self._prepare()
+        return self._command_writer
 
     def startup(self, blocking=True) -> None:
         """Starts the minecraft server"""
 
+        self.logger.setup()
+        # delete old logfile
+        self.logger.delete_logs()
+
+        self._prepare()
+        atexit.register(self._at_exit)
+
+        # a previous wrapper left the server running, so only its output and commands have to be taken over
+        if self.detached and self.server.attach():
+            self._output_thread.start()
+            # the player index is fed by the output, so a single /list is enough to catch up with the running server
+            self.server.execute_command("/list")
+            return
+
+        server_properties_helper.save_properties(self.server_path, self._properties)
+
         # if the Server is started for the first time,
         # create a temp server to create the eula and server.properties
         if not os.path.isfile(os.path.join(self.server_path, "./server.properties")) \
@@ -58,6 +143,39 @@ class Wrapper():
         self._output_thread.start()
         self.server.start(blocking=blocking)
 
+    def attach_log(self, pid: int | None = None) -> None:
+        """
+        Monitor a server which was started by other tooling, by following its logs/latest.log
+
+        The output is read through output_queue and subscribe() like the output of a started server,
+        continuing after the last line read by a previous attach. Commands can't be sent to such a server.
+
+        Args:
+            pid (int | None): the pid of the server, searched in the running java processes if not given
+        """
+
+        self.logger.setup()
+        # only the properties are needed, the running server already has its port
+        self._server_property_args = None
+        self._prepare()
+        self.server.attach_log(pid)
+        self._log_attached = True
+        atexit.register(self._at_exit)
+        self._output_thread.start()
+
+    def subscribe(self, replay: int = 0) -> Subscription:
+        """
+        Create a new reader of the server output, independent of output_queue and all other subscribers
+
+        Args:
+            replay (int): the amount of already received lines the subscriber should read first
+
+        Returns:
+            Subscription: the new subscriber, its get() behaves like the one of output_queue
+        """
+
+        return self.output_hub.subscribe(replay)
+
     def send_command(self, command, wait_time=0) -> None:
         """Sends and executes a command on the server, then waits for the given wait_time"""
 
@@ -72,16 +190,113 @@ class Wrapper():
         if wait_time > 0:
             sleep(wait_time)
 
+    def query_data(self, command: str, timeout: float = 5) -> Any:
+        """
+        Send a /data get command and return the data of the reply, parsed into python values
+
+        Args:
+            command (str): the command, e.g. /data get entity Steve Pos
+            timeout (float): the maximum seconds to wait for the reply
+
+        Returns:
+            Any: the parsed data, compounds are dicts and lists and arrays are lists
+
+        Raises:
+            CommandError: if the server replied with an error or didn't reply within the timeout
+        """
+
+        # pylint: disable-next=import-outside-toplevel
+        from .world import snbt
+
+        with self._query_lock:
+            # subscribing before sending makes sure the reply isn't missed
+            subscription = self.subscribe()
+            self.server.execute_command(command)
+            return snbt.await_data_reply(subscription, timeout, snbt.data_target(command))[1]
+
+    def send_commands(self, commands: list[str], wait: bool = True) -> None:
+        """
+        Queue many commands at once, which are sent in rate-limited batches instead of one by one
+
+        Args:
+            commands (list[str]): the commands to execute
+            wait (bool): if True, block until all commands were sent
+        """
+
+        self.command_writer.submit_all(commands)
+        if wait:
+            self.command_writer.flush()
+
     def stop(self) -> None:
         """Stops the server"""
 
+        # the server was never created, so it can't be running
+        if self._server is None:
+            return
+
+        self.command_writer.close(timeout=10)
         self.server.stop()
+        atexit.unregister(self._at_exit)
+        if self.port_allocator is not None:
+            self.port_allocator.release(str(self.server_path))
+
+    def detach(self) -> None:
+        """Stop controlling the detached server without stopping it, a new Wrapper can attach to it"""
+
+        if self._server is None:
+            return
+
+        self.command_writer.close(timeout=10)
+        self.server.detach()
+        atexit.unregister(self._at_exit)
 
     def server_running(self) -> bool:
         """Return True if the server is pingeable"""
 
         return self.server.is_running()
 
+    def prune_world(self, min_inhabited_ticks: int, protected_areas: list[ProtectedArea] | None = None,
+                    dry_run: bool = True, workers: int | None = None) -> PruneReport:
+        """
+        Drop the chunks of the world which players spent less than the given time in
+
+        Args:
+            min_inhabited_ticks (int): chunks with a lower InhabitedTime are dropped, 20 ticks are one second
+            protected_areas (list[ProtectedArea] | None): areas which are kept regardless of their InhabitedTime
+            dry_run (bool): if True, only report which chunks would be dropped, this also works while the server runs
+            workers (int | None): the amount of processes, defaults to the amount of cpus
+
+        Returns:
+            PruneReport: the results per region
+        """
+
+        if not dry_run and self._server_active():
+            raise ServerRunningError("The world can only be pruned while the server is stopped")
+
+        # pylint: disable-next=import-outside-toplevel
+        from .world.pruning import WorldPruner
+        pruner = WorldPruner(self._world_dir(), min_inhabited_ticks, protected_areas or [], workers)
+        return pruner.prune(dry_run)
+
+    def compact_world(self, compression_level: int | None = None, workers: int | None = None) -> CompactionReport:
+        """
+        Rewrite the region files of the world without unused sectors, the server has to be stopped
+
+        Args:
+            compression_level (int | None): the zlib level to recompress chunks with, None keeps the compressed data
+            workers (int | None): the amount of processes, defaults to the amount of cpus
+
+        Returns:
+            CompactionReport: the results per region file
+        """
+
+        if self._server_active():
+            raise ServerRunningError("The world can only be compacted while the server is stopped")
+
+        # pylint: disable-next=import-outside-toplevel
+        from .world.compaction import RegionCompactor
+        return RegionCompactor(self._world_dir(), compression_level, workers).compact()
+
     def get_version(self) -> McVersion:
         """
         Return the servers' version
@@ -92,10 +307,66 @@ class Wrapper():
 
         return self.server.version
 
+    def _prepare(self) -> None:
+        """Detect the server version and build the server, if this didn't happen yet"""
+
+        if self._server is not None:
+            return
+
+        self.logger.setup()
+
+        self._server_builder = ServerBuilder.from_jar(self.server_jar)
+
+        # an attached server keeps the properties it was started with, which are stored in server.properties
+        attaching = self.detached and session_alive(os.path.join(self.server_path, SESSION_DIR_NAME))
+        self._properties = server_properties_helper.parse_properties_args(self.server_path,
+                                                                          None if attaching
+                                                                          else self._server_property_args,
+                                                                          # pylint: disable-next=protected-access
+                                                                          self._server_builder._mcv)
+        if self.port_allocator is not None and not attaching:
+            self._properties["port"] = self.port_allocator.lease(str(self.server_path))["game"]
+        self._server_builder.port(self._properties["port"])
+
+        if self._server_start_command is not None:
+            self._server_builder.start_command(self._server_start_command)
+        if self.detached:
+            self._server_builder.detached()
+        if self.isolated:
+            self._server_builder.isolated()
+        if self.profile_mod_loading:
+            self._server_builder.profile_mod_loading()
+
+        self._server = self._server_builder.build()
+        self._command_writer = CommandWriter(self._server)
+
+    def _world_dir(self) -> str:
+        return os.path.join(self.server_path, server_properties_helper.get_level_name(str(self.server_path)))
+
+    def _server_active(self) -> bool:
+        """Return True if a server process uses the server directory, even if this wrapper didn't start it"""
+
+        if self._server is not None and self.server_running():
+            return True
+        return server_dir_in_use(str(self.server_path))
+
+    def _at_exit(self) -> None:
+        """Detach from detached servers and followed logs, and stop all others"""
+
+        if self.detached or self._log_attached:
+            self.detach()
+        else:
+            self.stop()
+
     def _run_temp_server(self):
         """Start a temporary server to generate server.properties and eula.txt"""
 
         tempserver = self._server_builder.build()
+        # the temporary server exits on its own and its output isn't read, so it never needs a session holder or worker
+        # pylint: disable=protected-access
+        tempserver._session_dir = None
+        tempserver._ring_size = None
+        # pylint: enable=protected-access
         atexit.register(tempserver.stop)
 
         try:
@@ -123,9 +394,13 @@ class Wrapper():
 
         for line in self.server.read_output():
             if line != "":
-                logger.log(line, print_output)
-                if not print_output:
-                    self.output_queue.put(line)
+                self.players.feed(line)
+                self.command_writer.feed(line)
+                self.logger.log(line, print_output)
+                self.output_hub.publish(line)
+
+        self.players.clear()
+        self.output_hub.close()
 
 # teststartcommand:
 # mcserverwrapper -jar server.jar -java java -ram 8G -port 25566 -maxp 5
@@ -0,0 +1,41 @@
+"""
+Benchmarks measuring the overhead of the wrapper itself, using the fake server instead of real server jars
+Run them with 'python -m pytest -s mcserverwrapper/test/benchmark_tests' to see the results
+"""
+
+import pytest
+
+from ..helpers import benchmark_helper
+
+@pytest.mark.parametrize("flavor", ["vanilla", "forge"])
+def test_read_output_throughput(tmp_path, flavor):
+    """Measures the lines per second read through BaseServer.read_output"""
+
+    lines_per_second = benchmark_helper.bench_read_output(str(tmp_path), line_count=5000, flavor=flavor)
+
+    print(f"\n[benchmark] read_output ({flavor}): {lines_per_second:.0f} lines/s")
+    assert lines_per_second > 0
+
+def test_command_latency(tmp_path):
+    """Measures the time between sending a command and reading its echo from the output_queue"""
+
+    latency = benchmark_helper.bench_command_latency(str(tmp_path))
+
+    print(f"\n[benchmark] command round trip: {latency * 1000:.2f} ms")
+    assert latency < 10
+
+def test_startup_detection(tmp_path):
+    """Measures the time between the server accepting pings and BaseServer.start returning"""
+
+    latency = benchmark_helper.bench_startup_detection(str(tmp_path))
+
+    print(f"\n[benchmark] startup detection: {latency * 1000:.0f} ms")
+    assert latency >= 0
+
+def test_memory_per_instance(tmp_path):
+    """Measures the python memory used by each running Wrapper"""
+
+    memory = benchmark_helper.bench_memory_per_instance(str(tmp_path), count=3)
+
+    print(f"\n[benchmark] memory per instance: {memory / 1024:.1f} KiB")
+    assert memory > 0
@@ -0,0 +1,175 @@
+"""Helpers for benchmarking the wrapper against the fake server"""
+
+from __future__ import annotations
+
+import json
+import os
+import pathlib
+import shlex
+import socket
+import sys
+import time
+import tracemalloc
+from zipfile import ZipFile
+
+from mcserverwrapper import Wrapper
+from mcserverwrapper.src.server import BaseServer, ServerBuilder
+from mcserverwrapper.src.util import logger
+
+FAKE_SERVER_PATH = os.path.join(pathlib.Path(__file__).parent.resolve(), "fake_server.py")
+
+def create_fake_jar(server_dir: str, flavor: str = "vanilla", version: str = "1.20.4") -> str:
+    """
+    Create a jar file which is detected as the given flavor and version
+
+    Returns:
+        str: the path to the created jar file
+    """
+
+    os.makedirs(server_dir, exist_ok=True)
+
+    if flavor == "forge":
+        version_json = {"id": f"{version}-forge-49.0.0", "name": f"{version}-forge"}
+    else:
+        version_json = {"id": version, "name": version}
+
+    jar_path = os.path.join(server_dir, "server.jar")
+    with ZipFile(jar_path, "w") as zf:
+        zf.writestr("version.json", json.dumps(version_json))
+    return jar_path
+
+def fake_start_command(flavor: str = "vanilla", version: str = "1.20.4", startup_lines: int = 200,
+                       startup_delay: float = 0, mod_loading: bool = False) -> str:
+    """Return the start command of the fake server"""
+
+    return shlex.join([sys.executable, FAKE_SERVER_PATH, "--flavor", flavor, "--version", version,
+                       "--startup-lines", str(startup_lines), "--startup-delay", str(startup_delay)]
+                      + (["--mod-loading"] if mod_loading else []))
+
+def get_free_port() -> int:
+    """Let the os choose a currently free port"""
+
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def create_fake_wrapper(server_dir: str, flavor: str = "vanilla", **start_args) -> Wrapper:
+    """Create a Wrapper which runs the fake server in the given directory"""
+
+    jar_path = create_fake_jar(server_dir, flavor)
+    return Wrapper(jar_path, server_start_command=fake_start_command(flavor, **start_args), print_output=False,
+                   server_property_args={"port": get_free_port()})
+
+def create_fake_server(server_dir: str, flavor: str = "vanilla", **start_args) -> BaseServer:
+    """Create and start a server running the fake server, without a Wrapper around it"""
+
+    jar_path = create_fake_jar(server_dir, flavor)
+    logger.setup(server_dir)
+    port = get_free_port()
+    with open(os.path.join(server_dir, "server.properties"), "w", encoding="utf8") as props_file:
+        props_file.write(f"server-port={port}\n")
+    with open(os.path.join(server_dir, "eula.txt"), "w", encoding="utf8") as eula_file:
+        eula_file.write("eula=true\n")
+
+    return ServerBuilder.from_jar(jar_path) \
+                        .start_command(fake_start_command(flavor, **start_args)) \
+                        .port(port) \
+                        .build()
+
+def run_fake_test(jarfile: str, offline_mode: bool = False, port: int | None = None) -> None:
+    """Run the same steps as run_vanilla_test against the fake server, used to test the matrix runner"""
+
+    flavor = "forge" if "forge" in jarfile else "vanilla"
+    server_property_args = {"port": port if port is not None else get_free_port()}
+    if offline_mode:
+        server_property_args["onli"] = "false"
+
+    wrapper = Wrapper(os.path.join(os.getcwd(), "testdir", jarfile), server_start_command=fake_start_command(flavor),
+                      print_output=False, server_property_args=server_property_args)
+    wrapper.startup()
+    assert wrapper.server_running()
+
+    wrapper.send_command("/say Hello World")
+    line = ""
+    while "Hello World" not in line:
+        line = wrapper.output_queue.get(timeout=10)
+
+    wrapper.stop()
+    assert wrapper.server.get_child_status(5) is not None
+
+def read_until(lines, text: str, timeout: float = 30) -> str:
+    """Consume lines from the given generator until a line containing text was read"""
+
+    terminate_time = time.perf_counter() + timeout
+    for line in lines:
+        if text in line:
+            return line
+        if time.perf_counter() > terminate_time:
+            break
+    raise TimeoutError(f"'{text}' was not read within {timeout} seconds")
+
+def bench_read_output(server_dir: str, line_count: int = 20000, flavor: str = "vanilla") -> float:
+    """Return the lines per second read through BaseServer.read_output"""
+
+    server = create_fake_server(server_dir, flavor)
+    server.start()
+    lines = server.read_output()
+    read_until(lines, "Done (")
+
+    start = time.perf_counter()
+    server.execute_command(f"/flood {line_count}")
+    read_until(lines, "Flood finished", timeout=600)
+    duration = time.perf_counter() - start
+
+    server.stop()
+    return line_count / duration
+
+def bench_command_latency(server_dir: str, count: int = 50, flavor: str = "vanilla") -> float:
+    """Return the mean seconds between sending a command and reading its echo through the Wrapper"""
+
+    wrapper = create_fake_wrapper(server_dir, flavor)
+    wrapper.startup()
+
+    total = 0.0
+    for i in range(count):
+        start = time.perf_counter()
+        wrapper.send_command(f"/say latency {i}")
+        line = ""
+        while f"latency {i}" not in line:
+            line = wrapper.output_queue.get(timeout=10)
+        total += time.perf_counter() - start
+
+    wrapper.stop()
+    return total / count
+
+def bench_startup_detection(server_dir: str, flavor: str = "vanilla") -> float:
+    """Return the seconds between the fake server being ready and BaseServer.start returning"""
+
+    server = create_fake_server(server_dir, flavor)
+    server.start(blocking=True)
+    returned_at = time.time()
+
+    ready_line = read_until(server.read_output(), "Fake server ready at")
+    ready_at = float(ready_line.rsplit(" ", maxsplit=1)[1])
+
+    server.stop()
+    return returned_at - ready_at
+
+def bench_memory_per_instance(server_dir: str, count: int = 5, flavor: str = "vanilla") -> float:
+    """Return the python heap bytes used per running Wrapper instance"""
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    wrappers = []
+    for i in range(count):
+        wrapper = create_fake_wrapper(os.path.join(server_dir, f"instance_{i}"), flavor)
+        wrapper.startup()
+        wrappers.append(wrapper)
+
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    for wrapper in wrappers:
+        wrapper.stop()
+    return (after - before) / count
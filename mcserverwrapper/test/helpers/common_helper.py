@@ -17,9 +17,13 @@ from requests.adapters import HTTPAdapter, Retry
 from javascript import require, once
 
 from mcserverwrapper.src.util import logger
+from mcserverwrapper.src.util.port_allocator import PortAllocator
 
 mineflayer = require('mineflayer')
 
+TEST_PORT_RANGE = (25500, 25600)
+_PORT_STATE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "temp", "ports.json")
+
 def setup_workspace():
     """Setup the testing folder"""
 
@@ -66,6 +70,17 @@ def assert_port_is_free(port: int = 25565, strict=True) -> bool:
                 raise e
         return True
 
+def lease_test_port() -> int:
+    """
+    Lease a free port for the server in the current testdir
+
+    The leases are shared by all test processes, so parallel tests never pick the same port
+    """
+
+    os.makedirs(os.path.dirname(_PORT_STATE_PATH), exist_ok=True)
+    allocator = PortAllocator(_PORT_STATE_PATH, TEST_PORT_RANGE, "127.0.0.1")
+    return allocator.lease(os.path.abspath("testdir"))["game"]
+
 def connect_mineflayer(address = "127.0.0.1", port = 25565, offline_mode=False):
     """Connect a fake player to the server"""
 
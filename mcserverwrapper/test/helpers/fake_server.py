@@ -0,0 +1,250 @@
+"""
+A fake minecraft server, which can be started instead of a server jar
+
+It creates eula.txt and server.properties like a real server, prints Vanilla or Forge formatted output,
+answers server list pings and echoes commands back. Only the standard library is used,
+so it can be started by any python interpreter.
+
+Usage: python fake_server.py [--flavor vanilla|forge] [--version 1.20.4] [--startup-lines 200] [--startup-delay 0]
+                              [--mod-loading]
+
+With --mod-loading, a Forge server prints a debug level mod loading sequence with one mod per startup line.
+
+Supported commands:
+    say <msg>: print '[Server] <msg>'
+    list: print an empty player list
+    flood <count>: print <count> filler lines, followed by 'Flood finished'
+    data get entity Steve [Pos]: print the entity data of a fake player
+    stop: stop the server
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import time
+from datetime import datetime
+from threading import Thread
+
+PROTOCOL_VERSION = 765
+
+def _varint(value: int) -> bytes:
+    data = b""
+    value &= 0xFFFFFFFF
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value != 0:
+            data += bytes([byte | 0x80])
+        else:
+            return data + bytes([byte])
+
+def _read_varint(conn: socket.socket) -> int:
+    value = 0
+    for i in range(5):
+        byte = conn.recv(1)
+        if len(byte) == 0:
+            raise ConnectionError("Connection closed")
+        value |= (byte[0] & 0x7F) << (7 * i)
+        if byte[0] & 0x80 == 0:
+            return value
+    raise ValueError("VarInt too big")
+
+def _recv_exact(conn: socket.socket, length: int) -> bytes:
+    data = b""
+    while len(data) < length:
+        chunk = conn.recv(length - len(data))
+        if len(chunk) == 0:
+            raise ConnectionError("Connection closed")
+        data += chunk
+    return data
+
+def _send_packet(conn: socket.socket, packet_id: int, payload: bytes) -> None:
+    packet = _varint(packet_id) + payload
+    conn.sendall(_varint(len(packet)) + packet)
+
+class FakeServer:
+    """The fake minecraft server"""
+
+    def __init__(self, flavor: str, version: str, mod_loading: bool = False) -> None:
+        self.flavor = flavor
+        self.version = version
+        self.mod_loading = mod_loading
+        self.port = 25565
+        self.max_players = 20
+        self._running = True
+
+    def line(self, message: str, thread: str = "Server thread", level: str = "INFO",
+             source: str = "minecraft/DedicatedServer") -> str:
+        """Format a console line like the emulated server would"""
+
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        if self.flavor == "forge":
+            return f"[{timestamp}] [{thread}/{level}] [{source}]: {message}\n"
+        return f"[{timestamp}] [{thread}/{level}]: {message}\n"
+
+    def print(self, message: str) -> None:
+        """Print a single console line"""
+
+        sys.stdout.write(self.line(message))
+        sys.stdout.flush()
+
+    def run(self, startup_lines: int, startup_delay: float) -> int:
+        """Start the fake server and return its exit code"""
+
+        start_time = time.time()
+        if self.mod_loading:
+            self._load_mods(startup_lines)
+        self.print(f"Starting minecraft server version {self.version}")
+
+        if not self._prepare_files():
+            self.print("You need to agree to the EULA in order to run the server. Go to eula.txt for more info.")
+            return 0
+
+        self.print("Loading properties")
+        if self.mod_loading:
+            self.print("Preparing level \"world\"")
+        else:
+            for i in range(startup_lines):
+                if self.flavor == "forge":
+                    sys.stdout.write(self.line(f"Loading mod fakemod{i % 50} phase {i}", "modloading-worker-0"))
+                else:
+                    sys.stdout.write(self.line(f"Preparing spawn area: {min(100, i * 100 // max(startup_lines, 1))}%"))
+        sys.stdout.flush()
+        time.sleep(startup_delay)
+
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind(("127.0.0.1", self.port))
+        listener.listen(16)
+        Thread(target=self._t_accept, args=[listener,], daemon=True).start()
+
+        self.print(f"Starting Minecraft server on *:{self.port}")
+        self.print(f"Fake server ready at {time.time():.6f}")
+        self.print(f"Done ({time.time() - start_time:.3f}s)! For help, type \"help\"")
+
+        for command in sys.stdin:
+            self._execute(command.strip())
+            if not self._running:
+                break
+
+        listener.close()
+        return 0
+
+    def _load_mods(self, mod_count: int) -> None:
+        """Print the mod loading of a Forge server with the console level set to debug"""
+
+        sys.stdout.write(self.line("ModLauncher running: args [--launchTarget, forgeserver]", "main",
+                                   source="cpw.mods.modlauncher.Launcher/MODLAUNCHER"))
+        sys.stdout.write(self.line(f"Loading {mod_count} mods:", "main", source="ne.mi.fm.lo.LoadingModList/"))
+        sys.stdout.write(self.line("Forge mod loading, version 49.0.0, for MC 1.20.4", "modloading-worker-0",
+                                   source="ne.mi.co.ForgeMod/FORGEMOD"))
+        for i in range(mod_count):
+            sys.stdout.write(self.line(f"Creating FMLModContainer instance for com.example.fakemod{i}.FakeMod",
+                                       f"modloading-worker-{i % 2}", "DEBUG", "ne.mi.fm.ja.FMLModContainer/LOADING"))
+        sys.stdout.write(self.line("Loaded 7 recipes", source="minecraft/RecipeManager"))
+        sys.stdout.flush()
+
+    def _prepare_files(self) -> bool:
+        """Create missing files, return False if the eula wasn't accepted yet"""
+
+        if not os.path.isfile("server.properties") or os.path.getsize("server.properties") == 0:
+            with open("server.properties", "w", encoding="utf8") as props_file:
+                props_file.write(f"server-port={self.port}\nmax-players={self.max_players}\nonline-mode=true\n")
+        else:
+            with open("server.properties", "r", encoding="utf8") as props_file:
+                for line in props_file.read().splitlines():
+                    if line.startswith("server-port=") and line.split("=")[1].isdecimal():
+                        self.port = int(line.split("=")[1])
+                    if line.startswith("max-players=") and line.split("=")[1].isdecimal():
+                        self.max_players = int(line.split("=")[1])
+
+        if not os.path.isfile("eula.txt"):
+            with open("eula.txt", "w", encoding="utf8") as eula_file:
+                eula_file.write("eula=false\n")
+            return False
+
+        with open("eula.txt", "r", encoding="utf8") as eula_file:
+            return "eula=true" in eula_file.read()
+
+    def _execute(self, command: str) -> None:
+        command = command.lstrip("/")
+        name = command.split(" ", maxsplit=1)[0]
+        args = command[len(name) + 1:]
+
+        if name == "say":
+            self.print(f"[Server] {args}")
+        elif name == "list":
+            self.print(f"There are 0 of a max of {self.max_players} players online: ")
+        elif name == "flood":
+            count = int(args) if args.isdecimal() else 1000
+            filler = self.line("Flood line with some filler text to get a realistic line length of about 100 chars")
+            # write in large chunks, so that the emulator isn't the bottleneck
+            for i in range(0, count, 1000):
+                sys.stdout.write(filler * min(1000, count - i))
+            self.print("Flood finished")
+        elif name == "data":
+            if args == "get entity Steve":
+                self.print("Steve has the following entity data: {Health: 20.0f, Pos: [0.5d, 64.0d, -2.5d], "
+                           "Inventory: [{Slot: 0b, id: \"minecraft:stone\", Count: 64b}], UUID: [I; 1, 2, 3, 4]}")
+            elif args == "get entity Steve Pos":
+                self.print("Steve has the following entity data: [0.5d, 64.0d, -2.5d]")
+            else:
+                self.print("No entity was found")
+        elif name == "stop":
+            self.print("Stopping the server")
+            self.print("Saving worlds")
+            self._running = False
+        elif name != "":
+            self.print("Unknown or incomplete command, see below for error")
+
+    def _t_accept(self, listener: socket.socket) -> None:
+        while self._running:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return
+            Thread(target=self._t_handle_ping, args=[conn,], daemon=True).start()
+
+    def _t_handle_ping(self, conn: socket.socket) -> None:
+        """Answer a server list ping"""
+
+        with conn:
+            try:
+                # handshake
+                _recv_exact(conn, _read_varint(conn))
+                while True:
+                    packet = _recv_exact(conn, _read_varint(conn))
+                    if packet[0] == 0x00:
+                        status = {
+                            "version": {"name": self.version, "protocol": PROTOCOL_VERSION},
+                            "players": {"max": self.max_players, "online": 0},
+                            "description": {"text": "A fake Minecraft Server"}
+                        }
+                        encoded = json.dumps(status).encode("utf8")
+                        _send_packet(conn, 0x00, _varint(len(encoded)) + encoded)
+                    elif packet[0] == 0x01:
+                        _send_packet(conn, 0x01, packet[1:9])
+                        return
+                    else:
+                        return
+            except (ConnectionError, OSError, ValueError):
+                return
+
+def main() -> int:
+    """Parse the arguments and run the fake server"""
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--flavor", choices=["vanilla", "forge"], default="vanilla")
+    parser.add_argument("--version", default="1.20.4")
+    parser.add_argument("--startup-lines", type=int, default=200)
+    parser.add_argument("--startup-delay", type=float, default=0)
+    parser.add_argument("--mod-loading", action="store_true")
+    # ignore arguments meant for java, e.g. nogui
+    args, _ = parser.parse_known_args()
+
+    return FakeServer(args.flavor, args.version, args.mod_loading).run(args.startup_lines, args.startup_delay)
+
+if __name__ == "__main__":
+    sys.exit(main())
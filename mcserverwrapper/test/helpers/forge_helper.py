@@ -1,7 +1,6 @@
 """Helpers for testing Forge servers"""
 
 import os
-from random import randint
 import re
 import subprocess
 
@@ -10,7 +9,7 @@ import pytest
 from mcserverwrapper import Wrapper
 from mcserverwrapper.src.error import ServerExitedError
 
-from .common_helper import assert_port_is_free, download_file, setup_workspace
+from .common_helper import lease_test_port, download_file, setup_workspace
 
 def install_forge(url: str):
     """Install a forge server from a given installer download url"""
@@ -42,12 +41,11 @@ def run_forge_test_url(url, offline_mode=False):
 
     run_forge_test(server_jar, offline_mode)
 
-def run_forge_test(jarfile, offline_mode=False):
+def run_forge_test(jarfile, offline_mode=False, port=None):
     """Run all tests for a single forge minecraft server jar"""
 
-    port = 25565
-    while not assert_port_is_free(port, False):
-        port = randint(25500, 25600)
+    if port is None:
+        port = lease_test_port()
 
     if not offline_mode:
         assert os.path.isfile("password.txt")
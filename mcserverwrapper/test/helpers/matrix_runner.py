@@ -0,0 +1,282 @@
+"""
+Run the version tests of many servers in parallel, with jars from a local cache instead of downloads
+
+Every version runs in its own process and working directory, with a port leased in the order of the versions:
+
+    python -m mcserverwrapper.test.helpers.matrix_runner seed CACHE vanilla 1.20.4 /path/to/server.jar
+    python -m mcserverwrapper.test.helpers.matrix_runner seed CACHE forge 1.20.4 /path/to/installed/server \\
+        --jar forge-1.20.4-49.0.31-shim.jar
+    python -m mcserverwrapper.test.helpers.matrix_runner run CACHE --workers 8
+
+A forge server can't be installed without network access, so forge versions are cached as archives of an
+already installed server directory.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable
+from zipfile import ZIP_DEFLATED, ZipFile
+
+from mcserverwrapper.src.mcversion import McVersion
+from mcserverwrapper.src.util.port_allocator import PortAllocator
+
+MANIFEST_NAME = "manifest.json"
+MATRIX_PORT_RANGE = (25600, 25700)
+
+class CacheEntry:
+    """A single cached server jar or server archive"""
+
+    # pylint: disable-next=too-many-arguments
+    def __init__(self, flavor: str, version: str, file: str, sha256: str, jar: str) -> None:
+        self.flavor = flavor
+        self.version = version
+        self.file = file
+        self.sha256 = sha256
+        self.jar = jar
+
+    flavor: str
+    version: str
+    # the file name inside the cache directory
+    file: str
+    sha256: str
+    # the name of the server jar after the entry was materialized
+    jar: str
+
+    @property
+    def key(self) -> str:
+        """The unique name of the entry"""
+
+        return f"{self.flavor}-{self.version}"
+
+class JarCache:
+    """
+    A directory of server jars and archives, with a manifest of their sha256 hashes
+
+    Args:
+        cache_dir (str): the cache directory, which is created if it doesn't exist
+    """
+
+    def __init__(self, cache_dir: str) -> None:
+        self.cache_dir = os.path.abspath(cache_dir)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def add(self, flavor: str, version: str, path: str, jar: str | None = None) -> CacheEntry:
+        """
+        Add a server jar, or a directory containing an installed server, to the cache
+
+        Args:
+            flavor (str): "vanilla" or "forge"
+            version (str): the minecraft version, e.g. "1.20.4"
+            path (str): the server jar or the server directory
+            jar (str | None): the name of the server jar inside the directory, if a directory is given
+        """
+
+        if os.path.isdir(path):
+            if jar is None:
+                raise ValueError("The name of the server jar is needed for server directories")
+            file = f"{flavor}-{version}.zip"
+            with ZipFile(os.path.join(self.cache_dir, file), "w", ZIP_DEFLATED) as archive:
+                for root, _, files in os.walk(path):
+                    for name in files:
+                        full_path = os.path.join(root, name)
+                        archive.write(full_path, os.path.relpath(full_path, path))
+        else:
+            file = f"{flavor}-{version}.jar"
+            jar = file
+            shutil.copyfile(path, os.path.join(self.cache_dir, file))
+
+        entry = CacheEntry(flavor, version, file, _sha256(os.path.join(self.cache_dir, file)), jar)
+        manifest = self._read_manifest()
+        manifest[entry.key] = vars(entry)
+        with open(os.path.join(self.cache_dir, MANIFEST_NAME), "w", encoding="utf8") as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+        return entry
+
+    def entries(self) -> list[CacheEntry]:
+        """Return all cached entries, sorted by flavor and version"""
+
+        entries = [CacheEntry(**data) for data in self._read_manifest().values()]
+        return sorted(entries, key=lambda entry: (entry.flavor, McVersion.version_name_to_id(entry.version)))
+
+    def get(self, key: str) -> CacheEntry:
+        """Return the entry with the given key, e.g. "vanilla-1.20.4" """
+
+        data = self._read_manifest().get(key)
+        if data is None:
+            raise KeyError(f"{key} is not cached")
+        return CacheEntry(**data)
+
+    def materialize(self, key: str, target_dir: str) -> str:
+        """
+        Verify the hash of a cached entry and put the server into the target directory
+
+        Returns:
+            str: the name of the server jar inside the target directory
+
+        Raises:
+            ValueError: if the cached file doesn't match its hash
+        """
+
+        entry = self.get(key)
+        path = os.path.join(self.cache_dir, entry.file)
+        if _sha256(path) != entry.sha256:
+            raise ValueError(f"The cached file {entry.file} doesn't match its hash")
+
+        os.makedirs(target_dir, exist_ok=True)
+        if entry.file.endswith(".zip"):
+            with ZipFile(path) as archive:
+                archive.extractall(target_dir)
+        else:
+            target = os.path.join(target_dir, entry.jar)
+            try:
+                # the jar is only read, so all working directories can share it
+                os.link(path, target)
+            except OSError:
+                shutil.copyfile(path, target)
+        return entry.jar
+
+    def _read_manifest(self) -> dict[str, dict]:
+        manifest_path = os.path.join(self.cache_dir, MANIFEST_NAME)
+        if not os.path.isfile(manifest_path):
+            return {}
+        with open(manifest_path, "r", encoding="utf8") as manifest_file:
+            return json.load(manifest_file)
+
+class MatrixResult:
+    """The outcome of the test of a single version"""
+
+    # pylint: disable-next=too-many-arguments
+    def __init__(self, key: str, outcome: str, duration: float, port: int, error: str | None = None) -> None:
+        self.key = key
+        self.outcome = outcome
+        self.duration = duration
+        self.port = port
+        self.error = error
+
+    key: str
+    # "passed", "failed" or "skipped"
+    outcome: str
+    duration: float
+    port: int
+    error: str | None
+
+# pylint: disable-next=too-many-arguments,too-many-positional-arguments
+def run_matrix(cache: JarCache, keys: list[str] | None = None, workers: int | None = None,
+               work_root: str | None = None, offline_mode: bool = True,
+               test_function: Callable | None = None) -> list[MatrixResult]:
+    """
+    Run the test of every cached version in a pool of processes
+
+    Args:
+        cache (JarCache): the cache containing the server jars
+        keys (list[str] | None): the entries to test, defaults to all cached entries
+        workers (int | None): the amount of parallel processes, defaults to the amount of cpus
+        work_root (str | None): the directory containing the working directories, defaults to a new temp directory
+        offline_mode (bool): if True, the servers run in offline mode, which doesn't need password.txt
+        test_function (Callable | None): called with the jar, offline_mode and port inside the working directory,
+            defaults to run_vanilla_test or run_forge_test
+
+    Returns:
+        list[MatrixResult]: the results in the order of the entries
+    """
+
+    entries = cache.entries() if keys is None else [cache.get(key) for key in keys]
+    work_root = tempfile.mkdtemp(prefix="mcserverwrapper-matrix-") if work_root is None else work_root
+    os.makedirs(work_root, exist_ok=True)
+
+    # a fresh allocator per run leases the lowest free ports in the order of the entries
+    allocator = PortAllocator(os.path.join(work_root, "ports.json"), MATRIX_PORT_RANGE, "127.0.0.1")
+    ports = [allocator.lease(entry.key)["game"] for entry in entries]
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_run_entry, entry.key, entry.flavor, cache.cache_dir,
+                                       os.path.join(work_root, entry.key), port, offline_mode, test_function)
+                       for entry, port in zip(entries, ports)]
+            return [future.result() for future in futures]
+    finally:
+        allocator.release_all()
+
+# pylint: disable-next=too-many-arguments,too-many-positional-arguments
+def _run_entry(key: str, flavor: str, cache_dir: str, work_dir: str, port: int, offline_mode: bool,
+               test_function: Callable | None) -> MatrixResult:
+    """Run the test of a single version, this runs in a worker process"""
+
+    # pylint: disable=import-outside-toplevel
+    import pytest
+    if test_function is None:
+        if flavor == "forge":
+            from .forge_helper import run_forge_test as test_function
+        else:
+            from .vanilla_helper import run_vanilla_test as test_function
+    # pylint: enable=import-outside-toplevel
+
+    start = time.perf_counter()
+    if os.path.isdir(work_dir):
+        shutil.rmtree(work_dir)
+    os.makedirs(work_dir)
+    # the helpers expect the server in ./testdir
+    os.chdir(work_dir)
+
+    try:
+        jarfile = JarCache(cache_dir).materialize(key, "testdir")
+        test_function(jarfile, offline_mode=offline_mode, port=port)
+    except pytest.skip.Exception as e:
+        return MatrixResult(key, "skipped", time.perf_counter() - start, port, str(e))
+    # every error fails this version only
+    # pylint: disable-next=broad-exception-caught
+    except Exception:
+        return MatrixResult(key, "failed", time.perf_counter() - start, port, traceback.format_exc())
+    return MatrixResult(key, "passed", time.perf_counter() - start, port)
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def main(args=None) -> int:
+    """Seed the cache or run the matrix from the command line"""
+
+    parser = argparse.ArgumentParser(prog="matrix_runner")
+    commands = parser.add_subparsers(dest="command", required=True)
+    seed_parser = commands.add_parser("seed", help="add a server jar or directory to the cache")
+    seed_parser.add_argument("cache")
+    seed_parser.add_argument("flavor", choices=["vanilla", "forge"])
+    seed_parser.add_argument("version")
+    seed_parser.add_argument("path")
+    seed_parser.add_argument("--jar", default=None, help="the server jar inside a server directory")
+    run_parser = commands.add_parser("run", help="test all cached versions")
+    run_parser.add_argument("cache")
+    run_parser.add_argument("keys", nargs="*", help="the versions to test, e.g. vanilla-1.20.4")
+    run_parser.add_argument("--workers", type=int, default=None)
+    run_parser.add_argument("--work-root", default=None)
+    run_parser.add_argument("--online", action="store_true", help="run the servers in online mode")
+    parsed = parser.parse_args(args)
+
+    cache = JarCache(parsed.cache)
+    if parsed.command == "seed":
+        entry = cache.add(parsed.flavor, parsed.version, parsed.path, parsed.jar)
+        print(f"Added {entry.key} ({entry.sha256})")
+        return 0
+
+    results = run_matrix(cache, parsed.keys or None, parsed.workers, parsed.work_root, not parsed.online)
+    for result in results:
+        print(f"{result.key:<24} {result.outcome:<8} {result.duration:7.1f}s  port {result.port}")
+        if result.outcome == "failed":
+            print(result.error)
+    return 1 if any(result.outcome == "failed" for result in results) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,10 @@
 """Helpers for testing Vanilla servers"""
 
 import os
-from random import randint
 
 from mcserverwrapper import Wrapper
 
-from .common_helper import connect_mineflayer, setup_workspace, download_file, assert_port_is_free
+from .common_helper import connect_mineflayer, setup_workspace, download_file, lease_test_port
 
 def run_vanilla_test_url(url, offline_mode=False):
     """Run all tests for a single vanilla minecraft server url"""
@@ -16,12 +15,11 @@ def run_vanilla_test_url(url, offline_mode=False):
 
     run_vanilla_test(jarfile, offline_mode)
 
-def run_vanilla_test(jarfile, offline_mode=False):
+def run_vanilla_test(jarfile, offline_mode=False, port=None):
     """Run all tests for a single vanilla minecraft server jar"""
 
-    port = 25565
-    while not assert_port_is_free(port, False):
-        port = randint(25500, 25600)
+    if port is None:
+        port = lease_test_port()
 
     if not offline_mode:
         assert os.path.isfile("password.txt")
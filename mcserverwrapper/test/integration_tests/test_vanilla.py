@@ -1,7 +1,6 @@
 """Module containing tests for Vanilla servers"""
 
 import os
-from random import randint
 from time import sleep
 from datetime import datetime, timedelta
 
@@ -9,7 +8,7 @@ import pytest
 
 from mcserverwrapper import Wrapper
 from mcserverwrapper.src import error
-from ..helpers.common_helper import assert_port_is_free, download_file, connect_mineflayer, setup_workspace
+from ..helpers.common_helper import lease_test_port, download_file, connect_mineflayer, setup_workspace
 from ..helpers.vanilla_helper import run_vanilla_test, run_vanilla_test_url
 from ..testable_thread import TestableThread
 
@@ -74,9 +73,7 @@ def test_single_offline(newest_server_jar):
 def test_mineflayer(newest_server_jar):
     """Test the mineflayer bot"""
 
-    port = 25565
-    while not assert_port_is_free(port, False):
-        port = randint(25500, 25600)
+    port = lease_test_port()
 
     assert os.path.isfile("password.txt")
     assert os.access("password.txt", os.R_OK)
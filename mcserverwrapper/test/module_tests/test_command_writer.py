@@ -0,0 +1,84 @@
+"""Test the CommandWriter class"""
+
+import os
+import pathlib
+
+from ...src.command_writer import CommandWriter
+from ...src.util import logger
+
+class _FakeServer:
+    """Records the commands instead of sending them to a server"""
+
+    def __init__(self):
+        self.batches = []
+        self.stopped = False
+        self.logger = logger.setup(os.path.join(pathlib.Path(__file__).parent.parent.resolve(), "temp"))
+
+    def execute_commands(self, commands):
+        """Record a batch of commands"""
+
+        self.batches.append(list(commands))
+
+    def execute_command(self, command):
+        """Record a stop command"""
+
+        assert command.lstrip("/") == "stop"
+        self.stopped = True
+
+def test_batches_all_commands():
+    """Tests that all commands are sent in order and in batches"""
+
+    server = _FakeServer()
+    writer = CommandWriter(server, rate=100000, burst=1000, batch_size=50)
+
+    commands = [f"/say {i}" for i in range(1000)]
+    assert writer.submit_all(commands) == 1000
+    assert writer.flush(timeout=10)
+    writer.close()
+
+    sent = [command for batch in server.batches for command in batch]
+    assert sent == commands
+    assert all(len(batch) <= 50 for batch in server.batches)
+
+def test_drop_duplicates():
+    """Tests that idempotent commands directly repeating a pending command are dropped"""
+
+    server = _FakeServer()
+    writer = CommandWriter(server, rate=1, burst=1, drop_duplicates=True)
+
+    assert writer.submit("/say first")
+    # the writer now waits for new tokens, so the next commands stay pending
+    assert writer.submit("/setblock 0 64 0 stone")
+    assert not writer.submit("/setblock 0 64 0 stone")
+    assert writer.submit("/say hello")
+    assert writer.submit("/say hello")
+    # the air undoes the first stone, so placing stone again is not a duplicate
+    assert writer.submit("/setblock 0 64 0 air")
+    assert writer.submit("/setblock 0 64 0 stone")
+    assert not writer.submit("/setblock 0 64 0 stone")
+    writer.close(flush=False)
+
+def test_stop_is_not_batched():
+    """Tests that stop commands use the servers' stop handling"""
+
+    server = _FakeServer()
+    writer = CommandWriter(server)
+
+    writer.submit_all(["/say bye", "/stop"])
+    assert writer.flush(timeout=10)
+    writer.close()
+
+    assert server.stopped
+    assert [command for batch in server.batches for command in batch] == ["/say bye"]
+
+def test_mspt_scales_rate():
+    """Tests that a slow server reduces the command rate"""
+
+    writer = CommandWriter(_FakeServer(), rate=100)
+    assert writer.effective_rate() == 100
+
+    writer.feed("[12:00:00] [Server thread/INFO]: Overall: Mean tick time: 100.000 ms. Mean TPS: 10.000")
+    assert writer.effective_rate() == 50
+
+    writer.observe_mspt(10)
+    assert writer.effective_rate() < 100
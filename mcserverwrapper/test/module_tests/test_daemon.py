@@ -0,0 +1,63 @@
+"""Test the daemon protocol"""
+
+import os
+import pathlib
+import sys
+from threading import Thread
+from time import sleep
+
+import pytest
+
+from ...src.daemon import Daemon, DaemonError, send_request
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="Unix domain sockets are not available")
+
+def test_requests_without_servers():
+    """Tests the responses of a daemon which doesn't manage any servers"""
+
+    socket_path = os.path.join(pathlib.Path(__file__).parent.parent.resolve(), "temp", "daemon_test.sock")
+    daemon = Daemon(socket_path)
+    thread = Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+    while not os.path.exists(socket_path):
+        sleep(0.01)
+
+    try:
+        assert send_request(socket_path, {"action": "status"}, timeout=5) == {"ok": True, "servers": []}
+
+        with pytest.raises(DaemonError):
+            send_request(socket_path, {"action": "command", "name": "missing", "command": "/say hi"}, timeout=5)
+        with pytest.raises(DaemonError):
+            send_request(socket_path, {"action": "start", "name": "missing", "jar": "missing.jar"}, timeout=5)
+        with pytest.raises(DaemonError):
+            send_request(socket_path, {"action": "unknown"}, timeout=5)
+
+        # a second daemon must not take over the socket
+        with pytest.raises(DaemonError):
+            Daemon(socket_path).serve_forever()
+    finally:
+        send_request(socket_path, {"action": "shutdown"}, timeout=5)
+        thread.join(5)
+
+    assert not thread.is_alive()
+    assert not os.path.exists(socket_path)
+
+def test_status_of_broken_server(tmp_path):
+    """Tests that a server whose jar can't be read doesn't break the status of the daemon"""
+
+    jar_file = os.path.join(tmp_path, "server.jar")
+    with open(jar_file, "w", encoding="utf8") as jar:
+        jar.write("not a jar")
+    daemon = Daemon(os.path.join(tmp_path, "daemon_test.sock"))
+
+    response = daemon.handle_request({"action": "start", "name": "broken", "jar": jar_file, "wait": False})
+    assert response["ok"]
+    assert response["server"]["startup_error"] is not None
+
+    servers = daemon.handle_request({"action": "status"})["servers"]
+    assert [server["name"] for server in servers] == ["broken"]
+    assert not servers[0]["running"]
+    assert servers[0]["startup_error"] is not None
+
+    daemon.stop_all()
+    assert daemon.handle_request({"action": "status"}) == {"ok": True, "servers": []}
@@ -0,0 +1,41 @@
+"""Test that importing the wrapper and creating a Wrapper instance stay cheap"""
+
+import os
+import pathlib
+import subprocess
+import sys
+
+from mcserverwrapper import Wrapper
+
+# generous enough for slow CI machines, but far below the time needed to import pexpect and mcstatus
+IMPORT_TIME_BUDGET = 0.5
+
+def test_import_time():
+    """Tests that importing the package stays below the budget and doesn't import heavy dependencies"""
+
+    code = "import sys, time\n" + \
+           "start = time.perf_counter()\n" + \
+           "import mcserverwrapper\n" + \
+           "print(time.perf_counter() - start)\n" + \
+           "print(','.join(name for name in ['pexpect', 'mcstatus', 'dns'] if name in sys.modules))\n"
+    project_root = pathlib.Path(__file__).parent.parent.parent.parent.resolve()
+    result = subprocess.run([sys.executable, "-c", code], cwd=project_root, capture_output=True, text=True,
+                            check=True)
+
+    import_time, heavy_modules = result.stdout.splitlines()
+    assert heavy_modules == ""
+    assert float(import_time) < IMPORT_TIME_BUDGET
+
+def test_construction_has_no_side_effects():
+    """Tests that creating a Wrapper neither reads the jar nor writes any files"""
+
+    server_path = os.path.join(pathlib.Path(__file__).parent.parent.resolve(), "temp", "lazy_wrapper")
+    os.makedirs(server_path, exist_ok=True)
+    for entry in os.listdir(server_path):
+        os.remove(os.path.join(server_path, entry))
+
+    # the jar doesn't exist, which would raise if it was checked
+    wrapper = Wrapper(os.path.join(server_path, "server.jar"))
+    wrapper.stop()
+
+    assert len(os.listdir(server_path)) == 0
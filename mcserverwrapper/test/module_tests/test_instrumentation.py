@@ -0,0 +1,83 @@
+"""Test the instrumentation module"""
+
+import json
+import os
+import pathlib
+
+from ...src.util import instrumentation
+
+def test_disabled_records_nothing():
+    """Tests that nothing is recorded while instrumentation is disabled"""
+
+    instrumentation.disable()
+    instrumentation.reset()
+
+    instrumentation.count("counter")
+    instrumentation.observe("histogram", 5)
+    with instrumentation.span("span"):
+        pass
+
+    assert instrumentation.snapshot() == {"counters": {}, "histograms": {}}
+
+def test_counters_histograms_and_spans():
+    """Tests recording data while instrumentation is enabled"""
+
+    instrumentation.reset()
+    spans = []
+    def hook(name, start, end):
+        assert end >= start
+        spans.append(name)
+    instrumentation.add_hook(hook)
+    instrumentation.enable()
+
+    try:
+        instrumentation.count("counter")
+        instrumentation.count("counter", 2)
+        instrumentation.observe("histogram", 3)
+        instrumentation.observe("histogram", 7000000)
+        with instrumentation.span("span"):
+            pass
+
+        @instrumentation.timed("timed")
+        def func(value):
+            return value * 2
+        assert func(2) == 4
+    finally:
+        instrumentation.disable()
+        instrumentation.remove_hook(hook)
+
+    data = instrumentation.snapshot()
+    assert data["counters"]["counter"] == 3
+    assert data["histograms"]["histogram"]["count"] == 2
+    assert data["histograms"]["histogram"]["buckets"]["5"] == 1
+    assert data["histograms"]["histogram"]["buckets"]["inf"] == 1
+    assert data["histograms"]["span"]["count"] == 1
+    assert data["histograms"]["timed"]["count"] == 1
+    assert spans == ["span", "timed"]
+
+def test_export_and_trace():
+    """Tests writing the registry and the spans to files"""
+
+    temp_path = os.path.join(pathlib.Path(__file__).parent.parent.resolve(), "temp")
+    trace_path = os.path.join(temp_path, "trace.jsonl")
+    export_path = os.path.join(temp_path, "instrumentation.json")
+    if os.path.isfile(trace_path):
+        os.remove(trace_path)
+
+    instrumentation.reset()
+    instrumentation.enable(trace_path)
+    try:
+        queue = instrumentation.InstrumentedQueue("queue")
+        queue.put(1)
+        queue.get()
+        with instrumentation.span("traced"):
+            pass
+    finally:
+        instrumentation.disable()
+    instrumentation.export(export_path)
+
+    with open(trace_path, "r", encoding="utf8") as trace_file:
+        assert json.loads(trace_file.readline())["name"] == "traced"
+    with open(export_path, "r", encoding="utf8") as export_file:
+        data = json.load(export_file)
+    assert data["counters"] == {"queue.put": 1, "queue.get": 1}
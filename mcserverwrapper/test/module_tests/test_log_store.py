@@ -0,0 +1,58 @@
+"""Test the LogStore class"""
+
+import os
+
+from ...src.log_store import LogStore
+from ...src.util.output_hub import OutputHub
+
+def test_query_filters(tmp_path):
+    """Tests filtering the stored lines by text, level, player, time and server"""
+
+    store = LogStore(os.path.join(tmp_path, "logs.sqlite3"))
+    store.add_lines([
+        "[12:00:00] [Server thread/INFO]: Starting minecraft server version 1.20.4",
+        "[12:00:01] [Server thread/INFO]: Steve joined the game",
+        "[12:00:02] [Server thread/INFO]: <Steve> has anyone seen my diamonds?",
+        "[12:00:03] [Server thread/ERROR]: Encountered an unexpected exception",
+        "java.lang.NullPointerException: Cannot invoke \"Object.toString()\"",
+        "\tat net.minecraft.server.MinecraftServer.run(MinecraftServer.java:123)"
+    ], server="lobby", received_at=1000.0)
+    store.add_lines(["[13:00:00 INFO]: Alex joined the game"], server="survival", received_at=5000.0)
+
+    assert [entry.message for entry in store.query(player="Steve")][::-1] == [
+        "Steve joined the game",
+        "<Steve> has anyone seen my diamonds?"
+    ]
+    assert len(store.query(text="diamonds")) == 1
+    assert len(store.query(text="diamonds seen")) == 1
+    assert len(store.query(text="diamonds emeralds")) == 0
+    # stack trace lines keep the level of the line before them
+    assert len(store.query(level="ERROR")) == 3
+    assert store.query(text="NullPointerException")[0].level == "ERROR"
+    assert [entry.player for entry in store.query(since=2000.0)] == ["Alex"]
+    assert len(store.query(until=2000.0)) == 6
+    assert len(store.query(server="survival", text="joined")) == 1
+    assert len(store.query(limit=2)) == 2
+    # the text is never interpreted as an FTS5 expression
+    assert len(store.query(text='"NOT" OR -* (')) == 0
+
+    assert store.delete_before(2000.0) == 6
+    assert len(store.query(text="diamonds")) == 0
+    store.close()
+
+def test_attach_to_hub(tmp_path):
+    """Tests storing the lines of an output hub in batches"""
+
+    store = LogStore(os.path.join(tmp_path, "logs.sqlite3"), batch_size=10, flush_interval=0.05)
+    hub = OutputHub()
+    store.attach(hub, "lobby")
+
+    for index in range(25):
+        hub.publish(f"[12:00:00] [Server thread/INFO]: line {index}")
+    hub.close()
+    store.close()
+
+    store = LogStore(os.path.join(tmp_path, "logs.sqlite3"))
+    assert len(store.query(limit=100)) == 25
+    assert store.query(server="lobby")[0].message == "line 24"
+    store.close()
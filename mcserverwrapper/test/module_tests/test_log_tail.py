@@ -0,0 +1,116 @@
+"""Test following the log file of servers which weren't started by the wrapper"""
+
+import os
+import pathlib
+import shutil
+import subprocess
+import sys
+import time
+
+import pexpect
+import pytest
+
+from mcserverwrapper import Wrapper
+from mcserverwrapper.src.server.log_tail import LogTailChild, LogTailError
+
+from ..helpers.benchmark_helper import create_fake_jar, read_until
+
+def _server_dir(name):
+    server_dir = os.path.join(pathlib.Path(__file__).parent.parent.resolve(), "temp", name)
+    if os.path.isdir(server_dir):
+        shutil.rmtree(server_dir)
+    os.makedirs(os.path.join(server_dir, "logs"))
+    return server_dir
+
+def _append(server_dir, text):
+    with open(os.path.join(server_dir, "logs", "latest.log"), "a", encoding="utf8") as log_file:
+        log_file.write(text)
+
+def _read_all(child):
+    data = b""
+    while True:
+        try:
+            data += child.read()
+        except pexpect.exceptions.TIMEOUT:
+            return data
+
+def test_follow_and_resume():
+    """Tests that only new lines are read, and a new tail continues after the last read byte"""
+
+    server_dir = _server_dir("log_tail")
+    _append(server_dir, "old line\n")
+
+    child = LogTailChild(server_dir, timeout=0.2)
+    assert _read_all(child) == b""
+    _append(server_dir, "first\nsecond\n")
+    assert _read_all(child) == b"first\nsecond\n"
+    child.close()
+    with pytest.raises(pexpect.exceptions.EOF):
+        child.read()
+
+    _append(server_dir, "while detached\n")
+    child = LogTailChild(server_dir, timeout=0.2)
+    assert child.read(6) == b"while "
+    child.close()
+    child = LogTailChild(server_dir, timeout=0.2)
+    assert _read_all(child) == b"detached\n"
+    with pytest.raises(LogTailError):
+        child.sendline("/say hi")
+    child.close()
+
+def test_rotation():
+    """Tests that the rest of a rotated log is read before the new log"""
+
+    server_dir = _server_dir("log_tail_rotation")
+    _append(server_dir, "")
+
+    child = LogTailChild(server_dir, timeout=0.2)
+    _append(server_dir, "before\n")
+    assert child.read(3) == b"bef"
+    _append(server_dir, "end of old log\n")
+    os.rename(os.path.join(server_dir, "logs", "latest.log"), os.path.join(server_dir, "logs", "2024-01-01-1.log"))
+    _append(server_dir, "new log\n")
+    assert _read_all(child) == b"ore\nend of old log\nnew log\n"
+
+    # truncating the log in place is detected too
+    with open(os.path.join(server_dir, "logs", "latest.log"), "w", encoding="utf8") as log_file:
+        log_file.write("x\n")
+    assert _read_all(child) == b"x\n"
+    child.close()
+
+def test_server_exit():
+    """Tests that the end of the output is reported once the server process exited"""
+
+    server_dir = _server_dir("log_tail_exit")
+    _append(server_dir, "")
+    with subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"]) as process:
+        child = LogTailChild(server_dir, pid=process.pid, timeout=0.2)
+        _append(server_dir, "stopping\n")
+        child.terminate()
+        process.wait()
+        assert child.read() == b"stopping\n"
+        with pytest.raises(pexpect.exceptions.EOF):
+            child.read()
+        assert child.proc.wait(1) == 0
+
+def test_wrapper_attach_log():
+    """Tests that the output of a followed log reaches the output queue"""
+
+    server_dir = _server_dir("log_tail_wrapper")
+    jar_path = create_fake_jar(server_dir)
+    with open(os.path.join(server_dir, "server.properties"), "w", encoding="utf8") as props_file:
+        props_file.write("server-port=25565\n")
+    _append(server_dir, "[12:00:00] [Server thread/INFO]: Done (1.0s)! For help, type \"help\"\n")
+
+    wrapper = Wrapper(jar_path, print_output=False)
+    wrapper.attach_log(pid=None)
+    _append(server_dir, "[12:00:01] [Server thread/INFO]: [Server] hello\n")
+    line = read_until(iter(lambda: wrapper.output_queue.get(timeout=10), None), "hello")
+    assert line.endswith("[Server] hello")
+
+    # detaching ends the output, but leaves the server running
+    wrapper.detach()
+    end = time.time() + 5
+    while not wrapper.output_hub.closed:
+        assert time.time() < end
+        time.sleep(0.05)
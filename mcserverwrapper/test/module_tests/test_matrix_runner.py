@@ -0,0 +1,41 @@
+"""Test the version matrix runner"""
+
+import os
+
+import pytest
+
+from ..helpers.benchmark_helper import create_fake_jar, run_fake_test
+from ..helpers.matrix_runner import JarCache, run_matrix
+
+def test_cache_verifies_hashes(tmp_path):
+    """Tests that modified cache files are rejected"""
+
+    cache = JarCache(os.path.join(tmp_path, "cache"))
+    entry = cache.add("vanilla", "1.20.4", create_fake_jar(os.path.join(tmp_path, "jar")))
+    assert [cached.key for cached in cache.entries()] == ["vanilla-1.20.4"]
+    assert cache.materialize("vanilla-1.20.4", os.path.join(tmp_path, "server")) == entry.jar
+    assert os.path.isfile(os.path.join(tmp_path, "server", entry.jar))
+
+    with open(os.path.join(cache.cache_dir, entry.file), "ab") as cached_file:
+        cached_file.write(b"corrupted")
+    with pytest.raises(ValueError):
+        cache.materialize("vanilla-1.20.4", os.path.join(tmp_path, "server2"))
+
+def test_run_matrix(tmp_path):
+    """Tests running the fake server of multiple versions in parallel"""
+
+    cache = JarCache(os.path.join(tmp_path, "cache"))
+    cache.add("vanilla", "1.20.4", create_fake_jar(os.path.join(tmp_path, "vanilla"), "vanilla", "1.20.4"))
+    cache.add("vanilla", "1.12.2", create_fake_jar(os.path.join(tmp_path, "old"), "vanilla", "1.12.2"))
+    forge_dir = os.path.join(tmp_path, "forge")
+    create_fake_jar(forge_dir, "forge", "1.20.4")
+    os.rename(os.path.join(forge_dir, "server.jar"), os.path.join(forge_dir, "forge-1.20.4.jar"))
+    cache.add("forge", "1.20.4", forge_dir, jar="forge-1.20.4.jar")
+
+    cwd = os.getcwd()
+    results = run_matrix(cache, workers=3, work_root=os.path.join(tmp_path, "work"), test_function=run_fake_test)
+    assert os.getcwd() == cwd
+
+    assert [result.key for result in results] == ["forge-1.20.4", "vanilla-1.12.2", "vanilla-1.20.4"]
+    assert [result.outcome for result in results] == ["passed"] * 3, [result.error for result in results]
+    assert len({result.port for result in results}) == 3
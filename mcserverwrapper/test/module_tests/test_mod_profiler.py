@@ -0,0 +1,99 @@
+"""Test the mod loading profiler of Forge servers"""
+
+import os
+import pathlib
+import time
+
+import pytest
+
+from mcserverwrapper.src.server import ServerBuilder
+from mcserverwrapper.src.server.mod_profiler import ModLoadProfiler, ProfileStore, compare_profiles
+from mcserverwrapper.src.util import logger
+
+from ..helpers.benchmark_helper import create_fake_jar, create_fake_wrapper
+
+class _Clock:
+    """A clock which only advances when told to"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def _line(message, thread="main", level="INFO"):
+    return f"[12:00:00] [{thread}/{level}] [ne.mi.fm.ja.FMLModContainer/LOADING]: {message}"
+
+def test_profile_phases_and_mods(tmp_path):
+    """Tests timing phases and mods, storing profiles and comparing them"""
+
+    clock = _Clock()
+    store = ProfileStore(str(tmp_path), max_profiles=2)
+    profiler = ModLoadProfiler(store, clock=clock)
+
+    profiles = []
+    for slow_time in (3.0, 1.0, 2.0):
+        profiler.begin()
+        for message, thread, delay in [("ModLauncher running: args []", "main", 1.0),
+                                       ("Forge mod loading, version 49.0.0, for MC 1.20.4", "modloading-worker-0", 2.0),
+                                       ("Creating FMLModContainer instance for com.example.Slow", "modloading-worker-0", 0.5),
+                                       ("Creating FMLModContainer instance for com.example.Fast", "modloading-worker-1", 0.5),
+                                       ("Creating FMLModContainer instance for com.example.Other", "modloading-worker-0",
+                                        slow_time),
+                                       ("Loaded 7 recipes", "Server thread", 1.0),
+                                       # phases never go back
+                                       ("Forge mod loading, version 49.0.0, for MC 1.20.4", "main", 0.0),
+                                       ("Preparing level \"world\"", "Server thread", 4.0),
+                                       ("Done (12.0s)! For help, type \"help\"", "Server thread", 0.0)]:
+            clock.now += delay
+            profiler.feed(_line(message, thread))
+        assert not profiler.active
+        profiles.append(profiler.last_profile)
+        # ignored until the next boot
+        profiler.feed(_line("ModLauncher running: args []"))
+
+    profile = profiles[0]
+    assert profile.phases == {"startup": 1.0, "launch": 2.0, "construct": 5.0, "data load": 4.0, "world": 0.0}
+    assert profile.total == 12.0
+    assert profile.mods["com.example.Slow"].phases == {"construct": 3.5}
+    assert profile.mods["com.example.Fast"].total == 4.0
+    assert [timing.mod for timing in profile.slowest_mods(1)] == ["com.example.Fast"]
+
+    # only the latest profiles are kept
+    assert len(store.list()) == 2
+    before, after = store.latest(2)
+    assert after.to_dict() == profiles[2].to_dict()
+    changes = compare_profiles(before, after)
+    assert (changes[0].kind, changes[0].name, changes[0].delta) in [("mod", "com.example.Slow", 1.0),
+                                                                    ("mod", "com.example.Fast", 1.0),
+                                                                    ("phase", "construct", 1.0)]
+    assert all(change.delta == 0 for change in changes[3:])
+
+def test_forge_boot_profile():
+    """Tests that the boots of a Forge server are profiled if enabled"""
+
+    server_dir = os.path.join(pathlib.Path(__file__).parent.parent.resolve(), "temp", "mod_profiler")
+    wrapper = create_fake_wrapper(server_dir, "forge", startup_lines=20, mod_loading=True)
+    wrapper.profile_mod_loading = True
+    wrapper.startup()
+    try:
+        profiler = wrapper.server.load_profiler
+        deadline = time.monotonic() + 10
+        while profiler.last_profile is None and time.monotonic() < deadline:
+            time.sleep(0.1)
+        profile = profiler.last_profile
+        assert len(profile.mods) == 20
+        assert list(profile.phases)[-1] == "world"
+        assert ProfileStore.load(profiler.store.list()[-1]).total == profile.total
+    finally:
+        wrapper.stop()
+
+def test_profiling_is_opt_in(tmp_path):
+    """Tests that servers are only profiled if asked to, and only Forge servers can be"""
+
+    logger.setup(str(tmp_path))
+    assert ServerBuilder.from_jar(create_fake_jar(str(tmp_path / "forge"), "forge")).build().load_profiler is None
+    assert ServerBuilder.from_jar(create_fake_jar(str(tmp_path / "forge"), "forge")).profile_mod_loading().build() \
+                        .load_profiler is not None
+    with pytest.raises(ValueError):
+        ServerBuilder.from_jar(create_fake_jar(str(tmp_path / "vanilla"))).profile_mod_loading()
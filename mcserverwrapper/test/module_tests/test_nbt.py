@@ -0,0 +1,100 @@
+"""Test the lazy NBT reader and the WorldData class"""
+
+import gzip
+import os
+import struct
+import zlib
+
+import pytest
+
+from ...src.world import nbt
+from ...src.world.region import COMPRESSION_ZLIB, write_region
+from ...src.world.world_data import WorldData
+
+class _Long(int):
+    """An int encoded as long tag"""
+
+# pylint: disable-next=too-many-return-statements
+def _payload(value):
+    """Return the tag type and payload of a python value"""
+
+    if isinstance(value, dict):
+        return nbt.TAG_COMPOUND, b"".join(_named(name, child) for name, child in value.items()) + b"\0"
+    if isinstance(value, list):
+        payloads = [_payload(element) for element in value]
+        element_tag = payloads[0][0] if payloads else nbt.TAG_END
+        return nbt.TAG_LIST, struct.pack(">Bi", element_tag, len(value)) + b"".join(payload for _, payload in payloads)
+    if isinstance(value, str):
+        return nbt.TAG_STRING, struct.pack(">H", len(value.encode("utf8"))) + value.encode("utf8")
+    if isinstance(value, float):
+        return nbt.TAG_DOUBLE, struct.pack(">d", value)
+    if isinstance(value, _Long):
+        return nbt.TAG_LONG, struct.pack(">q", value)
+    if isinstance(value, bytes):
+        return nbt.TAG_BYTE_ARRAY, struct.pack(">i", len(value)) + value
+    return nbt.TAG_INT, struct.pack(">i", value)
+
+def _named(name, value):
+    tag, payload = _payload(value)
+    return struct.pack(">BH", tag, len(name)) + name.encode("utf8") + payload
+
+def _encode(value):
+    return _named("", value)
+
+def test_lazy_compound():
+    """Tests reading compounds and lists on demand"""
+
+    data = _encode({"Blocks": bytes(5000), "Inventory": [{"id": "minecraft:stone", "Count": 64}, {"id": "x", "Count": 1}],
+                    "Pos": [1.5, 64.0, -3.25], "Name": "Steve", "Nested": {"Time": _Long(1 << 40)}})
+    root = nbt.load(data)
+    assert root["Name"] == "Steve"
+    assert root.tag_type("Blocks") == nbt.TAG_BYTE_ARRAY
+    assert root["Pos"][-1] == -3.25 and len(root["Pos"]) == 3
+    assert root["Inventory"][1]["id"] == "x"
+    assert [item["Count"] for item in root["Inventory"]] == [64, 1]
+    assert root["Nested"]["Time"] == 1 << 40
+    assert root.get("Missing", 5) == 5 and "Missing" not in root
+    with pytest.raises(KeyError):
+        _ = root["Missing"]
+    assert root["Nested"].to_python() == {"Time": 1 << 40}
+    assert len(root) == 5
+
+    assert nbt.loads(gzip.compress(data))["Name"] == "Steve"
+    assert nbt.loads(zlib.compress(data))["Name"] == "Steve"
+    with pytest.raises(nbt.NbtError):
+        nbt.load(data[:30])["Pos"]  # pylint: disable=expression-not-assigned
+    with pytest.raises(nbt.NbtError):
+        nbt.loads(b"\x1f\x8bbroken")
+
+def test_world_data(tmp_path):
+    """Tests reading level.dat, playerdata and chunks"""
+
+    world_dir = os.path.join(tmp_path, "world")
+    os.makedirs(os.path.join(world_dir, "playerdata"))
+    with open(os.path.join(world_dir, "level.dat"), "wb") as level_file:
+        level_file.write(gzip.compress(_encode({"Data": {
+            "LevelName": "world", "GameRules": {"keepInventory": "true"},
+            "WorldGenSettings": {"seed": _Long(-4172144997902289642)}
+        }})))
+    uuids = [f"00000000-0000-0000-0000-{index:012d}" for index in range(200)]
+    for index, uuid in enumerate(uuids):
+        with open(os.path.join(world_dir, "playerdata", f"{uuid}.dat"), "wb") as player_file:
+            player_file.write(gzip.compress(_encode({"Inventory": [{"id": "minecraft:dirt"}] * 30,
+                                                     "Pos": [float(index), 70.0, 0.0]})))
+    open(os.path.join(world_dir, "playerdata", f"{uuids[0]}.dat_old"), "wb").close()  # pylint: disable=consider-using-with
+    os.makedirs(os.path.join(world_dir, "region"))
+    write_region(os.path.join(world_dir, "region", "r.-1.0.mca"),
+                 [(31 + 2 * 32, 0, COMPRESSION_ZLIB, zlib.compress(_encode({"xPos": -1, "zPos": 2})))])
+
+    world = WorldData(world_dir)
+    assert world.seed() == -4172144997902289642
+    assert world.game_rules() == {"keepInventory": "true"}
+    assert world.player_uuids() == uuids
+    assert world.player(uuids[3])["Pos"][0] == 3.0
+    assert world.player("00000000-0000-0000-0000-999999999999") is None
+    assert world.query_players(("Pos",))[uuids[150]] == [150.0, 70.0, 0.0]
+    assert sum(1 for _ in world.players()) == 200
+    assert world.chunk(-1, 2)["zPos"] == 2
+    assert world.chunk(0, 0) is None
+    with pytest.raises(ValueError):
+        world.chunk(0, 0, "minecraft:the_end")
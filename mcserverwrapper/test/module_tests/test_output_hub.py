@@ -0,0 +1,74 @@
+"""Test the OutputHub class"""
+
+from queue import Empty
+from threading import Thread
+
+import pytest
+
+from ...src.util.output_hub import OutputHub
+
+def test_subscribers_read_independently():
+    """Tests that every subscriber reads every line"""
+
+    hub = OutputHub(10)
+    first = hub.subscribe()
+    second = hub.subscribe()
+
+    for index in range(5):
+        hub.publish(f"line {index}")
+
+    assert first.get(timeout=1) == "line 0"
+    assert first.get_many(10) == ["line 1", "line 2", "line 3", "line 4"]
+    assert first.empty()
+    assert second.lag() == 5
+    assert second.get_many(2) == ["line 0", "line 1"]
+
+    with pytest.raises(Empty):
+        first.get(timeout=0.01)
+    with pytest.raises(Empty):
+        first.get(block=False)
+
+def test_replay_and_latest():
+    """Tests reading already published lines"""
+
+    hub = OutputHub(4)
+    for index in range(6):
+        hub.publish(f"line {index}")
+
+    assert hub.latest(2) == ["line 4", "line 5"]
+    assert hub.latest(100) == ["line 2", "line 3", "line 4", "line 5"]
+    assert hub.subscribe(3).get_many(10) == ["line 3", "line 4", "line 5"]
+    assert hub.subscribe().empty()
+
+def test_lagging_subscriber_catches_up():
+    """Tests that a subscriber which fell behind skips the overwritten lines"""
+
+    hub = OutputHub(3)
+    lags = []
+    subscription = hub.subscribe(on_lag=lags.append)
+
+    for index in range(5):
+        hub.publish(f"line {index}")
+
+    assert subscription.get_many(10) == ["line 2", "line 3", "line 4"]
+    assert subscription.dropped == 2
+    assert lags == [2]
+
+def test_iteration_stops_when_closed():
+    """Tests that iterating a subscription blocks for new lines and ends with the hub"""
+
+    hub = OutputHub()
+    subscription = hub.subscribe()
+    received = []
+    reader = Thread(target=lambda: received.extend(subscription))
+    reader.start()
+
+    hub.publish("a")
+    hub.publish("b")
+    hub.close()
+    reader.join(timeout=5)
+
+    assert not reader.is_alive()
+    assert received == ["a", "b"]
+    with pytest.raises(ValueError):
+        hub.publish("c")
@@ -0,0 +1,76 @@
+"""Test the PlayerIndex class"""
+
+from ...src.player_index import PlayerIndex
+from ...src.util.console_parser import parse_line
+
+def test_join_and_leave():
+    """Tests tracking players from join and leave lines"""
+
+    index = PlayerIndex()
+    joined = []
+    left = []
+    index.on_join(joined.append)
+    index.on_leave(left.append)
+
+    index.feed("[12:00:00] [User Authenticator #1/INFO]: UUID of player Steve is 069a79f4-44e9-4726-a5be-fca90e38aaf5")
+    index.feed("[12:00:01] [Server thread/INFO]: Steve joined the game")
+    index.feed("[12:00:02] [Server thread/INFO] [minecraft/DedicatedServer]: Alex joined the game")
+
+    assert index.is_online("steve")
+    assert index.is_online("Alex")
+    assert index.count() == 2
+    assert index.get_uuid("Steve") == "069a79f4-44e9-4726-a5be-fca90e38aaf5"
+    assert index.get_session("Steve").uuid == "069a79f4-44e9-4726-a5be-fca90e38aaf5"
+    assert [session.name for session in joined] == ["Steve", "Alex"]
+
+    index.feed("[12:00:03] [Server thread/INFO]: Steve lost connection: Kicked by an operator")
+    index.feed("[12:00:03] [Server thread/INFO]: Steve left the game")
+
+    assert not index.is_online("Steve")
+    assert index.count() == 1
+    assert len(left) == 1
+    assert left[0].leave_reason == "Kicked by an operator"
+    assert left[0].duration() >= 0
+
+def test_forge_latest_log():
+    """Tests reading the lines of a Forge latest.log, which have the date and milliseconds in their timestamp"""
+
+    index = PlayerIndex()
+
+    index.feed("[19Oct2026 12:00:00.123] [User Authenticator #1/INFO] [minecraft/ServerLoginPacketListenerImpl]: "
+               "UUID of player Steve is 069a79f4-44e9-4726-a5be-fca90e38aaf5")
+    index.feed("[19Oct2026 12:00:00.456] [Server thread/INFO] [minecraft/MinecraftServer]: Steve joined the game")
+
+    assert index.get_session("Steve").uuid == "069a79f4-44e9-4726-a5be-fca90e38aaf5"
+    parsed = parse_line("[19Oct2026 12:00:01.789] [Server thread/INFO] [minecraft/MinecraftServer]: Steve left the game")
+    assert (parsed.time, parsed.thread, parsed.source) == ("19Oct2026 12:00:01.789", "Server thread", "minecraft/MinecraftServer")
+    index.feed("[19Oct2026 12:00:01.789] [Server thread/INFO] [minecraft/MinecraftServer]: Steve left the game")
+    assert index.count() == 0
+
+def test_chat_is_ignored():
+    """Tests that chat messages can't fake joins"""
+
+    index = PlayerIndex()
+
+    index.feed("[12:00:00] [Server thread/INFO]: <Steve> Alex joined the game")
+    index.feed("[12:00:00] [Server thread/INFO]: [Server] Alex joined the game")
+    index.feed("Alex joined the game")
+
+    assert index.count() == 0
+
+def test_reconcile_with_list():
+    """Tests reconciling the index with /list replies of new and old versions"""
+
+    index = PlayerIndex()
+    index.feed("[12:00:00] [Server thread/INFO]: Ghost joined the game")
+
+    index.feed("[12:00:01] [Server thread/INFO]: There are 2 of a max of 20 players online: Steve, Alex")
+    assert sorted(index.online_players()) == ["Alex", "Steve"]
+
+    index.feed("[12:00:02] [Server thread/INFO]: There are 1/20 players online:")
+    index.feed("[12:00:02] [Server thread/INFO]: Alex")
+    assert index.online_players() == ["Alex"]
+
+    index.feed("[12:00:03 INFO]: There are 0 of a max of 20 players online: ")
+    assert index.count() == 0
+    assert len(index.history()) == 3
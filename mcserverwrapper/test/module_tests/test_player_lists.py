@@ -0,0 +1,99 @@
+"""Test the PlayerLists class"""
+
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from ...src.player_index import PlayerIndex
+from ...src.player_lists import PlayerLists, offline_uuid
+
+class _FakeWrapper:
+    """Has the attributes of a Wrapper used by the PlayerLists"""
+
+    def __init__(self) -> None:
+        self.players = PlayerIndex()
+        self.commands = []
+
+    def server_running(self) -> bool:
+        """The server is always running"""
+
+        return True
+
+    def send_commands(self, commands) -> None:
+        """Record the commands"""
+
+        self.commands.extend(commands)
+
+def _read(path):
+    with open(path, "r", encoding="utf8") as file:
+        return json.load(file)
+
+def _write_properties(server_dir, online_mode):
+    with open(os.path.join(server_dir, "server.properties"), "w", encoding="utf8") as props_file:
+        props_file.write(f"online-mode={online_mode}\n")
+
+def test_offline_uuid():
+    """Tests that offline uuids match the ones of the server"""
+
+    assert offline_uuid("Notch") == "b50ad385-829d-3141-a216-7e7d7539ba7f"
+
+def test_batch_without_server(tmp_path):
+    """Tests that batches of a stopped server are written to the files directly"""
+
+    _write_properties(tmp_path, "false")
+    lists = PlayerLists(str(tmp_path))
+    with lists.batch() as batch:
+        for index in range(1000):
+            batch.whitelist_add(f"player{index}")
+        batch.whitelist_remove("player5")
+        batch.op("Admin", level=3)
+        batch.ban("Griefer", reason="Griefing")
+        batch.ban("Spammer", expires=datetime.now(timezone.utc) - timedelta(days=1))
+        batch.ban_ip("10.0.0.1")
+
+    assert lists.is_whitelisted("Player1") and lists.is_whitelisted(offline_uuid("player1"))
+    assert not lists.is_whitelisted("player5")
+    assert len(_read(os.path.join(tmp_path, "whitelist.json"))) == 999
+    assert _read(os.path.join(tmp_path, "ops.json"))[0]["level"] == 3
+    assert lists.is_banned("griefer") and not lists.is_banned("Spammer")
+    assert lists.is_ip_banned("10.0.0.1") and not lists.is_ip_banned("10.0.0.2")
+
+    # changes of the server are picked up on refresh
+    with open(os.path.join(tmp_path, "banned-ips.json"), "w", encoding="utf8") as bans_file:
+        json.dump([], bans_file)
+    lists.refresh()
+    assert not lists.is_ip_banned("10.0.0.1")
+    assert lists.is_banned("Griefer")
+
+    with pytest.raises(RuntimeError):
+        with lists.batch() as batch:
+            batch.pardon("Griefer")
+            raise RuntimeError("aborted")
+    assert lists.is_banned("Griefer")
+
+def test_batch_with_running_server(tmp_path):
+    """Tests that the whitelist is reloaded once, and ops and bans are changed with commands"""
+
+    _write_properties(tmp_path, "true")
+    wrapper = _FakeWrapper()
+    wrapper.players.feed("[12:00:00] [User Authenticator #1/INFO]: UUID of player Steve is 8667ba71-b85a-4004-af54-457a9734eed7")
+    lists = PlayerLists(str(tmp_path), wrapper)
+
+    with lists.batch() as batch:
+        batch.whitelist_add("Steve")
+        batch.whitelist_add("Alex", "ec561538-f3fd-461d-aff5-086b22154bce")
+        batch.op("Steve")
+        batch.ban("Herobrine", "f84c6a79-0a4e-45e0-879b-cd49ebd4c4e2", reason="Haunting")
+
+    assert [entry["uuid"] for entry in _read(os.path.join(tmp_path, "whitelist.json"))] == \
+           ["8667ba71-b85a-4004-af54-457a9734eed7", "ec561538-f3fd-461d-aff5-086b22154bce"]
+    assert wrapper.commands == ["/whitelist reload", "/op Steve", "/ban Herobrine Haunting"]
+    assert not os.path.isfile(os.path.join(tmp_path, "ops.json"))
+    assert lists.is_op("Steve") and lists.is_banned("Herobrine")
+
+    # online mode servers can't compute uuids
+    with pytest.raises(ValueError):
+        with lists.batch() as batch:
+            batch.whitelist_add("Unknown")
@@ -0,0 +1,68 @@
+"""Test the PortAllocator class"""
+
+import os
+import socket
+
+import pytest
+
+from ...src.error import PortAllocationError
+from ...src.util.port_allocator import PortAllocator
+
+def _get_free_range(length):
+    """Find a range of ports which are currently free"""
+
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        start = s.getsockname()[1]
+    start = min(start, 65535 - length)
+    return (start, start + length - 1)
+
+def test_leases_are_unique_and_persisted(tmp_path):
+    """Tests that owners get different ports, and the same ports again after a release"""
+
+    port_range = _get_free_range(10)
+    state_path = os.path.join(tmp_path, "ports.json")
+    allocator = PortAllocator(state_path, port_range, "127.0.0.1")
+
+    lobby = allocator.lease("lobby", ("game", "rcon", "query"))
+    survival = allocator.lease("survival")
+    assert len(set(lobby.values()) | {survival["game"]}) == 4
+    assert allocator.lease("lobby", ("game", "rcon", "query")) == lobby
+    assert set(allocator.leases()) == {"lobby", "survival"}
+
+    allocator.release("lobby")
+    assert set(allocator.leases()) == {"survival"}
+
+    # a new allocator, like after a restart, reads the reservation from the state file
+    restarted = PortAllocator(state_path, port_range, "127.0.0.1")
+    assert restarted.lease("creative")["game"] not in set(lobby.values()) | {survival["game"]}
+    assert restarted.lease("lobby", ("game", "rcon", "query")) == lobby
+    restarted.release_all()
+    allocator.release_all()
+    assert not allocator.leases()
+
+def test_ports_in_use_are_skipped(tmp_path):
+    """Tests that ports which can't be bound are never leased"""
+
+    port_range = _get_free_range(2)
+    allocator = PortAllocator(os.path.join(tmp_path, "ports.json"), port_range, "127.0.0.1")
+
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as blocker:
+        blocker.bind(("127.0.0.1", port_range[0]))
+        assert allocator.lease("lobby")["game"] == port_range[1]
+        with pytest.raises(PortAllocationError):
+            allocator.lease("survival")
+
+def test_leases_of_dead_processes_are_released(tmp_path):
+    """Tests that leases of crashed processes don't block their ports"""
+
+    port_range = _get_free_range(1)
+    state_path = os.path.join(tmp_path, "ports.json")
+    with open(state_path, "w", encoding="utf8") as state_file:
+        # pid 2^22 + 1 is above the default pid_max, so it never exists
+        state_file.write(f'{{"lobby": {{"ports": {{"game": {port_range[0]}}}, "pid": 4194305}}}}')
+
+    allocator = PortAllocator(state_path, port_range, "127.0.0.1")
+    assert not allocator.leases()
+    assert allocator.lease("survival")["game"] == port_range[0]
+    allocator.release_all()
@@ -0,0 +1,49 @@
+"""Test provisioning server directories from a template"""
+
+import os
+
+import pytest
+
+from ...src.provisioning import provision
+from ..helpers.benchmark_helper import create_fake_jar
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf8") as file:
+        file.write(content)
+
+def _read(path):
+    with open(path, "r", encoding="utf8") as file:
+        return file.read()
+
+def test_provision(tmp_path):
+    """Tests that immutable files are shared, and all other files are independent of the template"""
+
+    template_dir = os.path.join(tmp_path, "template")
+    create_fake_jar(template_dir)
+    _write(os.path.join(template_dir, "libraries", "org", "lib.jar"), "library")
+    _write(os.path.join(template_dir, "mods", "mod.jar"), "mod")
+    _write(os.path.join(template_dir, "world", "level.dat"), "level")
+    _write(os.path.join(template_dir, "server.properties"), "server-port=25565\nmotd=template\n")
+
+    target_dir = os.path.join(tmp_path, "instance")
+    result = provision(template_dir, target_dir, server_property_args={"port": 25570, "maxp": 5})
+
+    for path in ("server.jar", os.path.join("libraries", "org", "lib.jar"), os.path.join("mods", "mod.jar")):
+        assert os.path.samefile(os.path.join(template_dir, path), os.path.join(target_dir, path))
+    assert result.hardlinked == 3
+    assert result.reflinked + result.copied == 2
+
+    _write(os.path.join(target_dir, "world", "level.dat"), "changed")
+    assert _read(os.path.join(template_dir, "world", "level.dat")) == "level"
+
+    assert _read(os.path.join(target_dir, "eula.txt")) == "eula=true\n"
+    properties = _read(os.path.join(target_dir, "server.properties"))
+    assert "server-port=25570\n" in properties
+    assert "max-players=5\n" in properties
+    assert "motd=template\n" in properties
+    assert _read(os.path.join(template_dir, "server.properties")) == "server-port=25565\nmotd=template\n"
+    assert not os.path.exists(os.path.join(template_dir, "eula.txt"))
+
+    with pytest.raises(ValueError):
+        provision(template_dir, target_dir)
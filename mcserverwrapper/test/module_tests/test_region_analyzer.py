@@ -0,0 +1,86 @@
+"""Test the RegionAnalyzer class"""
+
+import os
+import struct
+import zlib
+
+import pytest
+
+from ...src.world.region import SECTOR_SIZE, RegionFile
+from ...src.world import region_analyzer
+from ...src.world.region_analyzer import RegionAnalyzer
+
+def _write_region(path, chunks, gap_sectors=0):
+    """Write a region file with the given chunk payloads by index, leaving unused sectors between them"""
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    locations = [0] * 1024
+    timestamps = [0] * 1024
+    body = b""
+    sector = 2
+    for index, payload in chunks.items():
+        data = zlib.compress(payload)
+        chunk = struct.pack(">IB", len(data) + 1, 2) + data
+        sector_count = -(-len(chunk) // SECTOR_SIZE)
+        locations[index] = (sector << 8) | sector_count
+        timestamps[index] = 1700000000 + index
+        body += chunk.ljust(sector_count * SECTOR_SIZE, b"\0") + b"\0" * SECTOR_SIZE * gap_sectors
+        sector += sector_count + gap_sectors
+    with open(path, "wb") as region_file:
+        region_file.write(struct.pack(">1024I", *locations) + struct.pack(">1024I", *timestamps) + body)
+
+def test_region_file(tmp_path):
+    """Tests reading the chunk locations and data of a region file"""
+
+    path = os.path.join(tmp_path, "r.-1.2.mca")
+    _write_region(path, {0: b"a" * 10, 33: os.urandom(6000)})
+    with RegionFile(path) as region:
+        assert (region.region_x, region.region_z) == (-1, 2)
+        chunks = region.chunks()
+        assert [(chunk.x, chunk.z) for chunk in chunks] == [(0, 0), (1, 1)]
+        assert chunks[1].sector_count == 2 and chunks[1].timestamp == 1700000033
+        assert region.read_chunk(chunks[0]) == b"a" * 10
+
+    # empty region files are valid
+    open(os.path.join(tmp_path, "r.0.0.mca"), "wb").close()  # pylint: disable=consider-using-with
+    with RegionFile(os.path.join(tmp_path, "r.0.0.mca")) as region:
+        assert not region.chunks()
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_analyze_world(tmp_path, monkeypatch, workers):
+    """Tests the stats per dimension and the incremental rescan"""
+
+    world_dir = os.path.join(tmp_path, "world")
+    _write_region(os.path.join(world_dir, "region", "r.0.0.mca"), {index: b"x" * 100 for index in range(10)})
+    _write_region(os.path.join(world_dir, "region", "r.1.0.mca"), {0: b"y"}, gap_sectors=3)
+    _write_region(os.path.join(world_dir, "entities", "r.0.0.mca"), {0: b"z"})
+    _write_region(os.path.join(world_dir, "DIM-1", "region", "r.0.0.mca"), {5: b"n", 6: b"n"})
+    _write_region(os.path.join(world_dir, "dimensions", "custom", "mining", "region", "r.0.0.mca"), {1: b"m"})
+    with open(os.path.join(world_dir, "region", "r.2.0.mca"), "wb") as broken_file:
+        broken_file.write(struct.pack(">I", (100 << 8) | 1).ljust(2 * SECTOR_SIZE, b"\0"))
+
+    # the pool is used even for a few files, if more than one worker is requested
+    monkeypatch.setattr(region_analyzer, "_MIN_FILES_FOR_POOL", 0 if workers > 1 else 64)
+
+    cache_path = os.path.join(tmp_path, "cache.json")
+    report = RegionAnalyzer(world_dir, cache_path, workers).analyze()
+    assert report.scanned == 6
+    stats = {(entry.dimension, entry.kind): entry for entry in report.dimensions()}
+    assert stats[("minecraft:overworld", "region")].chunk_count == 11
+    assert stats[("minecraft:overworld", "entities")].chunk_count == 1
+    assert stats[("minecraft:the_nether", "region")].chunk_count == 2
+    assert stats[("custom:mining", "region")].chunk_count == 1
+
+    regions = {region.path: region for region in report.regions}
+    sparse = regions[os.path.join("region", "r.1.0.mca")]
+    assert sparse.free_sectors == 3
+    assert sparse.fragmentation == 0.75
+    assert regions[os.path.join("region", "r.0.0.mca")].fragmentation == 0
+    assert report.most_fragmented(1)[0] is sparse
+    assert regions[os.path.join("region", "r.2.0.mca")].error is not None
+
+    # only changed files are read again
+    _write_region(os.path.join(world_dir, "region", "r.1.0.mca"), {0: b"y", 1: b"y"})
+    report = RegionAnalyzer(world_dir, cache_path, workers).analyze()
+    assert report.scanned == 1
+    assert {region.path: region for region in report.regions}[os.path.join("region", "r.1.0.mca")].chunk_count == 2
@@ -0,0 +1,83 @@
+"""Test the RegionCompactor class"""
+
+import gzip
+import os
+import zlib
+
+import pytest
+
+from ...main import main
+from ...src.server import log_tail
+from ...src.world import compaction
+from ...src.world.compaction import RegionCompactor
+from ...src.world.region import (COMPRESSION_GZIP, COMPRESSION_LZ4, COMPRESSION_ZLIB, SECTOR_SIZE, RegionFile,
+                                 write_region)
+from ...src.world.region_analyzer import RegionAnalyzer
+
+def _chunks(path):
+    with RegionFile(path) as region:
+        return {chunk.index: (chunk.compression, region.read_raw(chunk)) for chunk in region.chunks()}
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_compact_world(tmp_path, monkeypatch, workers):
+    """Tests that unused sectors are removed and chunks keep their data"""
+
+    world_dir = os.path.join(tmp_path, "world")
+    os.makedirs(os.path.join(world_dir, "region"))
+    os.makedirs(os.path.join(world_dir, "entities"))
+    sparse_path = os.path.join(world_dir, "region", "r.0.0.mca")
+    payload = b"chunk data " * 2000
+    write_region(sparse_path, [(0, 1, COMPRESSION_ZLIB, zlib.compress(payload, 1)),
+                               (1, 2, COMPRESSION_GZIP, gzip.compress(payload)),
+                               (2, 3, COMPRESSION_LZ4, b"lz4 block")])
+    # free sectors behind the chunks, like after chunks moved
+    with open(sparse_path, "ab") as sparse_file:
+        sparse_file.write(bytes(5 * SECTOR_SIZE))
+    compact_path = os.path.join(world_dir, "entities", "r.0.0.mca")
+    write_region(compact_path, [(7, 1, COMPRESSION_ZLIB, zlib.compress(b"entities"))])
+    monkeypatch.setattr(compaction, "_MIN_FILES_FOR_POOL", 0 if workers > 1 else 64)
+
+    before = _chunks(sparse_path)
+    report = RegionCompactor(world_dir, workers=workers).compact()
+    assert not report.errors()
+    assert report.reclaimed == 5 * SECTOR_SIZE
+    assert _chunks(sparse_path) == before
+    assert RegionAnalyzer(world_dir).analyze().most_fragmented(1)[0].free_sectors == 0
+    assert not [name for name in os.listdir(os.path.join(world_dir, "region")) if name != "r.0.0.mca"]
+
+    # recompressing converts gzip chunks to zlib, and keeps lz4 chunks
+    report = RegionCompactor(world_dir, compression_level=9, workers=workers).compact()
+    chunks = _chunks(sparse_path)
+    assert report.regions[0].recompressed == 2
+    assert chunks[1][0] == COMPRESSION_ZLIB and zlib.decompress(chunks[1][1]) == payload
+    assert chunks[2] == before[2]
+    assert len(chunks[0][1]) < len(before[0][1])
+
+def test_compact_invalid(tmp_path):
+    """Tests that broken region files are reported and left unchanged"""
+
+    os.makedirs(os.path.join(tmp_path, "region"))
+    path = os.path.join(tmp_path, "region", "r.0.0.mca")
+    write_region(path, [(0, 1, COMPRESSION_ZLIB, b"not zlib data")])
+    with open(path, "rb") as region_file:
+        content = region_file.read()
+
+    report = RegionCompactor(str(tmp_path), compression_level=6, workers=1).compact()
+    assert report.errors()[0].path == os.path.join("region", "r.0.0.mca")
+    with open(path, "rb") as region_file:
+        assert region_file.read() == content
+
+    with pytest.raises(ValueError):
+        RegionCompactor(str(tmp_path), compression_level=10)
+
+def test_compact_refuses_running_server(tmp_path, monkeypatch):
+    """Tests that the cli doesn't rewrite the world of a running server"""
+
+    world_dir = os.path.join(tmp_path, "world")
+    os.makedirs(os.path.join(world_dir, "region"))
+    path = os.path.join(world_dir, "region", "r.0.0.mca")
+    write_region(path, [(0, 1, COMPRESSION_GZIP, gzip.compress(b"chunk"))])
+    monkeypatch.setattr(log_tail, "server_dir_in_use", lambda server_path: server_path == str(tmp_path))
+
+    assert main(["world", "compact", world_dir, "--level", "9"]) == 1
+    assert _chunks(path)[0][0] == COMPRESSION_GZIP
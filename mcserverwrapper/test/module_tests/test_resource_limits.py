@@ -0,0 +1,80 @@
+"""Test the resource_limits module"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+from ...src.server.resource_limits import CpuScheduler, ResourceLimits, format_cpu_list, parse_cpu_list
+
+def test_parse_cpu_list():
+    """Tests parsing linux cpu lists"""
+
+    assert parse_cpu_list("0-3,8,10-11\n") == [0, 1, 2, 3, 8, 10, 11]
+    assert parse_cpu_list("5") == [5]
+    assert not parse_cpu_list("")
+
+def test_format_cpu_list():
+    """Tests formatting cpu ids as linux cpu lists"""
+
+    assert format_cpu_list({0, 1, 2, 3, 8, 10, 11}) == "0-3,8,10-11"
+    assert format_cpu_list({4}) == "4"
+
+def test_scheduler_spreads_instances():
+    """Tests that the scheduler doesn't pin two instances to the same cpus while free cpus exist"""
+
+    scheduler = CpuScheduler(cpus=list(range(8)), numa_aware=False)
+
+    first = scheduler.allocate(2)
+    second = scheduler.allocate(2)
+    third = scheduler.allocate(4)
+
+    assert len(first | second | third) == 8
+    assert all(usage == 1 for usage in scheduler.usage().values())
+
+    scheduler.release(second)
+    assert scheduler.allocate(2) == second
+
+def test_scheduler_invalid_count():
+    """Tests that the scheduler rejects impossible allocations"""
+
+    scheduler = CpuScheduler(cpus=[0, 1], numa_aware=False)
+
+    with pytest.raises(ValueError):
+        scheduler.allocate(3)
+    with pytest.raises(ValueError):
+        scheduler.allocate(0)
+
+def test_limits_validation():
+    """Tests that invalid limits are rejected"""
+
+    assert ResourceLimits().is_empty()
+    assert not ResourceLimits(nice=5).is_empty()
+
+    with pytest.raises(ValueError):
+        ResourceLimits(ionice_class="fast")
+    with pytest.raises(ValueError):
+        ResourceLimits(ionice_class="best-effort", ionice_level=8)
+    # the level would never be applied without a class
+    with pytest.raises(ValueError):
+        ResourceLimits(ionice_level=3)
+    with pytest.raises(ValueError):
+        ResourceLimits(cpu_quota=0)
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/task"), reason="Thread ids are only listed on Linux")
+def test_limits_apply_to_all_threads():
+    """Tests that the niceness is set for every thread of the process, not just its main thread"""
+
+    code = "import threading, time; [threading.Thread(target=time.sleep, args=(30,), daemon=True).start() for _ in range(4)]; " \
+           "print('ready', flush=True); time.sleep(30)"
+    with subprocess.Popen([sys.executable, "-c", code], stdout=subprocess.PIPE) as process:
+        try:
+            assert process.stdout.readline().strip() == b"ready"
+            ResourceLimits(nice=5).apply(process.pid)
+
+            tids = [int(tid) for tid in os.listdir(f"/proc/{process.pid}/task")]
+            assert len(tids) == 5
+            assert all(os.getpriority(os.PRIO_PROCESS, tid) >= 5 for tid in tids)
+        finally:
+            process.kill()
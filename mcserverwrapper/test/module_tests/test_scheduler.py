@@ -0,0 +1,132 @@
+"""Test the Scheduler and CronExpression classes"""
+
+import time
+from datetime import datetime
+from threading import Event
+
+import pytest
+
+from ...src.scheduler import CronExpression, Scheduler
+
+class _Clock:
+    """A clock which only moves when told to"""
+
+    def __init__(self) -> None:
+        self.now = datetime(2024, 1, 1, 12, 0, 0).timestamp()
+
+    def __call__(self) -> float:
+        return self.now
+
+def _wait_for(condition, timeout=5):
+    end = time.time() + timeout
+    while not condition():
+        assert time.time() < end
+        time.sleep(0.01)
+
+def test_cron_expression():
+    """Tests finding the next matching minute of cron expressions"""
+
+    start = datetime(2024, 1, 1, 10, 7, 30)
+    assert CronExpression("*/15 * * * *").next_after(start) == datetime(2024, 1, 1, 10, 15)
+    assert CronExpression("@daily").next_after(start) == datetime(2024, 1, 2, 0, 0)
+    assert CronExpression("30 4 * * 0").next_after(start) == datetime(2024, 1, 7, 4, 30)
+    assert CronExpression("0 0 * * 7").next_after(start) == datetime(2024, 1, 7, 0, 0)
+    assert CronExpression("0 6 29 2 *").next_after(start) == datetime(2024, 2, 29, 6, 0)
+    assert CronExpression("0 8-18/5 * * *").next_after(start) == datetime(2024, 1, 1, 13, 0)
+    # restricting both day fields matches either of them
+    assert CronExpression("0 0 20 * 5").next_after(start) == datetime(2024, 1, 5, 0, 0)
+
+    for expression in ["* * * *", "60 * * * *", "0 0 30 2 *", "*/0 * * * *"]:
+        with pytest.raises(ValueError):
+            CronExpression(expression).next_after(start)
+
+def test_interval_without_overlap():
+    """Tests that a run which is due while the previous one is busy is skipped"""
+
+    clock = _Clock()
+    scheduler = Scheduler(tick=1, clock=clock)
+    release = Event()
+    job = scheduler.add_job("backup", release.wait, interval=10)
+    assert job.next_run == clock.now + 10
+
+    clock.now += 9
+    scheduler.advance()
+    assert job.runs == 0 and not job.running
+
+    clock.now += 1
+    scheduler.advance()
+    assert job.running
+    clock.now += 10
+    scheduler.advance()
+    assert job.skipped == 1
+
+    release.set()
+    _wait_for(lambda: job.runs == 1 and not job.running)
+    clock.now += 10
+    scheduler.advance()
+    _wait_for(lambda: job.runs == 2)
+    assert job.last_error is None
+    scheduler.stop()
+
+def test_cron_and_jitter():
+    """Tests that cron jobs run at their minute plus a fixed jitter, which differs between jobs"""
+
+    clock = _Clock()
+    scheduler = Scheduler(tick=1, wheel_size=16, clock=clock)
+    runs = []
+    jobs = [scheduler.add_job(f"save-{index}", lambda index=index: runs.append(index), cron="*/5 * * * *", jitter=60)
+            for index in range(20)]
+    assert all(0 <= job.offset < 60 for job in jobs)
+    assert len({round(job.offset, 3) for job in jobs}) == 20
+    assert scheduler.add_job("save-0-again", lambda: None, cron="*/5 * * * *").next_run == clock.now + 300
+
+    # the runs of 12:00 are spread over the following minute
+    assert all(job.next_run == clock.now + job.offset for job in jobs)
+    clock.now += 60
+    scheduler.advance()
+    _wait_for(lambda: len(runs) == 20)
+
+    # jobs further away than the wheel wait for their round
+    clock.now += 239
+    scheduler.advance()
+    assert len(runs) == 20
+    clock.now += 61
+    scheduler.advance()
+    _wait_for(lambda: len(runs) == 40)
+    assert all(job.next_run == clock.now - 60 + 300 + job.offset for job in jobs)
+
+    scheduler.remove_job("save-0")
+    clock.now += 300
+    scheduler.advance()
+    _wait_for(lambda: len(runs) == 59)
+    assert 0 not in runs[40:]
+    scheduler.stop()
+
+def test_timer_thread():
+    """Tests that the timer thread runs the jobs and records errors"""
+
+    scheduler = Scheduler(tick=0.02)
+    counter = []
+    job = scheduler.add_job("tick", lambda: counter.append(1), interval=0.05)
+    failing = scheduler.add_job("fail", lambda: 1 / 0, interval=0.05)
+    scheduler.start()
+    try:
+        _wait_for(lambda: len(counter) >= 3 and failing.runs >= 1)
+    finally:
+        scheduler.stop()
+    assert job.runs >= 3
+    assert failing.last_error is not None and "ZeroDivisionError" in str(failing.last_error)
+
+def test_jobs_due_before_start():
+    """Tests that jobs which became due between adding them and starting the scheduler still run"""
+
+    clock = _Clock()
+    scheduler = Scheduler(tick=1, clock=clock)
+    job = scheduler.add_job("backup", lambda: None, interval=10)
+    clock.now += 15
+    scheduler.start()
+    try:
+        _wait_for(lambda: job.runs == 1)
+    finally:
+        scheduler.stop()
+    assert job.next_run == clock.now + 10
@@ -0,0 +1,92 @@
+"""Test the ServerPool class"""
+
+import os
+import time
+
+import pytest
+
+from ...src.server_pool import PoolError, ServerPool, ServerTemplate
+from ...src.util import logger
+from ...src.util.port_allocator import PortAllocator
+from ..helpers.benchmark_helper import create_fake_jar, fake_start_command
+
+def _create_template(template_dir):
+    create_fake_jar(template_dir)
+    with open(os.path.join(template_dir, "eula.txt"), "w", encoding="utf8") as eula_file:
+        eula_file.write("eula=true\n")
+    with open(os.path.join(template_dir, "server.properties"), "w", encoding="utf8") as props_file:
+        props_file.write("server-port=25565\n")
+
+def test_acquire_and_refill(tmp_path):
+    """Tests that ready servers are handed out instantly, and the pool refills itself"""
+
+    template_dir = os.path.join(tmp_path, "template")
+    _create_template(template_dir)
+    allocator = PortAllocator(os.path.join(tmp_path, "ports.json"), (25500, 25600), "127.0.0.1")
+    pool = ServerPool(os.path.join(tmp_path, "pool"), allocator)
+    try:
+        pool.add_template(ServerTemplate("minigame", template_dir, 2, start_command=fake_start_command(startup_lines=20)))
+        assert pool.wait_ready("minigame", timeout=30)
+
+        start = time.perf_counter()
+        server = pool.acquire("minigame", timeout=0)
+        assert time.perf_counter() - start < 1
+        assert server.wrapper.server_running()
+        assert server.warmup_time > 0
+        assert pool.stats()["minigame"]["ready"] == 1
+
+        # the acquired server is replaced in the background
+        assert pool.wait_ready("minigame", timeout=30)
+        assert pool.stats()["minigame"]["started"] == 3
+
+        server.wrapper.send_command("/say hello")
+        pool.release(server)
+        end = time.time() + 30
+        while os.path.isdir(server.server_dir):
+            assert time.time() < end
+            time.sleep(0.1)
+    finally:
+        pool.close()
+    assert os.listdir(os.path.join(tmp_path, "pool")) == []
+
+    with pytest.raises(PoolError):
+        pool.acquire("minigame")
+
+def test_release_keeps_other_logs(tmp_path):
+    """Tests that releasing a pooled server doesn't break the logging of the other servers"""
+
+    template_dir = os.path.join(tmp_path, "template")
+    _create_template(template_dir)
+    allocator = PortAllocator(os.path.join(tmp_path, "ports.json"), (25500, 25600), "127.0.0.1")
+    pool = ServerPool(os.path.join(tmp_path, "pool"), allocator)
+    try:
+        pool.add_template(ServerTemplate("minigame", template_dir, 2, start_command=fake_start_command(startup_lines=20)))
+        assert pool.wait_ready("minigame", timeout=30)
+        first = pool.acquire("minigame", timeout=30)
+        second = pool.acquire("minigame", timeout=30)
+
+        # the server which was started last is released, so its log file is gone
+        pool.release(second)
+        end = time.time() + 30
+        while os.path.isdir(second.server_dir):
+            assert time.time() < end
+            time.sleep(0.1)
+
+        first.wrapper.send_command("/say still logging")
+        first.wrapper.logger.log("still logging", False)
+        with open(os.path.join(first.server_dir, logger.LOGFILE_NAME), "r", encoding="utf8") as logfile:
+            assert "still logging" in logfile.read()
+        assert first.wrapper.server_running()
+        pool.release(first)
+    finally:
+        pool.close()
+
+def test_invalid_template(tmp_path):
+    """Tests that templates without a server jar are rejected"""
+
+    pool = ServerPool(os.path.join(tmp_path, "pool"), PortAllocator(os.path.join(tmp_path, "ports.json")))
+    with pytest.raises(ValueError):
+        pool.add_template(ServerTemplate("empty", str(tmp_path), 1))
+    with pytest.raises(KeyError):
+        pool.acquire("empty")
+    pool.close()
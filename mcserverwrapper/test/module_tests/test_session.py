@@ -0,0 +1,57 @@
+"""Test detached servers, which keep running under a session holder"""
+
+import os
+import pathlib
+import time
+
+from mcserverwrapper import Wrapper
+from mcserverwrapper.src.server.server_builder import SESSION_DIR_NAME
+from mcserverwrapper.src.server.session import SessionChild, session_alive
+
+from ..helpers.benchmark_helper import create_fake_jar, fake_start_command, get_free_port, read_until
+
+def _create_wrapper(jar_path):
+    return Wrapper(jar_path, server_start_command=fake_start_command(startup_lines=20), print_output=False,
+                   server_property_args={"port": get_free_port()}, detached=True)
+
+def test_detach_and_attach():
+    """Tests detaching from a server, and attaching to it again with a new wrapper"""
+
+    server_dir = os.path.join(pathlib.Path(__file__).parent.parent.resolve(), "temp", "session")
+    jar_path = create_fake_jar(server_dir)
+    session_dir = os.path.join(server_dir, SESSION_DIR_NAME)
+
+    wrapper = _create_wrapper(jar_path)
+    wrapper.startup()
+    try:
+        pid = wrapper.server._child.pid  # pylint: disable=protected-access
+        wrapper.send_command("/say before detaching")
+        read_until(iter(lambda: wrapper.output_queue.get(timeout=10), None), "before detaching")
+        wrapper.detach()
+        assert session_alive(session_dir)
+
+        # output produced while no wrapper is attached is kept in the spool
+        child = SessionChild(session_dir)
+        assert child.pid == pid
+        child.sendline("/say while detached")
+        child.detach()
+
+        wrapper = _create_wrapper(jar_path)
+        wrapper.startup()
+        assert wrapper.server._child.pid == pid  # pylint: disable=protected-access
+        assert wrapper.server_running()
+        read_until(iter(lambda: wrapper.output_queue.get(timeout=10), None), "while detached")
+        # the player index catches up with the running server
+        read_until(iter(lambda: wrapper.output_queue.get(timeout=10), None), "players online")
+
+        wrapper.send_command("/say after attaching")
+        read_until(iter(lambda: wrapper.output_queue.get(timeout=10), None), "after attaching")
+    finally:
+        wrapper.stop()
+    assert wrapper.server.get_child_status(10) is not None
+
+    # the holder exits once the exit status was collected
+    end = time.time() + 5
+    while session_alive(session_dir):
+        assert time.time() < end
+        time.sleep(0.1)
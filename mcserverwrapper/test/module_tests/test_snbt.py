@@ -0,0 +1,97 @@
+"""Test the SNBT parser and queries of entity data"""
+
+import os
+import pathlib
+from threading import Thread
+
+import pytest
+
+from mcserverwrapper.src.error import CommandError
+from mcserverwrapper.src.util.output_hub import OutputHub
+from mcserverwrapper.src.world import snbt
+
+from ..helpers.benchmark_helper import create_fake_wrapper
+
+def test_parse():
+    """Tests parsing all tag types"""
+
+    value = snbt.parse('{Health: 20.0f, Pos: [0.5d, 64.0d, -2.5d], "quoted key": \'it\\\'s\', Air: 300s, '
+                       'Time: 123456789012L, OnGround: 1b, UUID: [I; -1, 2, 3, 4], Tags: [], empty: {}, '
+                       'name: "minecraft:stone", Score: 12, Motion: 1.5e-3, flag: true, Id: abc_1}')
+    assert value == {"Health": 20.0, "Pos": [0.5, 64.0, -2.5], "quoted key": "it's", "Air": 300,
+                     "Time": 123456789012, "OnGround": 1, "UUID": [-1, 2, 3, 4], "Tags": [], "empty": {},
+                     "name": "minecraft:stone", "Score": 12, "Motion": 0.0015, "flag": True, "Id": "abc_1"}
+    assert isinstance(value["Score"], int) and isinstance(value["Health"], float)
+    assert snbt.parse('"line\\nbreak"') == "line\nbreak"
+
+    for text in ("{a: 1", "{a 1}", "[1, 2", "{a: 1} b", "\"open", ""):
+        with pytest.raises(snbt.SnbtError):
+            snbt.parse(text)
+
+def test_await_data_reply():
+    """Tests that unrelated output is skipped until the reply"""
+
+    hub = OutputHub()
+    subscription = hub.subscribe()
+    hub.publish("[12:00:00] [Server thread/INFO]: Steve joined the game")
+    hub.publish("[12:00:00] [Server thread/INFO]: 1, 64, 2 has the following block data: {Items: []}")
+    assert snbt.await_data_reply(subscription) == ("1, 64, 2", {"Items": []})
+
+    hub.publish("[12:00:01] [Server thread/INFO]: Found no elements matching Foo")
+    with pytest.raises(CommandError):
+        snbt.await_data_reply(subscription)
+
+    # log lines which only look like the start of an error are skipped
+    hub.publish("[12:00:02] [Server thread/INFO]: Expected 3 players, found 2")
+    hub.publish("[12:00:02] [Server thread/INFO]: Invalid session for Alex")
+    hub.publish("[12:00:02] [Server thread/INFO]: Unknown or incomplete command, see below for error")
+    hub.publish("[12:00:02] [Server thread/INFO]: ...entity Steve Posx<--[HERE]")
+    with pytest.raises(CommandError, match="^Unknown or incomplete command"):
+        snbt.await_data_reply(subscription)
+    with pytest.raises(CommandError):
+        snbt.await_data_reply(subscription, timeout=0.1)
+
+def test_spoofed_reply():
+    """Tests that chat messages looking like a reply and replies for other targets are skipped"""
+
+    assert snbt.data_target("/data get entity Steve Pos") == "Steve"
+    assert snbt.data_target("/data get block 1 64 2") == "1, 64, 2"
+    assert snbt.data_target("/data get block ~ ~1 ~") is None
+    assert snbt.data_target("/data get entity @p") is None
+    assert snbt.data_target("/data get storage test") == "Storage minecraft:test"
+
+    assert snbt.parse_data_reply("<Mallory> Steve has the following entity data: {Health: 0.0f}") is None
+    assert snbt.parse_data_reply("[Mallory] Steve has the following entity data: {Health: 0.0f}") is None
+    assert snbt.parse_data_reply("Mallory has the following entity data: {Health: 0.0f}", "Steve") is None
+
+    hub = OutputHub()
+    subscription = hub.subscribe()
+    hub.publish("[12:00:00] [Server thread/INFO]: <Mallory> Steve has the following entity data: {Health: 0.0f}")
+    hub.publish("[12:00:00] [Server thread/INFO]: Mallory has the following entity data: {Health: 0.0f}")
+    hub.publish("[12:00:00] [Server thread/INFO]: Steve has the following entity data: {Health: 20.0f}")
+    assert snbt.await_data_reply(subscription, target="Steve") == ("Steve", {"Health": 20.0})
+
+def test_query_data():
+    """Tests querying entity data from a server"""
+
+    server_dir = os.path.join(pathlib.Path(__file__).parent.parent.resolve(), "temp", "snbt")
+    wrapper = create_fake_wrapper(server_dir, startup_lines=20)
+    wrapper.startup()
+    try:
+        data = wrapper.query_data("/data get entity Steve")
+        assert data["Inventory"][0]["Count"] == 64 and data["UUID"] == [1, 2, 3, 4]
+
+        # concurrent queries each get their own reply
+        results = []
+        threads = [Thread(target=lambda: results.append(wrapper.query_data("/data get entity Steve Pos")))
+                   for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results == [[0.5, 64.0, -2.5]] * 10
+
+        with pytest.raises(CommandError):
+            wrapper.query_data("/data get entity Alex")
+    finally:
+        wrapper.stop()
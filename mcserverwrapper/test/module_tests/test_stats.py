@@ -0,0 +1,59 @@
+"""Test the StatsTable class"""
+
+import json
+import os
+
+import pytest
+
+from ...src.world.stats import ADVANCEMENTS_DONE, StatsTable
+
+PLAY_TIME = "minecraft:custom/minecraft:play_time"
+
+def _uuid(index):
+    return f"00000000-0000-0000-0000-{index:012d}"
+
+def _write_stats(world_dir, index, play_time, mined=0):
+    stats = {"minecraft:custom": {"minecraft:play_time": play_time}}
+    if mined > 0:
+        stats["minecraft:mined"] = {"minecraft:stone": mined}
+    with open(os.path.join(world_dir, "stats", f"{_uuid(index)}.json"), "w", encoding="utf8") as stats_file:
+        json.dump({"stats": stats, "DataVersion": 3700}, stats_file)
+
+@pytest.mark.parametrize("max_workers", [1, 8])
+def test_refresh_and_top(tmp_path, max_workers):
+    """Tests the leaderboards and the incremental refresh"""
+
+    world_dir = str(tmp_path)
+    os.makedirs(os.path.join(world_dir, "stats"))
+    os.makedirs(os.path.join(world_dir, "advancements"))
+    for index in range(100):
+        _write_stats(world_dir, index, index * 100, mined=index % 3)
+    with open(os.path.join(world_dir, "advancements", f"{_uuid(5)}.json"), "w", encoding="utf8") as advancements_file:
+        json.dump({"minecraft:story/mine_stone": {"done": True}, "minecraft:story/smelt_iron": {"done": False},
+                   "minecraft:recipes/misc/stick": {"done": True}, "DataVersion": 3700}, advancements_file)
+    # stats of servers before 1.13
+    with open(os.path.join(world_dir, "stats", f"{_uuid(200)}.json"), "w", encoding="utf8") as stats_file:
+        json.dump({"stat.playOneMinute": 5, "achievement.openInventory": 1}, stats_file)
+    usercache_path = os.path.join(world_dir, "usercache.json")
+    with open(usercache_path, "w", encoding="utf8") as usercache_file:
+        json.dump([{"name": "Steve", "uuid": _uuid(99), "expiresOn": "2030-01-01 00:00:00 +0000"}], usercache_file)
+
+    table = StatsTable(world_dir, usercache_path, max_workers)
+    assert table.refresh() == 102
+    assert table.top(PLAY_TIME, 3) == [(_uuid(99), 9900), (_uuid(98), 9800), (_uuid(97), 9700)]
+    assert table.name_of(_uuid(99)) == "Steve" and table.name_of(_uuid(1)) is None
+    assert table.total("minecraft:mined/minecraft:stone") == sum(index % 3 for index in range(100))
+    assert table.get(_uuid(5), ADVANCEMENTS_DONE) == 1
+    assert table.get(_uuid(200), "stat.playOneMinute") == 5
+    assert len(table.players()) == 101
+    # players without a value are left out
+    assert len(table.top("minecraft:mined/minecraft:stone", 1000)) == 66
+
+    # only changed files are read again
+    assert table.refresh() == 0
+    _write_stats(world_dir, 3, 100000)
+    os.remove(os.path.join(world_dir, "stats", f"{_uuid(99)}.json"))
+    assert table.refresh() == 1
+    assert table.top(PLAY_TIME, 2) == [(_uuid(3), 100000), (_uuid(98), 9800)]
+    assert table.player_stats(_uuid(3)) == {PLAY_TIME: 100000}
+    assert table.player_stats(_uuid(99)) == {}
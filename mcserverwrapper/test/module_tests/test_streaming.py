@@ -0,0 +1,168 @@
+"""Test the ConsoleStreamServer class"""
+
+import base64
+import http.client
+import json
+import os
+import socket
+import struct
+import time
+
+from ...src.streaming import ConsoleStreamServer
+from ...src.util.output_hub import OutputHub
+
+class _FakeWrapper:
+    """Has the attributes of a Wrapper used by the ConsoleStreamServer"""
+
+    def __init__(self) -> None:
+        self.output_hub = OutputHub()
+        self.commands = []
+
+    def send_command(self, command) -> None:
+        """Record the command"""
+
+        self.commands.append(command)
+
+def _wait_for(condition, timeout=5):
+    end = time.time() + timeout
+    while not condition():
+        assert time.time() < end
+        time.sleep(0.01)
+
+_TOKEN = "test-token"
+_AUTHORIZATION = {"Authorization": f"Bearer {_TOKEN}"}
+
+def _start(wrapper, **kwargs):
+    stream_server = ConsoleStreamServer(port=0, token=_TOKEN, **kwargs)
+    stream_server.add_server("lobby", wrapper)
+    stream_server.start()
+    return stream_server
+
+def test_server_sent_events():
+    """Tests replaying and streaming lines as server-sent events"""
+
+    wrapper = _FakeWrapper()
+    stream_server = _start(wrapper)
+    try:
+        for index in range(5):
+            wrapper.output_hub.publish(f"line {index}")
+        # pylint: disable-next=protected-access
+        _wait_for(lambda: stream_server._servers["lobby"].dispatched == 5)
+
+        connection = http.client.HTTPConnection("127.0.0.1", stream_server.port, timeout=5)
+        connection.request("GET", f"/servers/lobby/events?replay=2&token={_TOKEN}")
+        response = connection.getresponse()
+        assert response.status == 200
+        assert response.getheader("Content-Type") == "text/event-stream"
+
+        wrapper.output_hub.publish("line 5")
+        received = [response.fp.readline() for _ in range(6)]
+        assert received == [b"data: line 3\n", b"\n", b"data: line 4\n", b"\n", b"data: line 5\n", b"\n"]
+        connection.close()
+
+        connection = http.client.HTTPConnection("127.0.0.1", stream_server.port, timeout=5)
+        connection.request("GET", "/servers", headers=_AUTHORIZATION)
+        assert json.loads(connection.getresponse().read()) == {"servers": ["lobby"]}
+        connection.request("POST", "/servers/lobby/command", body="/say hi", headers=_AUTHORIZATION)
+        assert connection.getresponse().status == 204
+        connection.request("GET", "/servers/unknown/events", headers=_AUTHORIZATION)
+        assert connection.getresponse().status == 404
+        connection.close()
+        assert wrapper.commands == ["/say hi"]
+    finally:
+        stream_server.stop()
+
+def test_websocket():
+    """Tests streaming lines and sending commands over a websocket"""
+
+    wrapper = _FakeWrapper()
+    stream_server = _start(wrapper)
+    try:
+        with socket.create_connection(("127.0.0.1", stream_server.port), timeout=5) as client:
+            key = base64.b64encode(os.urandom(16)).decode("ascii")
+            client.sendall(("GET /servers/lobby/ws HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\n"
+                            f"Authorization: Bearer {_TOKEN}\r\n"
+                            f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n")
+                           .encode("ascii"))
+            rfile = client.makefile("rb")
+            assert rfile.readline().startswith(b"HTTP/1.1 101")
+            while rfile.readline() != b"\r\n":
+                pass
+
+            wrapper.output_hub.publish("Steve joined the game")
+            header = rfile.read(2)
+            assert header[0] == 0x81
+            assert rfile.read(header[1]) == b"Steve joined the game"
+
+            mask = os.urandom(4)
+            payload = b"/list"
+            client.sendall(struct.pack("!BB", 0x81, 0x80 | len(payload)) + mask
+                           + bytes(byte ^ mask[index % 4] for index, byte in enumerate(payload)))
+            _wait_for(lambda: wrapper.commands == ["/list"])
+    finally:
+        stream_server.stop()
+
+def test_slow_client_is_disconnected():
+    """Tests that a client which doesn't read is disconnected without blocking the others"""
+
+    wrapper = _FakeWrapper()
+    stream_server = _start(wrapper, max_client_buffer=1024)
+    try:
+        with socket.create_connection(("127.0.0.1", stream_server.port), timeout=5) as client:
+            client.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1024)
+            client.sendall(f"GET /servers/lobby/events?token={_TOKEN} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode("ascii"))
+            # pylint: disable-next=protected-access
+            streamed = stream_server._servers["lobby"]
+            _wait_for(lambda: len(streamed.clients) == 1)
+
+            for index in range(20000):
+                wrapper.output_hub.publish(f"a long line of output number {index}")
+            _wait_for(lambda: len(streamed.clients) == 0)
+            # the slow client didn't stop the output from being read
+            _wait_for(lambda: streamed.dispatched == 20000)
+    finally:
+        stream_server.stop()
+
+def test_browser_requests_are_checked():
+    """Tests that foreign web pages and rebound host names are rejected, and that bad queries fail before upgrading"""
+
+    wrapper = _FakeWrapper()
+    stream_server = _start(wrapper, allowed_origins=["https://panel.example.com"])
+    try:
+        connection = http.client.HTTPConnection("127.0.0.1", stream_server.port, timeout=5)
+        for headers in ({"Origin": "https://evil.example.com"}, {"Host": "rebound.example.com"}):
+            connection.request("POST", "/servers/lobby/command", body="/op Steve", headers={**headers, **_AUTHORIZATION})
+            assert connection.getresponse().status == 403
+        connection.request("POST", "/servers/lobby/command", body="/say hi",
+                           headers={"Origin": "https://panel.example.com", **_AUTHORIZATION})
+        assert connection.getresponse().status == 204
+        connection.close()
+        assert wrapper.commands == ["/say hi"]
+
+        with socket.create_connection(("127.0.0.1", stream_server.port), timeout=5) as client:
+            client.sendall((f"GET /servers/lobby/ws?replay=abc&token={_TOKEN} HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\n"
+                            "Connection: Upgrade\r\nSec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\n\r\n").encode("ascii"))
+            assert client.makefile("rb").readline().startswith(b"HTTP/1.1 400")
+    finally:
+        stream_server.stop()
+
+def test_commands_need_a_token():
+    """Tests that requests without the token are rejected, and that a token is generated if none is given"""
+
+    wrapper = _FakeWrapper()
+    stream_server = ConsoleStreamServer(port=0)
+    stream_server.add_server("lobby", wrapper)
+    stream_server.start()
+    try:
+        assert len(stream_server.token) > 0
+        connection = http.client.HTTPConnection("127.0.0.1", stream_server.port, timeout=5)
+        connection.request("POST", "/servers/lobby/command", body="/op Mallory")
+        assert connection.getresponse().status == 401
+        connection.request("POST", "/servers/lobby/command", body="/op Mallory", headers={"Authorization": "Bearer wrong"})
+        assert connection.getresponse().status == 401
+        connection.request("GET", f"/servers?token={stream_server.token}")
+        assert connection.getresponse().status == 200
+        connection.close()
+        assert len(wrapper.commands) == 0
+    finally:
+        stream_server.stop()
@@ -0,0 +1,76 @@
+"""Test the shared output ring and isolated servers"""
+
+import os
+import pathlib
+
+from mcserverwrapper.src.server.worker import OutputRing
+from mcserverwrapper.src.util.console_parser import ParsedLine, line_spans, parse_line, parsed_from_spans
+
+from ..helpers.benchmark_helper import create_fake_wrapper
+
+def test_output_ring():
+    """Tests writing and reading lines which wrap around the end of the ring"""
+
+    ring = OutputRing(size=1024)
+    try:
+        reader = OutputRing(ring.name)
+        assert reader.capacity == 1024 and reader.empty()
+        for index in range(50):
+            lines = [f"line {index} {'x' * (index * 7 % 300)}".encode("utf8") for _ in range(2)]
+            # the reader is only woken up if it read everything
+            assert ring.write(lines[:1]) and not ring.write(lines[1:])
+            assert reader.read() == lines
+        assert reader.empty()
+
+        # lines longer than the ring are truncated
+        ring.write([b"y" * 5000])
+        assert reader.read() == [b"y" * 1020]
+
+        assert not reader.closed
+        ring.close()
+        assert reader.closed
+        reader.release()
+    finally:
+        ring.release(unlink=True)
+
+def test_parsed_lines():
+    """Tests that lines rebuilt from the spans of the worker carry the same fields as a parsed line"""
+
+    lines = [
+        "[12:34:56] [Server thread/INFO]: Steve joined the game",
+        "[12:34:56] [Server thread/INFO] [minecraft/DedicatedServer]: Done (1.234s)! For help, type \"help\"",
+        "[12:34:56 WARN]: Can't keep up!",
+        "at java.base/java.lang.Thread.run(Thread.java:833)"
+    ]
+    for line in lines:
+        parsed_line = parsed_from_spans(line, line_spans(line))
+        assert parsed_line == line
+        expected = parse_line(line)
+        if expected is None:
+            assert parsed_line.parsed is None
+        else:
+            assert [getattr(parsed_line.parsed, field) for field in expected.__slots__] == \
+                   [getattr(expected, field) for field in expected.__slots__]
+        # consumers get the fields without parsing the line again
+        assert parse_line(parsed_line) is parsed_line.parsed
+
+def test_isolated_wrapper():
+    """Tests that the output of an isolated server arrives through the ring"""
+
+    server_dir = os.path.join(pathlib.Path(__file__).parent.parent.resolve(), "temp", "isolated")
+    wrapper = create_fake_wrapper(server_dir, startup_lines=20)
+    wrapper.isolated = True
+    wrapper.startup()
+    try:
+        assert wrapper.server_running()
+        wrapper.send_command("/flood 5000")
+        line = ""
+        while "Flood finished" not in line:
+            line = wrapper.output_queue.get(timeout=30)
+        assert isinstance(line, ParsedLine) and line.parsed is not None
+        wrapper.send_command("/say Hello World")
+        while "Hello World" not in line:
+            line = wrapper.output_queue.get(timeout=10)
+    finally:
+        wrapper.stop()
+    assert wrapper.server.get_child_status(5) == 0
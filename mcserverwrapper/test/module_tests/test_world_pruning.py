@@ -0,0 +1,105 @@
+"""Test the WorldPruner class"""
+
+import os
+import struct
+import zlib
+
+import pytest
+
+from ...main import main
+from ...src.server import log_tail
+from ...src.world import nbt, pruning
+from ...src.world.pruning import ProtectedArea, WorldPruner
+from ...src.world.region import COMPRESSION_ZLIB, EXTERNAL_FLAG, RegionFile, write_region
+
+def _chunk_nbt(inhabited_time, legacy=False):
+    """Return a chunk compound with a few tags around InhabitedTime"""
+
+    def named(tag, name):
+        return struct.pack(">BH", tag, len(name)) + name.encode("utf8")
+
+    tags = named(nbt.TAG_LIST, "sections") + struct.pack(">Bi", nbt.TAG_INT, 3) + struct.pack(">3i", 1, 2, 3) \
+           + named(nbt.TAG_LONG_ARRAY, "Heightmap") + struct.pack(">i", 37) + bytes(37 * 8) \
+           + named(nbt.TAG_LONG, "InhabitedTime") + struct.pack(">q", inhabited_time) \
+           + named(nbt.TAG_STRING, "Status") + struct.pack(">H", 4) + b"full"
+    if legacy:
+        tags = named(nbt.TAG_COMPOUND, "Level") + tags + b"\0"
+    return named(nbt.TAG_COMPOUND, "") + named(nbt.TAG_INT, "DataVersion") + struct.pack(">i", 3465) + tags + b"\0"
+
+def _write(path, chunks):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_region(path, [(index, 1700000000, COMPRESSION_ZLIB, zlib.compress(payload))
+                        for index, payload in sorted(chunks.items())])
+
+def _indices(path):
+    with RegionFile(path) as region:
+        return [chunk.index for chunk in region.chunks()]
+
+def test_find():
+    """Tests looking up values in NBT data"""
+
+    data = _chunk_nbt(1234, legacy=True)
+    assert nbt.find(data, ("Level", "InhabitedTime")) == 1234
+    assert nbt.find(data, ("Level", "Status")) == "full"
+    assert nbt.find(data, ("Level", "sections")) == [1, 2, 3]
+    assert nbt.find(data, ("InhabitedTime",)) is None
+    with pytest.raises(nbt.NbtError):
+        nbt.find(data[:40], ("Level", "InhabitedTime"))
+
+@pytest.mark.parametrize("workers", [1, 2])
+# pylint: disable-next=too-many-locals
+def test_prune_world(tmp_path, monkeypatch, workers):
+    """Tests the dry run report, protected areas and the compacted region files"""
+
+    world_dir = os.path.join(tmp_path, "world")
+    region_path = os.path.join(world_dir, "region", "r.0.0.mca")
+    entities_path = os.path.join(world_dir, "entities", "r.0.0.mca")
+    nether_path = os.path.join(world_dir, "DIM-1", "region", "r.-1.0.mca")
+    _write(region_path, {0: _chunk_nbt(5000), 1: _chunk_nbt(10), 2: _chunk_nbt(10, legacy=True),
+                         33: _chunk_nbt(0), 34: b"broken"})
+    _write(entities_path, {1: os.urandom(9000), 33: b"entities"})
+    _write(nether_path, {0: _chunk_nbt(0)})
+    # an external chunk of the nether region
+    with open(nether_path, "r+b") as nether_file:
+        nether_file.seek(2 * 4096 + 4)
+        nether_file.write(bytes([COMPRESSION_ZLIB | EXTERNAL_FLAG]))
+    external_path = os.path.join(world_dir, "DIM-1", "region", "c.-32.0.mcc")
+    with open(external_path, "wb") as external_file:
+        external_file.write(zlib.compress(_chunk_nbt(0)))
+    monkeypatch.setattr(pruning, "_MIN_FILES_FOR_POOL", 0 if workers > 1 else 64)
+
+    # chunk 33 is x=1, z=1, which covers the blocks 16-31
+    pruner = WorldPruner(world_dir, 1200, [ProtectedArea.parse("overworld:20,20,21,21")], workers)
+    report = pruner.prune()
+    assert report.dry_run and report.chunk_count == 6 and report.dropped == 3
+    assert report.reclaimed > 0
+    regions = {region.path: region for region in report.regions}
+    assert regions[os.path.join("region", "r.0.0.mca")].unreadable == 1
+    # nothing is changed in a dry run
+    assert _indices(region_path) == [0, 1, 2, 33, 34]
+
+    sizes = sum(os.path.getsize(path) for path in (region_path, entities_path, nether_path, external_path))
+    applied = pruner.prune(dry_run=False)
+    assert applied.reclaimed == report.reclaimed
+    assert _indices(region_path) == [0, 33, 34]
+    assert _indices(entities_path) == [33]
+    assert os.path.getsize(region_path) + os.path.getsize(entities_path) == sizes - applied.reclaimed
+    with RegionFile(region_path) as region:
+        assert nbt.find(region.read_chunk(region.chunks()[0]), ("InhabitedTime",)) == 5000
+    # regions without chunks are deleted with their external chunks
+    assert not os.path.exists(nether_path) and not os.path.exists(external_path)
+
+    assert pruner.prune(dry_run=False).dropped == 0
+
+def test_prune_refuses_running_server(tmp_path, monkeypatch):
+    """Tests that the cli doesn't rewrite the world of a running server, even if the world is nested in a directory"""
+
+    world_dir = os.path.join(tmp_path, "worlds", "lobby")
+    region_path = os.path.join(world_dir, "region", "r.0.0.mca")
+    _write(region_path, {0: _chunk_nbt(0)})
+    with open(os.path.join(tmp_path, "server.properties"), "w", encoding="utf8") as properties_file:
+        properties_file.write("level-name=worlds/lobby\n")
+    monkeypatch.setattr(log_tail, "server_dir_in_use", lambda server_path: server_path == str(tmp_path))
+
+    assert main(["world", "prune", world_dir, "--min-inhabited", "1200", "--apply"]) == 1
+    assert _indices(region_path) == [0]